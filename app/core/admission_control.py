@@ -0,0 +1,303 @@
+"""
+准入控制与负载卸载
+Admission Control and Load Shedding
+
+特性:
+- 按路由类别（heavy / default）限制并发请求数
+- 超出并发的请求进入有界等待队列，排队超时或队列已满时直接返回 503 + Retry-After
+- 释放时将名额直接交给队首等待者，避免惊群
+- 健康检查、指标抓取和长连接事件流不参与准入控制
+- 后台执行的任务（如 MCP SSE 会话中的工具调用）通过 admission_slot 占用同一类别名额
+- 队列深度、执行中请求数、排队时间和卸载次数导出到 /metrics，被卸载的请求按路由类别标记
+"""
+
+import asyncio
+import json
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import (
+    API_PREFIX,
+    ADMISSION_HEAVY_MAX_CONCURRENT,
+    ADMISSION_HEAVY_MAX_QUEUE,
+    ADMISSION_DEFAULT_MAX_CONCURRENT,
+    ADMISSION_DEFAULT_MAX_QUEUE,
+    ADMISSION_QUEUE_TIMEOUT,
+)
+from app.core.logging import setup_logging
+from app.core.metrics import ROUTE_LABEL_SCOPE_KEY, get_metrics_registry
+from app.core.secure_logging import sanitize_for_log
+
+logger = setup_logging("INFO")
+
+HEAVY_CLASS = "heavy"
+DEFAULT_CLASS = "default"
+
+# 高开销路由（方法, 路径）
+HEAVY_ROUTES: Tuple[Tuple[str, str], ...] = (
+    ("POST", f"{API_PREFIX}/deploy/export"),
+    ("POST", f"{API_PREFIX}/deploy/deploy"),
+    ("POST", f"{API_PREFIX}/web-scraping/batch-requests"),
+    ("POST", f"{API_PREFIX}/models/refresh"),
+    ("POST", f"{API_PREFIX}/mcp/call-tool"),
+    # 与 /mcp/call-tool 执行相同的工具（JSON-RPC 单条/批量）
+    # /mcp/messages 立即返回 202、工具在会话后台任务中执行，由任务自行调用 admission_slot
+    ("POST", f"{API_PREFIX}/mcp/streamable"),
+)
+
+# 不参与准入控制的路径前缀
+EXEMPT_PREFIXES: Tuple[str, ...] = (
+    "/health",
+    f"{API_PREFIX}/health",
+    "/metrics",
+    f"{API_PREFIX}/events",
+    f"{API_PREFIX}/mcp/sse",
+)
+
+
+@dataclass(frozen=True)
+class RouteClass:
+    """路由类别限额"""
+    name: str
+    max_concurrent: int
+    max_queue: int
+    queue_timeout: float
+    retry_after: int = 1
+
+
+class AdmissionRejected(Exception):
+    """请求被拒绝（reason: queue_full / timeout）"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class ConcurrencyLimiter:
+    """并发限制器：固定名额 + 有界 FIFO 等待队列
+
+    只在单个事件循环内使用，所有状态修改都发生在循环线程上，无需加锁。
+    """
+
+    def __init__(self, route_class: RouteClass):
+        self.route_class = route_class
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.shed = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self):
+        """获取名额，失败时抛出 AdmissionRejected"""
+        if self.active < self.route_class.max_concurrent and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+
+        if len(self._waiters) >= self.route_class.max_queue:
+            self.shed += 1
+            raise AdmissionRejected("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.route_class.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # 超时与名额移交同时发生：已获得名额
+                self.admitted += 1
+                return
+            waiter.cancel()
+            self._remove_waiter(waiter)
+            self.shed += 1
+            raise AdmissionRejected("timeout")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # 已获得名额但请求被取消，归还名额
+                self.release()
+            else:
+                waiter.cancel()
+                self._remove_waiter(waiter)
+            raise
+        self.admitted += 1
+
+    def _remove_waiter(self, waiter: asyncio.Future):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self):
+        """释放名额：优先直接移交给队首等待者"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "class": self.route_class.name,
+            "max_concurrent": self.route_class.max_concurrent,
+            "max_queue": self.route_class.max_queue,
+            "active": self.active,
+            "queue_depth": self.queue_depth,
+            "admitted": self.admitted,
+            "shed": self.shed,
+        }
+
+
+def default_route_classes() -> List[RouteClass]:
+    return [
+        RouteClass(HEAVY_CLASS, ADMISSION_HEAVY_MAX_CONCURRENT, ADMISSION_HEAVY_MAX_QUEUE,
+                   ADMISSION_QUEUE_TIMEOUT, retry_after=5),
+        RouteClass(DEFAULT_CLASS, ADMISSION_DEFAULT_MAX_CONCURRENT, ADMISSION_DEFAULT_MAX_QUEUE,
+                   ADMISSION_QUEUE_TIMEOUT, retry_after=1),
+    ]
+
+
+class AdmissionControlMiddleware:
+    """准入控制中间件（纯 ASGI）"""
+
+    def __init__(self, app, route_classes: Optional[Sequence[RouteClass]] = None,
+                 heavy_routes: Sequence[Tuple[str, str]] = HEAVY_ROUTES,
+                 exempt_prefixes: Sequence[str] = EXEMPT_PREFIXES):
+        self.app = app
+        self.limiters: Dict[str, ConcurrencyLimiter] = {
+            rc.name: ConcurrencyLimiter(rc) for rc in (route_classes or default_route_classes())
+        }
+        self.heavy_routes = {(method, path.rstrip("/")) for method, path in heavy_routes}
+        self.exempt_prefixes = tuple(exempt_prefixes)
+
+        registry = get_metrics_registry()
+        self.shed_total = registry.counter(
+            "lazyai_admission_shed_total", "准入控制拒绝的请求数", ("class", "reason")
+        )
+        self.wait_seconds = registry.histogram(
+            "lazyai_admission_wait_seconds", "准入控制排队时间（秒）", ("class",)
+        )
+        # 仅导出最近构建的中间件实例的状态，避免重复的指标族
+        global _current_middleware
+        _current_middleware = self
+        registry.register_collector(_collect_admission_metrics)
+
+    def classify(self, method: str, path: str) -> Optional[str]:
+        """返回路由类别，None 表示不参与准入控制"""
+        if path.startswith(self.exempt_prefixes):
+            return None
+        if (method, path.rstrip("/")) in self.heavy_routes:
+            return HEAVY_CLASS
+        if not path.startswith(API_PREFIX):
+            # 静态资源不占用 API 名额
+            return None
+        return DEFAULT_CLASS
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        class_name = self.classify(scope["method"], scope["path"])
+        limiter = self.limiters.get(class_name) if class_name else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self._acquire(limiter, f"{scope['method']} {scope['path']}")
+        except AdmissionRejected:
+            # 请求未进入路由，按类别标记指标中的路由标签
+            scope[ROUTE_LABEL_SCOPE_KEY] = f"<shed:{class_name}>"
+            await self._send_busy(send, limiter.route_class)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+    async def _acquire(self, limiter: ConcurrencyLimiter, description: str):
+        """获取名额并记录排队时间，拒绝时记录卸载指标后抛出 AdmissionRejected"""
+        class_name = limiter.route_class.name
+        start = time.perf_counter()
+        try:
+            await limiter.acquire()
+        except AdmissionRejected as rejected:
+            self.shed_total.inc((class_name, rejected.reason))
+            logger.warning(f"Request shed ({class_name}, {rejected.reason}): {sanitize_for_log(description)}")
+            raise
+        self.wait_seconds.observe(time.perf_counter() - start, (class_name,))
+
+    @asynccontextmanager
+    async def slot(self, class_name: str, description: str) -> AsyncIterator[None]:
+        """在请求之外占用类别名额（未配置该类别时不限制）"""
+        limiter = self.limiters.get(class_name)
+        if limiter is None:
+            yield
+            return
+        await self._acquire(limiter, description)
+        try:
+            yield
+        finally:
+            limiter.release()
+
+    @staticmethod
+    async def _send_busy(send, route_class: RouteClass):
+        body = json.dumps({
+            "success": False,
+            "message": "Server is busy, please retry later",
+        }).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"retry-after", str(route_class.retry_after).encode("latin-1")),
+                (b"cache-control", b"no-store"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    def get_status(self) -> List[Dict[str, Any]]:
+        return [limiter.get_status() for limiter in self.limiters.values()]
+
+
+# 当前生效的准入控制中间件
+_current_middleware: Optional[AdmissionControlMiddleware] = None
+
+
+def get_admission_status() -> List[Dict[str, Any]]:
+    """获取各路由类别的准入控制状态"""
+    return _current_middleware.get_status() if _current_middleware is not None else []
+
+
+@asynccontextmanager
+async def admission_slot(class_name: str, description: str) -> AsyncIterator[None]:
+    """为后台任务占用当前准入控制中间件的类别名额
+
+    准入控制未启用时不限制；名额不足时抛出 AdmissionRejected。
+    """
+    middleware = _current_middleware
+    if middleware is None:
+        yield
+        return
+    async with middleware.slot(class_name, description):
+        yield
+
+
+def _collect_admission_metrics():
+    status = get_admission_status()
+    return [
+        ("lazyai_admission_queue_depth", "gauge", "准入控制等待队列深度",
+         [({"class": s["class"]}, s["queue_depth"]) for s in status]),
+        ("lazyai_admission_in_flight", "gauge", "准入控制执行中请求数",
+         [({"class": s["class"]}, s["active"]) for s in status]),
+    ]
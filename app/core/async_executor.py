@@ -0,0 +1,308 @@
+"""
+阻塞操作异步执行层
+Async Facade for Blocking Services
+
+特性:
+- 存储（TinyDB）与文件 I/O 使用独立的有界线程池，互不阻塞
+- 同步 MCP 工具按分类使用独立线程池（如 github=8、system=1），慢工具不会拖住其他分类
+- 每个线程池限制排队任务数，超出时在事件循环上等待而不是无限堆积
+- AsyncServiceProxy 将同步服务的方法包装为可 await 的协程
+- 线程池排队时间、执行时间和队列深度导出到 /metrics
+- LoopBlockingMonitor 中间件检测在事件循环上同步执行超过阈值的请求
+"""
+
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from app.core.config import (
+    STORAGE_POOL_WORKERS,
+    FILE_IO_POOL_WORKERS,
+    BLOCKING_POOL_MAX_PENDING,
+    MCP_TOOL_POOL_WORKERS,
+    MCP_TOOL_POOL_DEFAULT_WORKERS,
+)
+from app.core.logging import setup_logging
+from app.core.metrics import get_metrics_registry, route_template
+from app.core.secure_logging import sanitize_for_log
+
+logger = setup_logging("INFO")
+
+T = TypeVar("T")
+
+STORAGE_POOL = "storage"
+FILE_IO_POOL = "file_io"
+TOOL_POOL_PREFIX = "mcp-"
+
+
+class BlockingPool:
+    """有界阻塞线程池"""
+
+    def __init__(self, name: str, max_workers: int, max_pending: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"lazyai-{name}")
+        self._semaphores: Dict[asyncio.AbstractEventLoop, asyncio.Semaphore] = {}
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.active = 0
+        self.completed = 0
+
+        registry = get_metrics_registry()
+        self._queue_time = registry.histogram(
+            "lazyai_blocking_pool_queue_seconds", "阻塞线程池排队时间（秒）", ("pool",)
+        )
+        self._run_time = registry.histogram(
+            "lazyai_blocking_pool_run_seconds", "阻塞线程池执行时间（秒）", ("pool",)
+        )
+        self._labels = (name,)
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        """每个事件循环一个信号量（asyncio.Semaphore 绑定创建时的循环）"""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            with self._lock:
+                # 清理已关闭循环的信号量
+                for stale in [l for l in self._semaphores if l.is_closed()]:
+                    del self._semaphores[stale]
+                semaphore = self._semaphores.setdefault(loop, asyncio.Semaphore(self.max_workers + self.max_pending))
+        return semaphore
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """在线程池中执行阻塞函数"""
+        result, _, _ = await self.run_measured(func, *args, **kwargs)
+        return result
+
+    async def run_measured(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> Tuple[T, float, float]:
+        """在线程池中执行阻塞函数，返回 (结果, 排队时间, 执行时间)
+
+        排队时间从调用开始计算，包含等待排队名额和等待空闲线程。
+        任务在线程取走前被取消时，由事件循环一侧扣减排队计数。
+        """
+        submitted = time.perf_counter()
+        timing = [0.0, 0.0]
+        queued = [True]  # 排队计数只由先到的一方（工作线程或取消路径）扣减
+
+        def dequeue():
+            with self._lock:
+                if queued[0]:
+                    queued[0] = False
+                    self.pending -= 1
+
+        async with self._semaphore():
+            with self._lock:
+                self.pending += 1
+
+            def call():
+                started = time.perf_counter()
+                dequeue()
+                with self._lock:
+                    self.active += 1
+                timing[0] = started - submitted
+                self._queue_time.observe(timing[0], self._labels)
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    timing[1] = time.perf_counter() - started
+                    with self._lock:
+                        self.active -= 1
+                        self.completed += 1
+                    self._run_time.observe(timing[1], self._labels)
+
+            try:
+                result = await asyncio.get_running_loop().run_in_executor(self._executor, call)
+            finally:
+                dequeue()
+            return result, timing[0], timing[1]
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "active": self.active,
+            "completed": self.completed,
+        }
+
+    def shutdown(self, wait: bool = False):
+        self._executor.shutdown(wait=wait)
+
+
+class AsyncServiceProxy:
+    """同步服务的异步代理：所有方法调用都在指定线程池中执行
+
+    用法:
+        recycle_service = async_service(get_recycle_bin_service())
+        items = await recycle_service.get_all_items(limit=10)
+    """
+
+    def __init__(self, service: Any, pool: str = STORAGE_POOL):
+        self._service = service
+        self._pool = pool
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._service, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def method(*args, **kwargs):
+            return await get_blocking_pool(self._pool).run(attr, *args, **kwargs)
+
+        return method
+
+
+# 全局线程池
+_pools: Dict[str, BlockingPool] = {}
+_pools_lock = threading.Lock()
+
+_POOL_SIZES = {
+    STORAGE_POOL: STORAGE_POOL_WORKERS,
+    FILE_IO_POOL: FILE_IO_POOL_WORKERS,
+}
+
+
+def get_blocking_pool(name: str, max_workers: Optional[int] = None) -> BlockingPool:
+    """获取指定名称的阻塞线程池
+
+    Args:
+        name: 线程池名称，内置线程池使用配置中的大小
+        max_workers: 非内置线程池首次创建时使用的线程数
+    """
+    pool = _pools.get(name)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(name)
+            if pool is None:
+                size = _POOL_SIZES.get(name, max_workers)
+                if size is None:
+                    raise ValueError(f"Unknown blocking pool: {name}")
+                pool = BlockingPool(name, size, BLOCKING_POOL_MAX_PENDING)
+                _pools[name] = pool
+                if len(_pools) == 1:
+                    get_metrics_registry().register_collector(_pool_collector)
+    return pool
+
+
+async def run_storage(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """在存储线程池中执行（TinyDB 读写）"""
+    return await get_blocking_pool(STORAGE_POOL).run(func, *args, **kwargs)
+
+
+async def run_file_io(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """在文件 I/O 线程池中执行（文件扫描、读取、系统信息采集）"""
+    return await get_blocking_pool(FILE_IO_POOL).run(func, *args, **kwargs)
+
+
+def get_tool_pool(category: str) -> BlockingPool:
+    """获取同步 MCP 工具所在分类的线程池"""
+    return get_blocking_pool(
+        f"{TOOL_POOL_PREFIX}{category}",
+        MCP_TOOL_POOL_WORKERS.get(category, MCP_TOOL_POOL_DEFAULT_WORKERS),
+    )
+
+
+def async_service(service: Any, pool: str = STORAGE_POOL) -> AsyncServiceProxy:
+    """将同步服务包装为异步代理"""
+    return AsyncServiceProxy(service, pool)
+
+
+def get_pools_status() -> List[Dict[str, Any]]:
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [pool.get_status() for pool in pools]
+
+
+def shutdown_pools(wait: bool = False):
+    """关闭所有线程池（应用退出时调用）"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=wait)
+
+
+def _pool_collector():
+    status = get_pools_status()
+    return [
+        ("lazyai_blocking_pool_pending", "gauge", "阻塞线程池排队任务数",
+         [({"pool": s["name"]}, s["pending"]) for s in status]),
+        ("lazyai_blocking_pool_active", "gauge", "阻塞线程池执行中任务数",
+         [({"pool": s["name"]}, s["active"]) for s in status]),
+    ]
+
+
+class _TimedCoroutine:
+    """逐步驱动协程并统计每一步在事件循环上的同步执行时间"""
+
+    __slots__ = ("_coro", "max_step", "total")
+
+    def __init__(self, coro):
+        self._coro = coro
+        self.max_step = 0.0
+        self.total = 0.0
+
+    def __await__(self):
+        coro = self._coro
+        send_value, throw_exc = None, None
+        while True:
+            start = time.perf_counter()
+            try:
+                if throw_exc is not None:
+                    yielded = coro.throw(throw_exc)
+                else:
+                    yielded = coro.send(send_value)
+            except StopIteration as stop:
+                self._record(time.perf_counter() - start)
+                return stop.value
+            except BaseException:
+                self._record(time.perf_counter() - start)
+                raise
+            self._record(time.perf_counter() - start)
+            try:
+                send_value, throw_exc = (yield yielded), None
+            except BaseException as e:
+                send_value, throw_exc = None, e
+
+    def _record(self, elapsed: float):
+        self.total += elapsed
+        if elapsed > self.max_step:
+            self.max_step = elapsed
+
+
+class LoopBlockingMonitor:
+    """事件循环阻塞检测中间件（调试用）
+
+    统计每个请求在事件循环上单次同步执行的最长时间，超过阈值时记录警告并计数。
+    线程池中执行的同步端点与 run_storage/run_file_io 不计入。
+    """
+
+    def __init__(self, app, threshold_ms: float = 100.0):
+        self.app = app
+        self.threshold = threshold_ms / 1000.0
+        self.blocked_total = get_metrics_registry().counter(
+            "lazyai_loop_blocked_requests_total", "在事件循环上阻塞超过阈值的请求数", ("method", "route")
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timed = _TimedCoroutine(self.app(scope, receive, send))
+        try:
+            await timed
+        finally:
+            if timed.max_step > self.threshold:
+                route = route_template(scope)
+                self.blocked_total.inc((scope.get("method", ""), route))
+                logger.warning(
+                    f"Event loop blocked by {sanitize_for_log(scope.get('method'))} {sanitize_for_log(route)}: "
+                    f"longest step {timed.max_step * 1000:.1f}ms, total on loop {timed.total * 1000:.1f}ms"
+                )
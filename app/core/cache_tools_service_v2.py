@@ -14,6 +14,7 @@ import logging
 from app.core.unified_database import get_unified_database, TableNames
 from app.core.secure_logging import sanitize_for_log
 from app.core.cache_backends import create_cache_backend, CacheBackend
+from app.core.event_bus import publish_event, EventTopics
 from tinydb import Query
 
 logger = logging.getLogger(__name__)
@@ -228,6 +229,7 @@ class CacheToolsService:
                 self.set_config_value("backend_type", backend_type)
 
             logger.info(f"Successfully switched from {old_backend_type} to {backend_type}")
+            publish_event(EventTopics.CACHE, "cache.backend_switched", {"from": old_backend_type, "to": backend_type})
             return True
 
         except Exception as e:
@@ -362,7 +364,10 @@ class CacheToolsService:
     def flush_all(self) -> bool:
         """清空所有缓存数据"""
         try:
-            return self.backend.flush_all()
+            result = self.backend.flush_all()
+            if result:
+                publish_event(EventTopics.CACHE, "cache.flushed", {"backend": self.backend_type})
+            return result
         except Exception as e:
             logger.error(f"Failed to flush all cache: {sanitize_for_log(str(e))}")
             return False
@@ -41,6 +41,65 @@ else:  # local 默认配置
 DATABASE_PATH = os.getenv("DATABASE_PATH", str(PROJECT_ROOT / "data" / "lazyai.db"))
 CACHE_TTL = int(os.getenv("CACHE_TTL", "3600"))  # 缓存过期时间（秒）
 
+# 阻塞操作线程池配置
+STORAGE_POOL_WORKERS = int(os.getenv("STORAGE_POOL_WORKERS", "1"))  # 统一数据库操作由全局锁串行化，多开线程只会互相等待
+FILE_IO_POOL_WORKERS = int(os.getenv("FILE_IO_POOL_WORKERS", "4"))
+BLOCKING_POOL_MAX_PENDING = int(os.getenv("BLOCKING_POOL_MAX_PENDING", "256"))  # 每个线程池最多排队任务数
+# 同步 MCP 工具按分类使用独立线程池，格式: "github=8,file=4,system=1"
+MCP_TOOL_POOL_DEFAULT_WORKERS = int(os.getenv("MCP_TOOL_POOL_DEFAULT_WORKERS", "4"))
+MCP_TOOL_POOL_WORKERS = {
+    "github": 8,
+    "file": 4,
+    "system": 1,  # system_get_info 采集 CPU 使用率会阻塞 1 秒
+    "cache": 4,
+    "time": 2,
+    **{
+        category.strip(): int(size)
+        for category, size in (
+            item.split("=", 1) for item in os.getenv("MCP_TOOL_POOL_WORKERS", "").split(",") if "=" in item
+        )
+    },
+}
+# 声明了 cache 的只读 MCP 工具的结果缓存总条目上限
+MCP_TOOL_CACHE_MAX_ENTRIES = int(os.getenv("MCP_TOOL_CACHE_MAX_ENTRIES", "1024"))
+# MCP 工具清单（工具元数据 + 所在模块），启动时据此注册工具而不导入实现模块
+MCP_TOOL_MANIFEST_PATH = os.getenv("MCP_TOOL_MANIFEST_PATH", str(PROJECT_ROOT / "data" / "mcp_tool_manifest.json"))
+# MCP 工具调用参数中字符串/字节值的总长度上限（不序列化，按 len 累加）
+MCP_MAX_ARGUMENT_SIZE = int(os.getenv("MCP_MAX_ARGUMENT_SIZE", str(1024 * 1024)))
+# MCP 工具结果：超过内联上限的结果写入临时结果句柄，客户端分页读取
+MCP_MAX_INLINE_RESULT_BYTES = int(os.getenv("MCP_MAX_INLINE_RESULT_BYTES", str(1024 * 1024)))
+MCP_RESULT_SPOOL_DIR = os.getenv("MCP_RESULT_SPOOL_DIR", str(PROJECT_ROOT / "data" / "temp" / "mcp-results"))
+MCP_RESULT_HANDLE_TTL = float(os.getenv("MCP_RESULT_HANDLE_TTL", "900"))  # 结果句柄保留时间（秒）
+MCP_RESULT_MAX_HANDLES = int(os.getenv("MCP_RESULT_MAX_HANDLES", "256"))
+MCP_RESULT_MAX_BYTES = int(os.getenv("MCP_RESULT_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))  # 结果句柄临时文件总大小上限（字节）
+# MCP 工具调用追踪：保留最近调用记录数、状态页展示的最慢调用数、慢调用告警阈值（秒）
+MCP_TRACE_BUFFER_SIZE = int(os.getenv("MCP_TRACE_BUFFER_SIZE", "256"))
+MCP_TRACE_SLOWEST = int(os.getenv("MCP_TRACE_SLOWEST", "20"))
+MCP_SLOW_CALL_SECONDS = float(os.getenv("MCP_SLOW_CALL_SECONDS", "5"))
+# MCP Streamable HTTP 批量请求：单批最多请求数与批内并发数
+MCP_BATCH_MAX_SIZE = int(os.getenv("MCP_BATCH_MAX_SIZE", "50"))
+MCP_BATCH_MAX_CONCURRENCY = int(os.getenv("MCP_BATCH_MAX_CONCURRENCY", "16"))
+# MCP SSE 会话传输
+MCP_SSE_MAX_SESSIONS = int(os.getenv("MCP_SSE_MAX_SESSIONS", "500"))
+MCP_SSE_QUEUE_SIZE = int(os.getenv("MCP_SSE_QUEUE_SIZE", "64"))  # 每个会话待发送消息上限
+MCP_SSE_MAX_INFLIGHT = int(os.getenv("MCP_SSE_MAX_INFLIGHT", "16"))  # 每个会话同时执行的请求上限
+MCP_SSE_IDLE_TIMEOUT = float(os.getenv("MCP_SSE_IDLE_TIMEOUT", "600"))  # 无客户端消息多久后淘汰（秒）
+MCP_SSE_SEND_TIMEOUT = float(os.getenv("MCP_SSE_SEND_TIMEOUT", "10"))  # 响应入队等待上限（秒），超时视为慢消费者
+MCP_SSE_PROGRESS_INTERVAL = float(os.getenv("MCP_SSE_PROGRESS_INTERVAL", "1"))  # 长时间工具调用的进度通知间隔（秒）
+# 网络抓取工具 HTTP 响应缓存（RFC 7234）的磁盘目录与总大小上限
+MCP_HTTP_CACHE_DIR = os.getenv("MCP_HTTP_CACHE_DIR", str(PROJECT_ROOT / "data" / "cache" / "http"))
+MCP_HTTP_CACHE_MAX_BYTES = int(os.getenv("MCP_HTTP_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# 事件循环阻塞检测阈值（毫秒），0 表示关闭；DEBUG 模式下默认 100ms
+LOOP_BLOCK_WARN_MS = int(os.getenv("LOOP_BLOCK_WARN_MS", "100" if DEBUG else "0"))
+
+# 准入控制配置（按路由类别限制并发，超出排队上限或等待超时返回 503）
+ADMISSION_CONTROL_ENABLED = os.getenv("ADMISSION_CONTROL_ENABLED", "true").lower() == "true"
+ADMISSION_HEAVY_MAX_CONCURRENT = int(os.getenv("ADMISSION_HEAVY_MAX_CONCURRENT", "2"))
+ADMISSION_HEAVY_MAX_QUEUE = int(os.getenv("ADMISSION_HEAVY_MAX_QUEUE", "8"))
+ADMISSION_DEFAULT_MAX_CONCURRENT = int(os.getenv("ADMISSION_DEFAULT_MAX_CONCURRENT", "64"))
+ADMISSION_DEFAULT_MAX_QUEUE = int(os.getenv("ADMISSION_DEFAULT_MAX_QUEUE", "128"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "5"))  # 排队等待超时（秒）
+
 # 文件工具安全配置
 FILE_TOOLS_CONFIG = {
     # 可读取的目录列表 - 默认允许项目根目录及其子目录
@@ -14,6 +14,7 @@ from app.core.config import PROJECT_ROOT
 from app.core.logging import setup_logging
 from app.core.secure_logging import secure_log_key_value, sanitize_for_log
 from app.core.unified_database import get_unified_database, TableNames
+from app.core.event_bus import publish_event, EventTopics
 
 logger = setup_logging("INFO")
 
@@ -202,6 +203,8 @@ class DatabaseService:
         self.metadata_table.upsert(metadata, Query_obj.config_name == config_name)
         
         logger.info(f"Sync completed for '{sanitize_for_log(config_name)}': {stats}")
+        if stats['added'] or stats['updated'] or stats['deleted']:
+            publish_event(EventTopics.RESOURCES, "resources.synced", {"config_name": config_name, "stats": stats})
         return stats
     
     def sync_all(self) -> Dict[str, Dict[str, int]]:
@@ -253,6 +256,7 @@ class DatabaseService:
         self.metadata_table.upsert(metadata, Query_obj.config_name == config_name)
 
         stats = metadata['stats']
+        publish_event(EventTopics.RESOURCES, "resources.refreshed", {"config_name": config_name, "stats": stats})
         logger.info(f"✅ Full refresh completed for '{sanitize_for_log(config_name)}': cleared {old_count}, inserted {len(scanned_files)}")
         return stats
 
@@ -391,6 +395,10 @@ class DatabaseService:
                 table.upsert(file_data, Query_obj.file_path == file_data['file_path'])
                 
                 logger.info(f"Synced file: {file_path}")
+                publish_event(EventTopics.RESOURCES, "resources.file_updated", {
+                    "config_name": self.config_name,
+                    "file_path": file_data['file_path']
+                })
                 
             except Exception as e:
                 logger.error(f"Failed to sync single file {file_path}: {e}")
@@ -407,6 +415,10 @@ class DatabaseService:
                 
                 if removed_count > 0:
                     logger.info(f"Removed file from cache: {file_path}")
+                    publish_event(EventTopics.RESOURCES, "resources.file_removed", {
+                        "config_name": self.config_name,
+                        "file_path": relative_path
+                    })
                 
             except Exception as e:
                 logger.error(f"Failed to remove file {file_path}: {e}")
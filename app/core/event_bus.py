@@ -0,0 +1,307 @@
+"""
+进程内事件总线
+In-Process Event Bus
+
+特性:
+- 服务发布带类型的变更事件，每个主题维护单调递增的目录版本号
+- 线程安全发布：同步服务线程和事件循环都可以调用 publish
+- 每个订阅者独立的有界队列，满时丢弃最旧事件（drop-oldest 背压）
+- 环形缓冲保存最近事件，支持按 Last-Event-ID 断线续传
+- SSE 编码与心跳由 event_stream 提供
+- 同步监听器在发布线程中直接回调，用于进程内缓存失效
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.logging import setup_logging
+from app.core.secure_logging import sanitize_for_log
+
+logger = setup_logging("INFO")
+
+
+class EventTopics:
+    """事件主题定义"""
+    RESOURCES = "resources"
+    MCP_TOOLS = "mcp_tools"
+    MCP_CONFIG = "mcp_config"
+    CACHE = "cache"
+    RECYCLE_BIN = "recycle_bin"
+    # 总线自身的控制事件（不计入目录版本）
+    SYSTEM = "system"
+
+
+@dataclass(frozen=True)
+class Event:
+    """变更事件"""
+    id: int
+    topic: str
+    type: str
+    version: int
+    data: Dict[str, Any]
+    timestamp: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "topic": self.topic,
+            "type": self.type,
+            "version": self.version,
+            "data": self.data,
+            "timestamp": self.timestamp,
+        }
+
+    def to_sse(self) -> str:
+        """编码为 SSE 帧"""
+        payload = json.dumps(self.to_dict(), ensure_ascii=False, default=str)
+        return f"id: {self.id}\nevent: {self.type}\ndata: {payload}\n\n"
+
+
+@dataclass
+class BusStats:
+    """总线统计"""
+    published: int = 0
+    delivered: int = 0
+    dropped: int = 0
+    resumed: int = 0
+    resets: int = 0
+
+
+class Subscription:
+    """订阅者：有界队列 + 事件循环唤醒"""
+
+    def __init__(self, bus: "EventBus", topics: Optional[Set[str]], max_queue_size: int):
+        self._bus = bus
+        self.topics = topics
+        self.max_queue_size = max_queue_size
+        self._queue: Deque[Event] = deque()
+        self._lock = threading.Lock()
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self.dropped = 0
+        self.closed = False
+
+    def matches(self, event: Event) -> bool:
+        return self.topics is None or event.topic in self.topics or event.topic == EventTopics.SYSTEM
+
+    def _push(self, event: Event):
+        """入队（可在任意线程调用），满时丢弃最旧事件"""
+        with self._lock:
+            if len(self._queue) >= self.max_queue_size:
+                self._queue.popleft()
+                self.dropped += 1
+                self._bus.stats.dropped += 1
+            self._queue.append(event)
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._wakeup.set()
+        else:
+            try:
+                self._loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError:
+                # 事件循环已关闭，自动退订
+                self.close()
+
+    def drain(self) -> List[Event]:
+        """取出当前队列中的所有事件"""
+        with self._lock:
+            events = list(self._queue)
+            self._queue.clear()
+            self._wakeup.clear()
+        return events
+
+    async def get(self, timeout: Optional[float] = None) -> List[Event]:
+        """等待并取出事件，超时返回空列表"""
+        events = self.drain()
+        if events:
+            return events
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        return self.drain()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self._bus.unsubscribe(self)
+
+
+class EventBus:
+    """进程内发布/订阅总线"""
+
+    def __init__(self, buffer_size: int = 1000, max_queue_size: int = 256):
+        self.buffer_size = buffer_size
+        self.max_queue_size = max_queue_size
+        self._buffer: Deque[Event] = deque(maxlen=buffer_size)
+        self._subscribers: List[Subscription] = []
+        self._listeners: List[Tuple[Optional[Set[str]], Callable[[Event], None]]] = []
+        self._versions: Dict[str, int] = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self.stats = BusStats()
+
+    def publish(self, topic: str, event_type: str, data: Optional[Dict[str, Any]] = None) -> Event:
+        """发布事件并递增主题目录版本"""
+        with self._lock:
+            if topic == EventTopics.SYSTEM:
+                version = self._versions.get(topic, 0)
+            else:
+                version = self._versions.get(topic, 0) + 1
+                self._versions[topic] = version
+            event = Event(
+                id=self._next_id,
+                topic=topic,
+                type=event_type,
+                version=version,
+                data=data or {},
+                timestamp=time.time(),
+            )
+            self._next_id += 1
+            self._buffer.append(event)
+            subscribers = list(self._subscribers)
+            listeners = list(self._listeners)
+            self.stats.published += 1
+
+        for subscription in subscribers:
+            if subscription.matches(event):
+                subscription._push(event)
+                self.stats.delivered += 1
+        for topics, callback in listeners:
+            if topics is None or event.topic in topics:
+                try:
+                    callback(event)
+                except Exception as e:
+                    logger.warning(f"Event listener failed for {sanitize_for_log(event.type)}: {sanitize_for_log(str(e))}")
+        return event
+
+    def add_listener(self, callback: Callable[[Event], None], topics: Optional[Iterable[str]] = None):
+        """注册同步监听器（在发布线程中调用，回调必须快速返回且不阻塞）"""
+        with self._lock:
+            self._listeners.append((set(topics) if topics else None, callback))
+
+    def remove_listener(self, callback: Callable[[Event], None]):
+        with self._lock:
+            self._listeners = [(t, cb) for t, cb in self._listeners if cb is not callback]
+
+    def subscribe(self, topics: Optional[Iterable[str]] = None, last_event_id: Optional[int] = None,
+                  max_queue_size: Optional[int] = None) -> Subscription:
+        """订阅事件（必须在事件循环中调用）
+
+        Args:
+            topics: 关注的主题，None 表示全部
+            last_event_id: 断线续传的最后事件 ID，从环形缓冲中补发之后的事件
+            max_queue_size: 队列上限，默认使用总线配置
+        """
+        subscription = Subscription(
+            self,
+            set(topics) if topics else None,
+            max_queue_size or self.max_queue_size,
+        )
+        with self._lock:
+            self._subscribers.append(subscription)
+            if last_event_id is not None:
+                oldest_id = self._buffer[0].id if self._buffer else self._next_id
+                reason = None
+                if last_event_id + 1 < oldest_id:
+                    # 请求的事件已被环形缓冲淘汰
+                    reason = "last_event_id_expired"
+                elif last_event_id >= self._next_id:
+                    # 比当前最新事件还新：服务重启后 ID 重新计数，或来自其他副本
+                    reason = "last_event_id_unknown"
+                if reason is not None:
+                    # 无法续传，通知客户端全量刷新
+                    self.stats.resets += 1
+                    reset = Event(
+                        id=self._next_id - 1,
+                        topic=EventTopics.SYSTEM,
+                        type="stream.reset",
+                        version=0,
+                        data={"reason": reason, "versions": dict(self._versions)},
+                        timestamp=time.time(),
+                    )
+                    subscription._push(reset)
+                else:
+                    self.stats.resumed += 1
+                    for event in self._buffer:
+                        if event.id > last_event_id and subscription.matches(event):
+                            subscription._push(event)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    def get_versions(self) -> Dict[str, int]:
+        """获取各主题当前目录版本"""
+        with self._lock:
+            return dict(self._versions)
+
+    def get_version(self, topic: str) -> int:
+        """获取单个主题的当前目录版本"""
+        return self._versions.get(topic, 0)
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "buffered_events": len(self._buffer),
+                "buffer_size": self.buffer_size,
+                "last_event_id": self._next_id - 1,
+                "versions": dict(self._versions),
+                "published": self.stats.published,
+                "delivered": self.stats.delivered,
+                "dropped": self.stats.dropped,
+                "resumed": self.stats.resumed,
+                "resets": self.stats.resets,
+            }
+
+
+async def event_stream(subscription: Subscription, heartbeat_interval: float = 15.0,
+                       retry_ms: int = 3000) -> AsyncIterator[str]:
+    """将订阅转换为 SSE 文本流，空闲时发送心跳注释"""
+    try:
+        yield f"retry: {retry_ms}\n\n"
+        while not subscription.closed:
+            events = await subscription.get(timeout=heartbeat_interval)
+            if not events:
+                yield f": heartbeat {int(time.time())}\n\n"
+                continue
+            for event in events:
+                yield event.to_sse()
+    finally:
+        subscription.close()
+
+
+# 全局事件总线实例
+_event_bus: Optional[EventBus] = None
+_event_bus_lock = threading.Lock()
+
+
+def get_event_bus() -> EventBus:
+    """获取全局事件总线"""
+    global _event_bus
+    if _event_bus is None:
+        with _event_bus_lock:
+            if _event_bus is None:
+                _event_bus = EventBus()
+    return _event_bus
+
+
+def publish_event(topic: str, event_type: str, data: Optional[Dict[str, Any]] = None) -> Optional[Event]:
+    """发布事件的便捷函数，发布失败不影响调用方业务"""
+    try:
+        return get_event_bus().publish(topic, event_type, data)
+    except Exception as e:
+        logger.warning(f"Failed to publish event {sanitize_for_log(event_type)}: {sanitize_for_log(str(e))}")
+        return None
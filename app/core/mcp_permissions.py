@@ -86,7 +86,8 @@ class MCPPermissionManager:
             "web-scraping_parse_rss",
             "web-scraping_parse_xml",
             "web-scraping_extract_css_selector",
-            "web-scraping_smart_extract_and_parse"
+            "web-scraping_smart_extract_and_parse",
+            "web-scraping_crawl"
         }
 
         # 写入工具 - 在remote模式下禁用
@@ -12,6 +12,7 @@ from app.models.mcp_config import MCPGlobalConfig, EnvironmentType
 from app.core.logging import setup_logging
 from app.core.secure_logging import sanitize_for_log
 from app.core.config import ENVIRONMENT
+from app.core.event_bus import publish_event, EventTopics
 
 logger = setup_logging()
 
@@ -51,6 +52,7 @@ class MCPConfigService:
             with open(self.config_file, 'w', encoding='utf-8') as f:
                 json.dump(self._config.to_dict(), f, indent=2, ensure_ascii=False)
             logger.debug("Saved MCP config")
+            publish_event(EventTopics.MCP_CONFIG, "mcp.config.updated", {"environment": self._config.environment.value})
             # 触发工具客户端重新加载配置
             self._reload_tool_clients()
         except Exception as e:
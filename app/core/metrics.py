@@ -0,0 +1,393 @@
+"""
+Prometheus 指标采集
+Prometheus Metrics Collection
+
+特性:
+- 按路由模板 + 方法 + 状态码统计请求数、延迟直方图、响应大小直方图
+- 在途请求 gauge
+- 固定桶直方图，线程本地分片计数，写路径无锁
+- 抓取时合并分片，输出 Prometheus 文本格式 (/metrics)
+- 支持注册采集回调，供其他模块在抓取时上报瞬时值
+"""
+
+import bisect
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.core.logging import setup_logging
+
+logger = setup_logging("INFO")
+
+# 默认延迟桶（秒）
+DEFAULT_LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+# 默认响应大小桶（字节）
+DEFAULT_SIZE_BUCKETS: Tuple[float, ...] = (
+    128, 512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304
+)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 未进入路由的请求（如被准入控制卸载）由上游中间件写入 scope 的路由标签
+ROUTE_LABEL_SCOPE_KEY = "lazyai.route_label"
+
+# 采集回调返回的指标族: (名称, 类型, 帮助信息, [(标签字典, 值), ...])
+MetricFamily = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _escape_label_value(value: str) -> str:
+    """转义标签值"""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Sequence[str], extra: str = "") -> str:
+    """格式化标签为 {a="x",b="y"}"""
+    parts = [f'{name}="{_escape_label_value(str(value))}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    """格式化样本值"""
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _ShardedMetric:
+    """线程分片指标基类
+
+    每个线程只写自己的分片（普通 dict），抓取时再合并所有分片，
+    因此记录路径不需要加锁。
+    """
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Dict[Tuple[str, ...], Any]] = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> Dict[Tuple[str, ...], Any]:
+        """获取当前线程的分片"""
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard: Dict[Tuple[str, ...], Any] = {}
+            self._local.shard = shard
+            with self._shards_lock:
+                self._shards.append(shard)
+            return shard
+
+    def _snapshot_shards(self) -> List[Dict[Tuple[str, ...], Any]]:
+        """复制所有分片（dict.copy 在 CPython 中是原子的）"""
+        with self._shards_lock:
+            shards = list(self._shards)
+        return [shard.copy() for shard in shards]
+
+    def reset(self):
+        """清空所有分片（主要用于测试）"""
+        with self._shards_lock:
+            for shard in self._shards:
+                shard.clear()
+
+    def collect(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_ShardedMetric):
+    """单调递增计数器"""
+
+    metric_type = "counter"
+
+    def inc(self, labelvalues: Tuple[str, ...] = (), amount: float = 1):
+        shard = self._shard()
+        shard[labelvalues] = shard.get(labelvalues, 0) + amount
+
+    def get(self, labelvalues: Tuple[str, ...] = ()) -> float:
+        """获取合并后的计数"""
+        return sum(shard.get(labelvalues, 0) for shard in self._snapshot_shards())
+
+    def totals(self) -> Dict[Tuple[str, ...], float]:
+        merged: Dict[Tuple[str, ...], float] = {}
+        for shard in self._snapshot_shards():
+            for key, value in shard.items():
+                merged[key] = merged.get(key, 0) + value
+        return merged
+
+    def collect(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self.totals().items())
+        ]
+
+
+class Gauge(Counter):
+    """可增可减的计量值
+
+    基于分片增量实现：每个线程记录自己的增减量，合并时求和。
+    若需要抓取时才计算的瞬时值，请使用 MetricsRegistry.register_collector。
+    """
+
+    metric_type = "gauge"
+
+    def dec(self, labelvalues: Tuple[str, ...] = (), amount: float = 1):
+        self.inc(labelvalues, -amount)
+
+
+class Histogram(_ShardedMetric):
+    """固定桶直方图"""
+
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 最后一个槽位对应 +Inf
+        self._slots = len(self.buckets) + 1
+
+    def observe(self, value: float, labelvalues: Tuple[str, ...] = ()):
+        shard = self._shard()
+        state = shard.get(labelvalues)
+        if state is None:
+            # [各桶计数..., 总和, 总数]
+            state = [0] * self._slots + [0.0, 0]
+            shard[labelvalues] = state
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    def totals(self) -> Dict[Tuple[str, ...], List[float]]:
+        merged: Dict[Tuple[str, ...], List[float]] = {}
+        for shard in self._snapshot_shards():
+            for key, state in shard.items():
+                state = list(state)
+                current = merged.get(key)
+                if current is None:
+                    merged[key] = state
+                else:
+                    for i, value in enumerate(state):
+                        current[i] += value
+        return merged
+
+    def quantile(self, q: float, labelvalues: Optional[Tuple[str, ...]] = None) -> Optional[float]:
+        """按桶线性插值估算分位数（labelvalues 为 None 时合并所有标签）"""
+        totals = self.totals()
+        if labelvalues is not None:
+            states = [totals[labelvalues]] if labelvalues in totals else []
+        else:
+            states = list(totals.values())
+        if not states:
+            return None
+
+        counts = [0] * self._slots
+        total = 0
+        for state in states:
+            for i in range(self._slots):
+                counts[i] += state[i]
+            total += state[-1]
+        if total == 0:
+            return None
+
+        rank = q * total
+        cumulative = 0
+        for i, count in enumerate(counts):
+            if cumulative + count >= rank and count > 0:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                if i >= len(self.buckets):
+                    return lower
+                upper = self.buckets[i]
+                return lower + (upper - lower) * ((rank - cumulative) / count)
+            cumulative += count
+        return self.buckets[-1]
+
+    def collect(self) -> List[str]:
+        lines = []
+        for key, state in sorted(self.totals().items()):
+            cumulative = 0
+            for i, bound in enumerate(self.buckets):
+                cumulative += state[i]
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            cumulative += state[len(self.buckets)]
+            inf_label = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, inf_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(float(state[-2]))}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _ShardedMetric] = {}
+        self._collectors: List[Callable[[], Iterable[MetricFamily]]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _ShardedMetric) -> _ShardedMetric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric '{metric.name}' already registered with a different definition")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """注册（或获取已注册的）计数器"""
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """注册（或获取已注册的）计量值"""
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        """注册（或获取已注册的）直方图"""
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name: str) -> Optional[_ShardedMetric]:
+        return self._metrics.get(name)
+
+    def register_collector(self, collector: Callable[[], Iterable[MetricFamily]]):
+        """注册抓取时调用的采集回调"""
+        with self._lock:
+            if collector not in self._collectors:
+                self._collectors.append(collector)
+
+    def unregister_collector(self, collector: Callable[[], Iterable[MetricFamily]]):
+        with self._lock:
+            if collector in self._collectors:
+                self._collectors.remove(collector)
+
+    def render(self) -> str:
+        """输出 Prometheus 文本格式"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        lines: List[str] = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            lines.extend(metric.collect())
+
+        for collector in collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+                continue
+            for name, metric_type, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    label_str = _format_labels(list(labels.keys()), list(labels.values()))
+                    lines.append(f"{name}{label_str} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """HTTP 请求指标中间件（纯 ASGI 实现，避免 BaseHTTPMiddleware 的额外开销）"""
+
+    def __init__(self, app, registry: Optional[MetricsRegistry] = None):
+        self.app = app
+        registry = registry or get_metrics_registry()
+        labels = ("method", "route", "status")
+        self.requests_total = registry.counter(
+            "lazyai_http_requests_total", "HTTP 请求总数", labels
+        )
+        self.request_duration = registry.histogram(
+            "lazyai_http_request_duration_seconds", "HTTP 请求延迟（秒）", labels
+        )
+        self.response_size = registry.histogram(
+            "lazyai_http_response_size_bytes", "HTTP 响应体大小（字节）", labels,
+            buckets=DEFAULT_SIZE_BUCKETS
+        )
+        self.in_flight = registry.gauge(
+            "lazyai_http_requests_in_flight", "正在处理的 HTTP 请求数"
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        state = [500, 0]  # [状态码, 响应体大小]
+
+        async def send_wrapper(message):
+            message_type = message["type"]
+            if message_type == "http.response.start":
+                state[0] = message["status"]
+            elif message_type == "http.response.body":
+                state[1] += len(message.get("body", b""))
+            await send(message)
+
+        self.in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.record(scope, state[0], time.perf_counter() - start, state[1])
+            self.in_flight.dec()
+
+    def record(self, scope, status: int, duration: float, size: int):
+        """记录单次请求（按路由模板聚合，避免路径参数造成标签基数膨胀）"""
+        labels = (scope.get("method", ""), route_template(scope), str(status))
+        self.requests_total.inc(labels)
+        self.request_duration.observe(duration, labels)
+        self.response_size.observe(size, labels)
+
+
+def route_template(scope) -> str:
+    """获取匹配的路由模板（中间件指定的标签优先，未匹配时返回 <unmatched>）"""
+    label = scope.get(ROUTE_LABEL_SCOPE_KEY)
+    if label:
+        return label
+    route = scope.get("route")
+    if route is None:
+        return "<unmatched>"
+    return getattr(route, "path_format", None) or getattr(route, "path", None) or "<unmatched>"
+
+
+def _process_collector() -> List[MetricFamily]:
+    """进程资源指标"""
+    import psutil
+    process = psutil.Process()
+    memory = process.memory_info()
+    cpu = process.cpu_times()
+    return [
+        ("process_resident_memory_bytes", "gauge", "常驻内存（字节）", [({}, float(memory.rss))]),
+        ("process_cpu_seconds_total", "counter", "进程 CPU 时间（秒）", [({}, cpu.user + cpu.system)]),
+        ("process_num_threads", "gauge", "进程线程数", [({}, float(process.num_threads()))]),
+    ]
+
+
+# 全局指标注册表
+_metrics_registry: Optional[MetricsRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """获取全局指标注册表"""
+    global _metrics_registry
+    if _metrics_registry is None:
+        with _registry_lock:
+            if _metrics_registry is None:
+                registry = MetricsRegistry()
+                registry.register_collector(_process_collector)
+                _metrics_registry = registry
+    return _metrics_registry
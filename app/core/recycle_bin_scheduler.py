@@ -13,6 +13,8 @@ from contextlib import asynccontextmanager
 from app.core.recycle_bin_service import get_recycle_bin_service
 from app.core.file_security_service import get_file_security_service
 from app.core.secure_logging import sanitize_for_log
+from app.core.event_bus import publish_event, EventTopics
+from app.core.async_executor import run_storage
 from app.core.logging import setup_logging
 
 logger = setup_logging("INFO")
@@ -63,10 +65,11 @@ class RecycleBinScheduler:
         """清理过期项目"""
         try:
             recycle_service = get_recycle_bin_service()
-            cleaned_count = recycle_service.cleanup_expired_items()
+            cleaned_count = await run_storage(recycle_service.cleanup_expired_items)
             
             if cleaned_count > 0:
                 logger.info(f"Scheduled cleanup: removed {cleaned_count} expired items")
+                publish_event(EventTopics.RECYCLE_BIN, "recycle_bin.cleaned", {"cleaned_count": cleaned_count, "trigger": "scheduled"})
             else:
                 logger.debug("Scheduled cleanup: no expired items to clean")
                 
@@ -83,12 +86,12 @@ class RecycleBinScheduler:
         while self.running:
             try:
                 # 检查是否应该运行清理
-                if self._should_run_cleanup():
+                if await run_storage(self._should_run_cleanup):
                     # 执行清理
                     await self.cleanup_expired_items()
                     
                     # 获取当前配置的清理间隔
-                    config = self._get_current_config()
+                    config = await run_storage(self._get_current_config)
                     wait_seconds = config["cleanup_hours"] * 3600
                     
                     logger.debug(f"Next cleanup in {config['cleanup_hours']} hours")
@@ -205,7 +208,9 @@ async def manual_cleanup_expired_items() -> dict:
         start_time = datetime.now()
         
         recycle_service = get_recycle_bin_service()
-        cleaned_count = recycle_service.cleanup_expired_items()
+        cleaned_count = await run_storage(recycle_service.cleanup_expired_items)
+        if cleaned_count > 0:
+            publish_event(EventTopics.RECYCLE_BIN, "recycle_bin.cleaned", {"cleaned_count": cleaned_count, "trigger": "manual"})
         
         end_time = datetime.now()
         duration = (end_time - start_time).total_seconds()
@@ -0,0 +1,399 @@
+"""
+前端静态资源服务
+Frontend Static Asset Server
+
+特性:
+- 启动时将 index.html 与 asset-manifest.json 载入内存，SPA 回退无需读盘
+- 优先返回预压缩的 .br / .gz 同名文件（按 Accept-Encoding 协商）
+- 内容哈希文件使用 immutable + 一年缓存，其他文件强制重新验证
+- 支持 If-None-Match (304) 与单段 Range (206/416)
+- 启动时遍历构建目录生成资源元数据表，请求只查表，未知路径不会占用内存
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+from dataclasses import dataclass
+from email.utils import formatdate
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import anyio
+
+from app.core.logging import setup_logging
+from app.core.secure_logging import sanitize_for_log
+
+logger = setup_logging("INFO")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# 预压缩编码及对应后缀（按优先级排序）
+PRECOMPRESSED_ENCODINGS: Tuple[Tuple[str, str], ...] = (("br", ".br"), ("gzip", ".gz"))
+
+# CRA 构建产物的内容哈希文件名，如 main.3f2a1b9c.js / 453.a1b2c3d4.chunk.css
+HASHED_FILENAME_PATTERN = re.compile(r"\.[0-9a-f]{8,}\.(?:chunk\.)?[A-Za-z0-9]+$")
+
+CHUNK_SIZE = 64 * 1024
+
+# 预压缩时跳过的类型（本身已压缩）
+_SKIP_COMPRESS_SUFFIXES = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif", ".woff", ".woff2",
+                           ".gz", ".br", ".zip", ".mp4", ".webm", ".ico"}
+
+_CONTENT_TYPES = {
+    ".html": "text/html; charset=utf-8",
+    ".js": "application/javascript; charset=utf-8",
+    ".mjs": "application/javascript; charset=utf-8",
+    ".css": "text/css; charset=utf-8",
+    ".json": "application/json",
+    ".map": "application/json",
+    ".svg": "image/svg+xml",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+    ".ico": "image/x-icon",
+    ".woff": "font/woff",
+    ".woff2": "font/woff2",
+    ".ttf": "font/ttf",
+    ".txt": "text/plain; charset=utf-8",
+    ".webmanifest": "application/manifest+json",
+}
+
+
+@dataclass(frozen=True)
+class AssetVariant:
+    """资源的一个物理表示（原始或预压缩）"""
+    path: Path
+    size: int
+    etag: str
+    encoding: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class AssetEntry:
+    """资源元数据"""
+    content_type: str
+    cache_control: str
+    last_modified: str
+    identity: AssetVariant
+    variants: Tuple[AssetVariant, ...] = ()
+
+
+def _guess_content_type(path: Path) -> str:
+    content_type = _CONTENT_TYPES.get(path.suffix.lower())
+    if content_type is None:
+        import mimetypes
+        content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    return content_type
+
+
+def _make_etag(stat: os.stat_result, suffix: str = "") -> str:
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{suffix}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """比较 If-None-Match（弱比较）"""
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    bare = etag[2:] if etag.startswith("W/") else etag
+    return any((c[2:] if c.startswith("W/") else c) == bare for c in candidates)
+
+
+def _parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """解析单段 Range，返回闭区间 (start, end)；不可满足时抛出 ValueError，不支持的格式返回 None"""
+    if not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    spec = range_header[6:].strip()
+    start_str, sep, end_str = spec.partition("-")
+    if not sep:
+        return None
+    try:
+        if start_str == "":
+            # 后缀范围：最后 N 字节
+            length = int(end_str)
+            if length <= 0:
+                raise ValueError("empty suffix range")
+            return max(size - length, 0), size - 1
+        start = int(start_str)
+        end = int(end_str) if end_str else size - 1
+    except ValueError:
+        raise ValueError("invalid range")
+    if start >= size or start > end:
+        raise ValueError("unsatisfiable range")
+    return start, min(end, size - 1)
+
+
+class StaticAssetServer:
+    """前端构建目录的 ASGI 静态资源服务"""
+
+    def __init__(self, build_dir: Path, index_file: str = "index.html",
+                 manifest_file: str = "asset-manifest.json", api_prefix: str = "/api"):
+        self.build_dir = Path(build_dir).resolve()
+        self.api_prefix = api_prefix
+
+        self.manifest: Dict = self._load_manifest(self.build_dir / manifest_file)
+        self.hashed_paths: Set[str] = self._collect_hashed_paths(self.manifest)
+        self._entries: Dict[str, AssetEntry] = self._scan_entries()
+
+        # index.html 常驻内存
+        index_path = self.build_dir / index_file
+        self.index_body: Optional[bytes] = index_path.read_bytes() if index_path.is_file() else None
+        index_digest = hashlib.md5(self.index_body).hexdigest() if self.index_body is not None else ""
+        self.index_etag = f'"{index_digest}"' if self.index_body is not None else ""
+        self.index_gzip: Optional[bytes] = (
+            gzip.compress(self.index_body, 9, mtime=0) if self.index_body else None
+        )
+        # 不同内容编码是不同的表示，ETag 必须不同
+        self.index_gzip_etag = f'"{index_digest}-gzip"' if self.index_gzip is not None else ""
+
+        logger.info(
+            f"StaticAssetServer loaded {sanitize_for_log(str(self.build_dir))}: "
+            f"{len(self._entries)} files, {len(self.hashed_paths)} hashed assets in manifest"
+        )
+
+    @staticmethod
+    def _load_manifest(path: Path) -> Dict:
+        if not path.is_file():
+            return {}
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except Exception as e:
+            logger.warning(f"Failed to load asset manifest: {sanitize_for_log(str(e))}")
+            return {}
+
+    @staticmethod
+    def _collect_hashed_paths(manifest: Dict) -> Set[str]:
+        """从 manifest 中收集构建产物路径"""
+        paths = set()
+        files = manifest.get("files", {})
+        if isinstance(files, dict):
+            for value in files.values():
+                if isinstance(value, str) and HASHED_FILENAME_PATTERN.search(value):
+                    paths.add("/" + value.lstrip("/"))
+        return paths
+
+    def is_hashed(self, url_path: str) -> bool:
+        return url_path in self.hashed_paths or bool(HASHED_FILENAME_PATTERN.search(url_path))
+
+    def _scan_entries(self) -> Dict[str, AssetEntry]:
+        """遍历构建目录一次，生成 URL 路径 -> 资源元数据表
+
+        构建目录运行期不变；未知路径直接查表未命中，不缓存也不触发 stat。
+        """
+        entries: Dict[str, AssetEntry] = {}
+        if not self.build_dir.is_dir():
+            return entries
+        for path in self.build_dir.rglob("*"):
+            if not path.is_file():
+                continue
+            url_path = "/" + path.relative_to(self.build_dir).as_posix()
+            stat = path.stat()
+            variants: List[AssetVariant] = []
+            for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+                sibling = path.with_name(path.name + suffix)
+                if sibling.is_file():
+                    variants.append(AssetVariant(sibling, sibling.stat().st_size,
+                                                 _make_etag(stat, f"-{encoding}"), encoding))
+            entries[url_path] = AssetEntry(
+                content_type=_guess_content_type(path),
+                cache_control=IMMUTABLE_CACHE_CONTROL if self.is_hashed(url_path) else REVALIDATE_CACHE_CONTROL,
+                last_modified=formatdate(stat.st_mtime, usegmt=True),
+                identity=AssetVariant(path, stat.st_size, _make_etag(stat)),
+                variants=tuple(variants),
+            )
+        return entries
+
+    def get_entry(self, url_path: str) -> Optional[AssetEntry]:
+        """获取资源元数据（只查启动时生成的表，目录穿越等路径自然查不到）"""
+        return self._entries.get(url_path)
+
+    async def __call__(self, scope, receive, send):
+        assert scope["type"] == "http"
+        method = scope["method"]
+        path = scope["path"]
+
+        if method not in ("GET", "HEAD"):
+            await self._send_simple(send, 405, b"Method Not Allowed", {"allow": "GET, HEAD"})
+            return
+
+        if path == self.api_prefix or path.startswith(self.api_prefix + "/"):
+            await self._send_simple(send, 404, b'{"detail":"Not Found"}',
+                                    {"content-type": "application/json"})
+            return
+
+        headers = _header_dict(scope)
+        entry = None if path in ("/", "/index.html") else self.get_entry(path)
+        if entry is None:
+            await self._send_index(send, headers, method)
+            return
+        await self._send_asset(send, entry, headers, method)
+
+    async def _send_index(self, send, headers: Dict[str, str], method: str):
+        """SPA 回退：直接返回内存中的 index.html"""
+        if self.index_body is None:
+            await self._send_simple(send, 404, b"Not Found")
+            return
+
+        body, etag = self.index_body, self.index_etag
+        use_gzip = self.index_gzip is not None and _accepts(headers, "gzip")
+        if use_gzip:
+            body, etag = self.index_gzip, self.index_gzip_etag
+
+        response_headers = {
+            "content-type": "text/html; charset=utf-8",
+            "cache-control": REVALIDATE_CACHE_CONTROL,
+            "etag": etag,
+            "vary": "Accept-Encoding",
+        }
+        if use_gzip:
+            response_headers["content-encoding"] = "gzip"
+
+        if_none_match = headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, etag):
+            await self._send_simple(send, 304, b"", response_headers, include_length=False)
+            return
+
+        await self._send_simple(send, 200, b"" if method == "HEAD" else body, response_headers,
+                                content_length=len(body))
+
+    async def _send_asset(self, send, entry: AssetEntry, headers: Dict[str, str], method: str):
+        range_header = headers.get("range")
+
+        # Range 请求只作用于原始表示，避免与内容编码组合
+        variant = entry.identity
+        if not range_header:
+            for candidate in entry.variants:
+                if _accepts(headers, candidate.encoding):
+                    variant = candidate
+                    break
+
+        response_headers = {
+            "content-type": entry.content_type,
+            "cache-control": entry.cache_control,
+            "etag": variant.etag,
+            "last-modified": entry.last_modified,
+            "accept-ranges": "bytes",
+        }
+        if entry.variants:
+            response_headers["vary"] = "Accept-Encoding"
+        if variant.encoding:
+            response_headers["content-encoding"] = variant.encoding
+
+        if_none_match = headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, variant.etag):
+            await self._send_simple(send, 304, b"", response_headers, include_length=False)
+            return
+
+        start, end, status = 0, variant.size - 1, 200
+        if range_header and _if_range_matches(headers.get("if-range"), variant.etag, entry.last_modified):
+            try:
+                parsed = _parse_range(range_header, variant.size)
+            except ValueError:
+                response_headers["content-range"] = f"bytes */{variant.size}"
+                await self._send_simple(send, 416, b"", response_headers)
+                return
+            if parsed is not None:
+                start, end = parsed
+                status = 206
+                response_headers["content-range"] = f"bytes {start}-{end}/{variant.size}"
+
+        length = max(end - start + 1, 0)
+        response_headers["content-length"] = str(length)
+        await send({"type": "http.response.start", "status": status,
+                    "headers": _encode_headers(response_headers)})
+        if method == "HEAD" or length == 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async with await anyio.open_file(variant.path, "rb") as f:
+            await f.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = await f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            await send({"type": "http.response.body", "body": b""})
+
+    @staticmethod
+    async def _send_simple(send, status: int, body: bytes, headers: Optional[Dict[str, str]] = None,
+                           include_length: bool = True, content_length: Optional[int] = None):
+        response_headers = dict(headers or {})
+        if include_length:
+            response_headers["content-length"] = str(len(body) if content_length is None else content_length)
+        await send({"type": "http.response.start", "status": status,
+                    "headers": _encode_headers(response_headers)})
+        await send({"type": "http.response.body", "body": body})
+
+
+def _header_dict(scope) -> Dict[str, str]:
+    return {k.decode("latin-1"): v.decode("latin-1") for k, v in scope.get("headers", [])}
+
+
+def _encode_headers(headers: Dict[str, str]) -> List[Tuple[bytes, bytes]]:
+    return [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()]
+
+
+def _accepts(headers: Dict[str, str], encoding: str) -> bool:
+    """检查 Accept-Encoding 是否接受指定编码（忽略 q=0）"""
+    accept = headers.get("accept-encoding", "")
+    for part in accept.split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() == encoding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def _if_range_matches(if_range: Optional[str], etag: str, last_modified: str) -> bool:
+    """If-Range 校验失败时应返回完整内容（ETag 使用强比较，弱 ETag 永不匹配）"""
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith("W/"):
+        return False
+    if if_range.startswith('"'):
+        return not etag.startswith("W/") and if_range == etag
+    return if_range == last_modified
+
+
+def precompress_directory(build_dir: Path, min_size: int = 1024) -> Dict[str, int]:
+    """为构建目录中的文本资源生成 .gz（以及可用时的 .br）同名文件
+
+    brotli 为可选依赖，未安装时只生成 gzip。
+    """
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+
+    stats = {"gzip": 0, "br": 0, "skipped": 0}
+    for path in Path(build_dir).rglob("*"):
+        if not path.is_file() or path.suffix.lower() in _SKIP_COMPRESS_SUFFIXES:
+            continue
+        data = path.read_bytes()
+        if len(data) < min_size:
+            stats["skipped"] += 1
+            continue
+        compressed = gzip.compress(data, 9, mtime=0)
+        if len(compressed) < len(data):
+            path.with_name(path.name + ".gz").write_bytes(compressed)
+            stats["gzip"] += 1
+        if brotli is not None:
+            compressed = brotli.compress(data, quality=11)
+            if len(compressed) < len(data):
+                path.with_name(path.name + ".br").write_bytes(compressed)
+                stats["br"] += 1
+    return stats
+
+
+if __name__ == "__main__":
+    target = Path(sys.argv[1]) if len(sys.argv) > 1 else Path("frontend/build")
+    print(f"Precompressed {target}: {precompress_directory(target)}")
@@ -5,15 +5,59 @@ Unified Database Service
 将所有TinyDB数据库合并为单一文件，使用不同的table进行区分
 """
 
+import functools
 import os
+import threading
 from pathlib import Path
 from typing import Dict, Any, Optional
 from tinydb import TinyDB, Query
+from tinydb.storages import JSONStorage
+from tinydb.table import Table
 from app.core.config import PROJECT_ROOT
 from app.core.logging import setup_logging
 
 logger = setup_logging("INFO")
 
+# 统一数据库的全局锁：存储服务、工具线程池和事件循环都会访问同一个 TinyDB 实例，
+# TinyDB 本身不是线程安全的（表的读-改-写、查询缓存和 JSON 文件句柄都会竞争）
+_DB_LOCK = threading.RLock()
+
+
+def _locked(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with _DB_LOCK:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class _LockedTable(Table):
+    """所有公开操作在全局锁内执行的表"""
+
+
+for _name in ("insert", "insert_multiple", "all", "search", "get", "contains", "update",
+              "update_multiple", "upsert", "remove", "truncate", "count", "clear_cache", "__len__"):
+    setattr(_LockedTable, _name, _locked(getattr(Table, _name)))
+
+
+class _LockedJSONStorage(JSONStorage):
+    """读写文件时持有全局锁的 JSON 存储"""
+
+    read = _locked(JSONStorage.read)
+    write = _locked(JSONStorage.write)
+
+
+class ThreadSafeTinyDB(TinyDB):
+    """线程安全的 TinyDB：单次表操作原子执行，跨多次操作的事务需自行持有 UnifiedDatabase.lock"""
+
+    table_class = _LockedTable
+    default_storage_class = _LockedJSONStorage
+
+    table = _locked(TinyDB.table)
+    tables = _locked(TinyDB.tables)
+    drop_tables = _locked(TinyDB.drop_tables)
+    drop_table = _locked(TinyDB.drop_table)
+
 class UnifiedDatabase:
     """统一数据库管理器"""
     
@@ -35,11 +79,16 @@ class UnifiedDatabase:
         db_dir.mkdir(exist_ok=True)
         
         db_path = str(db_dir / "lazyai.db")
-        self._db = TinyDB(db_path)
+        self._db = ThreadSafeTinyDB(db_path)
         self.db_path = db_path
         
         logger.info(f"Unified database initialized: {db_path}")
     
+    @property
+    def lock(self) -> threading.RLock:
+        """数据库全局锁（可重入），用于需要原子执行的多步操作"""
+        return _DB_LOCK
+
     @property
     def db(self) -> TinyDB:
         """获取数据库实例"""
@@ -53,10 +102,11 @@ class UnifiedDatabase:
     
     def close(self):
         """关闭数据库连接"""
-        if self._db:
-            self._db.close()
-            self._db = None
-            logger.info("Unified database closed")
+        with _DB_LOCK:
+            if self._db:
+                self._db.close()
+                self._db = None
+                logger.info("Unified database closed")
     
     def get_all_tables(self) -> Dict[str, int]:
         """获取所有表及其记录数"""
@@ -14,14 +14,13 @@ import os
 import sys
 from typing import Optional
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse, FileResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from pathlib import Path
 
 # 最小导入
-from app.core.config import API_PREFIX, DEBUG, LOG_LEVEL, PROJECT_ROOT, CORS_ORIGINS, CORS_ALLOW_CREDENTIALS
+from app.core.config import API_PREFIX, DEBUG, LOG_LEVEL, PROJECT_ROOT, CORS_ORIGINS, CORS_ALLOW_CREDENTIALS, LOOP_BLOCK_WARN_MS, ADMISSION_CONTROL_ENABLED
 from app.routers.api_models import router as models_router
 from app.routers.mcp import router as mcp_router
 from app.routers.api_rules import router as rules_router
@@ -38,6 +37,13 @@ from app.routers.api_cache_tools import router as cache_tools_router
 from app.routers.api_cache import router as cache_router
 from app.routers.api_mcp_config import router as mcp_config_router
 from app.routers.api_web_scraping import router as web_scraping_router
+from app.routers.api_metrics import router as metrics_router
+from app.routers.api_events import router as events_router
+from app.core.metrics import MetricsMiddleware
+from app.core.async_executor import run_storage, run_file_io, shutdown_pools, LoopBlockingMonitor
+from app.tools.sse_transport import close_sse_sessions
+from app.tools.streaming import close_result_store
+from app.core.admission_control import AdmissionControlMiddleware, get_admission_status
 
 # 全局变量 - 延迟初始化
 _db_service = None
@@ -174,6 +180,9 @@ async def lifespan(app: FastAPI):
     # 清理
     if _db_service:
         _db_service.close()
+    close_sse_sessions()
+    close_result_store()
+    shutdown_pools()
     gc.collect()
     print("✅ 极致优化服务已安全关闭\n", flush=True)
 
@@ -199,15 +208,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 禁用缓存中间件
+# 禁用缓存中间件（已自带 Cache-Control 的响应保持不变，如前端静态资源）
 @app.middleware("http")
 async def disable_cache_middleware(request: Request, call_next):
     response = await call_next(request)
+    if "cache-control" in response.headers:
+        return response
     response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
     response.headers["Pragma"] = "no-cache"
     response.headers["Expires"] = "0"
     return response
 
+# 事件循环阻塞检测（LOOP_BLOCK_WARN_MS > 0 时启用，DEBUG 模式默认开启）
+if LOOP_BLOCK_WARN_MS > 0:
+    app.add_middleware(LoopBlockingMonitor, threshold_ms=LOOP_BLOCK_WARN_MS)
+
+# 准入控制：按路由类别限制并发，饱和时返回 503 + Retry-After
+if ADMISSION_CONTROL_ENABLED:
+    app.add_middleware(AdmissionControlMiddleware)
+
+# 请求指标中间件（最后添加，位于最外层，统计完整请求耗时）
+app.add_middleware(MetricsMiddleware)
+
 # 最简异常处理
 @app.exception_handler(Exception)
 async def handle_error(request: Request, exc: Exception):
@@ -220,7 +242,7 @@ async def list_models():
     """获取模型列表"""
     try:
         db = get_database_service()
-        models = db.get_models_data()
+        models = await run_storage(db.get_models_data)
         return {"success": True, "data": models, "total": len(models)}
     except Exception as e:
         get_logger().error("Error in list_models: %s", str(e))
@@ -231,7 +253,7 @@ async def get_model(slug: str):
     """获取单个模型"""
     try:
         db = get_database_service()
-        model = db.get_model_by_slug(slug)
+        model = await run_storage(db.get_model_by_slug, slug)
         if model:
             return {"success": True, "data": model}
         return JSONResponse({"error": "Not found"}, status_code=404)
@@ -244,7 +266,7 @@ async def get_group_models(group: str):
     """获取组模型"""
     try:
         db = get_database_service()
-        models = db.get_models_by_group(group)
+        models = await run_storage(db.get_models_by_group, group)
         return {"success": True, "data": models, "total": len(models)}
     except Exception as e:
         get_logger().error("Error in get_group_models: %s", str(e))
@@ -255,7 +277,7 @@ async def refresh_models():
     """刷新模型缓存"""
     try:
         db = get_database_service()
-        result = db.refresh_models_cache()
+        result = await run_storage(db.refresh_models_cache)
         # 手动触发垃圾回收
         gc.collect()
         return {"success": True, "data": result}
@@ -295,11 +317,11 @@ async def get_status():
     try:
         import psutil
         process = psutil.Process()
-        memory_mb = process.memory_info().rss / 1024 / 1024
-        cpu_percent = process.cpu_percent()
+        memory_info, cpu_percent = await run_file_io(lambda: (process.memory_info(), process.cpu_percent()))
+        memory_mb = memory_info.rss / 1024 / 1024
 
         db = get_database_service()
-        db_status = db.get_status()
+        db_status = await run_storage(db.get_status)
 
         return {
             "success": True,
@@ -308,6 +330,7 @@ async def get_status():
                 "memory_mb": round(memory_mb, 2),
                 "cpu_percent": cpu_percent,
                 "database": db_status,
+                "admission": get_admission_status(),
                 "optimizations": [
                     "zero_cache",
                     "minimal_imports",
@@ -344,33 +367,18 @@ app.include_router(cache_tools_router, prefix="/api", tags=["cache-tools"])
 app.include_router(cache_router, prefix="/api", tags=["cache"])
 app.include_router(mcp_config_router, prefix="/api", tags=["mcp-config"])
 app.include_router(web_scraping_router, prefix="/api", tags=["web-scraping"])
+app.include_router(events_router, prefix="/api", tags=["events"])
+app.include_router(metrics_router)
 
 # 静态文件配置
 FRONTEND_BUILD_DIR = PROJECT_ROOT / "frontend" / "build"
-FRONTEND_STATIC_DIR = FRONTEND_BUILD_DIR / "static"
 
 # 挂载前端静态资源
 if FRONTEND_BUILD_DIR.exists():
-    # 挂载静态文件目录
-    if FRONTEND_STATIC_DIR.exists():
-        app.mount("/static", StaticFiles(directory=str(FRONTEND_STATIC_DIR)), name="static")
-
-    # SPA 路由处理 - 添加回退路由
-    from fastapi import HTTPException
-
-    @app.exception_handler(404)
-    async def spa_handler(request, exc):
-        # 如果请求的是 API 路径，返回 404
-        if request.url.path.startswith('/api'):
-            return JSONResponse(
-                status_code=404,
-                content={"detail": "Not Found"}
-            )
-        # 否则返回 index.html，让前端路由处理
-        return FileResponse(FRONTEND_BUILD_DIR / "index.html")
-
-    # 挂载前端应用
-    app.mount("/", StaticFiles(directory=str(FRONTEND_BUILD_DIR)), name="frontend")
+    # index.html 与 asset-manifest 常驻内存，哈希资源长期缓存，SPA 路由回退到内存中的 index.html
+    from app.core.static_assets import StaticAssetServer
+
+    app.mount("/", StaticAssetServer(FRONTEND_BUILD_DIR, api_prefix=API_PREFIX), name="frontend")
 else:
     # 根路径
     @app.get("/")
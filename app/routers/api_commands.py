@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from app.models.schemas import CommandsResponse
 from app.core.commands_service import CommandsService
+from app.core.async_executor import run_file_io
 
 router = APIRouter()
 
@@ -13,7 +14,7 @@ router = APIRouter()
 async def get_commands() -> CommandsResponse:
     """获取 commands 目录下所有文件的 metadata 信息"""
     try:
-        metadata_list = CommandsService.get_commands_metadata()
+        metadata_list = await run_file_io(CommandsService.get_commands_metadata)
         
         # Convert FileMetadata objects to dictionaries
         data_dicts = [item.model_dump() for item in metadata_list]
@@ -0,0 +1,68 @@
+"""
+事件流 API 路由
+通过 Server-Sent Events 推送资源和配置变更
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, Header, Query
+from fastapi.responses import StreamingResponse
+
+from app.core.event_bus import get_event_bus, event_stream
+from app.core.logging import setup_logging
+from app.core.secure_logging import sanitize_for_log
+
+logger = setup_logging()
+
+router = APIRouter(prefix="/events", tags=["Events"])
+
+# 心跳间隔（秒）
+HEARTBEAT_INTERVAL = 15.0
+
+
+def _parse_event_id(value: Optional[str]) -> Optional[int]:
+    """解析 Last-Event-ID，非法值视为未提供"""
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        logger.warning(f"Invalid Last-Event-ID: {sanitize_for_log(value)}")
+        return None
+
+
+@router.get("")
+async def stream_events(
+    topics: Optional[str] = Query(None, description="逗号分隔的主题列表，默认订阅全部"),
+    last_event_id: Optional[str] = Query(None, description="断线续传的最后事件 ID"),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    """订阅变更事件流（text/event-stream）"""
+    topic_set = [t.strip() for t in topics.split(",") if t.strip()] if topics else None
+    # 浏览器 EventSource 重连时通过请求头携带，首次连接可用查询参数
+    resume_id = _parse_event_id(last_event_id_header) if last_event_id_header else _parse_event_id(last_event_id)
+
+    subscription = get_event_bus().subscribe(topics=topic_set, last_event_id=resume_id)
+    return StreamingResponse(
+        event_stream(subscription, heartbeat_interval=HEARTBEAT_INTERVAL),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+@router.get("/status")
+async def get_events_status():
+    """获取事件总线状态和各主题目录版本"""
+    try:
+        return {
+            "success": True,
+            "message": "Event bus status retrieved",
+            "data": get_event_bus().get_status()
+        }
+    except Exception as e:
+        logger.error(f"Failed to get event bus status: {sanitize_for_log(str(e))}")
+        return {"success": False, "message": "Failed to get event bus status: Internal server error"}
@@ -0,0 +1,20 @@
+"""
+Prometheus 指标 API 路由
+提供 /metrics 抓取端点
+"""
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from app.core.metrics import get_metrics_registry, PROMETHEUS_CONTENT_TYPE
+
+router = APIRouter(tags=["Metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus 文本格式指标"""
+    return Response(
+        content=get_metrics_registry().render(),
+        media_type=PROMETHEUS_CONTENT_TYPE,
+    )
@@ -19,6 +19,7 @@ from app.core.recycle_bin_scheduler import (
     get_cleanup_statistics
 )
 from app.core.secure_logging import sanitize_for_log
+from app.core.async_executor import async_service
 from app.core.logging import setup_logging
 
 logger = setup_logging("INFO")
@@ -67,8 +68,8 @@ class EmptyRecycleBinRequest(BaseModel):
 async def soft_delete_item(request: SoftDeleteRequest):
     """软删除项目（移动到回收站）"""
     try:
-        recycle_service = get_recycle_bin_service()
-        success = recycle_service.soft_delete(
+        recycle_service = async_service(get_recycle_bin_service())
+        success = await recycle_service.soft_delete(
             table_name=request.table_name,
             item_id=request.item_id,
             item_type=request.item_type,
@@ -103,8 +104,8 @@ async def get_recycle_bin_items(
 ):
     """获取回收站项目列表"""
     try:
-        recycle_service = get_recycle_bin_service()
-        items = recycle_service.get_all_items(
+        recycle_service = async_service(get_recycle_bin_service())
+        items = await recycle_service.get_all_items(
             item_type=item_type,
             include_expired=include_expired,
             limit=limit
@@ -135,8 +136,8 @@ async def get_recycle_bin_items(
 async def get_recycle_bin_item(recycle_bin_id: str):
     """获取单个回收站项目详情"""
     try:
-        recycle_service = get_recycle_bin_service()
-        items = recycle_service.get_all_items()
+        recycle_service = async_service(get_recycle_bin_service())
+        items = await recycle_service.get_all_items()
         
         item = next((item for item in items if item["id"] == recycle_bin_id), None)
         if not item:
@@ -166,8 +167,8 @@ async def get_recycle_bin_item(recycle_bin_id: str):
 async def restore_item(recycle_bin_id: str):
     """从回收站恢复项目"""
     try:
-        recycle_service = get_recycle_bin_service()
-        success = recycle_service.restore(recycle_bin_id)
+        recycle_service = async_service(get_recycle_bin_service())
+        success = await recycle_service.restore(recycle_bin_id)
         
         if not success:
             raise HTTPException(
@@ -193,8 +194,8 @@ async def restore_item(recycle_bin_id: str):
 async def permanent_delete_item(recycle_bin_id: str):
     """永久删除回收站项目"""
     try:
-        recycle_service = get_recycle_bin_service()
-        success = recycle_service.permanent_delete(recycle_bin_id)
+        recycle_service = async_service(get_recycle_bin_service())
+        success = await recycle_service.permanent_delete(recycle_bin_id)
         
         if not success:
             raise HTTPException(status_code=404, detail=f"回收站项目未找到: {recycle_bin_id}")
@@ -217,8 +218,8 @@ async def permanent_delete_item(recycle_bin_id: str):
 async def cleanup_expired_items():
     """清理过期的回收站项目"""
     try:
-        recycle_service = get_recycle_bin_service()
-        cleaned_count = recycle_service.cleanup_expired_items()
+        recycle_service = async_service(get_recycle_bin_service())
+        cleaned_count = await recycle_service.cleanup_expired_items()
         
         logger.info(f"Cleaned up {cleaned_count} expired recycle bin items")
         
@@ -236,8 +237,8 @@ async def cleanup_expired_items():
 async def get_recycle_bin_statistics():
     """获取回收站统计信息"""
     try:
-        recycle_service = get_recycle_bin_service()
-        stats = recycle_service.get_statistics()
+        recycle_service = async_service(get_recycle_bin_service())
+        stats = await recycle_service.get_statistics()
         
         return RecycleBinStatsResponse(
             total_items=stats["total_items"],
@@ -255,8 +256,8 @@ async def get_recycle_bin_statistics():
 async def empty_recycle_bin(request: EmptyRecycleBinRequest):
     """清空回收站"""
     try:
-        recycle_service = get_recycle_bin_service()
-        deleted_count, skipped_count = recycle_service.empty_recycle_bin(force=request.force)
+        recycle_service = async_service(get_recycle_bin_service())
+        deleted_count, skipped_count = await recycle_service.empty_recycle_bin(force=request.force)
         
         logger.info(f"Recycle bin emptied: deleted {deleted_count}, skipped {skipped_count}")
         
@@ -276,13 +277,13 @@ async def empty_recycle_bin(request: EmptyRecycleBinRequest):
 async def batch_restore_items(recycle_bin_ids: List[str]):
     """批量恢复回收站项目"""
     try:
-        recycle_service = get_recycle_bin_service()
+        recycle_service = async_service(get_recycle_bin_service())
         
         results = {"success": [], "failed": []}
         
         for recycle_bin_id in recycle_bin_ids:
             try:
-                success = recycle_service.restore(recycle_bin_id)
+                success = await recycle_service.restore(recycle_bin_id)
                 if success:
                     results["success"].append(recycle_bin_id)
                     logger.info(f"Batch restore success: {sanitize_for_log(recycle_bin_id)}")
@@ -311,13 +312,13 @@ async def batch_restore_items(recycle_bin_ids: List[str]):
 async def batch_permanent_delete_items(recycle_bin_ids: List[str]):
     """批量永久删除回收站项目"""
     try:
-        recycle_service = get_recycle_bin_service()
+        recycle_service = async_service(get_recycle_bin_service())
         
         results = {"success": [], "failed": []}
         
         for recycle_bin_id in recycle_bin_ids:
             try:
-                success = recycle_service.permanent_delete(recycle_bin_id)
+                success = await recycle_service.permanent_delete(recycle_bin_id)
                 if success:
                     results["success"].append(recycle_bin_id)
                     logger.info(f"Batch delete success: {sanitize_for_log(recycle_bin_id)}")
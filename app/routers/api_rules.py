@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from app.models.schemas import RulesResponse, RulesRequest
 from app.core.rules_service import RulesService
+from app.core.async_executor import run_file_io
 
 router = APIRouter()
 
@@ -14,7 +15,7 @@ async def get_rules_by_slug(request: RulesRequest) -> RulesResponse:
     """根据 slug 获取 rules 文件的 metadata"""
     try:
         # 获取搜索结果
-        searched_dirs, found_dirs, metadata_list = RulesService.get_rules_by_slug(request.slug)
+        searched_dirs, found_dirs, metadata_list = await run_file_io(RulesService.get_rules_by_slug, request.slug)
         
         # Convert FileMetadata objects to dictionaries
         data_dicts = [item.model_dump() for item in metadata_list]
@@ -11,6 +11,7 @@ from typing import Dict, Any, List
 from pydantic import BaseModel
 
 from app.core.time_tools_service import get_time_tools_service
+from app.core.async_executor import async_service
 from app.core.secure_logging import sanitize_for_log
 from app.core.logging import setup_logging
 
@@ -32,8 +33,8 @@ class TimeConfigResponse(BaseModel):
 async def get_time_tools_status():
     """获取时间工具配置状态"""
     try:
-        time_service = get_time_tools_service()
-        status_info = time_service.get_status_info()
+        time_service = async_service(get_time_tools_service())
+        status_info = await time_service.get_status_info()
         
         return {
             "status": "success",
@@ -52,8 +53,8 @@ async def get_time_tools_status():
 async def get_all_time_configs():
     """获取所有时间工具配置"""
     try:
-        time_service = get_time_tools_service()
-        configs = time_service.get_all_configs()
+        time_service = async_service(get_time_tools_service())
+        configs = await time_service.get_all_configs()
         
         return {
             "status": "success",
@@ -83,8 +84,8 @@ async def get_time_config(config_type: str):
                 detail=f"Invalid config type. Valid types: {', '.join(valid_types)}"
             )
         
-        time_service = get_time_tools_service()
-        config = time_service.get_config(config_type)
+        time_service = async_service(get_time_tools_service())
+        config = await time_service.get_config(config_type)
         
         if not config:
             raise HTTPException(
@@ -119,10 +120,10 @@ async def update_time_config(config_type: str, request: TimeConfigRequest):
                 detail=f"Invalid config type. Valid types: {', '.join(valid_types)}"
             )
         
-        time_service = get_time_tools_service()
+        time_service = async_service(get_time_tools_service())
         
         # 检查配置是否存在
-        existing_config = time_service.get_config(config_type)
+        existing_config = await time_service.get_config(config_type)
         if not existing_config:
             raise HTTPException(
                 status_code=404,
@@ -130,7 +131,7 @@ async def update_time_config(config_type: str, request: TimeConfigRequest):
             )
         
         # 更新配置
-        success = time_service.update_config(config_type, request.value)
+        success = await time_service.update_config(config_type, request.value)
         
         if not success:
             raise HTTPException(
@@ -139,7 +140,7 @@ async def update_time_config(config_type: str, request: TimeConfigRequest):
             )
         
         # 获取更新后的配置
-        updated_config = time_service.get_config(config_type)
+        updated_config = await time_service.get_config(config_type)
         
         logger.info(f"Updated time config: {config_type} = {sanitize_for_log(str(request.value))}")
         
@@ -162,8 +163,8 @@ async def update_time_config(config_type: str, request: TimeConfigRequest):
 async def get_available_timezones():
     """获取可用时区列表"""
     try:
-        time_service = get_time_tools_service()
-        timezones = time_service.get_available_timezones()
+        time_service = async_service(get_time_tools_service())
+        timezones = await time_service.get_available_timezones()
         
         return {
             "status": "success",
@@ -185,13 +186,13 @@ async def get_available_timezones():
 async def reload_time_tools_config():
     """重新加载时间工具配置"""
     try:
-        time_service = get_time_tools_service()
+        time_service = async_service(get_time_tools_service())
         
         # 重新初始化默认配置
-        time_service._initialize_default_config()
+        await time_service._initialize_default_config()
         
         # 获取最新状态
-        status_info = time_service.get_status_info()
+        status_info = await time_service.get_status_info()
         
         logger.info("Time tools configuration reloaded")
         
@@ -212,12 +213,12 @@ async def reload_time_tools_config():
 async def get_current_time_with_config():
     """根据当前配置获取时间信息"""
     try:
-        time_service = get_time_tools_service()
+        time_service = async_service(get_time_tools_service())
         
         # 获取配置的时区
-        tz_obj = time_service.get_timezone_object()
-        show_tz_info = time_service.should_display_timezone_info()
-        default_tz_str = time_service.get_default_timezone()
+        tz_obj = await time_service.get_timezone_object()
+        show_tz_info = await time_service.should_display_timezone_info()
+        default_tz_str = await time_service.get_default_timezone()
         
         # 生成时间信息
         if tz_obj:
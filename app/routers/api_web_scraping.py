@@ -3,13 +3,19 @@
 提供网络抓取相关的REST API端点
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Dict, Any, Optional, List, Union
 import asyncio
+import json
 
+from app.core.async_executor import run_file_io
 from app.core.logging import setup_logging
 from app.core.secure_logging import sanitize_for_log
+from app.tools.batch_executor import MAX_BATCH_CONCURRENCY
+from app.tools.html_extract import get_document_cache
+from app.tools.streaming import StreamingResult, consume_stream
 from app.tools.web_scraping_tools import (
     get_web_scraping_tools,
     http_request,
@@ -23,6 +29,8 @@ logger = setup_logging()
 
 router = APIRouter(prefix="/web-scraping", tags=["Web Scraping"])
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
 # Pydantic 模型定义
 class HttpRequestRequest(BaseModel):
     """HTTP请求模型"""
@@ -34,6 +42,7 @@ class HttpRequestRequest(BaseModel):
     json_data: Optional[Dict[str, Any]] = Field(None, description="JSON请求体")
     auth: Optional[List[str]] = Field(None, description="HTTP基础认证 [username, password]")
     follow_redirects: Optional[bool] = Field(None, description="是否跟随重定向")
+    cache_mode: Optional[str] = Field(None, description="HTTP缓存模式（default/no-store/reload/no-cache/force-cache/only-if-cached）")
 
 
 class FetchWebpageRequest(BaseModel):
@@ -43,6 +52,7 @@ class FetchWebpageRequest(BaseModel):
     extract_text: bool = Field(True, description="提取纯文本")
     extract_links: bool = Field(False, description="提取链接")
     extract_images: bool = Field(False, description="提取图片")
+    cache_mode: Optional[str] = Field(None, description="HTTP缓存模式")
 
 
 class DownloadFileRequest(BaseModel):
@@ -51,6 +61,9 @@ class DownloadFileRequest(BaseModel):
     save_path: Optional[str] = Field(None, description="保存路径")
     headers: Optional[Dict[str, str]] = Field(None, description="自定义请求头")
     max_size: Optional[int] = Field(None, description="最大文件大小（字节）")
+    resume: bool = Field(True, description="断点续传未完成的下载")
+    expected_sha256: Optional[str] = Field(None, description="期望的 SHA-256")
+    max_segments: Optional[int] = Field(None, ge=1, le=16, description="分段并行下载的最大并发段数")
 
 
 class ApiCallRequest(BaseModel):
@@ -77,8 +90,11 @@ class BatchRequestItem(BaseModel):
 class BatchRequestsRequest(BaseModel):
     """批量请求模型"""
     requests: List[BatchRequestItem] = Field(..., description="请求列表")
-    max_concurrent: int = Field(5, ge=1, le=20, description="最大并发数")
-    delay_between_requests: float = Field(0.1, ge=0, description="请求间延迟（秒）")
+    max_concurrent: int = Field(5, ge=1, le=MAX_BATCH_CONCURRENCY, description="全局最大并发数")
+    max_per_host: Optional[int] = Field(None, ge=1, le=MAX_BATCH_CONCURRENCY, description="每个主机的并发上限")
+    delay_between_requests: float = Field(0, ge=0, description="本批请求的最小间隔（秒）")
+    deadline: Optional[float] = Field(None, gt=0, description="整批截止时间（秒），到期后取消未完成的请求")
+    stream: bool = Field(False, description="按完成顺序流式返回（NDJSON；Accept 为 text/event-stream 时为 SSE）")
 
 
 class WebScrapingConfigRequest(BaseModel):
@@ -115,7 +131,8 @@ async def make_http_request(request: HttpRequestRequest):
             data=request.data,
             json_data=request.json_data,
             auth=auth_tuple,
-            follow_redirects=request.follow_redirects
+            follow_redirects=request.follow_redirects,
+            cache_mode=request.cache_mode
         )
 
         return {"success": True, "data": result}
@@ -136,8 +153,12 @@ async def fetch_webpage_endpoint(request: FetchWebpageRequest):
             headers=request.headers,
             extract_text=request.extract_text,
             extract_links=request.extract_links,
-            extract_images=request.extract_images
+            extract_images=request.extract_images,
+            cache_mode=request.cache_mode
         )
+        if isinstance(result, StreamingResult):
+            # 超过内联上限的 HTML 写入结果句柄
+            result, _ = await consume_stream(result, run_file_io)
 
         return {"success": True, "data": result}
 
@@ -156,8 +177,14 @@ async def download_file_endpoint(request: DownloadFileRequest):
             url=request.url,
             save_path=request.save_path,
             headers=request.headers,
-            max_size=request.max_size
+            max_size=request.max_size,
+            resume=request.resume,
+            expected_sha256=request.expected_sha256,
+            max_segments=request.max_segments
         )
+        if isinstance(result, StreamingResult):
+            # 未指定保存路径时内容以流式结果返回，超过内联上限的写入结果句柄
+            result, _ = await consume_stream(result, run_file_io)
 
         return {"success": True, "data": result}
 
@@ -190,10 +217,17 @@ async def make_api_call(request: ApiCallRequest):
 
 
 @router.post("/batch-requests", response_model=Dict[str, Any])
-async def make_batch_requests(request: BatchRequestsRequest):
-    """执行批量HTTP请求"""
+async def make_batch_requests(request: BatchRequestsRequest, raw_request: Request):
+    """执行批量HTTP请求
+
+    stream 为 true 或 Accept 为 application/x-ndjson / text/event-stream 时按完成顺序流式返回：
+    NDJSON 每行一个结果，最后一行为 {"summary": ...}；SSE 以 result 事件推送结果，最后推送 summary 事件。
+    """
+    accept = raw_request.headers.get("accept", "")
+    sse = "text/event-stream" in accept
+    stream = request.stream or sse or NDJSON_MEDIA_TYPE in accept
     try:
-        logger.info(f"Batch requests: {len(request.requests)} requests")
+        logger.info(f"Batch requests: {len(request.requests)} requests{' (streaming)' if stream else ''}")
 
         # 转换请求格式
         requests_data = []
@@ -204,9 +238,19 @@ async def make_batch_requests(request: BatchRequestsRequest):
         result = await batch_requests(
             requests=requests_data,
             max_concurrent=request.max_concurrent,
-            delay_between_requests=request.delay_between_requests
+            max_per_host=request.max_per_host,
+            delay_between_requests=request.delay_between_requests,
+            deadline=request.deadline,
+            stream=stream
         )
 
+        if isinstance(result, StreamingResult):
+            return StreamingResponse(
+                _stream_batch(result, sse),
+                media_type="text/event-stream" if sse else NDJSON_MEDIA_TYPE,
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+
         return {"success": True, "data": result}
 
     except Exception as e:
@@ -214,6 +258,14 @@ async def make_batch_requests(request: BatchRequestsRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _stream_batch(result: StreamingResult, sse: bool):
+    """逐条推送批量请求结果，结束后推送汇总"""
+    async for line in result.chunks:
+        yield f"event: result\ndata: {line}\n" if sse else line
+    summary = json.dumps(result.metadata.get("summary", {}), ensure_ascii=False)
+    yield f"event: summary\ndata: {summary}\n\n" if sse else f'{{"summary": {summary}}}\n'
+
+
 @router.get("/config", response_model=Dict[str, Any])
 async def get_web_scraping_config():
     """获取网络抓取工具配置"""
@@ -359,7 +411,10 @@ async def get_web_scraping_status():
             "ssl_verification": tools.config.verify_ssl,
             "max_file_size_mb": tools.config.max_file_size // (1024 * 1024),
             "timeout_seconds": tools.config.timeout,
-            "max_retries": tools.config.max_retries
+            "max_retries": tools.config.max_retries,
+            "http_cache": tools.http_cache.get_status() if tools.http_cache else None,
+            "circuit_breaker": tools.circuit_breaker.get_status(),
+            "html_documents": get_document_cache().get_status()
         }
 
         return {"success": True, "data": status_info}
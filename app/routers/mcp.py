@@ -4,18 +4,36 @@ MCP (Model Context Protocol) API 路由
 """
 
 from fastapi import APIRouter, Request, Response, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field, field_validator
+import asyncio
+import base64
 import json
+import re
 from datetime import datetime
 from typing import Any, Dict, Optional
 
+from app.core.config import (
+    MCP_BATCH_MAX_SIZE,
+    MCP_BATCH_MAX_CONCURRENCY,
+    MCP_MAX_ARGUMENT_SIZE,
+    MCP_MAX_INLINE_RESULT_BYTES,
+    MCP_SSE_PROGRESS_INTERVAL,
+    MCP_SSE_QUEUE_SIZE,
+)
 from app.core.logging import setup_logging
 from app.core.secure_logging import sanitize_for_log
 from app.tools.service import get_mcp_tools_service
 from app.tools.server import get_mcp_server
+from app.tools.dispatcher import get_tool_dispatcher, ToolNotFoundError, ToolPermissionError
+from app.tools.catalog import get_tool_catalog
+from app.tools.validation import ToolArgumentError
+from app.tools.sse_transport import MCPSession, SessionBusy, SessionLimitExceeded, encode_message, get_sse_session_manager
+from app.tools.streaming import CHUNK_SIZE, TEXT_MEDIA_TYPE, chunk_sink, get_result_store, read_text_page
+from app.core.admission_control import HEAVY_CLASS, AdmissionRejected, admission_slot
+from app.core.async_executor import TOOL_POOL_PREFIX, get_pools_status, run_file_io
 from app.core.mcp_tools_service import get_mcp_config_service
-from app.core.mcp_permissions import check_tool_permission, get_permission_manager, refresh_permission_manager
+from app.core.mcp_permissions import get_permission_manager, refresh_permission_manager
 
 # 导入权限装饰器
 def require_edit_permission(func):
@@ -36,6 +54,40 @@ logger = setup_logging()
 
 router = APIRouter(prefix="/mcp", tags=["MCP"])
 
+# SSE 会话心跳间隔（秒）
+SSE_HEARTBEAT_INTERVAL = 15.0
+
+# 工具名称只允许字母数字、下划线和连字符
+TOOL_NAME_PATTERN = re.compile(r'^[a-zA-Z0-9_-]+$')
+MAX_ARGUMENT_COUNT = 50
+MAX_ARGUMENT_DEPTH = 10
+
+
+def _check_argument_limits(arguments: Dict[str, Any]):
+    """限制参数数量、嵌套深度和字符串总长度（各工具的类型、取值范围等由调度器按工具 Schema 校验）
+
+    只对字符串/字节取 len 累加，不把参数整体序列化。
+    """
+    if len(arguments) > MAX_ARGUMENT_COUNT:
+        raise ValueError(f'工具参数数量不能超过{MAX_ARGUMENT_COUNT}个')
+    total = 0
+    stack = [(arguments, 0)]
+    while stack:
+        obj, depth = stack.pop()
+        if depth > MAX_ARGUMENT_DEPTH:
+            raise ValueError(f'工具参数嵌套深度不能超过{MAX_ARGUMENT_DEPTH}层')
+        items = obj.items() if isinstance(obj, dict) else enumerate(obj)
+        for key, value in items:
+            if isinstance(key, str):
+                total += len(key)
+            if isinstance(value, (str, bytes)):
+                total += len(value)
+            elif isinstance(value, (dict, list)):
+                stack.append((value, depth + 1))
+        if total > MCP_MAX_ARGUMENT_SIZE:
+            raise ValueError(f'工具参数过大，字符串总长度不能超过{MCP_MAX_ARGUMENT_SIZE}')
+
+
 # Pydantic 模型定义用于输入验证
 class MCPToolCallRequest(BaseModel):
     """MCP 工具调用请求模型"""
@@ -45,70 +97,35 @@ class MCPToolCallRequest(BaseModel):
     @field_validator('name')
     @classmethod
     def validate_tool_name(cls, v):
-        # 只允许字母数字、下划线和连字符
-        import re
-        if not re.match(r'^[a-zA-Z0-9_-]+$', v):
+        if not TOOL_NAME_PATTERN.match(v):
             raise ValueError('工具名称只能包含字母、数字、下划线和连字符')
         return v
 
     @field_validator('arguments')
     @classmethod
     def validate_arguments(cls, v):
-        # 限制参数字典的大小以防止DoS攻击
-        if len(str(v)) > 10000:  # 限制序列化后的大小
-            raise ValueError('工具参数过大，序列化后不能超过10000字符')
-
-        # 检查参数数量
-        if isinstance(v, dict) and len(v) > 50:
-            raise ValueError('工具参数数量不能超过50个')
-
-        # 检查嵌套深度
-        def check_depth(obj, depth=0):
-            if depth > 10:  # 限制嵌套深度
-                raise ValueError('工具参数嵌套深度不能超过10层')
-            if isinstance(obj, dict):
-                for value in obj.values():
-                    check_depth(value, depth + 1)
-            elif isinstance(obj, list):
-                for item in obj:
-                    check_depth(item, depth + 1)
-
-        check_depth(v)
+        _check_argument_limits(v)
         return v
 
+
+def _argument_error_data(error: ToolArgumentError) -> Dict[str, Any]:
+    return {"tool_name": error.tool_name, "errors": error.errors, "error_code": "INVALID_ARGUMENTS"}
+
 @router.get("/tools")
 async def list_mcp_tools():
     """列出可用的 MCP 工具"""
     try:
-        # 从MCP工具服务获取真实的工具数据
-        tools_service = get_mcp_tools_service()
-        all_tools = tools_service.get_tools(enabled_only=False)  # 获取所有工具，包括禁用的
-
-        # 根据权限过滤工具
-        permission_manager = get_permission_manager()
-        allowed_tools = []
-        blocked_tools = []
-
-        for tool in all_tools:
-            if check_tool_permission(tool['name']):
-                allowed_tools.append(tool)
-            else:
-                blocked_tools.append({
-                    "name": tool['name'],
-                    "description": tool['description'],
-                    "category": tool['category'],
-                    "permission_level": permission_manager.get_permission_level(tool['name']),
-                    "blocked_reason": f"需要 {permission_manager.get_permission_level(tool['name'])} 权限，在 {permission_manager.environment} 环境下不可用"
-                })
+        # 使用按版本缓存的目录快照，权限分区已预先计算（包括禁用的工具）
+        catalog = await get_tool_catalog().get_catalog()
 
         return {
             "success": True,
             "message": "MCP tools retrieved successfully",
             "data": {
-                "tools": allowed_tools,
-                "blocked_tools": blocked_tools,
-                "environment": permission_manager.environment,
-                "permission_info": permission_manager.get_permission_info(),
+                "tools": list(catalog.allowed),
+                "blocked_tools": list(catalog.blocked),
+                "environment": catalog.environment,
+                "permission_info": catalog.permission_info,
                 "server": "LazyAI Studio MCP Server",
                 "organization": "LazyGophers"
             }
@@ -137,151 +154,45 @@ async def call_mcp_tool(request: MCPToolCallRequest):
 
         # 输入验证已通过 Pydantic 模型完成
 
-        # 权限检查：检查工具是否允许在当前环境下使用
-        if not check_tool_permission(tool_name):
-            permission_manager = get_permission_manager()
-            permission_level = permission_manager.get_permission_level(tool_name)
+        # 按调度表元数据检查存在性与环境权限（不导入工具模块，执行时由调度器完成唯一一次解析）
+        try:
+            await get_tool_dispatcher().check_access(tool_name)
+        except ToolNotFoundError:
             return {
                 "success": False,
-                "message": f"工具 '{sanitize_for_log(tool_name)}' 在 {permission_manager.environment} 环境下不可用。此工具需要 {permission_level} 权限，仅在本地环境中可用。",
+                "message": f"Tool '{sanitize_for_log(tool_name)}' not found"
+            }
+        except ToolPermissionError as e:
+            permission_level = e.entry.permission_level
+            return {
+                "success": False,
+                "message": f"工具 '{sanitize_for_log(tool_name)}' 在 {e.environment} 环境下不可用。此工具需要 {permission_level} 权限，仅在本地环境中可用。",
                 "error_code": "TOOL_PERMISSION_DENIED",
                 "data": {
                     "tool_name": tool_name,
-                    "environment": permission_manager.environment,
+                    "environment": e.environment,
                     "permission_level": permission_level,
                     "allowed": False
                 }
             }
-        
-        # 获取MCP服务器实例并调用工具
+
+        # 调用MCP工具
         try:
-            from app.tools.server import get_mcp_server
-            mcp_server = get_mcp_server()
-            
-            # 检查工具是否存在
-            available_tools = mcp_server.get_available_tools()
-            if tool_name not in [tool['name'] for tool in available_tools]:
-                return {
-                    "success": False,
-                    "message": f"Tool '{sanitize_for_log(tool_name)}' not found"
-                }
-            
-            # 调用MCP工具
-            result = await mcp_server.call_tool(tool_name, arguments)
-            
+            result = await get_mcp_server().call_tool(tool_name, arguments)
+        except ToolArgumentError as e:
             return {
-                "success": True,
-                "message": "Tool executed successfully",
-                "data": {
-                    "tool": tool_name,
-                    "result": result,
-                    "arguments": arguments
-                }
+                "success": False,
+                "message": f"工具 '{sanitize_for_log(tool_name)}' 参数不合法: {'; '.join(e.errors)}",
+                "error_code": "INVALID_ARGUMENTS",
+                "data": _argument_error_data(e)
             }
-            
         except Exception as e:
-            logger.error(f"Error calling MCP tool {tool_name}: {sanitize_for_log(str(e))}")
+            logger.error(f"Error calling MCP tool {sanitize_for_log(tool_name)}: {sanitize_for_log(str(e))}")
             return {
                 "success": False,
                 "message": f"Tool execution failed: {str(e)}"
             }
-        
-        # Legacy fallback implementation (should not be reached with new MCP server)
-        if tool_name == "get_current_timestamp":
-            import time
-            from datetime import datetime
-            from app.core.time_tools_service import get_time_tools_service
-            
-            try:
-                # 从参数获取格式设置
-                format_type = arguments.get('format', 'iso')
-                
-                # 获取时间工具配置服务
-                time_service = get_time_tools_service()
-                
-                # 获取配置的时区
-                tz_obj = time_service.get_timezone_object()
-                show_tz_info = time_service.should_display_timezone_info()
-                default_tz_str = time_service.get_default_timezone()
-                
-                # 生成时间
-                if tz_obj:
-                    now = datetime.now(tz_obj)
-                    tz_name = str(tz_obj)
-                else:
-                    now = datetime.now()
-                    tz_name = str(now.astimezone().tzinfo)
-                
-                unix_timestamp = int(now.timestamp())
-                
-                if format_type == 'unix':
-                    result = f"Unix时间戳: {unix_timestamp}"
-                elif format_type == 'formatted':
-                    if show_tz_info:
-                        result = f"格式化时间: {now.strftime('%Y-%m-%d %H:%M:%S')} ({tz_name})"
-                    else:
-                        result = f"格式化时间: {now.strftime('%Y-%m-%d %H:%M:%S')}"
-                else:  # iso
-                    result = f"ISO格式时间: {now.isoformat()}"
-                
-                # 完整信息总是包含
-                result += f"""
-
-完整时间信息:
-- ISO 格式: {now.isoformat()}
-- Unix 时间戳: {unix_timestamp}
-- 格式化时间: {now.strftime('%Y-%m-%d %H:%M:%S')}"""
-                if show_tz_info:
-                    result += f"\n- 配置时区: {default_tz_str}"
-                    result += f"\n- 实际时区: {tz_name}"
-                
-            except Exception as e:
-                logger.error(f"Error in get_current_timestamp API: {sanitize_for_log(str(e))}")
-                # 回退实现
-                now = datetime.now()
-                unix_timestamp = int(time.time())
-                result = f"""当前时间信息:
-- ISO 格式: {now.isoformat()}
-- Unix 时间戳: {unix_timestamp}
-- 格式化时间: {now.strftime('%Y-%m-%d %H:%M:%S')}
-- 时区: {now.astimezone().tzname()}"""
-        elif tool_name == "get_system_info":
-            import platform
-            import psutil
-            memory = psutil.virtual_memory()
-            cpu_percent = psutil.cpu_percent(interval=1)
-            result = f"""LazyAI Studio 系统信息:
-- Python 版本: {platform.python_version()}
-- 操作系统: {platform.system()} {platform.release()}
-- CPU 使用率: {cpu_percent}%
-- 内存使用: {memory.percent}% ({memory.used // 1024 // 1024}MB / {memory.total // 1024 // 1024}MB)
-- 可用内存: {memory.available // 1024 // 1024}MB
-- LazyGophers 出品 - 让 AI 替你思考！"""
-        elif tool_name == "list_available_modes":
-            result = """LazyAI Studio 可用模式:
-
-🧠 orchestrator - Brain (智能中枢)
-🏗️ architect - 顶尖架构师
-📚 ask - 学术顾问
-🪄 code - 代码魔法师
-🐍 code-python - Python 代码魔法师
-🔬 debug - 异常分析师
-✍️ doc-writer - 文档工程师
-⚙️ giter - 版本控制专家
-🧠 memory - 记忆中枢
-🔍 project-research - 项目研究员
-
-🎯 快速选择建议:
-- 需要架构设计 → architect
-- 编写代码功能 → code 或 code-python
-- 调试问题 → debug
-- 分析项目 → project-research
-- 任务规划 → orchestrator
-
-LazyGophers - 让你做个聪明的懒人！ 🛋️"""
-        else:
-            result = f"Tool {tool_name} executed with arguments {arguments}"
-        
+
         return {
             "success": True,
             "message": "Tool executed successfully",
@@ -331,6 +242,8 @@ async def mcp_status():
         tools_service = get_mcp_tools_service()
         mcp_server = get_mcp_server()
         
+        dispatcher = get_tool_dispatcher()
+
         # 获取统计信息
         stats = tools_service.get_statistics()
         tools_by_category = tools_service.get_tools_by_category()
@@ -345,9 +258,19 @@ async def mcp_status():
                 "total_tools": stats['total_tools'],
                 "categories_count": stats['total_categories'],
                 "tools_by_category": {cat_id: info['count'] for cat_id, info in stats['by_category'].items()},
+                "runtime": {
+                    "dispatcher": dispatcher.get_status(),
+                    "catalog": get_tool_catalog().get_status(),
+                    "pools": [pool for pool in get_pools_status() if pool["name"].startswith(TOOL_POOL_PREFIX)],
+                    "tools": dispatcher.get_tool_timings(),
+                    "sse": get_sse_session_manager().get_status(),
+                    "results": get_result_store().get_status()
+                },
                 "endpoints": {
                     "sse": "/api/mcp/sse",
+                    "messages": "/api/mcp/messages",
                     "streamable": "/api/mcp/streamable",
+                    "results": "/api/mcp/results/{id}",
                     "tools": "/api/mcp/tools",
                     "call_tool": "/api/mcp/call-tool",
                     "categories": "/api/mcp/categories"
@@ -368,21 +291,15 @@ async def mcp_status():
 async def list_mcp_categories():
     """列出 MCP 工具分类"""
     try:
-        tools_service = get_mcp_tools_service()
-        categories = tools_service.get_categories(enabled_only=False)  # 获取所有分类，包括禁用的
-        tools_by_category = tools_service.get_tools_by_category()
-        
-        # 为每个分类添加工具数量
-        for category in categories:
-            cat_id = category['id']
-            category['tools_count'] = tools_by_category.get(cat_id, {}).get('count', 0)
-        
+        # 快照中的分类已包含工具数量（包括禁用的分类）
+        catalog = await get_tool_catalog().get_catalog()
+
         return {
             "success": True,
             "message": "MCP categories retrieved successfully",
             "data": {
-                "categories": categories,
-                "total_categories": len(categories)
+                "categories": list(catalog.categories),
+                "total_categories": len(catalog.categories)
             }
         }
     except Exception as e:
@@ -404,25 +321,23 @@ async def list_tools_by_category(category: str):
                 detail="无效的分类名称：只能包含字母、数字、下划线和连字符，长度不超过50字符"
             )
 
-        tools_service = get_mcp_tools_service()
+        catalog = await get_tool_catalog().get_catalog()
 
         # 验证分类是否存在
-        category_info = tools_service.get_category(category)
-        if not category_info:
+        category_tools = catalog.get_category(category)
+        if not category_tools:
             raise HTTPException(
                 status_code=404,
                 detail=f"分类 '{sanitize_for_log(category)}' 未找到"
             )
-        
-        tools = tools_service.get_tools(category=category, enabled_only=True)
-        
+
         return {
             "success": True,
             "message": f"Tools in category '{category}' retrieved successfully",
             "data": {
-                "category": category_info,
-                "tools": tools,
-                "tools_count": len(tools)
+                "category": category_tools.info,
+                "tools": list(category_tools.tools),
+                "tools_count": len(category_tools.tools)
             }
         }
     except Exception as e:
@@ -521,289 +436,431 @@ async def sync_mcp_tools():
 
 # SSE 端点 - 集成到主应用中
 # 注意: 这里我们不直接挂载 FastMCP 的 SSE，而是创建代理端点
-@router.get("/sse")
-async def mcp_sse_endpoint(request: Request):
-    """MCP SSE 传输端点"""
-    try:
-        # 创建 SSE 响应头
-        headers = {
-            "Content-Type": "text/event-stream",
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Headers": "*"
-        }
-        
-        async def sse_generator():
-            """SSE 数据生成器"""
-            try:
-                # 发送初始连接事件
-                yield f"event: connection\ndata: {json.dumps({'status': 'connected', 'server': 'LazyAI Studio MCP'})}\n\n"
-                
-                # 发送工具列表
-                tools_data = [
-                    {"name": "get_current_timestamp", "description": "获取当前时间戳"},
-                    {"name": "get_system_info", "description": "获取 LazyAI Studio 系统信息"},
-                    {"name": "list_available_modes", "description": "列出可用的 AI 模式"}
-                ]
-                
-                yield f"event: tools\ndata: {json.dumps({'tools': tools_data})}\n\n"
-                
-                # 保持连接活跃
-                while True:
-                    import asyncio
-                    await asyncio.sleep(30)  # 30秒心跳
-                    yield f"event: heartbeat\ndata: {json.dumps({'timestamp': int(__import__('time').time())})}\n\n"
-                    
-            except Exception as e:
-                logger.error(f"SSE generator error: {sanitize_for_log(str(e))}")
-                yield f"event: error\ndata: {json.dumps({'error': 'Internal server error'})}\n\n"
-        
-        return StreamingResponse(sse_generator(), headers=headers)
-        
-    except Exception as e:
-        logger.error(f"SSE endpoint error: {sanitize_for_log(str(e))}")
+# JSON-RPC 2.0 标准错误码
+JSONRPC_PARSE_ERROR = -32700
+JSONRPC_INVALID_REQUEST = -32600
+JSONRPC_METHOD_NOT_FOUND = -32601
+JSONRPC_INVALID_PARAMS = -32602
+JSONRPC_SERVER_BUSY = -32000
+
+
+def _jsonrpc_error(request_id: Any, code: int, message: str, data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """构造 JSON-RPC 错误响应"""
+    error: Dict[str, Any] = {"code": code, "message": message}
+    if data is not None:
+        error["data"] = data
+    return {"jsonrpc": "2.0", "id": request_id, "error": error}
+
+
+async def _dispatch_jsonrpc_method(request_id: Any, method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """执行单个 JSON-RPC 方法并返回响应"""
+    if method == "tools/list":
+        # 返回调度表快照中的真实工具列表
+        snapshot = await get_tool_dispatcher().get_tools_snapshot()
         return {
-            "success": False,
-            "message": "SSE endpoint failed: Internal server error"
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "result": {
+                "tools": list(snapshot.tools),
+                "_meta": {"version": snapshot.version}
+            }
         }
 
-@router.post("/streamable")  
-async def mcp_streamable_endpoint(request: Dict[str, Any]):
-    """MCP Streamable HTTP 传输端点"""
-    try:
-        # 处理 Streamable HTTP 请求
-        method = request.get("method", "")
-        params = request.get("params", {})
-        
-        logger.info(f"MCP Streamable HTTP request: method={sanitize_for_log(method)}")
-        
-        if method == "tools/list":
-            # 返回工具列表
-            tools = [
-                {
-                    "name": "get_current_timestamp",
-                    "description": "获取当前时间戳",
-                    "inputSchema": {"type": "object", "properties": {}, "required": []}
-                },
-                {
-                    "name": "get_system_info", 
-                    "description": "获取 LazyAI Studio 系统信息",
-                    "inputSchema": {"type": "object", "properties": {}, "required": []}
-                },
+    elif method == "tools/call":
+        # 调用工具
+        tool_name = params.get("name")
+        arguments = params.get("arguments") or {}
+        if not isinstance(tool_name, str) or not isinstance(arguments, dict):
+            return _jsonrpc_error(request_id, JSONRPC_INVALID_PARAMS, "Invalid params: 'name' must be a string and 'arguments' an object")
+        try:
+            _check_argument_limits(arguments)
+        except ValueError as e:
+            return _jsonrpc_error(request_id, JSONRPC_INVALID_PARAMS, f"Invalid params: {e}")
+
+        # 检查环境权限（与 /call-tool 一致，远程环境禁止调用工具）
+        if not get_mcp_config_service().is_tool_call_allowed():
+            return _jsonrpc_error(
+                request_id,
+                -2,
+                "在远程环境中，MCP工具调用被禁用。请在本地环境中使用此功能。",
+                {"tool_name": tool_name, "allowed": False, "error_code": "TOOL_CALL_DISABLED"}
+            )
+
+        # 按调度表元数据检查存在性与环境权限（不导入工具模块，执行时由调度器完成唯一一次解析）
+        try:
+            await get_tool_dispatcher().check_access(tool_name)
+        except ToolNotFoundError:
+            return _jsonrpc_error(request_id, -1, f"Tool '{sanitize_for_log(tool_name)}' not found")
+        except ToolPermissionError as e:
+            permission_level = e.entry.permission_level
+            return _jsonrpc_error(
+                request_id,
+                -2,
+                f"工具 '{sanitize_for_log(tool_name)}' 在 {e.environment} 环境下不可用。此工具需要 {permission_level} 权限，仅在本地环境中可用。",
                 {
-                    "name": "list_available_modes",
-                    "description": "列出可用的 AI 模式", 
-                    "inputSchema": {"type": "object", "properties": {}, "required": []}
-                }
-            ]
-            
-            return {
-                "jsonrpc": "2.0", 
-                "id": request.get("id"),
-                "result": {
-                    "tools": tools
-                }
-            }
-            
-        elif method == "tools/call":
-            # 调用工具
-            tool_name = params.get("name")
-            arguments = params.get("arguments", {})
-
-            # 权限检查：检查工具是否允许在当前环境下使用
-            if not check_tool_permission(tool_name):
-                permission_manager = get_permission_manager()
-                permission_level = permission_manager.get_permission_level(tool_name)
-                return {
-                    "jsonrpc": "2.0",
-                    "id": request.get("id"),
-                    "error": {
-                        "code": -2,
-                        "message": f"工具 '{sanitize_for_log(tool_name)}' 在 {permission_manager.environment} 环境下不可用。此工具需要 {permission_level} 权限，仅在本地环境中可用。",
-                        "data": {
-                            "tool_name": tool_name,
-                            "environment": permission_manager.environment,
-                            "permission_level": permission_level,
-                            "allowed": False,
-                            "error_code": "TOOL_PERMISSION_DENIED"
-                        }
-                    }
+                    "tool_name": tool_name,
+                    "environment": e.environment,
+                    "permission_level": permission_level,
+                    "allowed": False,
+                    "error_code": "TOOL_PERMISSION_DENIED"
                 }
+            )
 
-            # 获取MCP服务器实例并调用工具
-            try:
-                from app.tools.server import get_mcp_server
-                mcp_server = get_mcp_server()
-                
-                # 检查工具是否存在
-                available_tools = mcp_server.get_available_tools()
-                if tool_name not in [tool['name'] for tool in available_tools]:
-                    return {
-                        "jsonrpc": "2.0",
-                        "id": request.get("id"), 
-                        "error": {
-                            "code": -1,
-                            "message": f"Tool '{sanitize_for_log(tool_name)}' not found"
-                        }
-                    }
-                
-                # 调用MCP工具
-                result = await mcp_server.call_tool(tool_name, arguments)
-                
-                return {
-                    "jsonrpc": "2.0",
-                    "id": request.get("id"),
-                    "result": {
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": result
-                            }
-                        ]
-                    }
-                }
-                
-            except Exception as e:
-                logger.error(f"Error in streamable MCP tool call: {sanitize_for_log(str(e))}")
-                return {
-                    "jsonrpc": "2.0",
-                    "id": request.get("id"),
-                    "error": {
-                        "code": -1,
-                        "message": f"Tool execution failed: {str(e)}"
-                    }
-                }
-            
-            # Legacy fallback implementation
-            if tool_name == "get_current_timestamp":
-                import time
-                from datetime import datetime
-                from app.core.time_tools_service import get_time_tools_service
-                
-                try:
-                    # 从参数获取格式设置
-                    format_type = arguments.get('format', 'iso')
-                    
-                    # 获取时间工具配置服务
-                    time_service = get_time_tools_service()
-                    
-                    # 获取配置的时区
-                    tz_obj = time_service.get_timezone_object()
-                    show_tz_info = time_service.should_display_timezone_info()
-                    default_tz_str = time_service.get_default_timezone()
-                    
-                    # 生成时间
-                    if tz_obj:
-                        now = datetime.now(tz_obj)
-                        tz_name = str(tz_obj)
-                    else:
-                        now = datetime.now()
-                        tz_name = str(now.astimezone().tzinfo)
-                    
-                    unix_timestamp = int(now.timestamp())
-                    
-                    if format_type == 'unix':
-                        result = f"Unix时间戳: {unix_timestamp}"
-                    elif format_type == 'formatted':
-                        if show_tz_info:
-                            result = f"格式化时间: {now.strftime('%Y-%m-%d %H:%M:%S')} ({tz_name})"
-                        else:
-                            result = f"格式化时间: {now.strftime('%Y-%m-%d %H:%M:%S')}"
-                    else:  # iso
-                        result = f"ISO格式时间: {now.isoformat()}"
-                    
-                    # 完整信息总是包含
-                    result += f"""
-
-完整时间信息:
-- ISO 格式: {now.isoformat()}
-- Unix 时间戳: {unix_timestamp}
-- 格式化时间: {now.strftime('%Y-%m-%d %H:%M:%S')}"""
-                    if show_tz_info:
-                        result += f"\n- 配置时区: {default_tz_str}"
-                        result += f"\n- 实际时区: {tz_name}"
-                        
-                except Exception as e:
-                    logger.error(f"Error in get_current_timestamp streamable: {sanitize_for_log(str(e))}")
-                    # 回退实现
-                    now = datetime.now()
-                    unix_timestamp = int(time.time())
-                    result = f"""当前时间信息:
-- ISO 格式: {now.isoformat()}
-- Unix 时间戳: {unix_timestamp}
-- 格式化时间: {now.strftime('%Y-%m-%d %H:%M:%S')}
-- 时区: {now.astimezone().tzname()}"""
-            else:
-                result = f"Tool {tool_name} executed with arguments {arguments}"
-            
-            return {
-                "jsonrpc": "2.0",
-                "id": request.get("id"),
-                "result": {
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": str(result)
-                        }
-                    ]
-                }
-            }
-            
-        elif method == "initialize":
-            # 初始化响应
-            return {
-                "jsonrpc": "2.0",
-                "id": request.get("id"),
-                "result": {
-                    "protocolVersion": "2024-11-05",
-                    "capabilities": {
-                        "tools": {}
-                    },
-                    "serverInfo": {
-                        "name": "LazyAI Studio MCP Server",
-                        "version": "1.0.0"
+        # 调用MCP工具
+        try:
+            result = await get_mcp_server().call_tool(tool_name, arguments)
+        except ToolArgumentError as e:
+            return _jsonrpc_error(request_id, JSONRPC_INVALID_PARAMS, f"Invalid params: {'; '.join(e.errors)}", _argument_error_data(e))
+        except Exception as e:
+            logger.error(f"Error in streamable MCP tool call: {sanitize_for_log(str(e))}")
+            return _jsonrpc_error(request_id, -1, f"Tool execution failed: {str(e)}")
+
+        return {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "result": {
+                "content": [
+                    {
+                        "type": "text",
+                        "text": result
                     }
-                }
-            }
-            
-        elif method == "ping":
-            # Ping 响应
-            return {
-                "jsonrpc": "2.0",
-                "id": request.get("id"),
-                "result": {}
-            }
-            
-        elif method == "notifications/initialized":
-            # 初始化通知响应
-            return {
-                "jsonrpc": "2.0",
-                "id": request.get("id"),
-                "result": {}
+                ]
             }
-            
+        }
+
+    elif method == "results/read":
+        # 分页读取超过内联上限的工具结果
+        handle_id = params.get("id")
+        offset = params.get("offset", 0)
+        length = params.get("length", CHUNK_SIZE)
+        if not isinstance(handle_id, str) or not isinstance(offset, int) or not isinstance(length, int) \
+                or offset < 0 or length <= 0:
+            return _jsonrpc_error(request_id, JSONRPC_INVALID_PARAMS, "Invalid params: 'id' must be a string, 'offset' and 'length' non-negative integers")
+
+        store = get_result_store()
+        handle = store.get(handle_id)
+        if handle is None:
+            return _jsonrpc_error(request_id, -1, f"Result '{sanitize_for_log(handle_id)}' not found or expired")
+
+        length = min(length, MCP_MAX_INLINE_RESULT_BYTES)
+        if handle.media_type == TEXT_MEDIA_TYPE:
+            text, next_offset = await run_file_io(read_text_page, store, handle, offset, length)
+            content = {"type": "text", "text": text}
         else:
-            return {
-                "jsonrpc": "2.0",
-                "id": request.get("id"),
-                "error": {
-                    "code": -1,
-                    "message": f"Method '{sanitize_for_log(method)}' not supported"
+            data = await run_file_io(store.read, handle, offset, length)
+            next_offset = offset + len(data)
+            content = {"type": "blob", "blob": base64.b64encode(data).decode("ascii"), "mimeType": handle.media_type}
+        return {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "result": {
+                "content": [content],
+                "_meta": {
+                    "offset": offset,
+                    "next_offset": next_offset,
+                    "size": handle.size,
+                    "eof": next_offset >= handle.size
                 }
             }
-            
-    except Exception as e:
-        logger.error(f"Streamable HTTP endpoint error: {sanitize_for_log(str(e))}")
+        }
+
+    elif method == "initialize":
+        # 初始化响应
         return {
             "jsonrpc": "2.0",
-            "id": request.get("id", None),
-            "error": {
-                "code": -1,
-                "message": "Internal server error"
+            "id": request_id,
+            "result": {
+                "protocolVersion": "2024-11-05",
+                "capabilities": {
+                    "tools": {}
+                },
+                "serverInfo": {
+                    "name": "LazyAI Studio MCP Server",
+                    "version": "1.0.0"
+                }
             }
         }
 
+    elif method in ("ping", "notifications/initialized"):
+        return {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "result": {}
+        }
+
+    return _jsonrpc_error(request_id, JSONRPC_METHOD_NOT_FOUND, f"Method '{sanitize_for_log(method)}' not supported")
+
+
+async def _handle_jsonrpc_message(message: Any) -> Optional[Dict[str, Any]]:
+    """处理单条 JSON-RPC 消息，通知（不带 id）不返回响应"""
+    if not isinstance(message, dict) or not isinstance(message.get("method"), str):
+        request_id = message.get("id") if isinstance(message, dict) else None
+        return _jsonrpc_error(request_id, JSONRPC_INVALID_REQUEST, "Invalid Request")
+
+    is_notification = "id" not in message
+    request_id = message.get("id")
+    params = message.get("params") or {}
+    if not isinstance(params, dict):
+        response = _jsonrpc_error(request_id, JSONRPC_INVALID_PARAMS, "Invalid params: 'params' must be an object")
+    else:
+        try:
+            response = await _dispatch_jsonrpc_method(request_id, message["method"], params)
+        except Exception as e:
+            logger.error(f"Streamable HTTP method error: {sanitize_for_log(str(e))}")
+            response = _jsonrpc_error(request_id, -1, "Internal server error")
+
+    return None if is_notification else response
+
+
+@router.post("/streamable")
+async def mcp_streamable_endpoint(request: Request):
+    """MCP Streamable HTTP 传输端点
+
+    支持 JSON-RPC 2.0 批量请求：数组中的请求并发执行（同步工具仍受分类线程池限制），
+    响应按原顺序合并返回；通知不产生响应，全部为通知时返回 202。
+    单个 tools/call 请求且 Accept 包含 text/event-stream 时，以 SSE 逐块推送部分结果，最后推送响应。
+    """
+    try:
+        payload = json.loads(await request.body())
+    except (ValueError, UnicodeDecodeError):
+        return JSONResponse(_jsonrpc_error(None, JSONRPC_PARSE_ERROR, "Parse error"))
+
+    if (
+        isinstance(payload, dict)
+        and payload.get("method") == "tools/call"
+        and "id" in payload
+        and "text/event-stream" in request.headers.get("accept", "")
+    ):
+        logger.info("MCP Streamable HTTP request: method=tools/call (event-stream)")
+        return StreamingResponse(
+            _stream_tool_call(payload),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    if isinstance(payload, list):
+        if not payload:
+            return JSONResponse(_jsonrpc_error(None, JSONRPC_INVALID_REQUEST, "Invalid Request: empty batch"))
+        if len(payload) > MCP_BATCH_MAX_SIZE:
+            return JSONResponse(_jsonrpc_error(
+                None, JSONRPC_INVALID_REQUEST, f"Invalid Request: batch exceeds {MCP_BATCH_MAX_SIZE} messages"
+            ))
+
+        logger.info(f"MCP Streamable HTTP batch request: {len(payload)} messages")
+        semaphore = asyncio.Semaphore(MCP_BATCH_MAX_CONCURRENCY)
+
+        async def handle(message: Any) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                return await _handle_jsonrpc_message(message)
+
+        results = await asyncio.gather(*(handle(message) for message in payload))
+        responses: Any = [response for response in results if response is not None]
+    else:
+        if isinstance(payload, dict):
+            logger.info(f"MCP Streamable HTTP request: method={sanitize_for_log(payload.get('method', ''))}")
+        responses = await _handle_jsonrpc_message(payload)
+
+    if not responses:
+        return Response(status_code=202)
+    return JSONResponse(responses)
+
+def _progress_token(message: Any) -> Any:
+    """取 tools/call 请求中的 progressToken"""
+    if isinstance(message, dict) and message.get("method") == "tools/call" and isinstance(message.get("params"), dict):
+        meta = message["params"].get("_meta")
+        if isinstance(meta, dict):
+            return meta.get("progressToken")
+    return None
+
+
+def _partial_notification(progress_token: Any, index: int, chunk: Any) -> Dict[str, Any]:
+    """构造部分结果通知（二进制分块以 base64 编码）"""
+    if isinstance(chunk, bytes):
+        content = {"type": "blob", "blob": base64.b64encode(chunk).decode("ascii")}
+    else:
+        content = {"type": "text", "text": chunk}
+    return {
+        "jsonrpc": "2.0",
+        "method": "notifications/tools/partial",
+        "params": {"progressToken": progress_token, "index": index, "content": content}
+    }
+
+
+async def _stream_tool_call(message: Dict[str, Any]):
+    """以 SSE 帧推送单个工具调用的部分结果和最终响应
+
+    分块经有界队列转发，客户端读取慢时工具端等待，内存占用不随结果大小增长。
+    """
+    progress_token = _progress_token(message)
+    if progress_token is None:
+        progress_token = message.get("id")
+    queue: asyncio.Queue = asyncio.Queue(MCP_SSE_QUEUE_SIZE)
+    done = object()
+
+    async def sink(chunk: Any, index: int):
+        await queue.put(encode_message(_partial_notification(progress_token, index, chunk)))
+
+    async def run():
+        try:
+            with chunk_sink(sink):
+                response = await _handle_jsonrpc_message(message)
+            await queue.put(encode_message(response))
+        finally:
+            await queue.put(done)
+
+    task = asyncio.create_task(run())
+    try:
+        while True:
+            frame = await queue.get()
+            if frame is done:
+                break
+            yield frame
+        await task
+    finally:
+        # 客户端断开时停止工具执行
+        if not task.done():
+            task.cancel()
+
+
+@router.get("/sse")
+async def mcp_sse_endpoint(request: Request):
+    """MCP SSE 传输端点
+
+    建立会话并返回 text/event-stream。首个 endpoint 事件给出客户端投递消息的地址，
+    之后的 JSON-RPC 响应和进度通知都以 message 事件推送。
+    """
+    manager = get_sse_session_manager()
+    try:
+        session = manager.create()
+    except SessionLimitExceeded:
+        logger.warning("MCP SSE session limit reached, rejecting connection")
+        return JSONResponse(
+            {"success": False, "message": "Too many MCP SSE sessions, please retry later"},
+            status_code=503,
+            headers={"Retry-After": "5"},
+        )
+
+    endpoint = f"{request.url.path.rsplit('/', 1)[0]}/messages?session_id={session.id}"
+    logger.info(f"MCP SSE session opened: {session.id} ({len(manager)} active)")
+    return StreamingResponse(
+        manager.stream(session, endpoint, heartbeat_interval=SSE_HEARTBEAT_INTERVAL),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+async def _send_progress(session: MCPSession, progress_token: Any, interval: float):
+    """工具执行期间定期推送进度通知"""
+    progress = 0
+    while True:
+        session.send_nowait({
+            "jsonrpc": "2.0",
+            "method": "notifications/progress",
+            "params": {"progressToken": progress_token, "progress": progress}
+        })
+        await asyncio.sleep(interval)
+        progress += 1
+
+
+async def _process_sse_message(session: MCPSession, message: Any):
+    """执行一条会话消息并将响应推送到会话流
+
+    tools/call 在后台任务中执行，需占用与 /mcp/call-tool 相同的 heavy 名额；
+    名额不足时以 JSON-RPC 错误响应。
+    """
+    if not (isinstance(message, dict) and message.get("method") == "tools/call"):
+        response = await _run_sse_message(session, message)
+    else:
+        try:
+            async with admission_slot(HEAVY_CLASS, "MCP SSE tools/call"):
+                response = await _run_sse_message(session, message)
+        except AdmissionRejected:
+            response = None if "id" not in message else _jsonrpc_error(
+                message["id"], JSONRPC_SERVER_BUSY, "Server is busy, please retry later"
+            )
+
+    if response is not None:
+        await session.send(response)
+
+
+async def _run_sse_message(session: MCPSession, message: Any) -> Optional[Dict[str, Any]]:
+    """执行会话消息：带 progressToken 的 tools/call 会定期推送进度，流式结果的分块以部分结果通知推送"""
+    progress_token = _progress_token(message)
+    if progress_token is None:
+        response = await _handle_jsonrpc_message(message)
+    else:
+        async def sink(chunk: Any, index: int):
+            # 分块必须送达；会话已关闭时中止工具执行
+            if not await session.send(_partial_notification(progress_token, index, chunk)):
+                raise ConnectionResetError("MCP SSE session closed")
+
+        reporter = asyncio.create_task(_send_progress(session, progress_token, MCP_SSE_PROGRESS_INTERVAL))
+        try:
+            with chunk_sink(sink):
+                response = await _handle_jsonrpc_message(message)
+        finally:
+            reporter.cancel()
+    return response
+
+
+@router.post("/messages")
+async def mcp_sse_messages(request: Request, session_id: str):
+    """MCP SSE 会话的消息投递端点（支持批量），结果通过会话流异步返回"""
+    session = get_sse_session_manager().get(session_id)
+    if session is None:
+        return JSONResponse({"success": False, "message": "Session not found"}, status_code=404)
+
+    try:
+        payload = json.loads(await request.body())
+    except (ValueError, UnicodeDecodeError):
+        return JSONResponse(_jsonrpc_error(None, JSONRPC_PARSE_ERROR, "Parse error"), status_code=400)
+
+    messages = payload if isinstance(payload, list) else [payload]
+    if not messages or len(messages) > MCP_BATCH_MAX_SIZE:
+        return JSONResponse(_jsonrpc_error(None, JSONRPC_INVALID_REQUEST, "Invalid Request"), status_code=400)
+
+    try:
+        session.ensure_capacity(len(messages))
+    except SessionBusy:
+        return JSONResponse(
+            {"success": False, "message": "Too many in-flight requests for this session"},
+            status_code=429,
+            headers={"Retry-After": "1"},
+        )
+
+    session.touch()
+    for message in messages:
+        session.spawn(_process_sse_message(session, message))
+    return Response(status_code=202)
+
+@router.get("/results/{result_id}")
+async def read_mcp_result(result_id: str, offset: int = 0, length: Optional[int] = None):
+    """读取工具结果句柄：指定 length 时返回一页原始字节，否则从 offset 起流式返回剩余内容"""
+    store = get_result_store()
+    handle = store.get(result_id)
+    if handle is None or offset < 0 or (length is not None and length <= 0):
+        return JSONResponse({"success": False, "message": "Result not found or expired"}, status_code=404)
+
+    headers = {"X-Result-Size": str(handle.size)}
+    if length is None:
+        return StreamingResponse(store.iter_file(handle, offset), media_type=handle.media_type, headers=headers)
+
+    data = await run_file_io(store.read, handle, offset, min(length, MCP_MAX_INLINE_RESULT_BYTES))
+    headers["X-Next-Offset"] = str(offset + len(data))
+    return Response(content=data, media_type=handle.media_type, headers=headers)
+
+
+@router.delete("/results/{result_id}")
+async def delete_mcp_result(result_id: str):
+    """提前释放工具结果句柄"""
+    if not await run_file_io(get_result_store().delete, result_id):
+        return {"success": False, "message": "Result not found or expired"}
+    return {"success": True, "message": "Result released"}
+
 @router.post("/tools/enable")
 @require_edit_permission
 async def enable_mcp_tool(request: Dict[str, Any]):
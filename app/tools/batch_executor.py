@@ -0,0 +1,247 @@
+"""
+自适应并发批量请求
+Adaptive-Concurrency Batch Executor
+
+特性:
+- 按主机的 AIMD 并发控制：请求正常完成时加性增加（约每个窗口 +1），
+  限流（429/503）、5xx、连接错误或延迟明显高于基线时乘性减少，同一波拥塞只减少一次
+- 全局并发上限 max_concurrent + 每主机上限 max_per_host；调度时轮询仍有余量的主机，已满的主机不阻塞其他主机
+- 结果按完成顺序产出，调用方可边执行边消费（NDJSON / SSE）
+- 整批截止时间：到期后取消仍在执行的请求，未开始的请求直接标记为已取消
+"""
+
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from app.core.logging import setup_logging
+from app.tools.rate_limiter import HostRateLimiter
+
+logger = setup_logging("INFO")
+
+MAX_BATCH_CONCURRENCY = 50
+THROTTLE_STATUSES = (429, 503)
+# 不计入延迟基线的缓存状态（没有真正访问远端）
+CACHED_STATUSES = ("hit",)
+
+
+class AIMDController:
+    """单个主机的 AIMD 并发窗口"""
+
+    def __init__(self, initial: float, maximum: float, minimum: float = 1, decrease_factor: float = 0.5,
+                 latency_tolerance: float = 2.0, smoothing: float = 0.3):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self.base_latency: Optional[float] = None
+        self.latency: Optional[float] = None
+        self.increases = 0
+        self.decreases = 0
+        self._since_decrease = 0
+
+    @property
+    def window(self) -> int:
+        """当前允许的并发数"""
+        return max(int(self.minimum), int(self.limit))
+
+    def record(self, latency: Optional[float], congested: bool):
+        """记录一次完成的请求；latency 为 None 时不参与延迟判断"""
+        if latency is not None:
+            if self.base_latency is None:
+                self.base_latency = latency
+            else:
+                # 基线取最低延迟，并缓慢向近期延迟回归，以适应响应整体变慢等持续变化
+                self.base_latency = min(latency, self.base_latency + self.smoothing / 10 * (latency - self.base_latency))
+            self.latency = latency if self.latency is None else self.latency + self.smoothing * (latency - self.latency)
+            if self.latency > self.base_latency * self.latency_tolerance:
+                congested = True
+
+        self._since_decrease += 1
+        if congested:
+            # 减少后至少完成一个窗口的请求才允许再次减少，同一波拥塞中在途请求的失败不会连续减半
+            if self.decreases == 0 or self._since_decrease >= self.window:
+                self.limit = max(self.minimum, self.limit * self.decrease_factor)
+                self.decreases += 1
+                self._since_decrease = 0
+                # 减少后延迟会回落，平滑值从基线重新开始
+                self.latency = self.base_latency
+        elif self.limit < self.maximum:
+            before = self.window
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            if self.window > before:
+                self.increases += 1
+
+
+def _host_of(request_data: Dict[str, Any]) -> str:
+    try:
+        return urlsplit(str(request_data.get("url", ""))).netloc.lower()
+    except ValueError:
+        return ""
+
+
+def is_congested(result: Dict[str, Any]) -> bool:
+    """失败结果是否表明远端过载：限流、5xx 或没有拿到响应"""
+    if result.get("success"):
+        return False
+    status = result.get("status_code")
+    return status is None or status in THROTTLE_STATUSES or status >= 500
+
+
+class BatchExecutor:
+    """执行一批请求，按完成顺序产出结果"""
+
+    def __init__(self, requests: List[Dict[str, Any]],
+                 execute: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+                 max_concurrent: int = 5, max_per_host: Optional[int] = None,
+                 deadline: Optional[float] = None, min_interval: float = 0):
+        self.requests = requests
+        self.execute = execute
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_per_host = max(1, min(max_per_host or self.max_concurrent, self.max_concurrent))
+        self.deadline = deadline if deadline and deadline > 0 else None
+        # 本批的整体最小间隔，以令牌桶预约实现
+        self._pacer = HostRateLimiter(1.0 / min_interval) if min_interval > 0 else None
+        self._controllers: Dict[str, AIMDController] = {}
+        self._active: Dict[str, int] = {}
+        self.successful = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.peak_in_flight = 0
+        self.deadline_exceeded = False
+        self.total_time = 0.0
+
+    def _controller(self, host: str) -> AIMDController:
+        controller = self._controllers.get(host)
+        if controller is None:
+            # 从上限的一半起步，按观测结果增减
+            controller = self._controllers[host] = AIMDController(
+                initial=math.ceil(self.max_per_host / 2), maximum=self.max_per_host
+            )
+        return controller
+
+    def _next_host(self, queues: "OrderedDict[str, Deque[int]]") -> Optional[str]:
+        for host in queues:
+            if self._active.get(host, 0) < self._controller(host).window:
+                # 轮询：刚调度过的主机排到最后
+                queues.move_to_end(host)
+                return host
+        return None
+
+    async def _run(self, request_data: Dict[str, Any]) -> Tuple[Dict[str, Any], float]:
+        if self._pacer is not None:
+            await self._pacer.acquire("batch")
+        started = time.monotonic()
+        try:
+            result = await self.execute(request_data)
+        except Exception as e:
+            result = {"success": False, "error": str(e), "request": request_data}
+        return result, time.monotonic() - started
+
+    def _complete(self, index: int, host: str, result: Dict[str, Any], elapsed: float) -> Dict[str, Any]:
+        self._active[host] -= 1
+        sample = elapsed if result.get("success") and result.get("cache") not in CACHED_STATUSES else None
+        self._controller(host).record(sample, is_congested(result))
+        if result.get("success", False):
+            self.successful += 1
+        else:
+            self.failed += 1
+        return {**result, "request_index": index, "elapsed_ms": round(elapsed * 1000, 1)}
+
+    def _cancelled(self, index: int, started: bool) -> Dict[str, Any]:
+        self.cancelled += 1
+        self.failed += 1
+        return {
+            "success": False,
+            "error": "Batch deadline exceeded",
+            "cancelled": True,
+            "started": started,
+            "request_index": index,
+            "request": self.requests[index],
+        }
+
+    async def results(self) -> AsyncIterator[Dict[str, Any]]:
+        """按完成顺序产出结果；截止时间到达后产出被取消的请求"""
+        started = time.monotonic()
+        deadline_at = started + self.deadline if self.deadline is not None else None
+        queues: "OrderedDict[str, Deque[int]]" = OrderedDict()
+        for index, request_data in enumerate(self.requests):
+            queues.setdefault(_host_of(request_data), deque()).append(index)
+        running: Dict[asyncio.Task, Tuple[int, str]] = {}
+
+        try:
+            while queues or running:
+                while len(running) < self.max_concurrent and queues:
+                    host = self._next_host(queues)
+                    if host is None:
+                        break
+                    index = queues[host].popleft()
+                    if not queues[host]:
+                        del queues[host]
+                    self._active[host] = self._active.get(host, 0) + 1
+                    running[asyncio.create_task(self._run(self.requests[index]))] = (index, host)
+                self.peak_in_flight = max(self.peak_in_flight, len(running))
+
+                timeout = None
+                if deadline_at is not None:
+                    timeout = deadline_at - time.monotonic()
+                    if timeout <= 0:
+                        break
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+                for task in done:
+                    index, host = running.pop(task)
+                    result, elapsed = task.result()
+                    yield self._complete(index, host, result, elapsed)
+
+            if running or queues:
+                self.deadline_exceeded = True
+                logger.warning(f"Batch deadline exceeded: cancelling {len(running)} running, "
+                               f"{sum(len(queue) for queue in queues.values())} pending requests")
+                tasks = list(running)
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                for task in sorted(tasks, key=lambda task: running[task][0]):
+                    index, host = running.pop(task)
+                    if task.cancelled():
+                        self._active[host] -= 1
+                        yield self._cancelled(index, started=True)
+                    else:
+                        # 截止前刚好完成的请求照常返回
+                        yield self._complete(index, host, *task.result())
+                for index in sorted(index for queue in queues.values() for index in queue):
+                    yield self._cancelled(index, started=False)
+        finally:
+            # 调用方提前停止消费时同样取消在途请求
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+            self.total_time = time.monotonic() - started
+
+    def summary(self) -> Dict[str, Any]:
+        controllers = self._controllers.values()
+        return {
+            "total": len(self.requests),
+            "successful": self.successful,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "deadline_exceeded": self.deadline_exceeded,
+            "total_time": round(self.total_time, 3),
+            "concurrency": {
+                "max_concurrent": self.max_concurrent,
+                "max_per_host": self.max_per_host,
+                "peak_in_flight": self.peak_in_flight,
+                "hosts": len(self._controllers),
+                "increases": sum(controller.increases for controller in controllers),
+                "decreases": sum(controller.decreases for controller in controllers),
+                "final_limits": {host: controller.window for host, controller in self._controllers.items()},
+            },
+        }
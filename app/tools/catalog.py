@@ -0,0 +1,191 @@
+"""
+MCP 工具目录快照
+MCP Tool Catalog Snapshot
+
+特性:
+- 按 (注册表版本, 工具状态版本, 权限环境) 生成不可变的工具目录快照
+- 预先计算允许/禁止两个权限分区、禁止原因以及按分类分组的启用工具
+- 工具状态版本取自事件总线 MCP_TOOLS 主题，启用/禁用/增删分类或同步数据库时递增
+- 列表类接口只做一次版本比较和字典查找，不再逐个工具查询权限和扫描数据库
+- 键变化时才在存储线程池中重建，并发请求共享同一次重建
+"""
+
+import threading
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from app.core.async_executor import run_storage
+from app.core.event_bus import EventTopics, get_event_bus
+from app.core.logging import setup_logging
+from app.core.mcp_permissions import get_permission_manager
+from app.tools.registry import get_registry_version
+
+logger = setup_logging("INFO")
+
+
+@dataclass(frozen=True)
+class CatalogKey:
+    """快照版本键"""
+    registry_version: int
+    tools_version: int
+    environment: str
+    # 权限管理器按身份比较：刷新后即使环境名不变也会重建
+    permission_manager: Any = field(repr=False)
+
+
+@dataclass(frozen=True)
+class CategoryTools:
+    """单个分类的启用工具"""
+    info: Dict[str, Any]
+    tools: Tuple[Dict[str, Any], ...]
+
+
+@dataclass(frozen=True)
+class ToolCatalog:
+    """不可变工具目录快照
+
+    快照内的字典在构建时复制，与数据库记录互不影响；调用方不应修改。
+    """
+    key: CatalogKey
+    version: int
+    environment: str
+    permission_info: Dict[str, Any]
+    allowed: Tuple[Dict[str, Any], ...]
+    blocked: Tuple[Dict[str, Any], ...]
+    categories: Tuple[Dict[str, Any], ...]
+    by_category: Mapping[str, CategoryTools]
+
+    def get_category(self, category_id: str) -> Optional[CategoryTools]:
+        """O(1) 获取分类及其启用工具，分类不存在时返回 None"""
+        return self.by_category.get(category_id)
+
+
+def _group_by_category(tools: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    grouped: Dict[str, List[Dict[str, Any]]] = {}
+    for tool in tools:
+        grouped.setdefault(tool.get("category", ""), []).append(dict(tool))
+    return grouped
+
+
+class ToolCatalogCache:
+    """工具目录快照缓存"""
+
+    def __init__(self, tools_service=None):
+        self._tools_service = tools_service
+        self._catalog: Optional[ToolCatalog] = None
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+
+    @property
+    def tools_service(self):
+        if self._tools_service is None:
+            from app.tools.service import get_mcp_tools_service
+            self._tools_service = get_mcp_tools_service()
+        return self._tools_service
+
+    def current_key(self) -> CatalogKey:
+        permission_manager = get_permission_manager()
+        return CatalogKey(
+            registry_version=get_registry_version(),
+            tools_version=get_event_bus().get_version(EventTopics.MCP_TOOLS),
+            environment=permission_manager.environment,
+            permission_manager=permission_manager,
+        )
+
+    def is_stale(self) -> bool:
+        return self._catalog is None or self._catalog.key != self.current_key()
+
+    def rebuild(self) -> ToolCatalog:
+        """重建快照（读取数据库，应在存储线程池中调用）"""
+        with self._lock:
+            # 先取键再读数据：重建期间发生的变更会使键再次变化，下次访问时重建
+            key = self.current_key()
+            if self._catalog is not None and self._catalog.key == key:
+                return self._catalog
+
+            permission_manager = key.permission_manager
+            service = self.tools_service
+
+            allowed: List[Dict[str, Any]] = []
+            blocked: List[Dict[str, Any]] = []
+            for tool in service.get_tools(enabled_only=False):
+                name = tool["name"]
+                if permission_manager.is_tool_allowed(name):
+                    allowed.append(dict(tool))
+                    continue
+                level = permission_manager.get_permission_level(name)
+                blocked.append({
+                    "name": name,
+                    "description": tool.get("description", ""),
+                    "category": tool.get("category", ""),
+                    "permission_level": level,
+                    "blocked_reason": f"需要 {level} 权限，在 {permission_manager.environment} 环境下不可用",
+                })
+
+            enabled_by_category = _group_by_category(service.get_tools(enabled_only=True))
+            enabled_category_ids = {c["id"] for c in service.get_categories(enabled_only=True)}
+
+            categories: List[Dict[str, Any]] = []
+            by_category: Dict[str, CategoryTools] = {}
+            for category in service.get_categories(enabled_only=False):
+                category_id = category["id"]
+                tools = tuple(enabled_by_category.get(category_id, ()))
+                # 与原有统计口径一致：禁用分类的工具数记为 0
+                count = len(tools) if category_id in enabled_category_ids else 0
+                info = {**category, "tools_count": count}
+                categories.append(info)
+                by_category[category_id] = CategoryTools(info=info, tools=tools)
+
+            catalog = ToolCatalog(
+                key=key,
+                version=self._catalog.version + 1 if self._catalog else 1,
+                environment=permission_manager.environment,
+                permission_info=permission_manager.get_permission_info(),
+                allowed=tuple(allowed),
+                blocked=tuple(blocked),
+                categories=tuple(categories),
+                by_category=MappingProxyType(by_category),
+            )
+            self._catalog = catalog
+            self.rebuilds += 1
+            logger.debug(f"Tool catalog rebuilt: {len(allowed)} allowed, {len(blocked)} blocked, {len(categories)} categories")
+            return catalog
+
+    @property
+    def catalog(self) -> ToolCatalog:
+        if self.is_stale():
+            return self.rebuild()
+        return self._catalog
+
+    async def get_catalog(self) -> ToolCatalog:
+        """在事件循环中获取快照，过期时在存储线程池中重建"""
+        if self.is_stale():
+            return await run_storage(self.rebuild)
+        return self._catalog
+
+    def get_status(self) -> Dict[str, Any]:
+        catalog = self._catalog
+        return {
+            "version": catalog.version if catalog else 0,
+            "stale": self.is_stale(),
+            "rebuilds": self.rebuilds,
+            "allowed": len(catalog.allowed) if catalog else 0,
+            "blocked": len(catalog.blocked) if catalog else 0,
+            "categories": len(catalog.categories) if catalog else 0,
+        }
+
+
+# 全局目录快照缓存
+_catalog_cache: Optional[ToolCatalogCache] = None
+_catalog_cache_lock = threading.Lock()
+
+
+def get_tool_catalog() -> ToolCatalogCache:
+    """获取全局工具目录快照缓存"""
+    global _catalog_cache
+    if _catalog_cache is None:
+        with _catalog_cache_lock:
+            if _catalog_cache is None:
+                _catalog_cache = ToolCatalogCache()
+    return _catalog_cache
@@ -0,0 +1,348 @@
+"""
+并发站点爬取
+Concurrent Site Crawler
+
+特性:
+- 异步待抓取队列（frontier）+ 固定数量的 worker，按深度和页面数上限扩展
+- URL 规范化（去掉片段、默认端口，小写协议和主机）后按摘要去重，重定向后的最终地址同样记入
+- robots.txt 按源站解析并缓存（TTL），同一次爬取内对同一源站只请求一次；支持 Crawl-delay；
+  获取失败时的全部禁止只缓存很短时间
+- 每个页面的响应体有单独的大小上限，链接到的大文件不会按 max_file_size 整体读入内存
+- 每个主机的并发上限（信号量）+ 令牌桶限速，请求本身仍经过 WebScrapingTools 的全局限速、重试和 HTTP 缓存
+- 页面完成即产出结果，调用方可边爬边消费
+"""
+
+import asyncio
+import hashlib
+import re
+import threading
+import time
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional, Pattern, Set, Tuple
+from urllib.parse import urljoin, urlsplit, urlunsplit
+from urllib.robotparser import RobotFileParser
+
+import aiohttp
+
+from app.core.logging import setup_logging
+from app.core.secure_logging import sanitize_for_log
+from app.tools.html_extract import extract, parse_document
+from app.tools.rate_limiter import HostRateLimiter
+
+if TYPE_CHECKING:
+    from app.tools.fetch_tools import WebScrapingTools
+
+logger = setup_logging("INFO")
+
+MAX_CRAWL_PAGES = 1000
+MAX_CRAWL_DEPTH = 10
+MAX_CRAWL_CONCURRENCY = 32
+ROBOTS_TTL = 3600
+ROBOTS_FAILURE_TTL = 60
+MAX_PAGE_BYTES = 5 * 1024 * 1024
+ROBOTS_CACHE_SIZE = 256
+MAX_TEXT_CHARS = 10000
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str, base: Optional[str] = None) -> Optional[str]:
+    """规范化 URL，非 http(s) 链接返回 None"""
+    try:
+        parts = urlsplit(urljoin(base, url.strip()) if base else url.strip())
+        scheme = parts.scheme.lower()
+        if scheme not in _DEFAULT_PORTS or not parts.hostname:
+            return None
+        host = parts.hostname.lower()
+        if ":" in host:
+            host = f"[{host}]"
+        port = parts.port
+    except ValueError:
+        return None
+    netloc = host if port in (None, _DEFAULT_PORTS[scheme]) else f"{host}:{port}"
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+class URLSet:
+    """已见 URL 集合，只保存 16 字节摘要"""
+
+    def __init__(self):
+        self._digests: Set[bytes] = set()
+
+    @staticmethod
+    def _digest(url: str) -> bytes:
+        return hashlib.blake2b(url.encode("utf-8"), digest_size=16).digest()
+
+    def add(self, url: str) -> bool:
+        """加入集合，返回此前是否不存在"""
+        digest = self._digest(url)
+        if digest in self._digests:
+            return False
+        self._digests.add(digest)
+        return True
+
+    def __contains__(self, url: str) -> bool:
+        return self._digest(url) in self._digests
+
+    def __len__(self) -> int:
+        return len(self._digests)
+
+
+class RobotsCache:
+    """按源站缓存解析后的 robots.txt"""
+
+    def __init__(self, ttl: float = ROBOTS_TTL, max_entries: int = ROBOTS_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[str, Tuple[float, RobotFileParser, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, origin: str) -> Optional[RobotFileParser]:
+        with self._lock:
+            entry = self._entries.get(origin)
+            if entry is None:
+                return None
+            stored_at, parser, ttl = entry
+            if time.monotonic() - stored_at > (self.ttl if ttl is None else ttl):
+                return None
+            return parser
+
+    def put(self, origin: str, parser: RobotFileParser, ttl: Optional[float] = None):
+        """缓存解析结果，ttl 为 None 时使用缓存的默认 TTL"""
+        with self._lock:
+            self._entries[origin] = (time.monotonic(), parser, ttl)
+            if len(self._entries) > self.max_entries:
+                oldest = min(self._entries, key=lambda key: self._entries[key][0])
+                del self._entries[oldest]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_robots_cache: Optional[RobotsCache] = None
+_robots_cache_lock = threading.Lock()
+
+
+def get_robots_cache() -> RobotsCache:
+    global _robots_cache
+    if _robots_cache is None:
+        with _robots_cache_lock:
+            if _robots_cache is None:
+                _robots_cache = RobotsCache()
+    return _robots_cache
+
+
+def _robots_from_lines(lines: List[str]) -> RobotFileParser:
+    parser = RobotFileParser()
+    parser.parse(lines)
+    return parser
+
+
+class Crawler:
+    """一次爬取任务"""
+
+    def __init__(self, tools: "WebScrapingTools", start_url: str, max_depth: int = 2, max_pages: int = 50,
+                 same_domain: bool = True, allowed_domains: Optional[List[str]] = None,
+                 include_patterns: Optional[List[str]] = None, exclude_patterns: Optional[List[str]] = None,
+                 respect_robots: bool = True, concurrency: int = 8, max_per_host: int = 2,
+                 requests_per_second: Optional[float] = 5, extract_text: bool = True,
+                 headers: Optional[Dict[str, str]] = None, cache_mode: Optional[str] = None):
+        start = normalize_url(start_url)
+        if start is None:
+            raise ValueError(f"Invalid start URL: {start_url}")
+        self.tools = tools
+        self.start_url = start
+        self.max_depth = max(0, min(max_depth, MAX_CRAWL_DEPTH))
+        self.max_pages = max(1, min(max_pages, MAX_CRAWL_PAGES))
+        self.respect_robots = respect_robots
+        self.concurrency = max(1, min(concurrency, MAX_CRAWL_CONCURRENCY))
+        self.max_per_host = max(1, max_per_host)
+        self.requests_per_second = requests_per_second
+        self.extract_text = extract_text
+        self.headers = headers
+        self.cache_mode = cache_mode
+
+        domains = [domain.lower().lstrip(".") for domain in allowed_domains or []]
+        if same_domain and not domains:
+            domains = [urlsplit(start).hostname]
+        self.allowed_domains = domains
+        self.include_patterns: List[Pattern] = [re.compile(pattern) for pattern in include_patterns or []]
+        self.exclude_patterns: List[Pattern] = [re.compile(pattern) for pattern in exclude_patterns or []]
+
+        self.seen = URLSet()
+        self.scheduled = 0
+        self.stats = {
+            "pages_crawled": 0, "errors": 0, "robots_blocked": 0, "duplicates": 0,
+            "filtered": 0, "max_depth_reached": 0,
+        }
+        self._robots = get_robots_cache()
+        self._robots_locks: Dict[str, asyncio.Lock] = {}
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._host_limiters: Dict[str, HostRateLimiter] = {}
+        self._frontier: Optional[asyncio.Queue] = None
+        self._results: Optional[asyncio.Queue] = None
+
+    def _allowed(self, url: str) -> bool:
+        host = urlsplit(url).hostname or ""
+        if self.allowed_domains and not any(host == domain or host.endswith("." + domain)
+                                            for domain in self.allowed_domains):
+            return False
+        if self.include_patterns and not any(pattern.search(url) for pattern in self.include_patterns):
+            return False
+        return not any(pattern.search(url) for pattern in self.exclude_patterns)
+
+    def _schedule(self, url: str, depth: int) -> bool:
+        if self.scheduled >= self.max_pages:
+            return False
+        if not self.seen.add(url):
+            self.stats["duplicates"] += 1
+            return False
+        if not self._allowed(url):
+            self.stats["filtered"] += 1
+            return False
+        self.scheduled += 1
+        self._frontier.put_nowait((url, depth))
+        return True
+
+    async def _robots_for(self, url: str) -> RobotFileParser:
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        parser = self._robots.get(origin)
+        if parser is not None:
+            return parser
+        lock = self._robots_locks.setdefault(origin, asyncio.Lock())
+        async with lock:
+            parser = self._robots.get(origin)
+            if parser is not None:
+                return parser
+            # 获取失败（5xx、网络错误、熔断）时全部禁止，但只短暂缓存，源站恢复后很快重新获取
+            ttl = None
+            try:
+                response = await self.tools._make_request_with_retry(
+                    "GET", f"{origin}/robots.txt", max_size=MAX_PAGE_BYTES
+                )
+                parser = _robots_from_lines((await response.text()).splitlines())
+            except aiohttp.ClientResponseError as e:
+                # 4xx 视为没有限制，5xx 视为全部禁止（RFC 9309）
+                parser = _robots_from_lines([] if e.status < 500 else ["User-agent: *", "Disallow: /"])
+                if e.status >= 500:
+                    ttl = ROBOTS_FAILURE_TTL
+            except (aiohttp.ClientError, asyncio.TimeoutError, UnicodeDecodeError, ValueError) as e:
+                logger.warning(f"robots.txt unavailable for {sanitize_for_log(origin)}: {e}")
+                parser = _robots_from_lines(["User-agent: *", "Disallow: /"])
+                ttl = ROBOTS_FAILURE_TTL
+            self._robots.put(origin, parser, ttl)
+            return parser
+
+    def _limiter_for(self, host: str, robots: Optional[RobotFileParser]) -> HostRateLimiter:
+        limiter = self._host_limiters.get(host)
+        if limiter is None:
+            rate = self.requests_per_second
+            delay = robots.crawl_delay(self.tools.config.user_agent) if robots is not None else None
+            if delay:
+                rate = min(rate, 1 / float(delay)) if rate else 1 / float(delay)
+            limiter = self._host_limiters[host] = HostRateLimiter(requests_per_second=rate, burst_size=1)
+        return limiter
+
+    async def _fetch(self, url: str, depth: int) -> Optional[Dict[str, Any]]:
+        robots = None
+        if self.respect_robots:
+            robots = await self._robots_for(url)
+            if not robots.can_fetch(self.tools.config.user_agent, url):
+                self.stats["robots_blocked"] += 1
+                return None
+
+        host = urlsplit(url).netloc
+        slot = self._host_slots.setdefault(host, asyncio.Semaphore(self.max_per_host))
+        started = time.monotonic()
+        async with slot:
+            await self._limiter_for(host, robots).acquire(host)
+            response = await self.tools._make_request_with_retry(
+                "GET", url, cache_mode=self.cache_mode, headers=self.headers, max_size=MAX_PAGE_BYTES
+            )
+
+        final_url = normalize_url(str(response.url)) or url
+        if final_url != url:
+            self.seen.add(final_url)
+        content_type = response.headers.get("Content-Type", "")
+        page = {
+            "url": url,
+            "final_url": final_url,
+            "depth": depth,
+            "status": response.status,
+            "content_type": content_type,
+            "cache": response.cache_status,
+            "title": "",
+            "links_found": 0,
+            "links_queued": 0,
+        }
+        if "html" in content_type.lower():
+            outputs = {"title", "links"} | ({"text_content"} if self.extract_text else set())
+            extracted = extract(parse_document(await response.text(), outputs), outputs, url=final_url)
+            page["title"] = extracted["title"]
+            if self.extract_text:
+                page["text"] = extracted["text_content"][:MAX_TEXT_CHARS]
+            page["links_found"] = len(extracted["links"])
+            if depth < self.max_depth:
+                for link in extracted["links"]:
+                    target = normalize_url(link["href"])
+                    if target is not None and self._schedule(target, depth + 1):
+                        page["links_queued"] += 1
+        page["elapsed_ms"] = round((time.monotonic() - started) * 1000, 1)
+        return page
+
+    async def _worker(self):
+        while True:
+            url, depth = await self._frontier.get()
+            try:
+                try:
+                    page = await self._fetch(url, depth)
+                    if page is not None:
+                        self.stats["pages_crawled"] += 1
+                        self.stats["max_depth_reached"] = max(self.stats["max_depth_reached"], depth)
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    logger.warning(f"Crawl failed for {sanitize_for_log(url)}: {e}")
+                    page = {"url": url, "depth": depth, "error": str(e)}
+                    if isinstance(e, aiohttp.ClientResponseError):
+                        page["status"] = e.status
+                # 先放入结果再结束任务，frontier 清空时所有结果都已入队
+                if page is not None:
+                    self._results.put_nowait(page)
+            finally:
+                self._frontier.task_done()
+
+    async def pages(self) -> AsyncIterator[Dict[str, Any]]:
+        """按完成顺序产出页面结果，队列清空后结束"""
+        self._frontier = asyncio.Queue()
+        self._results = asyncio.Queue()
+        # 起始页不受域名和模式过滤
+        self.seen.add(self.start_url)
+        self.scheduled = 1
+        self._frontier.put_nowait((self.start_url, 0))
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+        async def finish():
+            await self._frontier.join()
+            self._results.put_nowait(None)
+
+        monitor = asyncio.create_task(finish())
+        try:
+            while True:
+                page = await self._results.get()
+                if page is None:
+                    break
+                yield page
+        finally:
+            monitor.cancel()
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(monitor, *workers, return_exceptions=True)
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "start_url": self.start_url,
+            "pages_scheduled": self.scheduled,
+            "urls_seen": len(self.seen),
+            **self.stats,
+        }
@@ -0,0 +1,383 @@
+"""
+MCP 工具调度引擎
+MCP Tool Dispatch Engine
+
+特性:
+- 从装饰器注册表构建 工具名 -> (实现函数, 是否异步, Schema, 权限) 的只读调度表
+- 调用路径只做一次字典查找，不再扫描数据库或工具列表
+- 工具启用/禁用、注册表变化或权限环境切换时才重建调度表（通过事件总线失效）
+- 异步工具直接 await，同步工具按分类在独立线程池中执行，不阻塞事件循环
+- 按工具统计排队时间与执行时间，区分"线程池忙"和"工具本身慢"
+- 每次调用记录到追踪器：序列化耗时、参数/结果大小以及最慢调用记录
+- tools/list 使用随调度表版本缓存的不可变快照
+- 声明了 cache 的只读工具经结果缓存执行（LRU/TTL + single-flight）
+- 按清单注册的工具在首次调用时才导入实现模块
+- 调用前用注册时编译的校验器检查参数并补全默认值，不合法的调用不进入执行阶段
+- 工具返回 StreamingResult 时逐块转发或汇总；超过内联上限的结果写入临时结果句柄
+"""
+
+import asyncio
+import functools
+import json
+import threading
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+from app.core.async_executor import TOOL_POOL_PREFIX, get_tool_pool, run_file_io, run_storage
+from app.core.config import MCP_MAX_INLINE_RESULT_BYTES
+from app.core.event_bus import Event, EventTopics, get_event_bus
+from app.core.logging import setup_logging
+from app.core.mcp_permissions import get_permission_manager
+from app.core.secure_logging import sanitize_for_log
+from app.tools.registry import (
+    get_registry_version,
+    get_tool_by_name,
+    get_tool_cache_policy,
+    get_tool_callable,
+    get_tool_module,
+    get_tool_validator,
+    load_tool_module,
+)
+from app.tools.result_cache import CachePolicy, ToolResultCache
+from app.tools.streaming import StreamingResult, consume_stream, spill_text
+from app.tools.tracing import ToolTracer
+from app.tools.validation import ArgumentValidator, ToolArgumentError
+
+logger = setup_logging("INFO")
+
+
+@dataclass(frozen=True)
+class ToolEntry:
+    """调度表条目"""
+    name: str
+    category: str
+    description: str
+    func: Optional[Callable]
+    is_async: bool
+    schema: Dict[str, Any]
+    permission_level: str
+    allowed: bool
+    cache_policy: Optional[CachePolicy] = None
+    validator: Optional[ArgumentValidator] = None
+    # 实现模块；func 为 None 表示模块尚未导入，首次调用时加载
+    module: Optional[str] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.func is not None
+
+    @property
+    def pool(self) -> Optional[str]:
+        """同步工具所在线程池名称，异步工具为 None"""
+        return None if self.is_async else f"{TOOL_POOL_PREFIX}{self.category}"
+
+
+@dataclass(frozen=True)
+class ToolsSnapshot:
+    """tools/list 快照（调度表版本号 + MCP 格式的工具列表）"""
+    version: int
+    tools: Tuple[Dict[str, Any], ...]
+
+
+class ToolNotFoundError(LookupError):
+    """工具不存在、未启用或没有实现函数"""
+
+    def __init__(self, tool_name: str):
+        super().__init__(f"Tool '{tool_name}' not found")
+        self.tool_name = tool_name
+
+
+class ToolPermissionError(PermissionError):
+    """工具在当前环境下不可用"""
+
+    def __init__(self, entry: ToolEntry, environment: str):
+        super().__init__(f"Tool '{entry.name}' is not allowed in {environment} environment")
+        self.entry = entry
+        self.environment = environment
+
+
+class ToolDispatcher:
+    """工具调度器
+
+    调度表是不可变映射，重建时整体替换引用，读路径无需加锁。
+    """
+
+    def __init__(self, tools_service=None, max_inline_bytes: int = MCP_MAX_INLINE_RESULT_BYTES):
+        self._tools_service = tools_service
+        self.max_inline_bytes = max_inline_bytes
+        self._table: Mapping[str, ToolEntry] = MappingProxyType({})
+        self._dirty = True
+        self._registry_version = -1
+        self._permission_manager = None
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+        self._snapshot: Optional[ToolsSnapshot] = None
+        self._snapshot_table: Optional[Mapping[str, ToolEntry]] = None
+        self.result_cache = ToolResultCache()
+        self.tracer = ToolTracer()
+
+    @property
+    def tools_service(self):
+        if self._tools_service is None:
+            from app.tools.service import get_mcp_tools_service
+            self._tools_service = get_mcp_tools_service()
+        return self._tools_service
+
+    def invalidate(self, event: Optional[Event] = None):
+        """标记调度表过期（可作为事件总线监听器）"""
+        self._dirty = True
+
+    def is_stale(self) -> bool:
+        return (
+            self._dirty
+            or self._registry_version != get_registry_version()
+            or self._permission_manager is not get_permission_manager()
+        )
+
+    def rebuild(self) -> Mapping[str, ToolEntry]:
+        """重建调度表（读取数据库，应在存储线程池中调用）"""
+        with self._lock:
+            if not self.is_stale():
+                return self._table
+
+            # 先清除标记：重建期间发生的变更会再次置位，下次调用时重建
+            self._dirty = False
+            registry_version = get_registry_version()
+            permission_manager = get_permission_manager()
+
+            table: Dict[str, ToolEntry] = {}
+            for tool_data in self.tools_service.get_tools(enabled_only=True):
+                name = tool_data["name"]
+                func = get_tool_callable(name)
+                module = get_tool_module(name)
+                if func is None and module is None:
+                    continue
+                tool = get_tool_by_name(name)
+                table[name] = ToolEntry(
+                    name=name,
+                    category=tool.category if tool else tool_data.get("category", ""),
+                    description=tool.description if tool else tool_data.get("description", ""),
+                    func=func,
+                    is_async=asyncio.iscoroutinefunction(func) if func is not None else False,
+                    schema=tool.schema if tool else tool_data.get("schema", {}),
+                    permission_level=permission_manager.get_permission_level(name),
+                    allowed=permission_manager.is_tool_allowed(name),
+                    cache_policy=get_tool_cache_policy(name),
+                    validator=get_tool_validator(name),
+                    module=module,
+                )
+
+            self._table = MappingProxyType(table)
+            self._registry_version = registry_version
+            self._permission_manager = permission_manager
+            self.rebuilds += 1
+            logger.debug(f"Tool dispatch table rebuilt: {len(table)} tools")
+            return self._table
+
+    @property
+    def table(self) -> Mapping[str, ToolEntry]:
+        if self.is_stale():
+            return self.rebuild()
+        return self._table
+
+    def lookup(self, tool_name: str) -> Optional[ToolEntry]:
+        """O(1) 查找工具条目"""
+        return self.table.get(tool_name)
+
+    async def get_table(self) -> Mapping[str, ToolEntry]:
+        """在事件循环中获取调度表，过期时在存储线程池中重建"""
+        if self.is_stale():
+            return await run_storage(self.rebuild)
+        return self._table
+
+    async def get_tools_snapshot(self) -> ToolsSnapshot:
+        """获取当前环境可调用工具的 tools/list 快照，调度表未变化时直接复用"""
+        table = await self.get_table()
+        if self._snapshot is None or self._snapshot_table is not table:
+            self._snapshot = ToolsSnapshot(
+                version=self._snapshot.version + 1 if self._snapshot else 1,
+                tools=tuple(
+                    {"name": entry.name, "description": entry.description, "inputSchema": entry.schema}
+                    for entry in sorted(table.values(), key=lambda e: e.name)
+                    if entry.allowed
+                ),
+            )
+            self._snapshot_table = table
+        return self._snapshot
+
+    async def check_access(self, tool_name: str) -> ToolEntry:
+        """只按调度表元数据检查工具是否存在及权限，不导入实现模块"""
+        table = await self.get_table()
+        entry = table.get(tool_name)
+        if entry is None:
+            raise ToolNotFoundError(tool_name)
+        if not entry.allowed:
+            raise ToolPermissionError(entry, self._permission_manager.environment)
+        return entry
+
+    async def resolve(self, tool_name: str, arguments: Optional[Dict[str, Any]] = None) -> ToolEntry:
+        """在事件循环中查找工具并检查权限；给出 arguments 时同时校验参数（在导入实现模块之前）"""
+        entry = await self.check_access(tool_name)
+        if arguments is not None:
+            self.validate(entry, arguments)
+        if not entry.loaded:
+            entry = await self._load(entry)
+        return entry
+
+    def validate(self, entry: ToolEntry, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """校验参数并原地补全默认值，失败时按工具计数"""
+        if entry.validator is None:
+            return arguments
+        try:
+            return entry.validator.validate(arguments)
+        except ToolArgumentError:
+            self.tracer.record_invalid(entry.name, entry.category)
+            raise
+
+    async def _load(self, entry: ToolEntry) -> ToolEntry:
+        """导入工具所在模块（整个分类一起加载），并从重建后的调度表取回条目"""
+        await run_file_io(load_tool_module, entry.module)
+        loaded = (await self.get_table()).get(entry.name)
+        if loaded is None or not loaded.loaded:
+            # 清单中的工具在模块中已不存在
+            raise ToolNotFoundError(entry.name)
+        return loaded
+
+    async def call(self, tool_name: str, arguments: Optional[Dict[str, Any]] = None) -> Any:
+        """调用工具并返回原始结果（缓存命中时返回共享的缓存对象，调用方不应修改）
+
+        参数字典会被原地补全默认值。
+        """
+        arguments = {} if arguments is None else arguments
+        entry = await self.resolve(tool_name, arguments)
+        return await self._invoke(entry, arguments, serialize=False)
+
+    async def call_text(self, tool_name: str, arguments: Optional[Dict[str, Any]] = None) -> str:
+        """调用工具并将结果序列化为文本（非字符串结果编码为 JSON）
+
+        文本超过内联上限时写入结果句柄，返回句柄描述和内容预览。
+        """
+        arguments = {} if arguments is None else arguments
+        entry = await self.resolve(tool_name, arguments)
+        return await self._invoke(entry, arguments, serialize=True)
+
+    async def _invoke(self, entry: ToolEntry, arguments: Dict[str, Any], serialize: bool) -> Any:
+        """执行调用并记录追踪信息"""
+        # [排队时间, 执行时间]；缓存命中或合并等待时不会执行，保持为 0
+        phases = [0.0, 0.0]
+        executed = False
+
+        async def execute():
+            nonlocal executed, result_bytes
+            executed = True
+            result, phases[0], phases[1] = await self._execute(entry, arguments)
+            if isinstance(result, StreamingResult):
+                # 在缓存之内消费，缓存与合并等待的调用方拿到的是汇总后的结果
+                stream_started = time.perf_counter()
+                result, result_bytes = await consume_stream(
+                    result, self._stream_runner(entry), max_inline=self.max_inline_bytes,
+                )
+                phases[1] += time.perf_counter() - stream_started
+            return result
+
+        started = time.perf_counter()
+        serialize_time = 0.0
+        result_bytes = None
+        error = None
+        try:
+            if entry.cache_policy is not None:
+                result = await self.result_cache.get_or_call(
+                    entry.name, entry.func, entry.cache_policy, arguments, execute,
+                )
+            else:
+                result = await execute()
+            if serialize and not isinstance(result, str):
+                serialize_started = time.perf_counter()
+                result = json.dumps(result, ensure_ascii=False, default=str)
+                serialize_time = time.perf_counter() - serialize_started
+            if isinstance(result, str):
+                encoded_size = len(result.encode("utf-8"))
+                result_bytes = max(result_bytes or 0, encoded_size)
+                if serialize and encoded_size > self.max_inline_bytes:
+                    result = await self._spill(result)
+            return result
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            total_time = time.perf_counter() - started
+            queue_time, run_time = phases
+            if error and executed and not run_time:
+                # 同步工具抛出异常时无法取得分段耗时，整体计为执行时间
+                run_time = total_time
+            self.tracer.record(
+                entry.name, entry.category, arguments,
+                total_time=total_time, queue_time=queue_time, run_time=run_time,
+                serialize_time=serialize_time, result_bytes=result_bytes,
+                cached=not executed, pooled=not entry.is_async, error=error,
+            )
+
+    async def _execute(self, entry: ToolEntry, arguments: Dict[str, Any]) -> Tuple[Any, float, float]:
+        """执行工具，返回 (结果, 排队时间, 执行时间)"""
+        logger.debug(f"Dispatching MCP tool: {sanitize_for_log(entry.name)}")
+
+        if entry.is_async:
+            started = time.perf_counter()
+            result = await entry.func(**arguments)
+            return result, 0.0, time.perf_counter() - started
+        return await get_tool_pool(entry.category).run_measured(
+            functools.partial(entry.func, **arguments)
+        )
+
+    @staticmethod
+    def _stream_runner(entry: ToolEntry) -> Callable[..., Any]:
+        """同步分块迭代器在工具所属分类的线程池中推进"""
+        if entry.is_async:
+            # 异步工具返回的同步迭代器（如打开的文件）同样可能阻塞，交给文件线程池
+            return run_file_io
+        return get_tool_pool(entry.category).run
+
+    async def _spill(self, text: str) -> str:
+        """把超限的文本结果写入结果句柄，返回句柄描述 JSON"""
+        handle = await spill_text(text)
+        preview_limit = min(self.max_inline_bytes, 4096)
+        preview = text.encode("utf-8")[:preview_limit].decode("utf-8", errors="ignore")
+        return json.dumps({
+            "success": True,
+            "truncated": True,
+            "preview": preview,
+            "result_handle": handle.to_dict(),
+        }, ensure_ascii=False)
+
+    def get_tool_timings(self) -> Dict[str, Dict[str, Any]]:
+        """获取各工具的调用统计（排队/执行/序列化耗时、参数与结果大小）"""
+        return self.tracer.get_tool_stats()
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "tools": len(self._table),
+            "unloaded": sum(1 for entry in self._table.values() if not entry.loaded),
+            "stale": self.is_stale(),
+            "rebuilds": self.rebuilds,
+            "cache": self.result_cache.get_stats(),
+            "tracing": self.tracer.get_status(),
+        }
+
+
+# 全局调度器实例
+_dispatcher: Optional[ToolDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_tool_dispatcher() -> ToolDispatcher:
+    """获取全局工具调度器"""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                dispatcher = ToolDispatcher()
+                get_event_bus().add_listener(dispatcher.invalidate, (EventTopics.MCP_TOOLS,))
+                _dispatcher = dispatcher
+    return _dispatcher
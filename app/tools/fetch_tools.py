@@ -5,21 +5,45 @@
 """
 
 import asyncio
+import hashlib
 import json
-import base64
+import re
 import aiohttp
 import aiofiles
+import aiofiles.os
 from typing import Dict, Any, Optional, List, Union
 from urllib.parse import urljoin, urlparse
 from pathlib import Path
 import mimetypes
+import time
 from datetime import datetime
 
+from multidict import CIMultiDict
+
+from app.core.config import MCP_HTTP_CACHE_DIR, MCP_HTTP_CACHE_MAX_BYTES, MCP_MAX_INLINE_RESULT_BYTES
 from app.core.logging import setup_logging
 from app.core.secure_logging import sanitize_for_log
 from app.core.mcp_tools_service import get_mcp_config_service
 from app.models.mcp_config import MCPGlobalConfig
+from app.tools import json_query
+from app.tools.batch_executor import MAX_BATCH_CONCURRENCY, BatchExecutor
+from app.tools.crawler import MAX_CRAWL_CONCURRENCY, MAX_CRAWL_DEPTH, MAX_CRAWL_PAGES, Crawler
+from app.tools.http_cache import (
+    CACHE_MODES,
+    UNSAFE_METHODS,
+    BufferedResponse,
+    HTTPCache,
+    HTTPCacheMiss,
+    normalize_cache_mode,
+)
+from app.tools.rate_limiter import HostRateLimiter
 from app.tools.registry import fetch_tool, mcp_category
+from app.tools.resilience import OPEN as CIRCUIT_OPEN
+from app.tools.resilience import HostCircuitBreaker, backoff_delay, is_retryable_error, is_retryable_status
+from app.tools.segmented_download import RangeNotSatisfied, download_segments, supports_pwrite
+from app.tools.streaming import CHUNK_SIZE, StreamingResult, iter_text_chunks
+from app.tools.xml_stream import FeedParser, XMLStreamParser
+from app.tools.xml_stream import parse_stream as parse_xml_stream, parse_text as parse_xml_text
 
 logger = setup_logging()
 
@@ -42,6 +66,7 @@ logger = setup_logging()
         "default_user_agent": "LazyAI-Studio-WebScraper/1.0",
         "max_retries": 3,
         "retry_delay": 1.0,
+        "retry_max_delay": 30.0,
 
         # 代理配置示例
         "proxy_example": {
@@ -75,9 +100,31 @@ logger = setup_logging()
             "enabled": False,
             "requests_per_second": 10,
             "burst_size": 20,
+            "global_requests_per_second": 0,
+            "global_burst_size": 0,
             "delay_between_requests": 0
         },
 
+        # 按主机熔断配置示例（连续失败 failure_threshold 次后熔断 recovery_timeout 秒）
+        "circuit_breaker_example": {
+            "enabled": True,
+            "failure_threshold": 5,
+            "recovery_timeout": 30
+        },
+
+        # 分段并行下载配置示例（max_segments 为 1 时只用单连接下载）
+        "download_example": {
+            "max_segments": 1,
+            "min_segment_size_mb": 4
+        },
+
+        # HTTP 响应缓存配置示例（default_mode 取值同工具的 cache_mode 参数）
+        "http_cache_example": {
+            "enabled": True,
+            "default_mode": "default",
+            "max_size_mb": 256
+        },
+
         # 内容类型验证
         "enable_content_type_validation": True,
         "allowed_content_types": [
@@ -103,7 +150,8 @@ class WebScrapingConfig:
         self.user_agent = "LazyAI-Studio-WebScraper/1.0"
         self.timeout = 30
         self.max_retries = 3
-        self.retry_delay = 1.0
+        self.retry_delay = 1.0  # 重试退避基数（秒），第 n 次重试最多等待 retry_delay × 2^n
+        self.retry_max_delay = 30.0  # 单次重试等待上限（秒）
         self.max_file_size = 100 * 1024 * 1024  # 100MB
         self.allowed_content_types = [
             "text/html", "text/plain", "application/json",
@@ -133,9 +181,26 @@ class WebScrapingConfig:
 
         # 速率限制配置
         self.rate_limit_enabled = False  # 是否启用速率限制
-        self.requests_per_second = 10  # 每秒最大请求数
-        self.burst_size = 20  # 突发请求数量
-        self.delay_between_requests = 0  # 请求间强制延迟（秒）
+        self.requests_per_second = 10  # 每个主机每秒最大请求数
+        self.burst_size = 20  # 每个主机突发请求数量
+        self.global_requests_per_second = 0  # 所有主机合计每秒最大请求数（0 表示不限制）
+        self.global_burst_size = 0  # 全局突发请求数量（0 表示与 burst_size 相同）
+        self.delay_between_requests = 0  # 同一主机请求最小间隔（秒）
+
+        # 熔断配置
+        self.circuit_breaker_enabled = True  # 是否启用按主机熔断
+        self.circuit_failure_threshold = 5  # 连续失败多少次后熔断
+        self.circuit_recovery_timeout = 30.0  # 熔断后多久放行探测请求（秒）
+
+        # 下载配置
+        self.download_max_segments = 1  # 分段并行下载的最大并发段数（1 表示单连接）
+        self.download_min_segment_size = 4 * 1024 * 1024  # 每个片段的最小字节数
+
+        # HTTP 响应缓存配置
+        self.http_cache_enabled = True  # 是否启用 HTTP 响应缓存
+        self.http_cache_mode = "default"  # 未指定 cache_mode 时的缓存模式
+        self.http_cache_dir = MCP_HTTP_CACHE_DIR  # 缓存目录
+        self.http_cache_max_size = MCP_HTTP_CACHE_MAX_BYTES  # 缓存总大小上限（字节）
 
 
 class WebScrapingTools:
@@ -145,6 +210,11 @@ class WebScrapingTools:
         self.config = WebScrapingConfig()
         self.session: Optional[aiohttp.ClientSession] = None
         self.mcp_config: Optional[MCPGlobalConfig] = None
+        self.rate_limiter = HostRateLimiter()
+        self.circuit_breaker: Optional[HostCircuitBreaker] = None
+        self.circuit_breaker = self._build_circuit_breaker()
+        self.http_cache: Optional[HTTPCache] = None
+        self.http_cache = self._build_http_cache()
         self._load_config()
 
     def _load_config(self):
@@ -163,6 +233,12 @@ class WebScrapingTools:
             self._load_headers_config(custom_config)
             self._load_network_config(custom_config)
             self._load_rate_limit_config(custom_config)
+            self._load_circuit_breaker_config(custom_config)
+            self._load_download_config(custom_config)
+            self._load_http_cache_config(custom_config)
+            self.rate_limiter = self._build_rate_limiter()
+            self.circuit_breaker = self._build_circuit_breaker()
+            self.http_cache = self._build_http_cache()
 
             logger.info(f"Loaded web scraping tools config: UA={sanitize_for_log(self.config.user_agent)}, Proxy={self.config.proxy_enabled}")
 
@@ -185,12 +261,17 @@ class WebScrapingTools:
             self.config.max_retries = custom_config["max_retries"]
         elif self.mcp_config:
             self.config.max_retries = self.mcp_config.network.retry_times
+        # 负数视为不重试，保证至少发起一次请求
+        self.config.max_retries = max(0, int(self.config.max_retries))
 
         if "retry_delay" in custom_config:
             self.config.retry_delay = custom_config["retry_delay"]
         elif self.mcp_config:
             self.config.retry_delay = self.mcp_config.network.retry_delay
 
+        if "retry_max_delay" in custom_config:
+            self.config.retry_max_delay = custom_config["retry_max_delay"]
+
         if "verify_ssl" in custom_config:
             self.config.verify_ssl = custom_config["verify_ssl"]
         elif self.mcp_config:
@@ -266,9 +347,99 @@ class WebScrapingTools:
         if "burst_size" in rate_limit_config:
             self.config.burst_size = rate_limit_config["burst_size"]
 
+        if "global_requests_per_second" in rate_limit_config:
+            self.config.global_requests_per_second = rate_limit_config["global_requests_per_second"]
+
+        if "global_burst_size" in rate_limit_config:
+            self.config.global_burst_size = rate_limit_config["global_burst_size"]
+
         if "delay_between_requests" in rate_limit_config:
             self.config.delay_between_requests = rate_limit_config["delay_between_requests"]
 
+    def _build_rate_limiter(self) -> HostRateLimiter:
+        """按配置构建限速器（未启用时只记录 Retry-After 暂停）；参数未变化时沿用现有实例（保留令牌与暂停状态）"""
+        rate = None
+        burst = self.config.burst_size
+        if self.config.rate_limit_enabled:
+            rate = self.config.requests_per_second
+        if self.config.delay_between_requests > 0:
+            # 最小间隔等价于速率上限为 1/间隔、突发为 1 的令牌桶
+            interval_rate = 1.0 / self.config.delay_between_requests
+            rate = min(rate, interval_rate) if rate else interval_rate
+            burst = 1
+        limiter = HostRateLimiter(
+            requests_per_second=rate,
+            burst_size=burst,
+            global_requests_per_second=self.config.global_requests_per_second if self.config.rate_limit_enabled else None,
+            global_burst_size=self.config.global_burst_size or None,
+        )
+        current = self.rate_limiter
+        if current is not None and current.settings == limiter.settings:
+            return current
+        return limiter
+
+    def _load_circuit_breaker_config(self, custom_config: Dict[str, Any]):
+        """加载熔断配置"""
+        breaker_config = custom_config.get("circuit_breaker", {})
+
+        if "enabled" in breaker_config:
+            self.config.circuit_breaker_enabled = breaker_config["enabled"]
+
+        if "failure_threshold" in breaker_config:
+            self.config.circuit_failure_threshold = int(breaker_config["failure_threshold"])
+
+        if "recovery_timeout" in breaker_config:
+            self.config.circuit_recovery_timeout = float(breaker_config["recovery_timeout"])
+
+    def _build_circuit_breaker(self) -> HostCircuitBreaker:
+        """按配置构建熔断器；参数未变化时沿用现有实例（保留各主机状态）"""
+        current = self.circuit_breaker
+        if current is not None and current.enabled == self.config.circuit_breaker_enabled \
+                and current.failure_threshold == self.config.circuit_failure_threshold \
+                and current.recovery_timeout == self.config.circuit_recovery_timeout:
+            return current
+        return HostCircuitBreaker(
+            failure_threshold=self.config.circuit_failure_threshold,
+            recovery_timeout=self.config.circuit_recovery_timeout,
+            enabled=self.config.circuit_breaker_enabled,
+        )
+
+    def _load_download_config(self, custom_config: Dict[str, Any]):
+        """加载下载配置"""
+        download_config = custom_config.get("download", {})
+
+        if "max_segments" in download_config:
+            self.config.download_max_segments = max(1, int(download_config["max_segments"]))
+
+        if "min_segment_size_mb" in download_config:
+            self.config.download_min_segment_size = int(download_config["min_segment_size_mb"] * 1024 * 1024)
+
+    def _load_http_cache_config(self, custom_config: Dict[str, Any]):
+        """加载 HTTP 响应缓存配置"""
+        cache_config = custom_config.get("http_cache", {})
+
+        if "enabled" in cache_config:
+            self.config.http_cache_enabled = cache_config["enabled"]
+
+        if "default_mode" in cache_config:
+            self.config.http_cache_mode = normalize_cache_mode(cache_config["default_mode"])
+
+        if "max_size_mb" in cache_config:
+            self.config.http_cache_max_size = int(cache_config["max_size_mb"] * 1024 * 1024)
+
+        if "directory" in cache_config:
+            self.config.http_cache_dir = cache_config["directory"]
+
+    def _build_http_cache(self) -> Optional[HTTPCache]:
+        """按配置构建 HTTP 缓存；目录和容量未变化时沿用现有实例（保留索引与统计）"""
+        if not self.config.http_cache_enabled:
+            return None
+        current = self.http_cache
+        if current is not None and str(current.directory) == str(self.config.http_cache_dir) \
+                and current.max_bytes == self.config.http_cache_max_size:
+            return current
+        return HTTPCache(self.config.http_cache_dir, self.config.http_cache_max_size)
+
     async def _get_session(self) -> aiohttp.ClientSession:
         """获取HTTP会话，配置代理和其他参数"""
         if self.session is None or self.session.closed:
@@ -355,55 +526,150 @@ class WebScrapingTools:
         self,
         method: str,
         url: str,
+        cache_mode: Optional[str] = None,
+        max_size: Optional[int] = None,
         **kwargs
-    ) -> aiohttp.ClientResponse:
-        """带重试的HTTP请求"""
+    ) -> BufferedResponse:
+        """经过 HTTP 缓存的请求，返回已读取完响应体的响应
+
+        cache_mode 为 None 时使用配置的默认模式；response.cache_status 为
+        hit（直接使用缓存）、revalidated（304 后复用缓存）、miss 或 bypass（未经过缓存）。
+        max_size 为 None 时响应体上限为 max_file_size。
+        """
+        mode = normalize_cache_mode(cache_mode or self.config.http_cache_mode)
+        cache = self.http_cache
+        cache_url = None
+        if cache is not None and "auth" not in kwargs:
+            cache_url = HTTPCache.cache_key_url(url, kwargs.get("params"))
+
+        # Vary 按实际发送的请求头（会话默认请求头 + 本次请求头）匹配
         session = await self._get_session()
+        request_headers = CIMultiDict(session.headers)
+        request_headers.update(kwargs.get("headers") or {})
+        if cache_url is None:
+            mode = "no-store"
+        else:
+            mode = HTTPCache.request_mode(method, request_headers, mode)
+
+        if mode == "no-store":
+            response = await self._send_with_retry(method, url, max_size=max_size, **kwargs)
+            if cache is not None:
+                cache.record("bypassed")
+                if cache_url is not None and method in UNSAFE_METHODS:
+                    await cache.invalidate(cache_url)
+            return response
+
+        entry = await cache.lookup(cache_url, request_headers) if mode != "reload" else None
+        if entry is not None and (mode in ("force-cache", "only-if-cached")
+                                  or (mode == "default" and entry.is_fresh(cache.now()))):
+            body = await cache.read_body(entry)
+            if body is not None:
+                cache.record("hits")
+                return cache.to_response(entry, body, "hit")
+            entry = None
+        if mode == "only-if-cached":
+            cache.record("misses")
+            raise HTTPCacheMiss(f"No cached response for {url} (cache_mode=only-if-cached)")
+
+        original_headers = kwargs.get("headers")
+        conditional = entry.conditional_headers() if entry is not None else {}
+        if conditional:
+            kwargs["headers"] = {**(original_headers or {}), **conditional}
+        request_time = cache.now()
+        response = await self._send_with_retry(method, url, max_size=max_size, **kwargs)
+
+        if conditional and response.status == 304:
+            body = await cache.read_body(entry)
+            if body is not None:
+                entry = await cache.refresh(entry, response, request_time)
+                cache.record("revalidated")
+                logger.debug(f"Revalidated cached response for {sanitize_for_log(url)}")
+                return cache.to_response(entry, body, "revalidated")
+            # 缓存的响应体已丢失，去掉条件请求头重新获取
+            kwargs["headers"] = original_headers
+            request_time = cache.now()
+            response = await self._send_with_retry(method, url, max_size=max_size, **kwargs)
+
+        cache.record("misses")
+        response.cache_status = "miss"
+        await cache.store(cache_url, request_headers, response, request_time)
+        return response
+
+    async def _send_with_retry(
+        self,
+        method: str,
+        url: str,
+        max_size: Optional[int] = None,
+        **kwargs
+    ) -> BufferedResponse:
+        """带重试的HTTP请求
 
-        # 应用速率限制
-        if self.config.rate_limit_enabled or self.config.delay_between_requests > 0:
-            await self._apply_rate_limit()
+        每次尝试都经过熔断器和限速器；可重试的错误按指数退避 + 完全抖动等待，
+        429/503 带 Retry-After 时按其等待，其他 4xx 和不可恢复的错误立即抛出。
+        响应体在连接释放前读取完毕，超过 max_size（默认 max_file_size）时抛出 ValueError。
+        """
+        session = await self._get_session()
+        if max_size is None:
+            max_size = self.config.max_file_size
 
         # 获取代理配置
-        from urllib.parse import urlparse
         parsed_url = urlparse(url)
+        host = parsed_url.netloc
         use_proxy = self._should_use_proxy(url)
         proxy_url = None
         if use_proxy:
             proxy_url = self._get_proxy_url(parsed_url.scheme)
 
-        for attempt in range(self.config.max_retries + 1):
+        breaker = self.circuit_breaker
+        max_retries = self.config.max_retries
+        for attempt in range(max_retries + 1):
+            # 熔断中的主机直接失败，不占用连接
+            breaker.before_request(host)
             try:
                 # 设置代理
                 if proxy_url:
                     kwargs["proxy"] = proxy_url
 
+                await self._apply_rate_limit(host)
                 async with session.request(method, url, **kwargs) as response:
                     # 检查响应状态
                     if response.status < 400:
                         logger.debug(f"Request successful: {method} {url} -> {response.status}")
-                        return response
-                    elif attempt < self.config.max_retries:
-                        logger.warning(f"Request failed with status {response.status}, retrying ({attempt + 1}/{self.config.max_retries})")
-                        await asyncio.sleep(self.config.retry_delay)
-                        continue
-                    else:
+                        buffered = await BufferedResponse.from_response(response, max_size)
+                        breaker.record_success(host)
+                        return buffered
+                    breaker.record_status(host, response.status)
+                    pause = self.rate_limiter.feedback(host, response.status, response.headers.get("Retry-After"))
+                    if attempt >= max_retries or not is_retryable_status(response.status) \
+                            or breaker.state(host) == CIRCUIT_OPEN:
                         response.raise_for_status()
+                    if pause is not None:
+                        if pause > self.config.timeout:
+                            response.raise_for_status()
+                        # 服务端给出了等待时间：下一次尝试在限速器中等待，不再额外 sleep
+                        logger.warning(f"Request throttled with status {response.status}, retrying after {pause:.1f}s ({attempt + 1}/{max_retries})")
+                        continue
+                    delay = backoff_delay(attempt, self.config.retry_delay, self.config.retry_max_delay)
+                    logger.warning(f"Request failed with status {response.status}, retrying in {delay:.2f}s ({attempt + 1}/{max_retries})")
 
+            except aiohttp.ClientResponseError:
+                # 状态码错误是否重试已在上面决定（包括 Retry-After 超过超时时间时不再等待）
+                raise
             except (aiohttp.ClientError, asyncio.TimeoutError) as e:
-                if attempt < self.config.max_retries:
-                    logger.warning(f"Request failed: {e}, retrying ({attempt + 1}/{self.config.max_retries})")
-                    await asyncio.sleep(self.config.retry_delay)
-                else:
-                    raise e
+                retryable = is_retryable_error(e)
+                if retryable:
+                    # 连接失败、超时等说明主机不可达；证书错误、无效 URL 等不计入熔断
+                    breaker.record_failure(host)
+                if not retryable or attempt >= max_retries or breaker.state(host) == CIRCUIT_OPEN:
+                    raise
+                delay = backoff_delay(attempt, self.config.retry_delay, self.config.retry_max_delay)
+                logger.warning(f"Request failed: {e}, retrying in {delay:.2f}s ({attempt + 1}/{max_retries})")
 
-    async def _apply_rate_limit(self):
-        """应用速率限制"""
-        if self.config.delay_between_requests > 0:
-            await asyncio.sleep(self.config.delay_between_requests)
+            await asyncio.sleep(delay)
 
-        # 这里可以扩展更复杂的速率限制逻辑（如令牌桶算法）
-        # 目前使用简单的延迟机制
+    async def _apply_rate_limit(self, host: str) -> float:
+        """按主机令牌桶限速，返回等待的秒数"""
+        return await self.rate_limiter.acquire(host)
 
     async def close(self):
         """关闭会话"""
@@ -477,6 +743,11 @@ def reload_fetch_config():
             "follow_redirects": {
                 "type": "boolean",
                 "description": "是否跟随重定向"
+            },
+            "cache_mode": {
+                "type": "string",
+                "enum": list(CACHE_MODES),
+                "description": "HTTP缓存模式（仅GET）：default 按响应缓存头使用/重新验证缓存，no-store 不经过缓存，reload 忽略缓存并更新，no-cache 总是重新验证，force-cache 有缓存即使用，only-if-cached 只用缓存；省略时使用工具集配置"
             }
         },
         "required": ["url"]
@@ -489,7 +760,8 @@ def reload_fetch_config():
             "content": {"type": "string", "description": "响应内容"},
             "url": {"type": "string", "description": "最终请求URL"},
             "encoding": {"type": "string", "description": "内容编码"},
-            "content_type": {"type": "string", "description": "内容类型"}
+            "content_type": {"type": "string", "description": "内容类型"},
+            "cache": {"type": "string", "description": "缓存结果：hit、revalidated、miss 或 bypass"}
         }
     },
     metadata={
@@ -505,7 +777,8 @@ async def http_request(
     data: Optional[Union[str, Dict[str, Any]]] = None,
     json_data: Optional[Dict[str, Any]] = None,
     auth: Optional[tuple] = None,
-    follow_redirects: Optional[bool] = None
+    follow_redirects: Optional[bool] = None,
+    cache_mode: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     执行HTTP请求
@@ -519,6 +792,7 @@ async def http_request(
         json_data: JSON请求体
         auth: HTTP基础认证 (username, password)
         follow_redirects: 是否跟随重定向
+        cache_mode: HTTP缓存模式，None 时使用工具集配置的默认模式
 
     Returns:
         包含响应信息的字典
@@ -553,41 +827,45 @@ async def http_request(
         else:
             kwargs["allow_redirects"] = tools.config.follow_redirects
 
-        # 执行请求
-        async with await tools._make_request_with_retry(method.upper(), url, **kwargs) as response:
-            content_type = response.headers.get("Content-Type", "").lower()
+        # 执行请求（响应体已在连接释放前读取完毕）
+        response = await tools._make_request_with_retry(method.upper(), url, cache_mode=cache_mode, **kwargs)
+        content_type = response.headers.get("Content-Type", "").lower()
 
-            # 读取响应内容
-            if "application/json" in content_type:
-                content = await response.json()
-                content_text = json.dumps(content, ensure_ascii=False, indent=2)
-            else:
-                content = await response.text()
-                content_text = content
-
-            result = {
-                "success": True,
-                "status_code": response.status,
-                "headers": dict(response.headers),
-                "content": content,
-                "content_text": content_text,
-                "content_type": content_type,
-                "url": str(response.url),
-                "method": method.upper(),
-                "encoding": response.get_encoding()
-            }
+        # 读取响应内容
+        if "application/json" in content_type:
+            content = await response.json()
+            content_text = json.dumps(content, ensure_ascii=False, indent=2)
+        else:
+            content = await response.text()
+            content_text = content
 
-            logger.info(f"HTTP request successful: {response.status}")
-            return result
+        result = {
+            "success": True,
+            "status_code": response.status,
+            "headers": dict(response.headers),
+            "content": content,
+            "content_text": content_text,
+            "content_type": content_type,
+            "url": str(response.url),
+            "method": method.upper(),
+            "encoding": response.get_encoding(),
+            "cache": response.cache_status
+        }
+
+        logger.info(f"HTTP request successful: {response.status} (cache: {response.cache_status})")
+        return result
 
     except Exception as e:
         logger.error(f"HTTP request failed: {e}")
-        return {
+        result = {
             "success": False,
             "error": str(e),
             "url": url,
             "method": method.upper()
         }
+        if isinstance(e, aiohttp.ClientResponseError):
+            result["status_code"] = e.status
+        return result
 
 
 @fetch_tool(
@@ -600,7 +878,8 @@ async def http_request(
             "headers": {"type": "object", "additionalProperties": {"type": "string"}, "description": "自定义请求头"},
             "extract_text": {"type": "boolean", "description": "是否提取纯文本内容", "default": True},
             "extract_links": {"type": "boolean", "description": "是否提取链接", "default": False},
-            "extract_images": {"type": "boolean", "description": "是否提取图片URL", "default": False}
+            "extract_images": {"type": "boolean", "description": "是否提取图片URL", "default": False},
+            "cache_mode": {"type": "string", "enum": list(CACHE_MODES), "description": "HTTP缓存模式，取值同 http_request；省略时使用工具集配置"}
         },
         "required": ["url"]
     },
@@ -615,6 +894,7 @@ async def http_request(
             "error": {"type": "string", "description": "错误信息（如果失败）"}
         }
     },
+    # 不声明结果缓存：HTTP 缓存已按 cache_mode 和源站 Cache-Control 处理重复抓取
     metadata={"tags": ["webpage", "scraping", "html"]}
 )
 async def fetch_webpage(
@@ -622,8 +902,9 @@ async def fetch_webpage(
     headers: Optional[Dict[str, str]] = None,
     extract_text: bool = True,
     extract_links: bool = False,
-    extract_images: bool = False
-) -> Dict[str, Any]:
+    extract_images: bool = False,
+    cache_mode: Optional[str] = None
+) -> Union[Dict[str, Any], StreamingResult]:
     """
     抓取网页内容并解析
 
@@ -633,9 +914,10 @@ async def fetch_webpage(
         extract_text: 是否提取纯文本
         extract_links: 是否提取链接
         extract_images: 是否提取图片URL
+        cache_mode: HTTP缓存模式，None 时使用工具集配置的默认模式
 
     Returns:
-        包含网页内容和解析结果的字典
+        包含网页内容和解析结果的字典；HTML 超过内联上限时以 html 字段流式产出的 StreamingResult 返回
     """
     tools = get_fetch_tools()
 
@@ -643,7 +925,7 @@ async def fetch_webpage(
         logger.info(f"Fetching webpage: {sanitize_for_log(url)}")
 
         # 执行HTTP请求
-        result = await http_request(url, headers=headers)
+        result = await http_request(url, headers=headers, cache_mode=cache_mode)
 
         if not result["success"]:
             return result
@@ -660,6 +942,7 @@ async def fetch_webpage(
             "url": result["url"],
             "status_code": result["status_code"],
             "headers": result["headers"],
+            "cache": result["cache"],
             "html": html_content,
             "title": "",
             "text": "",
@@ -667,58 +950,29 @@ async def fetch_webpage(
             "images": []
         }
 
-        # 简单的HTML解析（可以考虑使用BeautifulSoup）
         try:
-            from bs4 import BeautifulSoup
-            soup = BeautifulSoup(html_content, 'html.parser')
-
-            # 提取标题
-            title_tag = soup.find('title')
-            if title_tag:
-                parsed_result["title"] = title_tag.get_text().strip()
+            from app.tools.html_extract import extract, parse_document
 
-            # 提取纯文本
+            # 不提取纯文本时只需定向解析 title/a/img
+            outputs = {"title"}
             if extract_text:
-                # 移除script和style标签
-                for script in soup(["script", "style"]):
-                    script.decompose()
-                parsed_result["text"] = soup.get_text()
-
-            # 提取链接
+                outputs.add("text_content")
             if extract_links:
-                links = []
-                for link in soup.find_all('a', href=True):
-                    href = link['href']
-                    # 处理相对链接
-                    if href.startswith('/'):
-                        href = urljoin(url, href)
-                    elif not href.startswith(('http://', 'https://', 'mailto:', 'tel:')):
-                        href = urljoin(url, href)
-
-                    links.append({
-                        "url": href,
-                        "text": link.get_text().strip(),
-                        "title": link.get('title', '')
-                    })
-                parsed_result["links"] = links
-
-            # 提取图片
+                outputs.add("links")
             if extract_images:
-                images = []
-                for img in soup.find_all('img', src=True):
-                    src = img['src']
-                    # 处理相对链接
-                    if src.startswith('/'):
-                        src = urljoin(url, src)
-                    elif not src.startswith(('http://', 'https://', 'data:')):
-                        src = urljoin(url, src)
-
-                    images.append({
-                        "url": src,
-                        "alt": img.get('alt', ''),
-                        "title": img.get('title', '')
-                    })
-                parsed_result["images"] = images
+                outputs.add("images")
+            extracted = extract(parse_document(html_content, outputs), outputs, url=url)
+
+            parsed_result["title"] = extracted["title"]
+            parsed_result["text"] = extracted["text_content"]
+            parsed_result["links"] = [
+                {"url": link["href"], "text": link["text"], "title": link["title"] or ""}
+                for link in extracted["links"]
+            ]
+            parsed_result["images"] = [
+                {"url": image["src"], "alt": image["alt"] or "", "title": image["title"] or ""}
+                for image in extracted["images"] if image["src"] is not None
+            ]
 
         except ImportError:
             logger.warning("BeautifulSoup not available, skipping HTML parsing")
@@ -730,6 +984,10 @@ async def fetch_webpage(
                 parsed_result["text"] = ' '.join(text.split())
 
         logger.info(f"Webpage fetched successfully: {len(html_content)} characters")
+        if len(html_content) > MCP_MAX_INLINE_RESULT_BYTES:
+            # 大页面的 HTML 分块写入结果句柄，不再随结果整体序列化
+            del parsed_result["html"]
+            return StreamingResult(iter_text_chunks(html_content), metadata=parsed_result, field="html")
         return parsed_result
 
     except Exception as e:
@@ -743,14 +1001,17 @@ async def fetch_webpage(
 
 @fetch_tool(
     name="download_file",
-    description="下载文件到指定路径，支持大文件下载和进度监控，可设置文件大小限制",
+    description="下载文件到指定路径，流式写入临时文件并计算 SHA-256/MD5，支持断点续传和文件大小限制",
     schema={
         "type": "object",
         "properties": {
             "url": {"type": "string", "description": "文件下载URL"},
-            "save_path": {"type": "string", "description": "文件保存路径"},
+            "save_path": {"type": "string", "description": "文件保存路径（省略时返回 base64 内容，过大时返回结果句柄）"},
             "headers": {"type": "object", "additionalProperties": {"type": "string"}, "description": "自定义请求头"},
-            "max_size": {"type": "integer", "description": "最大文件大小（字节）"}
+            "max_size": {"type": "integer", "description": "最大文件大小（字节）"},
+            "resume": {"type": "boolean", "description": "存在未完成的 .part 文件时是否断点续传", "default": True},
+            "expected_sha256": {"type": "string", "description": "期望的 SHA-256（十六进制），不一致时丢弃下载结果"},
+            "max_segments": {"type": "integer", "minimum": 1, "maximum": 16, "description": "分段并行下载的最大并发段数（需要 save_path 且服务端支持 Range）；省略时使用工具集配置"}
         },
         "required": ["url"]
     },
@@ -758,10 +1019,13 @@ async def fetch_webpage(
         "type": "object",
         "properties": {
             "success": {"type": "boolean", "description": "是否成功下载"},
-            "file_path": {"type": "string", "description": "下载文件的完整路径"},
-            "file_size": {"type": "integer", "description": "文件大小（字节）"},
+            "saved_path": {"type": "string", "description": "下载文件的完整路径"},
+            "size": {"type": "integer", "description": "文件大小（字节）"},
             "content_type": {"type": "string", "description": "文件内容类型"},
-            "download_time": {"type": "number", "description": "下载耗时（秒）"},
+            "sha256": {"type": "string", "description": "文件 SHA-256"},
+            "md5": {"type": "string", "description": "文件 MD5"},
+            "resumed_from": {"type": "integer", "description": "断点续传的起始字节（0 表示完整下载）"},
+            "segments": {"type": "object", "description": "分段下载统计（片段数、重试次数、最大并发、吞吐）"},
             "error": {"type": "string", "description": "错误信息（如果失败）"}
         }
     },
@@ -771,108 +1035,400 @@ async def download_file(
     url: str,
     save_path: Optional[str] = None,
     headers: Optional[Dict[str, str]] = None,
-    max_size: Optional[int] = None
-) -> Dict[str, Any]:
+    max_size: Optional[int] = None,
+    resume: bool = True,
+    expected_sha256: Optional[str] = None,
+    max_segments: Optional[int] = None
+) -> Union[Dict[str, Any], StreamingResult]:
     """
     下载文件
 
+    响应体按块流式处理，内存占用与文件大小无关：指定 save_path 时写入同目录的
+    .part 临时文件，完成后原子重命名；否则以流式结果返回（由调度器内联或写入结果句柄）。
+
     Args:
         url: 文件URL
         save_path: 保存路径（如果为空则返回二进制内容）
         headers: 自定义请求头
         max_size: 最大文件大小限制（字节）
+        resume: 是否从未完成的 .part 文件断点续传（需要服务端支持 Range 且响应带 ETag/Last-Modified）
+        expected_sha256: 期望的 SHA-256，不一致时删除临时文件并返回失败
+        max_segments: 分段并行下载的最大并发段数，大于 1 且服务端支持 Range 时按片段并发下载
 
     Returns:
-        包含下载结果的字典
+        包含下载结果的字典，或 content_base64 字段流式产出的 StreamingResult
     """
     tools = get_fetch_tools()
 
     try:
         logger.info(f"Downloading file from: {sanitize_for_log(url)}")
 
-        session = await tools._get_session()
-        proxy_url = tools._get_proxy_url()
+        max_allowed_size = max_size or tools.config.max_file_size
+        if save_path:
+            segments = max_segments or tools.config.download_max_segments
+            if segments > 1:
+                result = await _download_segmented(tools, url, Path(save_path), headers, max_allowed_size,
+                                                   segments, expected_sha256)
+                if result is not None:
+                    return result
+            return await _download_to_file(tools, url, Path(save_path), headers, max_allowed_size,
+                                           resume, expected_sha256)
+        return await _download_as_stream(tools, url, headers, max_allowed_size)
 
-        kwargs = {}
-        if headers:
-            kwargs["headers"] = headers
-        if proxy_url:
-            kwargs["proxy"] = proxy_url
+    except Exception as e:
+        logger.error(f"Failed to download file: {e}")
+        return {
+            "success": False,
+            "error": str(e),
+            "url": url
+        }
 
-        async with session.get(url, **kwargs) as response:
-            response.raise_for_status()
 
-            # 检查文件大小
-            content_length = response.headers.get('Content-Length')
-            file_size = int(content_length) if content_length else None
-            max_allowed_size = max_size or tools.config.max_file_size
+async def _open_download(tools: WebScrapingTools, url: str, headers: Optional[Dict[str, str]],
+                         max_retries: Optional[int] = None) -> aiohttp.ClientResponse:
+    """经过熔断器和限速器发起下载请求，返回未读取响应体的响应（调用方负责 release）
 
-            if file_size and file_size > max_allowed_size:
-                return {
-                    "success": False,
-                    "error": f"File too large: {file_size} bytes (max: {max_allowed_size})",
-                    "url": url
-                }
+    建立连接和响应头阶段与 _send_with_retry 使用相同的重试策略（max_retries 默认取配置）；
+    响应体传输中断由续传恢复。
+    """
+    session = await tools._get_session()
+    kwargs: Dict[str, Any] = {}
+    if headers:
+        kwargs["headers"] = headers
+    proxy_url = tools._get_proxy_url()
+    if proxy_url:
+        kwargs["proxy"] = proxy_url
+
+    # 下载耗时与文件大小相关，只限制连接和单次读取的等待时间
+    kwargs["timeout"] = aiohttp.ClientTimeout(
+        total=None, sock_connect=tools.config.timeout, sock_read=tools.config.timeout
+    )
+
+    host = urlparse(url).netloc
+    breaker = tools.circuit_breaker
+    if max_retries is None:
+        max_retries = tools.config.max_retries
+    for attempt in range(max_retries + 1):
+        breaker.before_request(host)
+        await tools._apply_rate_limit(host)
+        try:
+            response = await session.get(url, **kwargs)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            retryable = is_retryable_error(e)
+            if retryable:
+                breaker.record_failure(host)
+            if not retryable or attempt >= max_retries or breaker.state(host) == CIRCUIT_OPEN:
+                raise
+            delay = backoff_delay(attempt, tools.config.retry_delay, tools.config.retry_max_delay)
+            logger.warning(f"Download request failed: {e}, retrying in {delay:.2f}s ({attempt + 1}/{max_retries})")
+            await asyncio.sleep(delay)
+            continue
+
+        breaker.record_status(host, response.status)
+        pause = tools.rate_limiter.feedback(host, response.status, response.headers.get("Retry-After"))
+        # 成功、不可重试的状态码或重试耗尽时交给调用方处理（如 416 需要调用方从头下载）
+        if response.status < 400 or attempt >= max_retries or not is_retryable_status(response.status) \
+                or breaker.state(host) == CIRCUIT_OPEN or (pause is not None and pause > tools.config.timeout):
+            return response
+        response.release()
+        if pause is not None:
+            # 服务端给出了等待时间：下一次尝试在限速器中等待
+            logger.warning(f"Download throttled with status {response.status}, retrying after {pause:.1f}s ({attempt + 1}/{max_retries})")
+            continue
+        delay = backoff_delay(attempt, tools.config.retry_delay, tools.config.retry_max_delay)
+        logger.warning(f"Download failed with status {response.status}, retrying in {delay:.2f}s ({attempt + 1}/{max_retries})")
+        await asyncio.sleep(delay)
+
+
+def _download_metadata(response: aiohttp.ClientResponse, url: str) -> Dict[str, Any]:
+    """下载结果的公共字段（文件名取自 Content-Disposition 或 URL）"""
+    filename = None
+    content_disposition = response.headers.get('Content-Disposition', '')
+    if 'filename=' in content_disposition:
+        filename = content_disposition.split('filename=')[1].strip('"')
+
+    if not filename:
+        # 从URL推断文件名
+        filename = Path(urlparse(url).path).name or "download"
+
+    return {
+        "success": True,
+        "url": str(response.url),
+        "status_code": response.status,
+        "headers": dict(response.headers),
+        "size": None,
+        "content_type": response.headers.get("Content-Type", ""),
+        "filename": filename
+    }
 
-            # 读取内容
-            content = await response.read()
-            actual_size = len(content)
 
-            if actual_size > max_allowed_size:
-                return {
-                    "success": False,
-                    "error": f"File too large: {actual_size} bytes (max: {max_allowed_size})",
-                    "url": url
-                }
+def _resume_validator(response: aiohttp.ClientResponse) -> Optional[str]:
+    """If-Range 可用的验证器：强 ETag，其次 Last-Modified"""
+    etag = response.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return response.headers.get("Last-Modified")
 
-            result = {
-                "success": True,
-                "url": str(response.url),
-                "status_code": response.status,
-                "headers": dict(response.headers),
-                "size": actual_size,
-                "content_type": response.headers.get("Content-Type", ""),
-                "filename": None
-            }
 
-            # 确定文件名
-            filename = None
-            content_disposition = response.headers.get('Content-Disposition', '')
-            if 'filename=' in content_disposition:
-                filename = content_disposition.split('filename=')[1].strip('"')
+def _content_range_start(value: Optional[str]) -> Optional[int]:
+    """解析 Content-Range: bytes <start>-<end>/<total> 的起始字节"""
+    match = re.match(r"bytes\s+(\d+)-\d+/(?:\d+|\*)$", (value or "").strip())
+    return int(match.group(1)) if match else None
 
-            if not filename:
-                # 从URL推断文件名
-                parsed_url = urlparse(url)
-                filename = Path(parsed_url.path).name or "download"
 
-            result["filename"] = filename
+async def _remove_partial(*paths: Path):
+    for path in paths:
+        try:
+            await aiofiles.os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+async def _download_to_file(tools: WebScrapingTools, url: str, save_file_path: Path,
+                            headers: Optional[Dict[str, str]], max_allowed_size: int,
+                            resume: bool, expected_sha256: Optional[str]) -> Dict[str, Any]:
+    """流式下载到 .part 临时文件，边写边计算摘要，完成后原子重命名为 save_path"""
+    part_path = save_file_path.with_name(save_file_path.name + ".part")
+    meta_path = save_file_path.with_name(save_file_path.name + ".part.json")
+
+    # 只有同一 URL 且记录了验证器的临时文件才能续传
+    offset = 0
+    validator = None
+    if resume and await aiofiles.os.path.exists(part_path) and await aiofiles.os.path.exists(meta_path):
+        try:
+            async with aiofiles.open(meta_path, "r", encoding="utf-8") as f:
+                partial = json.loads(await f.read())
+            if partial.get("url") == url and partial.get("validator"):
+                validator = partial["validator"]
+                offset = (await aiofiles.os.stat(part_path)).st_size
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable partial download metadata: {e}")
+
+    request_headers = dict(headers or {})
+    if offset:
+        request_headers["Range"] = f"bytes={offset}-"
+        request_headers["If-Range"] = validator
+
+    response = await _open_download(tools, url, request_headers)
+    try:
+        if response.status == 416 and offset:
+            # 临时文件与远端文件不再对应（如远端变短），从头下载
+            response.release()
+            request_headers.pop("Range")
+            request_headers.pop("If-Range")
+            response = await _open_download(tools, url, request_headers)
+        response.raise_for_status()
+
+        # 服务端忽略 Range 或验证器不匹配时返回 200，需要从头写
+        if not (offset and response.status == 206
+                and _content_range_start(response.headers.get("Content-Range")) == offset):
+            offset = 0
+
+        content_length = response.content_length
+        if content_length is not None and offset + content_length > max_allowed_size:
+            await _remove_partial(part_path, meta_path)
+            return {
+                "success": False,
+                "error": f"File too large: {offset + content_length} bytes (max: {max_allowed_size})",
+                "url": url
+            }
 
-            if save_path:
-                # 保存到文件
-                save_file_path = Path(save_path)
-                save_file_path.parent.mkdir(parents=True, exist_ok=True)
+        save_file_path.parent.mkdir(parents=True, exist_ok=True)
+        sha256 = hashlib.sha256()
+        md5 = hashlib.md5()
+        if offset:
+            # 续传时先用已下载部分初始化摘要
+            async with aiofiles.open(part_path, "rb") as f:
+                while chunk := await f.read(CHUNK_SIZE):
+                    sha256.update(chunk)
+                    md5.update(chunk)
+            logger.info(f"Resuming download at byte {offset}")
+        else:
+            new_validator = _resume_validator(response)
+            if new_validator:
+                async with aiofiles.open(meta_path, "w", encoding="utf-8") as f:
+                    await f.write(json.dumps({"url": url, "validator": new_validator}))
+            else:
+                await _remove_partial(meta_path)
 
-                async with aiofiles.open(save_file_path, 'wb') as f:
-                    await f.write(content)
+        size = offset
+        try:
+            async with aiofiles.open(part_path, "ab" if offset else "wb") as f:
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > max_allowed_size:
+                        break
+                    sha256.update(chunk)
+                    md5.update(chunk)
+                    await f.write(chunk)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # 保留临时文件，下次调用时续传
+            resumable = await aiofiles.os.path.exists(meta_path)
+            logger.warning(f"Download interrupted after {size} bytes: {e}")
+            return {
+                "success": False,
+                "error": f"Download interrupted: {e}",
+                "url": url,
+                "partial_path": str(part_path),
+                "downloaded_bytes": size,
+                "resumable": resumable
+            }
 
-                result["saved_path"] = str(save_file_path)
-                logger.info(f"File saved to: {save_file_path}")
-            else:
-                # 返回base64编码的内容
-                result["content_base64"] = base64.b64encode(content).decode('utf-8')
+        if size > max_allowed_size:
+            await _remove_partial(part_path, meta_path)
+            return {
+                "success": False,
+                "error": f"File too large: more than {max_allowed_size} bytes (max: {max_allowed_size})",
+                "url": url
+            }
 
-            logger.info(f"File downloaded successfully: {actual_size} bytes")
-            return result
+        digest = sha256.hexdigest()
+        if expected_sha256 and digest != expected_sha256.lower():
+            await _remove_partial(part_path, meta_path)
+            return {
+                "success": False,
+                "error": f"SHA-256 mismatch: expected {expected_sha256}, got {digest}",
+                "url": url,
+                "sha256": digest
+            }
 
-    except Exception as e:
-        logger.error(f"Failed to download file: {e}")
+        await aiofiles.os.replace(part_path, save_file_path)
+        await _remove_partial(meta_path)
+
+        result = _download_metadata(response, url)
+        result.update({
+            "size": size,
+            "saved_path": str(save_file_path),
+            "sha256": digest,
+            "md5": md5.hexdigest(),
+            "resumed_from": offset
+        })
+        logger.info(f"File saved to: {save_file_path} ({size} bytes)")
+        return result
+    finally:
+        response.release()
+
+
+async def _download_segmented(tools: WebScrapingTools, url: str, save_file_path: Path,
+                              headers: Optional[Dict[str, str]], max_allowed_size: int, max_segments: int,
+                              expected_sha256: Optional[str]) -> Optional[Dict[str, Any]]:
+    """HEAD 探测后分段并行下载；服务端不支持 Range 或文件太小时返回 None，由调用方单连接下载"""
+    if not supports_pwrite():
+        return None
+
+    session = await tools._get_session()
+    kwargs: Dict[str, Any] = {"headers": headers} if headers else {}
+    proxy_url = tools._get_proxy_url()
+    if proxy_url:
+        kwargs["proxy"] = proxy_url
+    host = urlparse(url).netloc
+    await tools._apply_rate_limit(host)
+    async with session.head(url, allow_redirects=True, **kwargs) as head:
+        tools.rate_limiter.feedback(host, head.status, head.headers.get("Retry-After"))
+        size = head.content_length
+        if head.status >= 400 or head.headers.get("Accept-Ranges", "").lower() != "bytes" or not size:
+            return None
+        if size < 2 * tools.config.download_min_segment_size:
+            return None
+        if size > max_allowed_size:
+            return {
+                "success": False,
+                "error": f"File too large: {size} bytes (max: {max_allowed_size})",
+                "url": url
+            }
+        # 所有片段请求同一个（重定向后的）地址，并用验证器保证拼出的是同一版本
+        final_url = str(head.url)
+        validator = _resume_validator(head)
+        result = _download_metadata(head, url)
+
+    async def open_range(start: int, end: int) -> aiohttp.ClientResponse:
+        range_headers = dict(headers or {})
+        range_headers["Range"] = f"bytes={start}-{end}"
+        if validator:
+            range_headers["If-Range"] = validator
+        # 失败的片段由 download_segments 单独退避重试
+        return await _open_download(tools, final_url, range_headers, max_retries=0)
+
+    part_path = save_file_path.with_name(save_file_path.name + ".part")
+    meta_path = save_file_path.with_name(save_file_path.name + ".part.json")
+    save_file_path.parent.mkdir(parents=True, exist_ok=True)
+    logger.info(f"Segmented download of {size} bytes with up to {max_segments} segments")
+    try:
+        segmented = await download_segments(open_range, part_path, size, max_segments,
+                                            tools.config.download_min_segment_size,
+                                            retry_delay=tools.config.retry_delay,
+                                            retry_max_delay=tools.config.retry_max_delay)
+    except RangeNotSatisfied as e:
+        logger.warning(f"Range requests not honoured, falling back to a single stream: {e}")
+        await _remove_partial(part_path, meta_path)
+        return None
+    except BaseException:
+        await _remove_partial(part_path, meta_path)
+        raise
+
+    if expected_sha256 and segmented.sha256 != expected_sha256.lower():
+        await _remove_partial(part_path, meta_path)
         return {
             "success": False,
-            "error": str(e),
-            "url": url
+            "error": f"SHA-256 mismatch: expected {expected_sha256}, got {segmented.sha256}",
+            "url": url,
+            "sha256": segmented.sha256
         }
 
+    await aiofiles.os.replace(part_path, save_file_path)
+    # 之前单连接下载留下的续传记录已失效
+    await _remove_partial(meta_path)
+    result.update({
+        "size": segmented.size,
+        "saved_path": str(save_file_path),
+        "sha256": segmented.sha256,
+        "md5": segmented.md5,
+        "resumed_from": 0,
+        "segments": segmented.to_dict()
+    })
+    logger.info(f"File saved to: {save_file_path} ({size} bytes, {segmented.pieces} segments)")
+    return result
+
+
+async def _download_as_stream(tools: WebScrapingTools, url: str, headers: Optional[Dict[str, str]],
+                              max_allowed_size: int) -> Union[Dict[str, Any], StreamingResult]:
+    """以流式结果返回文件内容，size 与摘要在流结束后写入结果"""
+    response = await _open_download(tools, url, headers)
+    try:
+        response.raise_for_status()
+        content_length = response.content_length
+        if content_length is not None and content_length > max_allowed_size:
+            response.release()
+            return {
+                "success": False,
+                "error": f"File too large: {content_length} bytes (max: {max_allowed_size})",
+                "url": url
+            }
+    except BaseException:
+        response.release()
+        raise
+
+    metadata = _download_metadata(response, url)
+
+    async def chunks():
+        sha256 = hashlib.sha256()
+        md5 = hashlib.md5()
+        size = 0
+        try:
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_allowed_size:
+                    raise ValueError(f"File too large: more than {max_allowed_size} bytes (max: {max_allowed_size})")
+                sha256.update(chunk)
+                md5.update(chunk)
+                yield chunk
+        finally:
+            response.release()
+        metadata.update({"size": size, "sha256": sha256.hexdigest(), "md5": md5.hexdigest()})
+        logger.info(f"File downloaded successfully: {size} bytes")
+
+    return StreamingResult(chunks(), metadata, field="content_base64", binary=True)
+
 
 @fetch_tool(
     name="api_call",
@@ -970,7 +1526,7 @@ async def api_call(
 
 @fetch_tool(
     name="batch_requests",
-    description="批量执行HTTP请求，支持并发控制和请求间延迟，适合大量数据抓取",
+    description="批量执行HTTP请求，按主机自适应并发（AIMD）并限速，结果可按完成顺序流式返回，支持整批截止时间，适合大量数据抓取",
     schema={
         "type": "object",
         "properties": {
@@ -990,35 +1546,42 @@ async def api_call(
                 },
                 "description": "请求列表"
             },
-            "max_concurrent": {"type": "integer", "minimum": 1, "maximum": 20, "description": "最大并发数", "default": 5},
-            "delay_between_requests": {"type": "number", "minimum": 0, "description": "请求间延迟（秒）", "default": 0.1}
+            "max_concurrent": {"type": "integer", "minimum": 1, "maximum": MAX_BATCH_CONCURRENCY, "description": "全局最大并发数", "default": 5},
+            "max_per_host": {"type": "integer", "minimum": 1, "maximum": MAX_BATCH_CONCURRENCY, "description": "每个主机的并发上限（实际并发在此范围内按延迟和错误率自适应），默认同 max_concurrent"},
+            "delay_between_requests": {"type": "number", "minimum": 0, "description": "本批请求的最小间隔（秒），0 表示只受工具集限速配置约束", "default": 0},
+            "deadline": {"type": "number", "minimum": 0, "description": "整批截止时间（秒），到期后取消未完成的请求；0 或省略表示不限制"},
+            "stream": {"type": "boolean", "description": "按完成顺序以 NDJSON 流式返回结果", "default": False}
         },
         "required": ["requests"]
     },
     returns={
         "type": "object",
         "properties": {
-            "success": {"type": "boolean", "description": "批量请求是否全部成功"},
+            "success": {"type": "boolean", "description": "批量请求是否执行完成"},
             "results": {
-                "type": "array",
+                "type": ["array", "string"],
                 "items": {
                     "type": "object",
                     "properties": {
                         "success": {"type": "boolean"},
                         "status_code": {"type": "integer"},
                         "content": {"type": ["string", "object"]},
-                        "error": {"type": "string"}
+                        "error": {"type": "string"},
+                        "request_index": {"type": "integer", "description": "请求在列表中的位置"},
+                        "cancelled": {"type": "boolean", "description": "是否因截止时间被取消"}
                     }
                 },
-                "description": "每个请求的结果列表"
+                "description": "每个请求的结果列表（按请求顺序）；stream 时为按完成顺序的 NDJSON"
             },
             "summary": {
                 "type": "object",
                 "properties": {
                     "total": {"type": "integer", "description": "总请求数"},
                     "successful": {"type": "integer", "description": "成功请求数"},
-                    "failed": {"type": "integer", "description": "失败请求数"},
-                    "total_time": {"type": "number", "description": "总耗时（秒）"}
+                    "failed": {"type": "integer", "description": "失败请求数（含被取消的请求）"},
+                    "cancelled": {"type": "integer", "description": "因截止时间被取消的请求数"},
+                    "total_time": {"type": "number", "description": "总耗时（秒）"},
+                    "concurrency": {"type": "object", "description": "自适应并发统计（峰值、增减次数、各主机最终窗口）"}
                 }
             }
         }
@@ -1028,82 +1591,55 @@ async def api_call(
 async def batch_requests(
     requests: List[Dict[str, Any]],
     max_concurrent: int = 5,
-    delay_between_requests: float = 0.1
-) -> Dict[str, Any]:
+    delay_between_requests: float = 0,
+    max_per_host: Optional[int] = None,
+    deadline: Optional[float] = None,
+    stream: bool = False
+) -> Union[Dict[str, Any], StreamingResult]:
     """
     批量HTTP请求
 
+    每个请求经 http_request 共享按主机/全局限速；各主机的并发窗口按 AIMD 根据延迟和错误率调整，
+    上限为 max_per_host，全局不超过 max_concurrent。delay_between_requests 额外限制本批的整体速率。
+
     Args:
         requests: 请求列表，每个请求包含url、method等参数
-        max_concurrent: 最大并发数
-        delay_between_requests: 请求间延迟
+        max_concurrent: 全局最大并发数
+        delay_between_requests: 本批请求的最小间隔（秒）
+        max_per_host: 每个主机的并发上限
+        deadline: 整批截止时间（秒）
+        stream: 是否按完成顺序流式返回结果
 
     Returns:
-        批量请求结果
+        批量请求结果，stream 时为 NDJSON 流式结果
     """
-    try:
-        logger.info(f"Starting batch requests: {len(requests)} requests")
-
-        async def process_request(request_data: Dict[str, Any]) -> Dict[str, Any]:
-            """处理单个请求"""
-            try:
-                if delay_between_requests > 0:
-                    await asyncio.sleep(delay_between_requests)
-
-                return await http_request(**request_data)
-            except Exception as e:
-                return {
-                    "success": False,
-                    "error": str(e),
-                    "request": request_data
-                }
-
-        # 使用信号量限制并发数
-        semaphore = asyncio.Semaphore(max_concurrent)
+    logger.info(f"Starting batch requests: {len(requests)} requests")
+    executor = BatchExecutor(
+        requests, lambda request_data: http_request(**request_data),
+        max_concurrent=max_concurrent, max_per_host=max_per_host,
+        deadline=deadline, min_interval=delay_between_requests
+    )
 
-        async def limited_request(request_data):
-            async with semaphore:
-                return await process_request(request_data)
+    def finish(summary: Dict[str, Any]):
+        logger.info(f"Batch requests completed: {summary['successful']} successful, {summary['failed']} failed"
+                    f" ({summary['cancelled']} cancelled), peak concurrency {summary['concurrency']['peak_in_flight']}")
 
-        # 执行批量请求
-        tasks = [limited_request(req) for req in requests]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+    if stream:
+        metadata = {"success": True, "total_requests": len(requests)}
 
-        # 处理结果
-        successful = 0
-        failed = 0
-        processed_results = []
-
-        for i, result in enumerate(results):
-            if isinstance(result, Exception):
-                processed_results.append({
-                    "success": False,
-                    "error": str(result),
-                    "request_index": i,
-                    "request": requests[i]
-                })
-                failed += 1
-            else:
-                processed_results.append({
-                    **result,
-                    "request_index": i
-                })
-                if result.get("success", False):
-                    successful += 1
-                else:
-                    failed += 1
-
-        batch_result = {
-            "success": True,
-            "total_requests": len(requests),
-            "successful": successful,
-            "failed": failed,
-            "results": processed_results
-        }
+        async def chunks():
+            try:
+                async for result in executor.results():
+                    yield json.dumps(result, ensure_ascii=False, default=str) + "\n"
+            finally:
+                summary = executor.summary()
+                metadata.update(successful=summary["successful"], failed=summary["failed"], summary=summary)
+                finish(summary)
 
-        logger.info(f"Batch requests completed: {successful} successful, {failed} failed")
-        return batch_result
+        return StreamingResult(chunks(), metadata=metadata, field="results")
 
+    try:
+        results = [result async for result in executor.results()]
     except Exception as e:
         logger.error(f"Batch requests failed: {e}")
         return {
@@ -1112,6 +1648,18 @@ async def batch_requests(
             "total_requests": len(requests)
         }
 
+    results.sort(key=lambda result: result["request_index"])
+    summary = executor.summary()
+    finish(summary)
+    return {
+        "success": True,
+        "total_requests": len(requests),
+        "successful": summary["successful"],
+        "failed": summary["failed"],
+        "results": results,
+        "summary": summary
+    }
+
 
 @fetch_tool(
     name="parse_html",
@@ -1130,7 +1678,12 @@ async def batch_requests(
                 "description": "要提取的CSS选择器列表"
             },
             "remove_scripts": {"type": "boolean", "description": "是否移除script标签", "default": True},
-            "remove_styles": {"type": "boolean", "description": "是否移除style标签", "default": True}
+            "remove_styles": {"type": "boolean", "description": "是否移除style标签", "default": True},
+            "include": {
+                "type": "array",
+                "items": {"type": "string", "enum": ["title", "headings", "paragraphs", "links", "images", "tables", "forms", "meta_tags", "css_extracts", "text_content"]},
+                "description": "只返回这些输出项（省略时返回全部）；不含 text_content/css_extracts 时只解析相关标签"
+            }
         },
         "required": ["html_content"]
     },
@@ -1148,6 +1701,7 @@ async def batch_requests(
             "meta_tags": {"type": "object", "description": "meta标签信息"},
             "css_extracts": {"type": "object", "description": "CSS选择器提取结果"},
             "text_content": {"type": "string", "description": "纯文本内容"},
+            "parser": {"type": "string", "description": "使用的HTML解析器（lxml 或 html.parser）"},
             "error": {"type": "string", "description": "错误信息（如果失败）"}
         }
     },
@@ -1161,148 +1715,31 @@ async def parse_html(
     extract_meta: bool = True,
     css_selectors: Optional[List[str]] = None,
     remove_scripts: bool = True,
-    remove_styles: bool = True
+    remove_styles: bool = True,
+    include: Optional[List[str]] = None
 ) -> Dict[str, Any]:
-    """解析HTML内容，提取结构化数据"""
-    try:
-        from bs4 import BeautifulSoup
-        from urllib.parse import urljoin, urlparse
-        import re
-
-        # 解析HTML
-        soup = BeautifulSoup(html_content, 'html.parser')
-
-        # 移除不需要的元素
-        if remove_scripts:
-            for script in soup.find_all('script'):
-                script.decompose()
-        if remove_styles:
-            for style in soup.find_all('style'):
-                style.decompose()
+    """解析HTML内容，提取结构化数据
 
-        result = {
-            "success": True,
-            "title": "",
-            "headings": [],
-            "paragraphs": [],
-            "links": [],
-            "images": [],
-            "tables": [],
-            "forms": [],
-            "meta_tags": {},
-            "css_extracts": {},
-            "text_content": ""
-        }
-
-        # 提取标题
-        title_tag = soup.find('title')
-        if title_tag:
-            result["title"] = title_tag.get_text().strip()
-
-        # 提取各级标题
-        for i in range(1, 7):
-            headings = soup.find_all(f'h{i}')
-            for heading in headings:
-                result["headings"].append({
-                    "level": i,
-                    "text": heading.get_text().strip(),
-                    "id": heading.get('id'),
-                    "class": heading.get('class')
-                })
-
-        # 提取段落
-        paragraphs = soup.find_all('p')
-        for p in paragraphs:
-            text = p.get_text().strip()
-            if text:
-                result["paragraphs"].append(text)
-
-        # 提取链接
-        links = soup.find_all('a', href=True)
-        for link in links:
-            href = link['href']
-            if url:
-                href = urljoin(url, href)
-            result["links"].append({
-                "text": link.get_text().strip(),
-                "href": href,
-                "title": link.get('title'),
-                "class": link.get('class')
-            })
-
-        # 提取图片
-        images = soup.find_all('img')
-        for img in images:
-            src = img.get('src')
-            if src and url:
-                src = urljoin(url, src)
-            result["images"].append({
-                "src": src,
-                "alt": img.get('alt'),
-                "title": img.get('title'),
-                "width": img.get('width'),
-                "height": img.get('height'),
-                "class": img.get('class')
-            })
-
-        # 提取表格
-        if extract_tables:
-            tables = soup.find_all('table')
-            for table in tables:
-                table_data = []
-                rows = table.find_all('tr')
-                for row in rows:
-                    cells = row.find_all(['td', 'th'])
-                    row_data = [cell.get_text().strip() for cell in cells]
-                    table_data.append(row_data)
-                result["tables"].append(table_data)
-
-        # 提取表单
-        if extract_forms:
-            forms = soup.find_all('form')
-            for form in forms:
-                inputs = form.find_all(['input', 'textarea', 'select'])
-                form_data = {
-                    "action": form.get('action'),
-                    "method": form.get('method', 'get'),
-                    "fields": []
-                }
-                for input_elem in inputs:
-                    field = {
-                        "name": input_elem.get('name'),
-                        "type": input_elem.get('type'),
-                        "value": input_elem.get('value'),
-                        "required": input_elem.has_attr('required')
-                    }
-                    form_data["fields"].append(field)
-                result["forms"].append(form_data)
-
-        # 提取meta标签
-        if extract_meta:
-            meta_tags = soup.find_all('meta')
-            for meta in meta_tags:
-                name = meta.get('name') or meta.get('property') or meta.get('http-equiv')
-                content = meta.get('content')
-                if name and content:
-                    result["meta_tags"][name] = content
-
-        # CSS选择器提取
-        if css_selectors:
-            for selector in css_selectors:
-                try:
-                    elements = soup.select(selector)
-                    result["css_extracts"][selector] = [
-                        {
-                            "text": elem.get_text().strip(),
-                            "html": str(elem),
-                            "attributes": elem.attrs
-                        } for elem in elements
-                    ]
-                except Exception as e:
-                    result["css_extracts"][selector] = {"error": str(e)}
-
-        # 提取纯文本
-        result["text_content"] = soup.get_text().strip()
+    只请求部分输出（include）时定向解析相关标签；同一HTML内容的解析结果会被缓存复用。
+    文档树不会被修改，remove_scripts/remove_styles 作用于纯文本和 CSS 提取的 html 字段。
+    """
+    try:
+        from app.tools.html_extract import HTML_OUTPUTS, extract, parse_document
+
+        outputs = set(include or HTML_OUTPUTS)
+        if not extract_tables:
+            outputs.discard("tables")
+        if not extract_forms:
+            outputs.discard("forms")
+        if not extract_meta:
+            outputs.discard("meta_tags")
+        if not css_selectors:
+            outputs.discard("css_extracts")
+
+        document = parse_document(html_content, outputs)
+        result = {"success": True, "parser": document.parser}
+        result.update(extract(document, outputs, url=url, css_selectors=css_selectors,
+                              remove_scripts=remove_scripts, remove_styles=remove_styles))
 
         logger.info(f"HTML parsing successful: extracted {len(result['paragraphs'])} paragraphs, {len(result['links'])} links")
         return result
@@ -1496,9 +1933,15 @@ async def parse_markdown(
             },
             "extract_attributes": {"type": "boolean", "description": "是否提取元素属性", "default": True},
             "namespace_map": {"type": "object", "description": "XML命名空间映射"},
-            "parse_as_dict": {"type": "boolean", "description": "是否转换为字典格式", "default": True}
+            "parse_as_dict": {"type": "boolean", "description": "是否转换为字典格式", "default": True},
+            "url": {"type": "string", "description": "XML地址（未提供 xml_content 时从响应流增量解析）"},
+            "headers": {"type": "object", "additionalProperties": {"type": "string"}, "description": "HTTP请求头（配合 url 使用）"},
+            "max_elements": {"type": "integer", "minimum": 1, "description": "最多解析的元素数，达到后停止解析"}
         },
-        "required": ["xml_content"]
+        "anyOf": [
+            {"required": ["xml_content"]},
+            {"required": ["url"]}
+        ]
     },
     returns={
         "type": "object",
@@ -1509,84 +1952,59 @@ async def parse_markdown(
             "xpath_results": {"type": "object", "description": "XPath查询结果"},
             "elements": {"type": "array", "items": {"type": "object"}, "description": "元素列表"},
             "text_content": {"type": "string", "description": "纯文本内容"},
+            "truncated": {"type": "boolean", "description": "是否因 max_elements 提前停止"},
             "error": {"type": "string", "description": "错误信息（如果失败）"}
         }
     },
     metadata={"tags": ["xml", "parsing", "xpath", "structured-data"]}
 )
 async def parse_xml(
-    xml_content: str,
+    xml_content: Optional[str] = None,
     xpath_queries: Optional[List[str]] = None,
     extract_attributes: bool = True,
     namespace_map: Optional[Dict[str, str]] = None,
-    parse_as_dict: bool = True
+    parse_as_dict: bool = True,
+    url: Optional[str] = None,
+    headers: Optional[Dict[str, str]] = None,
+    max_elements: Optional[int] = None
 ) -> Dict[str, Any]:
-    """解析XML内容，提取结构化数据"""
+    """解析XML内容，提取结构化数据
+
+    增量解析：元素完成即转换并释放，只有执行 XPath 查询时保留完整的树。
+    提供 url 时直接从响应流解析，不构造完整的响应字符串。
+    """
     try:
-        import xml.etree.ElementTree as ET
-        from xml.dom import minidom
-        import re
+        parser = XMLStreamParser(
+            extract_attributes=extract_attributes,
+            build_structure=parse_as_dict,
+            keep_tree=bool(xpath_queries),
+            max_elements=max_elements
+        )
+        if xml_content is not None:
+            parse_xml_text(parser, xml_content)
+        elif url:
+            await _parse_xml_stream(parser, url, headers)
+        else:
+            return {
+                "success": False,
+                "error": "Either 'xml_content' or 'url' must be provided"
+            }
 
         result = {
             "success": True,
-            "root_tag": "",
-            "structure": {},
+            "root_tag": parser.root_tag,
+            "structure": parser.structure,
             "xpath_results": {},
-            "elements": [],
-            "text_content": ""
+            "elements": parser.elements,
+            "text_content": parser.text_content,
+            "truncated": parser.truncated
         }
 
-        # 解析XML
-        root = ET.fromstring(xml_content)
-        result["root_tag"] = root.tag
-
-        # 递归转换XML为字典
-        def element_to_dict(element):
-            result_dict = {}
-
-            # 添加属性
-            if extract_attributes and element.attrib:
-                result_dict["@attributes"] = element.attrib
-
-            # 添加文本内容
-            if element.text and element.text.strip():
-                result_dict["@text"] = element.text.strip()
-
-            # 处理子元素
-            children = {}
-            for child in element:
-                child_dict = element_to_dict(child)
-                if child.tag in children:
-                    if not isinstance(children[child.tag], list):
-                        children[child.tag] = [children[child.tag]]
-                    children[child.tag].append(child_dict)
-                else:
-                    children[child.tag] = child_dict
-
-            if children:
-                result_dict.update(children)
-
-            return result_dict
-
-        # 转换为字典格式
-        if parse_as_dict:
-            result["structure"] = {root.tag: element_to_dict(root)}
-
-        # 提取所有元素信息
-        for elem in root.iter():
-            elem_info = {
-                "tag": elem.tag,
-                "text": elem.text.strip() if elem.text else "",
-                "attributes": dict(elem.attrib) if extract_attributes else {},
-                "tail": elem.tail.strip() if elem.tail else ""
-            }
-            result["elements"].append(elem_info)
-
         # 执行XPath查询
-        if xpath_queries:
+        if xpath_queries and parser.root is not None:
             for query in xpath_queries:
                 try:
-                    elements = root.findall(query, namespace_map or {})
+                    elements = parser.root.findall(query, namespace_map or {})
                     result["xpath_results"][query] = [
                         {
                             "tag": elem.tag,
@@ -1597,9 +2015,6 @@ async def parse_xml(
                 except Exception as e:
                     result["xpath_results"][query] = {"error": str(e)}
 
-        # 提取纯文本
-        result["text_content"] = ET.tostring(root, method='text', encoding='unicode').strip()
-
         logger.info(f"XML parsing successful: {len(result['elements'])} elements extracted")
         return result
 
@@ -1611,6 +2026,20 @@ async def parse_xml(
         }
 
 
+async def _parse_xml_stream(parser: Union[FeedParser, XMLStreamParser], url: str, headers: Optional[Dict[str, str]]) -> int:
+    """从 HTTP 响应流增量解析，解析器提前结束时立即释放连接"""
+    tools = get_fetch_tools()
+    response = await _open_download(tools, url, headers)
+    try:
+        response.raise_for_status()
+        _, total = await parse_xml_stream(
+            parser, response.content.iter_chunked(CHUNK_SIZE), max_size=tools.config.max_file_size
+        )
+        return total
+    finally:
+        response.release()
+
+
 @fetch_tool(
     name="parse_json",
     description="解析和处理JSON数据，支持JSONPath查询和数据转换",
@@ -1625,7 +2054,8 @@ async def parse_xml(
             },
             "flatten_arrays": {"type": "boolean", "description": "是否展平数组", "default": False},
             "extract_keys": {"type": "array", "items": {"type": "string"}, "description": "要提取的特定键"},
-            "max_depth": {"type": "integer", "description": "最大解析深度", "default": 10}
+            "max_depth": {"type": "integer", "description": "最大解析深度", "default": 10},
+            "stream": {"type": "boolean", "description": "流式模式（顶层须为数组）：逐元素查询，匹配结果以 NDJSON 写入 matches，不返回 data", "default": False}
         },
         "required": ["json_content"]
     },
@@ -1638,6 +2068,8 @@ async def parse_xml(
             "extracted_keys": {"type": "object", "description": "提取的键值对"},
             "statistics": {"type": "object", "description": "数据统计信息"},
             "flattened": {"type": "object", "description": "展平后的数据"},
+            "matches": {"type": "string", "description": "流式模式的匹配结果（NDJSON）"},
+            "match_counts": {"type": "object", "description": "流式模式下每个查询的匹配数"},
             "error": {"type": "string", "description": "错误信息（如果失败）"}
         }
     },
@@ -1648,16 +2080,19 @@ async def parse_json(
     jsonpath_queries: Optional[List[str]] = None,
     flatten_arrays: bool = False,
     extract_keys: Optional[List[str]] = None,
-    max_depth: int = 10
-) -> Dict[str, Any]:
-    """解析JSON数据，支持复杂查询和转换"""
+    max_depth: int = 10,
+    stream: bool = False
+) -> Union[Dict[str, Any], StreamingResult]:
+    """解析JSON数据，支持复杂查询和转换
+
+    stream=True 时要求顶层为数组：逐元素解码、查询和统计，匹配结果以 NDJSON
+    （每行 {"query", "value"}）流式写入 matches 字段，不返回 data。
+    """
     try:
-        import json
-        import re
-        from collections import defaultdict
+        if stream:
+            return _parse_json_stream(json_content, jsonpath_queries or [], flatten_arrays, extract_keys, max_depth)
 
-        # 解析JSON
-        data = json.loads(json_content)
+        data = json_query.loads(json_content)
 
         result = {
             "success": True,
@@ -1669,130 +2104,25 @@ async def parse_json(
         }
 
         # 统计信息
-        def collect_stats(obj, depth=0):
-            stats = {"total_keys": 0, "total_values": 0, "max_depth": depth, "data_types": defaultdict(int)}
-
-            if isinstance(obj, dict):
-                stats["total_keys"] += len(obj)
-                for key, value in obj.items():
-                    stats["data_types"][type(value).__name__] += 1
-                    if isinstance(value, (dict, list)) and depth < max_depth:
-                        sub_stats = collect_stats(value, depth + 1)
-                        stats["total_keys"] += sub_stats["total_keys"]
-                        stats["total_values"] += sub_stats["total_values"]
-                        stats["max_depth"] = max(stats["max_depth"], sub_stats["max_depth"])
-                        for k, v in sub_stats["data_types"].items():
-                            stats["data_types"][k] += v
-            elif isinstance(obj, list):
-                stats["total_values"] += len(obj)
-                for item in obj:
-                    if isinstance(item, (dict, list)) and depth < max_depth:
-                        sub_stats = collect_stats(item, depth + 1)
-                        stats["total_keys"] += sub_stats["total_keys"]
-                        stats["total_values"] += sub_stats["total_values"]
-                        stats["max_depth"] = max(stats["max_depth"], sub_stats["max_depth"])
-                        for k, v in sub_stats["data_types"].items():
-                            stats["data_types"][k] += v
-            else:
-                stats["total_values"] += 1
-                stats["data_types"][type(obj).__name__] += 1
-
-            return stats
-
-        result["statistics"] = collect_stats(data)
-        result["statistics"]["data_types"] = dict(result["statistics"]["data_types"])
-
-        # 简单的JSONPath查询实现
-        def simple_jsonpath(obj, path):
-            """简化的JSONPath实现"""
-            if not path:
-                return [obj]
-
-            if path.startswith('$.'):
-                path = path[2:]
-
-            parts = path.split('.')
-            current = [obj]
-
-            for part in parts:
-                next_level = []
-                for item in current:
-                    if part == '*':
-                        if isinstance(item, dict):
-                            next_level.extend(item.values())
-                        elif isinstance(item, list):
-                            next_level.extend(item)
-                    elif '[' in part and ']' in part:
-                        # 数组索引处理
-                        key = part.split('[')[0]
-                        index_str = part.split('[')[1].split(']')[0]
-                        if isinstance(item, dict) and key in item:
-                            if index_str == '*':
-                                if isinstance(item[key], list):
-                                    next_level.extend(item[key])
-                            else:
-                                try:
-                                    index = int(index_str)
-                                    if isinstance(item[key], list) and 0 <= index < len(item[key]):
-                                        next_level.append(item[key][index])
-                                except ValueError:
-                                    pass
-                    elif isinstance(item, dict) and part in item:
-                        next_level.append(item[part])
-                current = next_level
-
-            return current
+        stats = json_query.JSONStats(max_depth)
+        stats.add(data)
+        result["statistics"] = stats.to_dict()
 
-        # 执行JSONPath查询
+        # 执行JSONPath查询（编译结果按表达式缓存）
         if jsonpath_queries:
             for query in jsonpath_queries:
                 try:
-                    result["jsonpath_results"][query] = simple_jsonpath(data, query)
+                    result["jsonpath_results"][query] = json_query.compile_jsonpath(query).find(data)
                 except Exception as e:
                     result["jsonpath_results"][query] = {"error": str(e)}
 
         # 提取特定键
         if extract_keys:
-            def extract_recursive(obj, keys, prefix=""):
-                extracted = {}
-                if isinstance(obj, dict):
-                    for key, value in obj.items():
-                        full_key = f"{prefix}.{key}" if prefix else key
-                        if key in keys:
-                            extracted[full_key] = value
-                        if isinstance(value, (dict, list)):
-                            sub_extracted = extract_recursive(value, keys, full_key)
-                            extracted.update(sub_extracted)
-                elif isinstance(obj, list):
-                    for i, item in enumerate(obj):
-                        if isinstance(item, (dict, list)):
-                            sub_extracted = extract_recursive(item, keys, f"{prefix}[{i}]")
-                            extracted.update(sub_extracted)
-                return extracted
-
-            result["extracted_keys"] = extract_recursive(data, extract_keys)
+            result["extracted_keys"] = json_query.extract_keys(data, extract_keys)
 
         # 展平数据
         if flatten_arrays:
-            def flatten_recursive(obj, parent_key="", sep="."):
-                items = []
-                if isinstance(obj, dict):
-                    for key, value in obj.items():
-                        new_key = f"{parent_key}{sep}{key}" if parent_key else key
-                        if isinstance(value, (dict, list)):
-                            items.extend(flatten_recursive(value, new_key, sep).items())
-                        else:
-                            items.append((new_key, value))
-                elif isinstance(obj, list):
-                    for i, value in enumerate(obj):
-                        new_key = f"{parent_key}[{i}]"
-                        if isinstance(value, (dict, list)):
-                            items.extend(flatten_recursive(value, new_key, sep).items())
-                        else:
-                            items.append((new_key, value))
-                return dict(items)
-
-            result["flattened"] = flatten_recursive(data)
+            result["flattened"] = json_query.flatten(data)
 
         logger.info(f"JSON parsing successful: {result['statistics']['total_keys']} keys, {result['statistics']['total_values']} values")
         return result
@@ -1811,6 +2141,27 @@ async def parse_json(
         }
 
 
+def _parse_json_stream(json_content: str, jsonpath_queries: List[str], flatten_arrays: bool,
+                       extract_keys: Optional[List[str]], max_depth: int) -> StreamingResult:
+    """流式模式：匹配结果逐块产出，统计等字段在流结束时写入 metadata"""
+    engine = json_query.JSONStream(json_content, jsonpath_queries, keys=extract_keys,
+                                   flatten_arrays=flatten_arrays, max_depth=max_depth)
+    metadata = {"success": True, "streamed_items": 0}
+
+    def chunks():
+        yield from engine.ndjson_chunks()
+        metadata.update({
+            "streamed_items": engine.items,
+            "statistics": engine.stats.to_dict(),
+            "match_counts": engine.match_counts,
+            "extracted_keys": engine.extracted_keys,
+            "flattened": engine.flattened
+        })
+        logger.info(f"JSON stream parsing successful: {engine.items} items, {sum(engine.match_counts.values())} matches")
+
+    return StreamingResult(chunks(), metadata=metadata, field="matches")
+
+
 @fetch_tool(
     name="parse_rss",
     description="解析RSS/Atom订阅源，提取文章、标题、链接等信息",
@@ -1821,9 +2172,14 @@ async def parse_json(
             "max_items": {"type": "integer", "description": "最大提取项目数", "default": 50},
             "extract_content": {"type": "boolean", "description": "是否提取完整内容", "default": True},
             "parse_dates": {"type": "boolean", "description": "是否解析日期", "default": True},
-            "include_raw": {"type": "boolean", "description": "是否包含原始XML", "default": False}
+            "include_raw": {"type": "boolean", "description": "是否包含原始XML", "default": False},
+            "url": {"type": "string", "description": "订阅源地址（未提供 rss_content 时从响应流增量解析）"},
+            "headers": {"type": "object", "additionalProperties": {"type": "string"}, "description": "HTTP请求头（配合 url 使用）"}
         },
-        "required": ["rss_content"]
+        "anyOf": [
+            {"required": ["rss_content"]},
+            {"required": ["url"]}
+        ]
     },
     returns={
         "type": "object",
@@ -1839,130 +2195,38 @@ async def parse_json(
     metadata={"tags": ["rss", "atom", "feed", "news", "syndication"]}
 )
 async def parse_rss(
-    rss_content: str,
+    rss_content: Optional[str] = None,
     max_items: int = 50,
     extract_content: bool = True,
     parse_dates: bool = True,
-    include_raw: bool = False
+    include_raw: bool = False,
+    url: Optional[str] = None,
+    headers: Optional[Dict[str, str]] = None
 ) -> Dict[str, Any]:
-    """解析RSS/Atom订阅源"""
-    try:
-        import xml.etree.ElementTree as ET
-        from datetime import datetime
-        import re
+    """解析RSS/Atom订阅源
 
-        # 解析XML
-        root = ET.fromstring(rss_content)
+    增量解析：条目完成即提取并释放，达到 max_items 后停止解析（提供 url 时同时停止读取响应）。
+    """
+    try:
+        parser = FeedParser(max_items=max_items, extract_content=extract_content, include_raw=include_raw)
+        if rss_content is not None:
+            parse_xml_text(parser, rss_content)
+        elif url:
+            await _parse_xml_stream(parser, url, headers)
+        else:
+            return {
+                "success": False,
+                "error": "Either 'rss_content' or 'url' must be provided"
+            }
 
         result = {
             "success": True,
-            "feed_type": "",
-            "feed_info": {},
-            "items": [],
+            "feed_type": parser.feed_type,
+            "feed_info": parser.feed_info,
+            "items": parser.items,
             "statistics": {}
         }
 
-        # 检测订阅源类型
-        if root.tag == 'rss' or 'rss' in root.tag.lower():
-            result["feed_type"] = "RSS"
-            channel = root.find('.//channel')
-
-            # RSS订阅源信息
-            if channel is not None:
-                result["feed_info"] = {
-                    "title": getattr(channel.find('title'), 'text', ''),
-                    "description": getattr(channel.find('description'), 'text', ''),
-                    "link": getattr(channel.find('link'), 'text', ''),
-                    "language": getattr(channel.find('language'), 'text', ''),
-                    "lastBuildDate": getattr(channel.find('lastBuildDate'), 'text', ''),
-                    "generator": getattr(channel.find('generator'), 'text', '')
-                }
-
-                # 提取RSS条目
-                items = channel.findall('item')[:max_items]
-                for item in items:
-                    item_data = {
-                        "title": getattr(item.find('title'), 'text', ''),
-                        "description": getattr(item.find('description'), 'text', ''),
-                        "link": getattr(item.find('link'), 'text', ''),
-                        "pubDate": getattr(item.find('pubDate'), 'text', ''),
-                        "guid": getattr(item.find('guid'), 'text', ''),
-                        "author": getattr(item.find('author'), 'text', ''),
-                        "categories": []
-                    }
-
-                    # 提取分类
-                    for category in item.findall('category'):
-                        if category.text:
-                            item_data["categories"].append(category.text)
-
-                    # 提取内容
-                    if extract_content:
-                        content = item.find('content:encoded', {'content': 'http://purl.org/rss/1.0/modules/content/'})
-                        if content is not None:
-                            item_data["content"] = content.text
-
-                    if include_raw:
-                        item_data["raw_xml"] = ET.tostring(item, encoding='unicode')
-
-                    result["items"].append(item_data)
-
-        elif 'atom' in root.tag.lower() or root.tag.endswith('feed'):
-            result["feed_type"] = "Atom"
-
-            # Atom订阅源信息
-            result["feed_info"] = {
-                "title": getattr(root.find('.//{http://www.w3.org/2005/Atom}title'), 'text', ''),
-                "subtitle": getattr(root.find('.//{http://www.w3.org/2005/Atom}subtitle'), 'text', ''),
-                "id": getattr(root.find('.//{http://www.w3.org/2005/Atom}id'), 'text', ''),
-                "updated": getattr(root.find('.//{http://www.w3.org/2005/Atom}updated'), 'text', ''),
-                "generator": getattr(root.find('.//{http://www.w3.org/2005/Atom}generator'), 'text', '')
-            }
-
-            # 查找链接
-            link_elem = root.find('.//{http://www.w3.org/2005/Atom}link')
-            if link_elem is not None:
-                result["feed_info"]["link"] = link_elem.get('href', '')
-
-            # 提取Atom条目
-            entries = root.findall('.//{http://www.w3.org/2005/Atom}entry')[:max_items]
-            for entry in entries:
-                item_data = {
-                    "title": getattr(entry.find('.//{http://www.w3.org/2005/Atom}title'), 'text', ''),
-                    "summary": getattr(entry.find('.//{http://www.w3.org/2005/Atom}summary'), 'text', ''),
-                    "id": getattr(entry.find('.//{http://www.w3.org/2005/Atom}id'), 'text', ''),
-                    "published": getattr(entry.find('.//{http://www.w3.org/2005/Atom}published'), 'text', ''),
-                    "updated": getattr(entry.find('.//{http://www.w3.org/2005/Atom}updated'), 'text', ''),
-                    "categories": []
-                }
-
-                # 查找链接
-                link_elem = entry.find('.//{http://www.w3.org/2005/Atom}link')
-                if link_elem is not None:
-                    item_data["link"] = link_elem.get('href', '')
-
-                # 查找作者
-                author_elem = entry.find('.//{http://www.w3.org/2005/Atom}author/{http://www.w3.org/2005/Atom}name')
-                if author_elem is not None:
-                    item_data["author"] = author_elem.text
-
-                # 提取分类
-                for category in entry.findall('.//{http://www.w3.org/2005/Atom}category'):
-                    term = category.get('term')
-                    if term:
-                        item_data["categories"].append(term)
-
-                # 提取内容
-                if extract_content:
-                    content = entry.find('.//{http://www.w3.org/2005/Atom}content')
-                    if content is not None:
-                        item_data["content"] = content.text
-
-                if include_raw:
-                    item_data["raw_xml"] = ET.tostring(entry, encoding='unicode')
-
-                result["items"].append(item_data)
-
         # 日期解析
         if parse_dates:
             for item in result["items"]:
@@ -2047,8 +2311,7 @@ async def extract_css_selector(
 ) -> Dict[str, Any]:
     """使用CSS选择器提取网页内容"""
     try:
-        from bs4 import BeautifulSoup
-        import time
+        from app.tools.html_extract import parse_document
 
         # 获取HTML内容
         if html_content:
@@ -2070,8 +2333,8 @@ async def extract_css_selector(
                 "error": "Either 'url' or 'html_content' must be provided"
             }
 
-        # 解析HTML
-        soup = BeautifulSoup(html, 'html.parser')
+        # 解析HTML（同一内容已被 parse_html 等解析过时复用缓存的文档）
+        soup = parse_document(html).soup
 
         result = {
             "success": True,
@@ -2199,7 +2462,8 @@ async def extract_css_selector(
                 }
             },
             "headers": {"type": "object", "description": "HTTP请求头"},
-            "follow_redirects": {"type": "boolean", "description": "是否跟随重定向", "default": True}
+            "follow_redirects": {"type": "boolean", "description": "是否跟随重定向", "default": True},
+            "cache_mode": {"type": "string", "enum": list(CACHE_MODES), "description": "HTTP缓存模式，取值同 http_request；省略时使用工具集配置"}
         },
         "required": ["url"]
     },
@@ -2224,17 +2488,18 @@ async def smart_extract_and_parse(
     force_format: Optional[str] = None,
     extract_options: Optional[Dict[str, Any]] = None,
     headers: Optional[Dict[str, str]] = None,
-    follow_redirects: bool = True
+    follow_redirects: bool = True,
+    cache_mode: Optional[str] = None
 ) -> Dict[str, Any]:
     """智能抓取并解析网页内容"""
     try:
-        import re
         from urllib.parse import urlparse
+        from app.tools.html_extract import content_features, detect_format
 
         extract_options = extract_options or {}
 
         # 1. 抓取网页内容
-        fetch_result = await http_request(url, headers=headers or {})
+        fetch_result = await http_request(url, headers=headers or {}, cache_mode=cache_mode)
         if not fetch_result.get("success"):
             return {
                 "success": False,
@@ -2257,7 +2522,8 @@ async def smart_extract_and_parse(
                 "url_domain": urlparse(final_url).netloc,
                 "response_info": {
                     "status_code": fetch_result.get("status_code"),
-                    "encoding": fetch_result.get("encoding")
+                    "encoding": fetch_result.get("encoding"),
+                    "cache": fetch_result.get("cache")
                 }
             },
             "statistics": {}
@@ -2267,31 +2533,8 @@ async def smart_extract_and_parse(
         detected_format = force_format
 
         if auto_detect_format and not force_format:
-            # 基于内容类型检测
-            if "application/json" in content_type:
-                detected_format = "json"
-            elif "application/xml" in content_type or "text/xml" in content_type:
-                detected_format = "xml"
-            elif "application/rss+xml" in content_type or "application/atom+xml" in content_type:
-                detected_format = "rss"
-            elif "text/html" in content_type:
-                detected_format = "html"
-            else:
-                # 基于内容特征检测
-                content_lower = raw_content.strip().lower()
-                if content_lower.startswith('{') or content_lower.startswith('['):
-                    detected_format = "json"
-                elif content_lower.startswith('<?xml') or '<rss' in content_lower or '<feed' in content_lower:
-                    if 'rss' in content_lower or 'atom' in content_lower:
-                        detected_format = "rss"
-                    else:
-                        detected_format = "xml"
-                elif content_lower.startswith('<!doctype html') or '<html' in content_lower:
-                    detected_format = "html"
-                elif re.match(r'^#+\s', raw_content.strip(), re.MULTILINE):
-                    detected_format = "markdown"
-                else:
-                    detected_format = "html"  # 默认作为HTML处理
+            # 基于内容类型与内容开头检测
+            detected_format = detect_format(raw_content, content_type)
 
         result["detected_format"] = detected_format or "html"
 
@@ -2379,9 +2622,7 @@ async def smart_extract_and_parse(
             "content_features": {
                 "has_structured_data": result["detected_format"] in ["json", "xml", "rss"],
                 "has_html_content": result["detected_format"] == "html",
-                "estimated_word_count": len(raw_content.split()),
-                "has_code_blocks": "```" in raw_content,
-                "has_tables": "|" in raw_content or "<table" in raw_content.lower()
+                **content_features(raw_content)
             }
         }
 
@@ -2397,6 +2638,84 @@ async def smart_extract_and_parse(
         }
 
 
+@fetch_tool(
+    name="crawl",
+    description="从起始页面并发爬取站点：按深度和页面数限制扩展链接，URL 去重，遵守 robots.txt，按主机限制并发和速率，页面完成即流式返回",
+    schema={
+        "type": "object",
+        "properties": {
+            "start_url": {"type": "string", "description": "起始页面URL"},
+            "max_depth": {"type": "integer", "minimum": 0, "maximum": MAX_CRAWL_DEPTH, "description": "最大链接深度（起始页为 0）", "default": 2},
+            "max_pages": {"type": "integer", "minimum": 1, "maximum": MAX_CRAWL_PAGES, "description": "最多抓取的页面数", "default": 50},
+            "same_domain": {"type": "boolean", "description": "只爬取起始页所在域名（含子域名）", "default": True},
+            "allowed_domains": {"type": "array", "items": {"type": "string"}, "description": "允许爬取的域名列表（含子域名），优先于 same_domain"},
+            "include_patterns": {"type": "array", "items": {"type": "string"}, "description": "URL 需匹配其中之一的正则表达式"},
+            "exclude_patterns": {"type": "array", "items": {"type": "string"}, "description": "匹配任一即跳过的正则表达式"},
+            "respect_robots": {"type": "boolean", "description": "是否遵守 robots.txt（含 Crawl-delay）", "default": True},
+            "concurrency": {"type": "integer", "minimum": 1, "maximum": MAX_CRAWL_CONCURRENCY, "description": "并发 worker 数", "default": 8},
+            "max_per_host": {"type": "integer", "minimum": 1, "description": "每个主机的最大并发请求数", "default": 2},
+            "requests_per_second": {"type": "number", "minimum": 0, "description": "每个主机每秒最大请求数（0 表示不限制）", "default": 5},
+            "extract_text": {"type": "boolean", "description": "是否返回页面纯文本（每页最多 10000 字符）", "default": True},
+            "headers": {"type": "object", "additionalProperties": {"type": "string"}, "description": "自定义请求头"},
+            "cache_mode": {"type": "string", "enum": list(CACHE_MODES), "description": "HTTP缓存模式，取值同 http_request；省略时使用工具集配置"}
+        },
+        "required": ["start_url"]
+    },
+    returns={
+        "type": "object",
+        "properties": {
+            "success": {"type": "boolean", "description": "是否成功"},
+            "pages": {"type": "string", "description": "页面结果（NDJSON，每行一个页面：url、depth、status、title、text、links_found 等）"},
+            "statistics": {"type": "object", "description": "爬取统计（抓取页数、错误、robots 拦截、重复链接等）"},
+            "error": {"type": "string", "description": "错误信息（如果失败）"}
+        }
+    },
+    metadata={"tags": ["crawl", "scraping", "webpage", "robots"]}
+)
+async def crawl(
+    start_url: str,
+    max_depth: int = 2,
+    max_pages: int = 50,
+    same_domain: bool = True,
+    allowed_domains: Optional[List[str]] = None,
+    include_patterns: Optional[List[str]] = None,
+    exclude_patterns: Optional[List[str]] = None,
+    respect_robots: bool = True,
+    concurrency: int = 8,
+    max_per_host: int = 2,
+    requests_per_second: float = 5,
+    extract_text: bool = True,
+    headers: Optional[Dict[str, str]] = None,
+    cache_mode: Optional[str] = None
+) -> Union[Dict[str, Any], StreamingResult]:
+    """并发爬取站点，页面结果以 NDJSON 流式返回，统计信息在流结束时写入"""
+    try:
+        crawler = Crawler(
+            get_fetch_tools(), start_url, max_depth=max_depth, max_pages=max_pages,
+            same_domain=same_domain, allowed_domains=allowed_domains,
+            include_patterns=include_patterns, exclude_patterns=exclude_patterns,
+            respect_robots=respect_robots, concurrency=concurrency, max_per_host=max_per_host,
+            requests_per_second=requests_per_second, extract_text=extract_text,
+            headers=headers, cache_mode=cache_mode
+        )
+    except (ValueError, re.error) as e:
+        return {"success": False, "error": str(e)}
+
+    metadata = {"success": True, "statistics": {}}
+
+    async def chunks():
+        started = time.monotonic()
+        logger.info(f"Crawling from {sanitize_for_log(crawler.start_url)} (depth {crawler.max_depth}, pages {crawler.max_pages})")
+        try:
+            async for page in crawler.pages():
+                yield json.dumps(page, ensure_ascii=False) + "\n"
+        finally:
+            metadata["statistics"] = {**crawler.get_status(), "elapsed_seconds": round(time.monotonic() - started, 3)}
+            logger.info(f"Crawl finished: {metadata['statistics']['pages_crawled']} pages, {metadata['statistics']['errors']} errors")
+
+    return StreamingResult(chunks(), metadata=metadata, field="pages")
+
+
 # MCP工具注册信息
 MCP_TOOLS = [
     {
@@ -2444,6 +2763,11 @@ MCP_TOOLS = [
                 "follow_redirects": {
                     "type": "boolean",
                     "description": "Whether to follow redirects"
+                },
+                "cache_mode": {
+                    "type": "string",
+                    "enum": list(CACHE_MODES),
+                    "description": "HTTP cache mode for GET requests (defaults to the category config)"
                 }
             },
             "required": ["url"]
@@ -2477,6 +2801,11 @@ MCP_TOOLS = [
                     "type": "boolean",
                     "default": False,
                     "description": "Extract all image URLs from the page"
+                },
+                "cache_mode": {
+                    "type": "string",
+                    "enum": list(CACHE_MODES),
+                    "description": "HTTP cache mode (defaults to the category config)"
                 }
             },
             "required": ["url"]
@@ -2503,6 +2832,21 @@ MCP_TOOLS = [
                 "max_size": {
                     "type": "integer",
                     "description": "Maximum file size in bytes"
+                },
+                "resume": {
+                    "type": "boolean",
+                    "default": True,
+                    "description": "Resume an unfinished .part download via Range/If-Range"
+                },
+                "expected_sha256": {
+                    "type": "string",
+                    "description": "Expected SHA-256 hex digest of the file"
+                },
+                "max_segments": {
+                    "type": "integer",
+                    "minimum": 1,
+                    "maximum": 16,
+                    "description": "Maximum parallel range segments when saving to disk"
                 }
             },
             "required": ["url"]
@@ -2551,7 +2895,7 @@ MCP_TOOLS = [
     },
     {
         "name": "batch_requests",
-        "description": "Execute multiple HTTP requests concurrently with rate limiting",
+        "description": "Execute multiple HTTP requests with adaptive per-host concurrency and rate limiting",
         "inputSchema": {
             "type": "object",
             "properties": {
@@ -2575,14 +2919,30 @@ MCP_TOOLS = [
                     "type": "integer",
                     "default": 5,
                     "minimum": 1,
-                    "maximum": 20,
+                    "maximum": MAX_BATCH_CONCURRENCY,
                     "description": "Maximum concurrent requests"
                 },
+                "max_per_host": {
+                    "type": "integer",
+                    "minimum": 1,
+                    "maximum": MAX_BATCH_CONCURRENCY,
+                    "description": "Per-host concurrency ceiling; the actual window adapts to latency and errors"
+                },
                 "delay_between_requests": {
                     "type": "number",
-                    "default": 0.1,
+                    "default": 0,
                     "minimum": 0,
-                    "description": "Delay between requests in seconds"
+                    "description": "Minimum interval between requests of this batch in seconds"
+                },
+                "deadline": {
+                    "type": "number",
+                    "minimum": 0,
+                    "description": "Overall batch deadline in seconds; unfinished requests are cancelled"
+                },
+                "stream": {
+                    "type": "boolean",
+                    "default": False,
+                    "description": "Stream results as NDJSON in completion order"
                 }
             },
             "required": ["requests"]
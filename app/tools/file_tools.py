@@ -9,8 +9,13 @@ import hashlib
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 from app.tools.registry import file_tool, mcp_category
+from app.tools.streaming import CHUNK_SIZE, StreamAborted, StreamingResult
+from app.core.config import MCP_MAX_INLINE_RESULT_BYTES
 from app.core.secure_logging import sanitize_for_log
 
+# 完整读取的大小上限：超过内联上限的文件以流式结果返回，不再整体载入内存
+MAX_STREAM_READ_SIZE = 1024 * 1024 * 1024
+
 
 # 注册文件工具分类
 @mcp_category(
@@ -70,10 +75,21 @@ def read(file_path: str, encoding: str = "utf-8", max_lines: int = 0):
         if not file_path.is_file():
             return {"success": False, "error": f"Path is not a file: {sanitize_for_log(str(file_path))}"}
 
-        # Check file size (limit to 10MB)
         file_size = file_path.stat().st_size
-        if file_size > 10 * 1024 * 1024:
-            return {"success": False, "error": "File too large (>10MB)"}
+        if file_size > MAX_STREAM_READ_SIZE:
+            return {"success": False, "error": "File too large (>1GB)"}
+
+        if max_lines <= 0 and file_size > MCP_MAX_INLINE_RESULT_BYTES:
+            return StreamingResult(
+                _iter_text(file_path, encoding),
+                metadata={
+                    "success": True,
+                    "file_path": str(file_path),
+                    "encoding": encoding,
+                    "size_bytes": file_size,
+                    "truncated": False
+                }
+            )
 
         with open(file_path, 'r', encoding=encoding) as f:
             if max_lines > 0:
@@ -106,6 +122,20 @@ def read(file_path: str, encoding: str = "utf-8", max_lines: int = 0):
         return {"success": False, "error": str(e)}
 
 
+def _iter_text(file_path: Path, encoding: str):
+    """按块读取文本文件（增量解码，不会在多字节字符中间截断）"""
+    with open(file_path, 'r', encoding=encoding) as f:
+        while True:
+            try:
+                chunk = f.read(CHUNK_SIZE)
+            except UnicodeDecodeError as e:
+                # 与整体读取时一致，返回错误结果而不是抛出异常
+                raise StreamAborted({"success": False, "error": f"Encoding error: {str(e)}"})
+            if not chunk:
+                return
+            yield chunk
+
+
 @file_tool(
     name="write",
     description="Write content to file at specified path",
@@ -5,11 +5,15 @@ GitHub工具集
 import os
 import json
 import base64
-from typing import Dict, Any, List, Optional, Union
+import binascii
+import codecs
+from typing import Dict, Any, Iterator, List, Optional, Union
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from app.tools.registry import github_tool, mcp_category
+from app.tools.streaming import CHUNK_SIZE, StreamAborted, StreamingResult
+from app.core.config import MCP_MAX_INLINE_RESULT_BYTES
 from app.core.mcp_tools_service import get_proxy_for_requests, get_mcp_config
 
 
@@ -40,11 +44,8 @@ class GitHubAPIClient:
             self.mcp_config = None
 
         # Token配置：优先使用参数，其次环境变量，最后从MCP配置中获取
-        self.token = (
-            token or
-            os.getenv('GITHUB_TOKEN', '') or
-            (self.mcp_config.environment_variables.get('GITHUB_TOKEN', '') if self.mcp_config else '')
-        )
+        self._explicit_token = token
+        self.token = self._resolve_token()
 
         self.base_url = "https://api.github.com"
         self.session = requests.Session()
@@ -99,10 +100,23 @@ class GitHubAPIClient:
                 "Authorization": f"token {self.token}"
             })
 
+    def _resolve_token(self) -> str:
+        return (
+            self._explicit_token or
+            os.getenv('GITHUB_TOKEN', '') or
+            (self.mcp_config.environment_variables.get('GITHUB_TOKEN', '') if self.mcp_config else '')
+        )
+
     def reload_config(self):
         """重新加载配置"""
         try:
             self.mcp_config = get_mcp_config()
+            # 更新Token（环境变量可能已在配置中修改）
+            self.token = self._resolve_token()
+            if self.token:
+                self.session.headers["Authorization"] = f"token {self.token}"
+            else:
+                self.session.headers.pop("Authorization", None)
             # 重新配置session
             if self.mcp_config:
                 # 更新代理配置
@@ -196,6 +210,10 @@ def reload_github_client_config():
     global github_client
     github_client.reload_config()
 
+    # 凭据可能已变化，缓存的结果（如 token 所属用户信息）不能再复用
+    from app.tools.dispatcher import get_tool_dispatcher
+    get_tool_dispatcher().result_cache.invalidate("github_*")
+
 
 @github_tool(
     name="get_repository",
@@ -220,7 +238,8 @@ def reload_github_client_config():
             {"owner": "microsoft", "repo": "vscode"},
             {"owner": "facebook", "repo": "react"}
         ]
-    }
+    },
+    cache={"ttl": 60, "key": ["owner", "repo"]}
 )
 def github_get_repository(owner: str, repo: str) -> Dict[str, Any]:
     """获取GitHub仓库详细信息"""
@@ -422,7 +441,8 @@ def github_create_repository(name: str, description: str = "", homepage: str = "
             {"username": "octocat"},
             {"username": "torvalds"}
         ]
-    }
+    },
+    cache={"ttl": 300, "key": ["username"]}
 )
 def github_get_user(username: str = "") -> Dict[str, Any]:
     """获取GitHub用户信息"""
@@ -853,7 +873,8 @@ def github_create_pull_request(owner: str, repo: str, title: str, head: str, bas
             {"owner": "microsoft", "repo": "vscode"},
             {"owner": "facebook", "repo": "react", "protected": True}
         ]
-    }
+    },
+    cache={"ttl": 60}
 )
 def github_list_branches(owner: str, repo: str, protected: bool = False, per_page: int = 30, page: int = 1) -> Dict[str, Any]:
     """列出仓库的分支"""
@@ -1153,9 +1174,8 @@ def github_get_latest_release(owner: str, repo: str) -> Dict[str, Any]:
             },
             "sort": {
                 "type": "string",
-                "description": "排序方式",
-                "enum": ["stars", "forks", "help-wanted-issues", "updated"],
-                "default": "best-match"
+                "description": "排序方式（省略时按相关度排序）",
+                "enum": ["stars", "forks", "help-wanted-issues", "updated"]
             },
             "order": {
                 "type": "string",
@@ -1222,9 +1242,8 @@ def github_search_repositories(q: str, sort: str = "", order: str = "desc", per_
             },
             "sort": {
                 "type": "string",
-                "description": "排序方式",
-                "enum": ["comments", "reactions", "reactions-+1", "reactions--1", "reactions-smile", "reactions-thinking_face", "reactions-heart", "reactions-tada", "interactions", "created", "updated"],
-                "default": "best-match"
+                "description": "排序方式（省略时按相关度排序）",
+                "enum": ["comments", "reactions", "reactions-+1", "reactions--1", "reactions-smile", "reactions-thinking_face", "reactions-heart", "reactions-tada", "interactions", "created", "updated"]
             },
             "order": {
                 "type": "string",
@@ -1316,8 +1335,12 @@ def github_search_issues(q: str, sort: str = "", order: str = "desc", per_page:
         ]
     }
 )
-def github_get_file_contents(owner: str, repo: str, path: str = "", ref: str = "") -> Dict[str, Any]:
-    """获取GitHub仓库中文件或目录的内容"""
+def github_get_file_contents(owner: str, repo: str, path: str = "", ref: str = "") -> Union[Dict[str, Any], StreamingResult]:
+    """获取GitHub仓库中文件或目录的内容
+
+    解码后超过内联上限的文件以 decoded_content 字段流式返回（写入结果句柄），
+    data 中不再附带 base64 原文。
+    """
     try:
         if not owner or not repo:
             return {"success": False, "error": "owner和repo参数不能为空"}
@@ -1335,6 +1358,11 @@ def github_get_file_contents(owner: str, repo: str, path: str = "", ref: str = "
         # 如果是文件内容，解码Base64
         if result.get("success") and "data" in result:
             if isinstance(result["data"], dict) and "content" in result["data"]:
+                content = result["data"]["content"]
+                if isinstance(content, str) and len(content) * 3 // 4 > MCP_MAX_INLINE_RESULT_BYTES:
+                    data = {key: value for key, value in result["data"].items() if key != "content"}
+                    return StreamingResult(_iter_base64_text(content, result), metadata={**result, "data": data},
+                                           field="decoded_content")
                 try:
                     content = result["data"]["content"]
                     decoded_content = base64.b64decode(content).decode('utf-8')
@@ -1347,6 +1375,26 @@ def github_get_file_contents(owner: str, repo: str, path: str = "", ref: str = "
         return {"success": False, "error": str(e)}
 
 
+def _iter_base64_text(content: str, result: Dict[str, Any]) -> Iterator[str]:
+    """分块解码 base64 文件内容（GitHub 每 60 个字符换行）；解码失败时返回未解码的原始结果"""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    try:
+        for start in range(0, len(content), CHUNK_SIZE):
+            piece = pending + "".join(content[start:start + CHUNK_SIZE].split())
+            usable = len(piece) - len(piece) % 4
+            pending = piece[usable:]
+            text = decoder.decode(base64.b64decode(piece[:usable]))
+            if text:
+                yield text
+        text = decoder.decode(base64.b64decode(pending), final=True)
+    except (binascii.Error, UnicodeDecodeError):
+        # 与整体解码失败时一致：保持原样，不提供 decoded_content
+        raise StreamAborted(result)
+    if text:
+        yield text
+
+
 @github_tool(
     name="create_or_update_file",
     description="在GitHub仓库中创建或更新文件",
@@ -0,0 +1,306 @@
+"""
+HTML 单次解析提取引擎
+Single-Parse HTML Extraction Engine
+
+特性:
+- 解析器按可用性选择：安装了 lxml 时使用 lxml，否则退回标准库 html.parser
+- 只请求部分输出（如仅链接、图片、meta）时使用 SoupStrainer 定向解析，只构建相关标签的子树
+- 一次遍历文档即填充所有请求的提取项（标题、各级标题、段落、链接、图片、表格、表单、meta、纯文本）
+- 解析后的文档按内容摘要缓存（LRU），同一 HTML 的连续调用（parse_html → extract_css_selector 等）复用同一棵树；
+  提取过程不修改文档树，缓存的文档可安全共享
+- 格式检测只查看内容开头的 SNIFF_SIZE 个字符
+"""
+
+import copy
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Set
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.builder import builder_registry
+from bs4.element import CData, NavigableString, Tag
+
+from app.core.logging import setup_logging
+
+logger = setup_logging("INFO")
+
+HTML_OUTPUTS = (
+    "title", "headings", "paragraphs", "links", "images",
+    "tables", "forms", "meta_tags", "css_extracts", "text_content",
+)
+
+# 只依赖这些标签子树的输出可以定向解析；text_content 与 css_extracts 需要完整文档
+_OUTPUT_TAGS = {
+    "title": ("title",),
+    "headings": ("h1", "h2", "h3", "h4", "h5", "h6"),
+    "paragraphs": ("p",),
+    "links": ("a",),
+    "images": ("img",),
+    "tables": ("table",),
+    "forms": ("form",),
+    "meta_tags": ("meta",),
+}
+
+# 与 Tag.get_text() 一致：只收集普通文本与 CDATA，跳过注释、script、style 等
+_TEXT_TYPES = (NavigableString, CData)
+
+SNIFF_SIZE = 4096
+DOCUMENT_CACHE_SIZE = 8
+
+_MARKDOWN_HEADING = re.compile(r"^#+\s", re.MULTILINE)
+_TABLE_TAG = re.compile(r"<table", re.IGNORECASE)
+_WORD = re.compile(r"\S+")
+
+
+def _detect_parser() -> str:
+    return "lxml" if builder_registry.lookup("lxml") else "html.parser"
+
+
+HTML_PARSER = _detect_parser()
+
+
+class ParsedDocument:
+    """解析后的文档；only_tags 不为 None 时表示只包含这些标签的定向解析结果"""
+
+    def __init__(self, soup: BeautifulSoup, parser: str, only_tags: Optional[FrozenSet[str]] = None):
+        self.soup = soup
+        self.parser = parser
+        self.only_tags = only_tags
+
+    def covers(self, tags: Optional[FrozenSet[str]]) -> bool:
+        return self.only_tags is None or (tags is not None and tags <= self.only_tags)
+
+
+class DocumentCache:
+    """按 HTML 内容摘要缓存解析结果"""
+
+    def __init__(self, max_entries: int = DOCUMENT_CACHE_SIZE, parser: str = HTML_PARSER):
+        self.max_entries = max_entries
+        self.parser = parser
+        self._entries: "OrderedDict[tuple, ParsedDocument]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def get(self, html: str, only_tags: Optional[Iterable[str]] = None) -> ParsedDocument:
+        """返回覆盖 only_tags 的文档；完整文档可以满足任何定向请求"""
+        tags = frozenset(only_tags) if only_tags is not None else None
+        digest = hashlib.sha1(html.encode("utf-8", "surrogatepass")).hexdigest()
+        with self._lock:
+            for key in ((digest, None), (digest, tags)):
+                document = self._entries.get(key)
+                if document is not None and document.covers(tags):
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return document
+            self._stats["misses"] += 1
+
+        parse_only = SoupStrainer(sorted(tags)) if tags is not None else None
+        document = ParsedDocument(BeautifulSoup(html, self.parser, parse_only=parse_only), self.parser, tags)
+        with self._lock:
+            self._entries[(digest, tags)] = document
+            self._entries.move_to_end((digest, tags))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return document
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stats = {"hits": 0, "misses": 0}
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"parser": self.parser, "documents": len(self._entries), **self._stats}
+
+
+_document_cache: Optional[DocumentCache] = None
+_document_cache_lock = threading.Lock()
+
+
+def get_document_cache() -> DocumentCache:
+    global _document_cache
+    if _document_cache is None:
+        with _document_cache_lock:
+            if _document_cache is None:
+                _document_cache = DocumentCache()
+    return _document_cache
+
+
+def parse_document(html: str, outputs: Optional[Iterable[str]] = None) -> ParsedDocument:
+    """解析（或从缓存取回）足以产生 outputs 的文档，outputs 为 None 时解析完整文档"""
+    return get_document_cache().get(html, tags_for_outputs(outputs) if outputs is not None else None)
+
+
+def tags_for_outputs(outputs: Iterable[str]) -> Optional[FrozenSet[str]]:
+    """定向解析需要保留的标签；需要完整文档时返回 None"""
+    tags: Set[str] = set()
+    for output in outputs:
+        if output not in _OUTPUT_TAGS:
+            return None
+        tags.update(_OUTPUT_TAGS[output])
+    return frozenset(tags)
+
+
+def _element_html(element: Tag, drop_tags: List[str]) -> str:
+    if drop_tags and element.find(drop_tags) is not None:
+        # 不修改共享的文档树，在副本上移除
+        element = copy.copy(element)
+        for child in element.find_all(drop_tags):
+            child.decompose()
+    return str(element)
+
+
+def extract(document: ParsedDocument, outputs: Iterable[str], url: Optional[str] = None,
+            css_selectors: Optional[List[str]] = None, remove_scripts: bool = True,
+            remove_styles: bool = True) -> Dict[str, Any]:
+    """一次遍历文档填充所有请求的输出，返回与 parse_html 相同结构的字段"""
+    wanted = set(outputs)
+    result: Dict[str, Any] = {
+        "title": "", "headings": [], "paragraphs": [], "links": [], "images": [],
+        "tables": [], "forms": [], "meta_tags": {}, "css_extracts": {}, "text_content": "",
+    }
+    title_seen = False
+    texts: List[str] = []
+
+    def on_title(tag: Tag):
+        nonlocal title_seen
+        if not title_seen:
+            title_seen = True
+            result["title"] = tag.get_text().strip()
+
+    def on_heading(tag: Tag):
+        result["headings"].append({
+            "level": int(tag.name[1]),
+            "text": tag.get_text().strip(),
+            "id": tag.get("id"),
+            "class": tag.get("class"),
+        })
+
+    def on_paragraph(tag: Tag):
+        text = tag.get_text().strip()
+        if text:
+            result["paragraphs"].append(text)
+
+    def on_link(tag: Tag):
+        if not tag.has_attr("href"):
+            return
+        href = tag["href"]
+        result["links"].append({
+            "text": tag.get_text().strip(),
+            "href": urljoin(url, href) if url else href,
+            "title": tag.get("title"),
+            "class": tag.get("class"),
+        })
+
+    def on_image(tag: Tag):
+        src = tag.get("src")
+        result["images"].append({
+            "src": urljoin(url, src) if src and url else src,
+            "alt": tag.get("alt"),
+            "title": tag.get("title"),
+            "width": tag.get("width"),
+            "height": tag.get("height"),
+            "class": tag.get("class"),
+        })
+
+    def on_table(tag: Tag):
+        result["tables"].append([
+            [cell.get_text().strip() for cell in row.find_all(["td", "th"])]
+            for row in tag.find_all("tr")
+        ])
+
+    def on_form(tag: Tag):
+        result["forms"].append({
+            "action": tag.get("action"),
+            "method": tag.get("method", "get"),
+            "fields": [
+                {
+                    "name": field.get("name"),
+                    "type": field.get("type"),
+                    "value": field.get("value"),
+                    "required": field.has_attr("required"),
+                }
+                for field in tag.find_all(["input", "textarea", "select"])
+            ],
+        })
+
+    def on_meta(tag: Tag):
+        name = tag.get("name") or tag.get("property") or tag.get("http-equiv")
+        content = tag.get("content")
+        if name and content:
+            result["meta_tags"][name] = content
+
+    handlers: Dict[str, Callable[[Tag], None]] = {}
+    for output, handler in (("title", on_title), ("headings", on_heading), ("paragraphs", on_paragraph),
+                            ("links", on_link), ("images", on_image), ("tables", on_table),
+                            ("forms", on_form), ("meta_tags", on_meta)):
+        if output in wanted:
+            handlers.update(dict.fromkeys(_OUTPUT_TAGS[output], handler))
+    collect_text = "text_content" in wanted
+
+    for node in document.soup.descendants:
+        if isinstance(node, Tag):
+            handler = handlers.get(node.name)
+            if handler is not None:
+                handler(node)
+        elif collect_text and type(node) in _TEXT_TYPES:
+            texts.append(node)
+
+    # 与逐级 find_all 的顺序一致：先按级别，同级按文档顺序
+    result["headings"].sort(key=lambda heading: heading["level"])
+    if collect_text:
+        result["text_content"] = "".join(texts).strip()
+
+    if css_selectors and "css_extracts" in wanted:
+        drop_tags = [name for name, drop in (("script", remove_scripts), ("style", remove_styles)) if drop]
+        for selector in css_selectors:
+            try:
+                result["css_extracts"][selector] = [
+                    {
+                        "text": element.get_text().strip(),
+                        "html": _element_html(element, drop_tags),
+                        "attributes": element.attrs,
+                    }
+                    for element in document.soup.select(selector)
+                ]
+            except Exception as e:
+                result["css_extracts"][selector] = {"error": str(e)}
+
+    return result
+
+
+def detect_format(content: str, content_type: str = "") -> str:
+    """根据 Content-Type 与内容开头判断格式：json / xml / rss / html / markdown"""
+    content_type = content_type.lower()
+    if "application/json" in content_type:
+        return "json"
+    if "application/xml" in content_type or "text/xml" in content_type:
+        return "xml"
+    if "application/rss+xml" in content_type or "application/atom+xml" in content_type:
+        return "rss"
+    if "text/html" in content_type:
+        return "html"
+
+    head = content[:SNIFF_SIZE].lstrip()
+    head_lower = head.lower()
+    if head_lower.startswith(("{", "[")):
+        return "json"
+    if head_lower.startswith("<?xml") or "<rss" in head_lower or "<feed" in head_lower:
+        return "rss" if "rss" in head_lower or "atom" in head_lower else "xml"
+    if head_lower.startswith("<!doctype html") or "<html" in head_lower:
+        return "html"
+    if _MARKDOWN_HEADING.match(head):
+        return "markdown"
+    return "html"
+
+
+def content_features(content: str) -> Dict[str, Any]:
+    """smart_extract 的内容特征统计，不复制整份内容"""
+    return {
+        "estimated_word_count": sum(1 for _ in _WORD.finditer(content)),
+        "has_code_blocks": "```" in content,
+        "has_tables": "|" in content or _TABLE_TAG.search(content) is not None,
+    }
@@ -0,0 +1,553 @@
+"""
+网络抓取 HTTP 响应缓存
+HTTP Response Cache for Web Scraping Tools
+
+特性:
+- 按 RFC 7234 实现的私有缓存：Cache-Control（max-age、no-cache、no-store、must-revalidate）、
+  Expires、Age、基于 Last-Modified 的启发式新鲜期
+- 缓存键为 方法 + URL（含查询参数）+ 响应 Vary 指定的请求头取值，Vary: * 的响应不缓存
+- 过期条目携带 If-None-Match / If-Modified-Since 条件请求重新验证，304 时复用已缓存的响应体
+- 磁盘存储（元数据 JSON + 响应体），按总大小上限以最近使用顺序淘汰，重启后自动加载索引
+- 每次调用可通过 cache_mode 覆盖缓存行为（取值同 Fetch API 的 RequestCache）
+- 统计命中、重新验证、未命中和绕过次数
+- 带 Authorization / Cookie 或自带条件请求头的请求、非 GET 请求不经过缓存；
+  成功的非安全方法请求（POST/PUT/PATCH/DELETE）使同一 URL 的缓存失效
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Set, Tuple, Union
+
+import aiohttp
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+from app.core.async_executor import run_file_io
+from app.core.logging import setup_logging
+from app.core.metrics import get_metrics_registry
+from app.core.secure_logging import sanitize_for_log
+
+logger = setup_logging("INFO")
+
+# 每次调用的缓存模式，语义同 Fetch API 的 RequestCache
+CACHE_MODES = ("default", "no-store", "reload", "no-cache", "force-cache", "only-if-cached")
+DEFAULT_CACHE_MODE = "default"
+
+# 可缓存的状态码（RFC 7231 §6.1 默认可缓存，以及 308）
+CACHEABLE_STATUSES = frozenset({200, 203, 204, 300, 301, 308, 404, 405, 410, 414, 501})
+UNSAFE_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+# 带这些请求头的请求结果因人而异或由调用方自行验证，不经过缓存
+BYPASS_REQUEST_HEADERS = ("Authorization", "Cookie", "If-None-Match", "If-Modified-Since", "If-Match",
+                          "If-Unmodified-Since", "If-Range", "Range")
+# 304 响应不得覆盖的首部（描述的是已缓存响应体本身）
+PRESERVED_ON_304 = frozenset({"content-length", "content-encoding", "content-type", "transfer-encoding",
+                              "content-range"})
+# 启发式新鲜期：距 Last-Modified 时间的 10%，不超过一天（RFC 7234 §4.2.2）
+HEURISTIC_FRACTION = 0.1
+MAX_HEURISTIC_LIFETIME = 86400.0
+# 单个条目最多占总容量的比例
+MAX_ENTRY_FRACTION = 8
+
+
+class HTTPCacheMiss(aiohttp.ClientError):
+    """cache_mode=only-if-cached 时缓存中没有可用响应"""
+
+
+def normalize_cache_mode(mode: Optional[str]) -> str:
+    """校验缓存模式，None 返回默认模式"""
+    if mode is None:
+        return DEFAULT_CACHE_MODE
+    if mode not in CACHE_MODES:
+        raise ValueError(f"Invalid cache_mode '{mode}', expected one of {', '.join(CACHE_MODES)}")
+    return mode
+
+
+def parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    """解析 Cache-Control，指令名转为小写，无参数的指令值为 None"""
+    directives: Dict[str, Optional[str]] = {}
+    if not value:
+        return directives
+    for part in value.split(","):
+        name, sep, argument = part.strip().partition("=")
+        name = name.strip().lower()
+        if name:
+            directives[name] = argument.strip().strip('"') if sep else None
+    return directives
+
+
+def _parse_seconds(value: Optional[str]) -> Optional[int]:
+    try:
+        return max(0, int(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _parse_http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class BufferedResponse:
+    """已完整读取响应体的 HTTP 响应
+
+    接口与 aiohttp.ClientResponse 的常用部分一致（status、headers、url、read/text/json、
+    raise_for_status），可以在连接释放后继续读取；cache_status 标记响应来源。
+    """
+
+    def __init__(self, method: str, url: Union[str, URL], status: int, reason: Optional[str],
+                 headers: Union[CIMultiDict, CIMultiDictProxy, List[Tuple[str, str]]], body: bytes,
+                 cache_status: str = "bypass", request_info: Optional[aiohttp.RequestInfo] = None):
+        self.method = method
+        self.url = URL(url) if isinstance(url, str) else url
+        self.status = status
+        self.reason = reason
+        self.headers = CIMultiDictProxy(CIMultiDict(headers))
+        self._body = body
+        self.cache_status = cache_status
+        self.request_info = request_info or aiohttp.RequestInfo(self.url, method, CIMultiDictProxy(CIMultiDict()), self.url)
+
+    @classmethod
+    async def from_response(cls, response: aiohttp.ClientResponse, max_size: Optional[int] = None) -> "BufferedResponse":
+        """读取 aiohttp 响应的完整响应体，超过 max_size 时抛出 ValueError"""
+        content_length = response.content_length
+        if max_size is not None and content_length is not None and content_length > max_size:
+            raise ValueError(f"Response too large: {content_length} bytes (max: {max_size})")
+        chunks = []
+        size = 0
+        async for chunk in response.content.iter_chunked(64 * 1024):
+            size += len(chunk)
+            if max_size is not None and size > max_size:
+                raise ValueError(f"Response too large: more than {max_size} bytes")
+            chunks.append(chunk)
+        return cls(response.method, response.url, response.status, response.reason, response.headers,
+                   b"".join(chunks), request_info=response.request_info)
+
+    async def __aenter__(self) -> "BufferedResponse":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return None
+
+    def release(self):
+        return None
+
+    @property
+    def content_type(self) -> str:
+        return self.headers.get("Content-Type", "").split(";", 1)[0].strip().lower()
+
+    def get_encoding(self) -> str:
+        for part in self.headers.get("Content-Type", "").split(";")[1:]:
+            name, _, value = part.strip().partition("=")
+            if name.lower() == "charset" and value:
+                return value.strip('"').lower()
+        return "utf-8"
+
+    async def read(self) -> bytes:
+        return self._body
+
+    async def text(self, encoding: Optional[str] = None, errors: str = "strict") -> str:
+        if encoding is None:
+            encoding = self.get_encoding()
+            # 未声明字符集时按 UTF-8 解码，无法解码的字节替换而不是报错
+            if "charset=" not in self.headers.get("Content-Type", "").lower():
+                errors = "replace"
+        return self._body.decode(encoding, errors)
+
+    async def json(self, **kwargs) -> Any:
+        return json.loads(self._body.decode(self.get_encoding()))
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise aiohttp.ClientResponseError(
+                self.request_info, (), status=self.status, message=self.reason or "", headers=self.headers
+            )
+
+
+@dataclass
+class CacheEntry:
+    """缓存条目元数据（响应体单独存放在磁盘上）"""
+    key: str
+    primary: str
+    method: str
+    url: str
+    status: int
+    reason: Optional[str]
+    headers: List[Tuple[str, str]]
+    vary: Dict[str, str]
+    request_time: float
+    response_time: float
+    size: int
+    cache_control: Dict[str, Optional[str]] = field(default_factory=dict, repr=False)
+
+    def __post_init__(self):
+        self.headers = [tuple(item) for item in self.headers]
+        self.cache_control = parse_cache_control(self.header("Cache-Control"))
+
+    def header(self, name: str) -> Optional[str]:
+        name = name.lower()
+        values = [value for key, value in self.headers if key.lower() == name]
+        return ", ".join(values) if values else None
+
+    def freshness_lifetime(self) -> float:
+        """新鲜期（秒）：max-age > Expires - Date > 启发式"""
+        max_age = _parse_seconds(self.cache_control.get("max-age"))
+        if max_age is not None:
+            return float(max_age)
+        date = _parse_http_date(self.header("Date")) or self.response_time
+        expires_header = self.header("Expires")
+        if expires_header is not None:
+            expires = _parse_http_date(expires_header)
+            # 无法解析的 Expires（如 "0"）视为已过期
+            return max(0.0, expires - date) if expires is not None else 0.0
+        last_modified = _parse_http_date(self.header("Last-Modified"))
+        if last_modified is not None and self.status in CACHEABLE_STATUSES:
+            return min(max(0.0, date - last_modified) * HEURISTIC_FRACTION, MAX_HEURISTIC_LIFETIME)
+        return 0.0
+
+    def current_age(self, now: float) -> float:
+        """当前年龄（秒），RFC 7234 §4.2.3"""
+        date = _parse_http_date(self.header("Date")) or self.response_time
+        apparent_age = max(0.0, self.response_time - date)
+        response_delay = self.response_time - self.request_time
+        corrected_age = (_parse_seconds(self.header("Age")) or 0) + response_delay
+        return max(apparent_age, corrected_age) + (now - self.response_time)
+
+    def is_fresh(self, now: float) -> bool:
+        if "no-cache" in self.cache_control:
+            return False
+        return self.freshness_lifetime() > self.current_age(now)
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """重新验证用的条件请求头"""
+        headers = {}
+        etag = self.header("ETag")
+        if etag:
+            headers["If-None-Match"] = etag
+        last_modified = self.header("Last-Modified")
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def to_meta(self) -> Dict[str, Any]:
+        meta = asdict(self)
+        meta.pop("cache_control")
+        return meta
+
+
+def _primary_key(method: str, url: str) -> str:
+    return f"{method} {url}"
+
+
+def _variant_key(primary: str, vary: Mapping[str, str]) -> str:
+    payload = json.dumps([primary, sorted(vary.items())], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class HTTPCache:
+    """磁盘 HTTP 响应缓存
+
+    内存中只保存条目元数据索引，响应体在文件 I/O 线程池中读写。
+    """
+
+    def __init__(self, directory: Union[str, Path], max_bytes: int, clock=time.time):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max(1, max_bytes // MAX_ENTRY_FRACTION)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        # 主键（方法 + URL）-> 各变体的缓存键 / 最近一次响应的 Vary 请求头
+        self._variants: Dict[str, Set[str]] = {}
+        self._vary_names: Dict[str, Tuple[str, ...]] = {}
+        self._size = 0
+        self._loaded = False
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "bypassed": 0, "stores": 0, "evictions": 0}
+        self._requests = get_metrics_registry().counter(
+            "lazyai_http_cache_requests_total", "网络抓取 HTTP 缓存查找次数", ("result",)
+        )
+
+    def now(self) -> float:
+        return self._clock()
+
+    # ---- 请求分类 ----
+
+    @staticmethod
+    def cache_key_url(url: str, params: Optional[Mapping[str, Any]] = None) -> Optional[str]:
+        """计算含查询参数的缓存 URL，参数无法编码时返回 None（不缓存）"""
+        try:
+            target = URL(url)
+            if params:
+                target = target.extend_query(params)
+            return str(target)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def request_mode(method: str, headers: Mapping[str, str], mode: str) -> str:
+        """结合请求方法与请求头确定实际的缓存模式，不经过缓存时返回 no-store"""
+        if method != "GET" or mode == "no-store":
+            return "no-store"
+        if any(name in headers for name in BYPASS_REQUEST_HEADERS):
+            return "no-store"
+        directives = parse_cache_control(headers.get("Cache-Control"))
+        if "no-store" in directives:
+            return "no-store"
+        if mode == "default" and ("no-cache" in directives or directives.get("max-age") == "0"
+                                  or "no-cache" in headers.get("Pragma", "").lower()):
+            return "no-cache"
+        return mode
+
+    def record(self, result: str):
+        """记录一次查找结果：hits / revalidated / misses / bypassed"""
+        with self._lock:
+            self.stats[result] += 1
+        self._requests.inc((result,))
+
+    # ---- 索引 ----
+
+    def _load_index(self):
+        """从磁盘加载条目索引（只执行一次）"""
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            if not self.directory.is_dir():
+                return
+            entries = []
+            for meta_path in self.directory.glob("*.json"):
+                try:
+                    with open(meta_path, "r", encoding="utf-8") as f:
+                        entry = CacheEntry(**json.load(f))
+                    if (self.directory / f"{entry.key}.body").stat().st_size != entry.size:
+                        raise ValueError("body size mismatch")
+                except (OSError, ValueError, TypeError) as e:
+                    logger.warning(f"Discarding broken HTTP cache entry {meta_path.name}: {e}")
+                    self._remove_files(meta_path.stem)
+                    continue
+                entries.append(entry)
+            for entry in sorted(entries, key=lambda item: item.response_time):
+                self._index(entry)
+            evicted = self._evict_locked()
+        self._remove_evicted(evicted)
+        if entries:
+            logger.info(f"Loaded {len(self._entries)} HTTP cache entries ({self._size} bytes)")
+
+    def _index(self, entry: CacheEntry):
+        old = self._entries.pop(entry.key, None)
+        if old is not None:
+            self._size -= old.size
+        self._entries[entry.key] = entry
+        self._size += entry.size
+        self._variants.setdefault(entry.primary, set()).add(entry.key)
+        self._vary_names[entry.primary] = tuple(sorted(entry.vary))
+
+    def _unindex(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry.size
+            keys = self._variants.get(entry.primary)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._variants[entry.primary]
+                    self._vary_names.pop(entry.primary, None)
+        return entry
+
+    def _evict_locked(self) -> List[str]:
+        evicted = []
+        while self._size > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            self._unindex(key)
+            evicted.append(key)
+        self.stats["evictions"] += len(evicted)
+        return evicted
+
+    def _remove_files(self, key: str):
+        for suffix in (".json", ".body"):
+            try:
+                (self.directory / f"{key}{suffix}").unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Failed to remove HTTP cache file {key}{suffix}: {e}")
+
+    def _remove_evicted(self, keys: List[str]):
+        for key in keys:
+            self._remove_files(key)
+
+    async def _ensure_loaded(self):
+        if not self._loaded:
+            await run_file_io(self._load_index)
+
+    # ---- 查找与存储 ----
+
+    async def lookup(self, url: str, headers: Mapping[str, str]) -> Optional[CacheEntry]:
+        """按 URL 和请求头（Vary）查找 GET 响应的缓存条目"""
+        await self._ensure_loaded()
+        primary = _primary_key("GET", url)
+        with self._lock:
+            names = self._vary_names.get(primary)
+            if names is None:
+                return None
+            key = _variant_key(primary, {name: headers.get(name, "").strip() for name in names})
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    async def read_body(self, entry: CacheEntry) -> Optional[bytes]:
+        """读取条目的响应体，文件丢失或损坏时删除条目并返回 None"""
+        body_path = self.directory / f"{entry.key}.body"
+        try:
+            body = await run_file_io(body_path.read_bytes)
+        except OSError:
+            body = None
+        if body is None or len(body) != entry.size:
+            await self.delete(entry.key)
+            return None
+        return body
+
+    def to_response(self, entry: CacheEntry, body: bytes, cache_status: str) -> BufferedResponse:
+        response = BufferedResponse(entry.method, entry.url, entry.status, entry.reason,
+                                    entry.headers, body, cache_status=cache_status)
+        # 按 RFC 7234 §5.1 给出缓存响应的当前年龄
+        headers = CIMultiDict(response.headers)
+        headers["Age"] = str(int(entry.current_age(self.now())))
+        response.headers = CIMultiDictProxy(headers)
+        return response
+
+    def is_storable(self, response: BufferedResponse) -> bool:
+        """响应是否可以存储（RFC 7234 §3）"""
+        if response.method != "GET" or response.status not in CACHEABLE_STATUSES:
+            return False
+        directives = parse_cache_control(response.headers.get("Cache-Control"))
+        if "no-store" in directives or response.headers.get("Vary", "").strip() == "*":
+            return False
+        if len(response._body) > self.max_entry_bytes:
+            return False
+        # 有显式新鲜期或验证器（可用于重新验证）时才值得存储
+        return any(name in directives for name in ("max-age", "public")) or any(
+            name in response.headers for name in ("Expires", "ETag", "Last-Modified")
+        )
+
+    async def store(self, url: str, request_headers: Mapping[str, str], response: BufferedResponse,
+                    request_time: float) -> bool:
+        """存储响应，返回是否已存储"""
+        if not self.is_storable(response):
+            return False
+        await self._ensure_loaded()
+        primary = _primary_key("GET", url)
+        vary_names = sorted({
+            name.strip().lower() for name in response.headers.get("Vary", "").split(",") if name.strip()
+        })
+        vary = {name: request_headers.get(name, "").strip() for name in vary_names}
+        entry = CacheEntry(
+            key=_variant_key(primary, vary), primary=primary, method="GET", url=str(response.url),
+            status=response.status, reason=response.reason, headers=list(response.headers.items()),
+            vary=vary, request_time=request_time, response_time=self.now(), size=len(response._body),
+        )
+        try:
+            await run_file_io(self._write, entry, response._body)
+        except OSError as e:
+            logger.warning(f"Failed to store HTTP cache entry for {sanitize_for_log(url)}: {e}")
+            return False
+        with self._lock:
+            if self._vary_names.get(primary, tuple(vary_names)) != tuple(vary_names):
+                # Vary 变化后旧变体无法再被命中
+                stale = [key for key in self._variants.get(primary, ()) if key != entry.key]
+            else:
+                stale = []
+            for key in stale:
+                self._unindex(key)
+            self._index(entry)
+            self.stats["stores"] += 1
+            evicted = self._evict_locked()
+        if stale or evicted:
+            await run_file_io(self._remove_evicted, stale + evicted)
+        return True
+
+    def _write(self, entry: CacheEntry, body: bytes):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        body_path = self.directory / f"{entry.key}.body"
+        meta_path = self.directory / f"{entry.key}.json"
+        # 先写响应体再写元数据，任一步中断都不会留下可加载的半条目
+        tmp_body = body_path.with_suffix(".body.tmp")
+        tmp_body.write_bytes(body)
+        os.replace(tmp_body, body_path)
+        self._write_meta(meta_path, entry)
+
+    @staticmethod
+    def _write_meta(meta_path: Path, entry: CacheEntry):
+        tmp_meta = meta_path.with_suffix(".json.tmp")
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump(entry.to_meta(), f, ensure_ascii=False)
+        os.replace(tmp_meta, meta_path)
+
+    async def refresh(self, entry: CacheEntry, response: BufferedResponse, request_time: float) -> CacheEntry:
+        """用 304 响应的首部更新条目并重置年龄（RFC 7234 §4.3.4）"""
+        updates = CIMultiDict(
+            (name, value) for name, value in response.headers.items() if name.lower() not in PRESERVED_ON_304
+        )
+        headers = [(name, value) for name, value in entry.headers if name not in updates]
+        headers.extend(updates.items())
+        refreshed = CacheEntry(**{
+            **entry.to_meta(), "headers": headers, "request_time": request_time, "response_time": self.now(),
+        })
+        with self._lock:
+            if entry.key in self._entries:
+                self._index(refreshed)
+        try:
+            await run_file_io(self._write_meta, self.directory / f"{entry.key}.json", refreshed)
+        except OSError as e:
+            logger.warning(f"Failed to update HTTP cache entry {entry.key}: {e}")
+        return refreshed
+
+    async def delete(self, key: str):
+        with self._lock:
+            self._unindex(key)
+        await run_file_io(self._remove_files, key)
+
+    async def invalidate(self, url: str):
+        """非安全方法成功后使该 URL 的所有缓存变体失效（RFC 7234 §4.4）"""
+        await self._ensure_loaded()
+        with self._lock:
+            keys = list(self._variants.get(_primary_key("GET", url), ()))
+            for key in keys:
+                self._unindex(key)
+        if keys:
+            await run_file_io(self._remove_evicted, keys)
+
+    def clear(self):
+        """删除全部缓存条目"""
+        self._load_index()
+        with self._lock:
+            keys = list(self._entries)
+            for key in keys:
+                self._unindex(key)
+        self._remove_evicted(keys)
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            entries = len(self._entries)
+            size = self._size
+        lookups = stats["hits"] + stats["revalidated"] + stats["misses"]
+        return {
+            "directory": str(self.directory),
+            "entries": entries,
+            "size_bytes": size,
+            "max_bytes": self.max_bytes,
+            **stats,
+            "hit_rate": round((stats["hits"] + stats["revalidated"]) / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,303 @@
+"""
+JSON 解析与查询引擎
+JSON Decoding and Query Engine
+
+特性:
+- 使用 orjson 解码；字符串之外含超过 64 位整数的输入以及 orjson 不接受的输入（NaN 等）退回标准库 json，
+  检查直接在 str/bytes 上进行，没有长数字串时不额外扫描
+- JSONPath 表达式编译为步骤序列并按表达式缓存，查询时不再重复拆分路径字符串
+- 统计信息用显式栈遍历（不受递归深度限制），流式模式下逐元素累加
+- 流式模式：顶层为数组时按元素边界切分，逐个元素解码、查询、统计后即丢弃，
+  匹配结果以 NDJSON 增量产出，不构建整份文档的 Python 对象
+"""
+
+import json
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import orjson
+
+from app.tools.streaming import CHUNK_SIZE
+
+JSONPATH_CACHE_SIZE = 256
+
+# 字符串整体跳过（其中的括号和逗号不计入结构），其余只关心结构字符
+_STRUCTURE = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|[\[\]{},]')
+_WHITESPACE = re.compile(r"\s*")
+_LONG_DIGITS = re.compile(r"[0-9]{19,}")
+_LONG_DIGITS_BYTES = re.compile(rb"[0-9]{19,}")
+# 跳过整个字符串；只有完整的整数 token（不是小数或指数的一部分）才进入分组
+_LONG_INTEGER = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|(?<![0-9.eE+-])(-?[0-9]{19,})(?![0-9.eE])')
+_LONG_INTEGER_BYTES = re.compile(_LONG_INTEGER.pattern.encode("ascii"))
+
+Content = Union[str, bytes]
+
+
+def _has_long_integer(content: Content) -> bool:
+    """字符串之外是否有 19 位以上的整数 token"""
+    is_text = isinstance(content, str)
+    # 先粗查长数字串，绝大多数文档到此为止；命中后再跳过字符串精确匹配
+    if not (_LONG_DIGITS if is_text else _LONG_DIGITS_BYTES).search(content):
+        return False
+    pattern = _LONG_INTEGER if is_text else _LONG_INTEGER_BYTES
+    return any(match.group(1) for match in pattern.finditer(content))
+
+
+def loads(content: Content) -> Any:
+    # orjson 把超出 64 位的整数解码为 float，含有这类数字时交给标准库保持精度
+    if _has_long_integer(content):
+        return json.loads(content)
+    try:
+        return orjson.loads(content)
+    except orjson.JSONDecodeError:
+        # 仍然无效时抛出标准库的 JSONDecodeError
+        return json.loads(content)
+
+
+class JSONPath:
+    """编译后的 JSONPath：支持 key、*、key[n]、key[*]，按层展开"""
+
+    __slots__ = ("expression", "steps")
+
+    def __init__(self, expression: str, steps: Optional[Tuple[Tuple, ...]]):
+        self.expression = expression
+        # None 表示空路径（选中整个文档）
+        self.steps = steps
+
+    @property
+    def selects_root(self) -> bool:
+        return self.steps is None
+
+    @property
+    def iterates_root(self) -> bool:
+        """第一步是否为通配（对数组根逐元素展开）"""
+        return bool(self.steps) and self.steps[0][0] == "wildcard"
+
+    def find(self, obj: Any, start: int = 0) -> List[Any]:
+        if self.steps is None:
+            return [obj]
+        current = [obj]
+        for kind, key, index in self.steps[start:]:
+            next_level = []
+            for item in current:
+                if kind == "wildcard":
+                    if isinstance(item, dict):
+                        next_level.extend(item.values())
+                    elif isinstance(item, list):
+                        next_level.extend(item)
+                elif not isinstance(item, dict) or key not in item:
+                    continue
+                elif kind == "key":
+                    next_level.append(item[key])
+                elif kind == "all":
+                    if isinstance(item[key], list):
+                        next_level.extend(item[key])
+                elif kind == "index":
+                    value = item[key]
+                    if isinstance(value, list) and 0 <= index < len(value):
+                        next_level.append(value[index])
+            current = next_level
+        return current
+
+
+@lru_cache(maxsize=JSONPATH_CACHE_SIZE)
+def compile_jsonpath(expression: str) -> JSONPath:
+    """编译 JSONPath（结果按表达式缓存）"""
+    if not expression:
+        return JSONPath(expression, None)
+    path = expression[2:] if expression.startswith("$.") else expression
+    steps = []
+    for part in path.split("."):
+        if part == "*":
+            steps.append(("wildcard", None, None))
+        elif "[" in part and "]" in part:
+            key = part.split("[")[0]
+            index_str = part.split("[")[1].split("]")[0]
+            if index_str == "*":
+                steps.append(("all", key, None))
+            else:
+                try:
+                    steps.append(("index", key, int(index_str)))
+                except ValueError:
+                    # 无效下标不匹配任何内容
+                    steps.append(("none", key, None))
+        else:
+            steps.append(("key", part, None))
+    return JSONPath(expression, tuple(steps))
+
+
+class JSONStats:
+    """parse_json 的统计信息：键数、值数、最大深度、值类型分布"""
+
+    def __init__(self, max_depth: int = 10):
+        self.max_depth = max_depth
+        self.total_keys = 0
+        self.total_values = 0
+        self.deepest = 0
+        self.data_types: Counter = Counter()
+
+    def add(self, obj: Any, depth: int = 0):
+        stack = [(obj, depth)]
+        while stack:
+            node, level = stack.pop()
+            self.deepest = max(self.deepest, level)
+            if isinstance(node, dict):
+                self.total_keys += len(node)
+                for value in node.values():
+                    self.data_types[type(value).__name__] += 1
+                    if isinstance(value, (dict, list)) and level < self.max_depth:
+                        stack.append((value, level + 1))
+            elif isinstance(node, list):
+                self.total_values += len(node)
+                for value in node:
+                    if isinstance(value, (dict, list)) and level < self.max_depth:
+                        stack.append((value, level + 1))
+            else:
+                self.total_values += 1
+                self.data_types[type(node).__name__] += 1
+
+    def add_root_item(self, item: Any):
+        """流式模式：累加顶层数组的一个元素"""
+        self.total_values += 1
+        if isinstance(item, (dict, list)) and self.max_depth > 0:
+            self.add(item, 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total_keys": self.total_keys,
+            "total_values": self.total_values,
+            "max_depth": self.deepest,
+            "data_types": dict(self.data_types),
+        }
+
+
+def extract_keys(obj: Any, keys: Sequence[str], prefix: str = "") -> Dict[str, Any]:
+    """递归提取指定键，键名带路径前缀"""
+    extracted = {}
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            full_key = f"{prefix}.{key}" if prefix else key
+            if key in keys:
+                extracted[full_key] = value
+            if isinstance(value, (dict, list)):
+                extracted.update(extract_keys(value, keys, full_key))
+    elif isinstance(obj, list):
+        for i, item in enumerate(obj):
+            if isinstance(item, (dict, list)):
+                extracted.update(extract_keys(item, keys, f"{prefix}[{i}]"))
+    return extracted
+
+
+def flatten(obj: Any, parent_key: str = "", sep: str = ".") -> Dict[str, Any]:
+    """展平为 a.b[0].c 形式的键"""
+    items = {}
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            new_key = f"{parent_key}{sep}{key}" if parent_key else key
+            if isinstance(value, (dict, list)):
+                items.update(flatten(value, new_key, sep))
+            else:
+                items[new_key] = value
+    elif isinstance(obj, list):
+        for i, value in enumerate(obj):
+            new_key = f"{parent_key}[{i}]"
+            if isinstance(value, (dict, list)):
+                items.update(flatten(value, new_key, sep))
+            else:
+                items[new_key] = value
+    return items
+
+
+def _array_start(text: str) -> int:
+    start = _WHITESPACE.match(text).end()
+    if not text.startswith("[", start):
+        raise ValueError("Streaming mode requires a top-level JSON array")
+    return start
+
+
+def iter_array_items(content: Content) -> Iterator[Any]:
+    """顶层为数组时逐个解码元素；顶层不是数组时抛出 ValueError"""
+    text = content.decode("utf-8") if isinstance(content, bytes) else content
+    start = _array_start(text)
+
+    depth = 0
+    item_start = start + 1
+    end = None
+    for match in _STRUCTURE.finditer(text, start):
+        char = text[match.start()]
+        if char == '"':
+            continue
+        if char in "[{":
+            depth += 1
+        elif char in "]}":
+            depth -= 1
+            if depth == 0:
+                end = match.start()
+                break
+        elif depth == 1:
+            yield loads(text[item_start:match.start()])
+            item_start = match.end()
+
+    if end is None:
+        raise json.JSONDecodeError("Unterminated array", text, len(text))
+    if text[end + 1:].strip():
+        raise json.JSONDecodeError("Extra data", text, end + 1)
+    last = text[item_start:end]
+    if last.strip():
+        yield loads(last)
+    elif item_start != start + 1:
+        raise json.JSONDecodeError("Trailing comma", text, item_start)
+
+
+class JSONStream:
+    """流式查询：逐元素产出 NDJSON 匹配行，迭代完成后 statistics 等字段可用"""
+
+    def __init__(self, content: Content, queries: Sequence[str] = (), keys: Optional[Sequence[str]] = None,
+                 flatten_arrays: bool = False, max_depth: int = 10):
+        self.content = content.decode("utf-8") if isinstance(content, bytes) else content
+        _array_start(self.content)
+        self.paths = [compile_jsonpath(query) for query in queries]
+        for path in self.paths:
+            if path.selects_root:
+                raise ValueError("Selecting the whole document is not supported in streaming mode")
+        self.keys = keys
+        self.flatten_arrays = flatten_arrays
+        self.stats = JSONStats(max_depth)
+        self.match_counts = {path.expression: 0 for path in self.paths}
+        self.extracted_keys: Dict[str, Any] = {}
+        self.flattened: Dict[str, Any] = {}
+        self.items = 0
+
+    def matches(self) -> Iterator[Tuple[str, Any]]:
+        """逐个产出 (查询表达式, 匹配值)"""
+        for index, item in enumerate(iter_array_items(self.content)):
+            self.items += 1
+            self.stats.add_root_item(item)
+            if self.keys and isinstance(item, (dict, list)):
+                self.extracted_keys.update(extract_keys(item, self.keys, f"[{index}]"))
+            if self.flatten_arrays:
+                if isinstance(item, (dict, list)):
+                    self.flattened.update(flatten(item, f"[{index}]"))
+                else:
+                    self.flattened[f"[{index}]"] = item
+            for path in self.paths:
+                # 非通配开头的路径在数组根上不会匹配
+                if not path.iterates_root:
+                    continue
+                for value in path.find(item, start=1):
+                    self.match_counts[path.expression] += 1
+                    yield path.expression, value
+
+    def ndjson_chunks(self, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """匹配结果按 NDJSON 分块产出，每块约 chunk_size 字节"""
+        buffer = bytearray()
+        for query, value in self.matches():
+            buffer += orjson.dumps({"query": query, "value": value})
+            buffer += b"\n"
+            if len(buffer) >= chunk_size:
+                yield bytes(buffer)
+                buffer.clear()
+        if buffer:
+            yield bytes(buffer)
@@ -0,0 +1,220 @@
+"""
+MCP 工具清单
+MCP Tool Manifest
+
+特性:
+- 清单记录每个工具模块中的分类与工具元数据（名称、描述、Schema、缓存声明、函数参数名）
+- 启动时从清单注册工具，实现模块在该分类的工具首次被调用时才导入
+- 清单携带工具模块源码指纹，源码变化后清单失效，回退为导入全部模块并重新生成
+- 清单内容哈希用于判断是否需要把注册表同步到数据库
+- 可通过 `python -m app.tools.manifest` 预先生成（如在镜像构建时）
+"""
+
+import hashlib
+import importlib
+import importlib.util
+import inspect
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+from app.core.config import MCP_TOOL_MANIFEST_PATH
+from app.core.logging import setup_logging
+from app.tools import registry
+
+logger = setup_logging("INFO")
+
+MANIFEST_VERSION = 2
+
+# 启动时加载的工具模块
+TOOL_MODULES = (
+    "app.tools.github_tools",
+    "app.tools.web_scraping_tools",
+    "app.tools.file_tools",
+    "app.tools.time_tools",
+    "app.tools.system_tools",
+    "app.tools.cache_tools",
+)
+
+
+def _module_source(module_name: str) -> Optional[Path]:
+    spec = importlib.util.find_spec(module_name)
+    if spec is None or not spec.origin or not spec.has_location:
+        return None
+    return Path(spec.origin)
+
+
+def source_fingerprint(module_names: Iterable[str]) -> str:
+    """计算模块源码指纹（按模块名排序后哈希源码内容）"""
+    digest = hashlib.sha256()
+    for module_name in sorted(set(module_names)):
+        digest.update(module_name.encode("utf-8") + b"\0")
+        path = _module_source(module_name)
+        if path is not None and path.is_file():
+            digest.update(path.read_bytes())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _content_hash(modules: Dict[str, Any]) -> str:
+    encoded = json.dumps(modules, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def build_manifest(entry_modules: Iterable[str] = TOOL_MODULES) -> Dict[str, Any]:
+    """从当前注册表生成清单（入口模块必须已导入）"""
+    entry_modules = list(entry_modules)
+    prefixes = {name.rsplit(".", 1)[0] + "." for name in entry_modules}
+
+    def included(module_name: Optional[str]) -> bool:
+        return bool(module_name) and any(module_name.startswith(prefix) for prefix in prefixes)
+
+    modules: Dict[str, Dict[str, list]] = {}
+    for category in registry.get_registered_categories():
+        module_name = registry.get_category_module(category["id"])
+        if not included(module_name):
+            continue
+        definition = {k: v for k, v in category.items() if k not in ("created_at", "updated_at")}
+        modules.setdefault(module_name, {"categories": [], "tools": []})["categories"].append(definition)
+
+    for tool in registry.get_registered_tools():
+        module_name = registry.get_tool_module(tool.name)
+        if not included(module_name):
+            continue
+        policy = registry.get_tool_cache_policy(tool.name)
+        func = registry.get_tool_callable(tool.name)
+        modules.setdefault(module_name, {"categories": [], "tools": []})["tools"].append({
+            "name": tool.name,
+            "description": tool.description,
+            "category": tool.category,
+            "schema": tool.schema,
+            "returns": tool.returns,
+            "metadata": tool.metadata,
+            "enabled": tool.enabled,
+            "cache": {"ttl": policy.ttl, "key": list(policy.key) if policy.key is not None else None} if policy else None,
+            # 用于在不导入模块时决定补全哪些默认参数
+            "parameters": registry.signature_parameters(func) if func is not None else None,
+        })
+
+    for content in modules.values():
+        content["categories"].sort(key=lambda c: c["id"])
+        content["tools"].sort(key=lambda t: t["name"])
+
+    return {
+        "version": MANIFEST_VERSION,
+        "entry_modules": entry_modules,
+        "source_hash": source_fingerprint([*entry_modules, *modules]),
+        "hash": _content_hash(modules),
+        "modules": modules,
+    }
+
+
+def load_manifest(path: str = MCP_TOOL_MANIFEST_PATH,
+                  entry_modules: Iterable[str] = TOOL_MODULES) -> Optional[Dict[str, Any]]:
+    """读取清单，文件不存在、格式不符或源码已变化时返回 None"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Failed to read MCP tool manifest: {e}")
+        return None
+
+    entry_modules = list(entry_modules)
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("entry_modules") != entry_modules:
+        return None
+    modules = manifest.get("modules") or {}
+    if manifest.get("source_hash") != source_fingerprint([*entry_modules, *modules]):
+        logger.info("MCP tool manifest is out of date, tool modules will be imported")
+        return None
+    return manifest
+
+
+def save_manifest(manifest: Dict[str, Any], path: str = MCP_TOOL_MANIFEST_PATH):
+    """原子写入清单"""
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=str(target.parent), prefix=".manifest-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, target)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def register_manifest(manifest: Dict[str, Any]) -> int:
+    """按清单注册分类与工具（不导入实现模块），返回注册的工具数"""
+    count = 0
+    for module_name, content in manifest["modules"].items():
+        for category in content.get("categories", []):
+            registry.register_category_definition(category, module_name)
+        for tool in content.get("tools", []):
+            registry.register_tool_definition(tool, module_name)
+            count += 1
+    return count
+
+
+def _needs_reload(module) -> bool:
+    """模块已导入但其装饰器注册的工具不在注册表中（注册表被清空过）"""
+    for _, obj in inspect.getmembers(module, inspect.isfunction):
+        tool = getattr(obj, "_mcp_tool", None)
+        if tool is not None and obj.__module__ == module.__name__ and registry.get_tool_callable(tool.name) is None:
+            return True
+    return False
+
+
+def import_tool_modules(entry_modules: Iterable[str] = TOOL_MODULES) -> int:
+    """导入全部工具模块（清单不可用时的回退路径），返回成功导入的入口模块数"""
+    loaded = 0
+    for module_name in entry_modules:
+        try:
+            importlib.import_module(module_name)
+            loaded += 1
+        except Exception as e:
+            logger.warning(f"Failed to import tool module {module_name}: {e}")
+
+    # 入口模块可能只是转发（如 web_scraping_tools -> fetch_tools），检查所有已导入的工具模块
+    package = "app.tools."
+    for module_name, module in list(sys.modules.items()):
+        if module is not None and module_name.startswith(package) and _needs_reload(module):
+            importlib.reload(module)
+    return loaded
+
+
+def ensure_manifest(path: str = MCP_TOOL_MANIFEST_PATH,
+                    entry_modules: Iterable[str] = TOOL_MODULES) -> Optional[Dict[str, Any]]:
+    """启动入口：优先按清单注册；清单不可用时导入全部模块并重新生成清单
+
+    返回当前有效的清单（写入失败时也返回内存中的清单）。
+    """
+    entry_modules = list(entry_modules)
+    manifest = load_manifest(path, entry_modules)
+    if manifest is not None:
+        count = register_manifest(manifest)
+        logger.info(f"Registered {count} MCP tools from manifest")
+        return manifest
+
+    import_tool_modules(entry_modules)
+    manifest = build_manifest(entry_modules)
+    try:
+        save_manifest(manifest, path)
+        logger.info(f"MCP tool manifest written: {path}")
+    except OSError as e:
+        logger.warning(f"Failed to write MCP tool manifest: {e}")
+    return manifest
+
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else MCP_TOOL_MANIFEST_PATH
+    import_tool_modules()
+    result = build_manifest()
+    save_manifest(result, target)
+    tools = sum(len(content["tools"]) for content in result["modules"].values())
+    print(f"Wrote {tools} tools from {len(result['modules'])} modules to {target}")
@@ -0,0 +1,175 @@
+"""
+网络请求限速
+Outbound Request Rate Limiting
+
+特性:
+- 令牌桶限速：按主机一个桶（requests_per_second / burst_size），可选的全局桶限制总速率
+- 预约式取令牌：每个请求在事件循环中同步预约并得到等待时间，只 sleep 一次，按到达顺序放行
+- 服务端反馈：429/503 响应的 Retry-After 会暂停该主机的桶，恢复后按速率逐个放行而不是同时涌入
+- 限速关闭时仍记录 Retry-After 暂停，避免在服务端要求的等待期内继续请求
+- 主机桶数量有上限，按最近使用淘汰
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.core.logging import setup_logging
+from app.core.secure_logging import sanitize_for_log
+
+logger = setup_logging("INFO")
+
+# Retry-After 暂停上限（秒），防止异常响应长时间封住主机
+MAX_RETRY_AFTER = 3600.0
+MAX_TRACKED_HOSTS = 1024
+
+
+def parse_retry_after(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """解析 Retry-After（秒数或 HTTP 日期），返回需要等待的秒数"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError, IndexError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        current = now if now is not None else time.time()
+        seconds = retry_at.timestamp() - current
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+class TokenBucket:
+    """令牌桶（非线程安全，只在事件循环中使用）
+
+    rate 为 None 时不限速，只用于记录 Retry-After 暂停。
+    """
+
+    __slots__ = ("rate", "capacity", "_tokens", "_updated")
+
+    def __init__(self, rate: Optional[float], capacity: float, now: float):
+        self.rate = rate
+        self.capacity = max(1.0, float(capacity))
+        self._tokens = self.capacity
+        # 上次补充令牌的时间；暂停期间指向暂停结束时间，期间不补充
+        self._updated = now
+
+    def reserve(self, now: float) -> float:
+        """预约一个令牌，返回需要等待的秒数"""
+        if self.rate is None:
+            return max(0.0, self._updated - now)
+        if now > self._updated:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+        self._tokens -= 1
+        deficit = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        return max(0.0, self._updated - now) + deficit
+
+    def pause(self, seconds: float, now: float):
+        """暂停 seconds 秒，恢复后桶中最多剩一个令牌"""
+        until = now + seconds
+        if until > self._updated:
+            if self.rate is not None:
+                if now > self._updated:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._tokens = min(self._tokens, 1.0)
+            self._updated = until
+
+    def paused_for(self, now: float) -> float:
+        return max(0.0, self._updated - now)
+
+
+class HostRateLimiter:
+    """按主机 + 全局的令牌桶限速器"""
+
+    def __init__(self, requests_per_second: Optional[float] = None, burst_size: float = 1,
+                 global_requests_per_second: Optional[float] = None, global_burst_size: Optional[float] = None,
+                 max_hosts: int = MAX_TRACKED_HOSTS, clock: Callable[[], float] = time.monotonic):
+        self.rate = requests_per_second if requests_per_second and requests_per_second > 0 else None
+        self.burst_size = burst_size
+        self.max_hosts = max_hosts
+        self._clock = clock
+        self._hosts: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        global_rate = global_requests_per_second if global_requests_per_second and global_requests_per_second > 0 else None
+        self._global = TokenBucket(global_rate, global_burst_size or burst_size, clock()) if global_rate else None
+        self.requests = 0
+        self.delayed = 0
+        self.wait_seconds = 0.0
+        self.retry_after_pauses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate is not None or self._global is not None
+
+    @property
+    def settings(self) -> Tuple[Optional[float], float, Optional[float], Optional[float]]:
+        """限速参数（每主机速率、突发、全局速率、全局容量），用于判断重新加载时能否沿用"""
+        if self._global is None:
+            return self.rate, self.burst_size, None, None
+        return self.rate, self.burst_size, self._global.rate, self._global.capacity
+
+    def _bucket(self, host: str, now: float) -> TokenBucket:
+        bucket = self._hosts.get(host)
+        if bucket is None:
+            bucket = self._hosts[host] = TokenBucket(self.rate, self.burst_size, now)
+            while len(self._hosts) > self.max_hosts:
+                self._hosts.popitem(last=False)
+        else:
+            self._hosts.move_to_end(host)
+        return bucket
+
+    def reserve(self, host: str) -> float:
+        """为 host 预约一次请求，返回需要等待的秒数"""
+        now = self._clock()
+        wait = self._bucket(host.lower(), now).reserve(now)
+        if self._global is not None:
+            wait = max(wait, self._global.reserve(now))
+        self.requests += 1
+        if wait > 0:
+            self.delayed += 1
+            self.wait_seconds += wait
+        return wait
+
+    async def acquire(self, host: str) -> float:
+        """等待直到允许向 host 发送请求，返回实际等待的秒数"""
+        wait = self.reserve(host)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def feedback(self, host: str, status: int, retry_after: Optional[str]) -> Optional[float]:
+        """根据 429/503 响应的 Retry-After 暂停主机，返回暂停秒数"""
+        if status not in (429, 503):
+            return None
+        delay = parse_retry_after(retry_after)
+        if delay is None:
+            return None
+        now = self._clock()
+        self._bucket(host.lower(), now).pause(delay, now)
+        self.retry_after_pauses += 1
+        logger.warning(f"Host {sanitize_for_log(host)} responded {status}, pausing requests for {delay:.1f}s")
+        return delay
+
+    def paused_for(self, host: str) -> float:
+        bucket = self._hosts.get(host.lower())
+        return bucket.paused_for(self._clock()) if bucket is not None else 0.0
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "requests_per_second": self.rate,
+            "burst_size": self.burst_size,
+            "global_requests_per_second": self._global.rate if self._global else None,
+            "hosts": len(self._hosts),
+            "requests": self.requests,
+            "delayed": self.delayed,
+            "wait_seconds": round(self.wait_seconds, 3),
+            "retry_after_pauses": self.retry_after_pauses,
+        }
@@ -3,12 +3,17 @@ MCP工具注册装饰器系统
 通过装饰器自动注册和发现MCP工具，支持模块化管理
 """
 import inspect
+import importlib
 import importlib.util
+import sys
+import threading
 from pathlib import Path
 from typing import Dict, List, Callable, Any, Optional
 from functools import wraps
 from app.models.mcp_tool import MCPTool
 from app.core.logging import setup_logging
+from app.tools.result_cache import CachePolicy
+from app.tools.validation import ArgumentValidator, compile_validator
 
 logger = setup_logging()
 
@@ -19,6 +24,24 @@ _CATEGORY_REGISTRY: Dict[str, List[str]] = {}
 # 分类定义注册表（存储分类的元数据）
 _CATEGORY_DEFINITIONS: Dict[str, Dict[str, Any]] = {}
 
+# 工具实现函数表（工具名 -> 原始函数）
+_TOOL_CALLABLES: Dict[str, Callable] = {}
+
+# 工具结果缓存策略表（仅声明了 cache 的工具）
+_TOOL_CACHE_POLICIES: Dict[str, CachePolicy] = {}
+
+# 工具参数校验器表（注册时由 schema 编译）
+_TOOL_VALIDATORS: Dict[str, ArgumentValidator] = {}
+
+# 工具/分类所在模块（工具名或分类ID -> 模块路径），用于按需导入
+_TOOL_MODULES: Dict[str, str] = {}
+_CATEGORY_MODULES: Dict[str, str] = {}
+
+# 注册表版本号，每次注册或清空时递增，用于判断派生数据是否过期
+_REGISTRY_VERSION = 0
+
+_MODULE_LOAD_LOCK = threading.Lock()
+
 
 def mcp_category(
     category_id: str,
@@ -70,6 +93,7 @@ def mcp_category(
 
         # 注册到分类定义表
         _CATEGORY_DEFINITIONS[category_id] = category_def
+        _CATEGORY_MODULES[category_id] = func.__module__
         logger.debug(f"Registered MCP category: {category_id} - {name}")
 
         return func
@@ -84,7 +108,8 @@ def mcp_tool(
     schema: Dict[str, Any],
     returns: Optional[Dict[str, Any]] = None,
     metadata: Optional[Dict[str, Any]] = None,
-    enabled: bool = True
+    enabled: bool = True,
+    cache: Optional[Dict[str, Any]] = None
 ):
     """
     MCP工具注册装饰器
@@ -97,6 +122,8 @@ def mcp_tool(
         returns: 返回值的JSON Schema定义
         metadata: 元数据信息
         enabled: 是否默认启用
+        cache: 结果缓存声明（仅用于幂等的只读工具），如 {"ttl": 60, "key": ["owner", "repo"]}；
+            ttl 为缓存秒数，key 为参与缓存键的参数名，省略时使用全部参数
 
     Usage:
         @mcp_tool(
@@ -123,18 +150,27 @@ def mcp_tool(
                 },
                 "required": ["id", "name", "full_name"]
             },
-            metadata={"tags": ["github", "repository"]}
+            metadata={"tags": ["github", "repository"]},
+            cache={"ttl": 60, "key": ["owner", "repo"]}
         )
         def github_get_repo():
             pass
     """
+    # 在注册前校验缓存声明，声明错误时不留下半注册的工具
+    cache_policy = CachePolicy.from_spec(cache) if cache is not None else None
+
     def decorator(func: Callable) -> Callable:
+        global _REGISTRY_VERSION
+
         # 自动添加分类前缀（如果名称还没有前缀）
         final_name = name
         prefix = f"{category}_"
         if not name.startswith(prefix):
             final_name = f"{prefix}{name}"
 
+        # 注册前编译参数校验器，Schema 不合法时直接报错
+        validator = compile_validator(final_name, schema, signature_parameters(func))
+
         # 创建MCPTool实例
         tool = MCPTool(
             name=final_name,
@@ -149,17 +185,28 @@ def mcp_tool(
 
         # 注册到全局注册表
         _TOOL_REGISTRY[final_name] = tool
+        _TOOL_CALLABLES[final_name] = func
+        _TOOL_VALIDATORS[final_name] = validator
+        _TOOL_MODULES[final_name] = func.__module__
+        if cache_policy is not None:
+            _TOOL_CACHE_POLICIES[final_name] = cache_policy
+        else:
+            _TOOL_CACHE_POLICIES.pop(final_name, None)
+        _REGISTRY_VERSION += 1
 
         # 注册到分类表
-        if category not in _CATEGORY_REGISTRY:
-            _CATEGORY_REGISTRY[category] = []
-        _CATEGORY_REGISTRY[category].append(final_name)
+        _add_to_category(category, final_name)
 
         logger.debug(f"Registered MCP tool: {final_name} in category: {category}")
 
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            return func(*args, **kwargs)
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                return await func(*args, **kwargs)
+        else:
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                return func(*args, **kwargs)
 
         # 将工具元数据附加到函数
         wrapper._mcp_tool = tool
@@ -168,6 +215,86 @@ def mcp_tool(
     return decorator
 
 
+def signature_parameters(func: Callable) -> Optional[List[str]]:
+    """实现函数接受的关键字参数名；接受 **kwargs 时返回 None"""
+    parameters = inspect.signature(func).parameters.values()
+    if any(p.kind is inspect.Parameter.VAR_KEYWORD for p in parameters):
+        return None
+    return [p.name for p in parameters
+            if p.kind in (inspect.Parameter.POSITIONAL_OR_KEYWORD, inspect.Parameter.KEYWORD_ONLY)]
+
+
+def _add_to_category(category: str, tool_name: str):
+    tool_names = _CATEGORY_REGISTRY.setdefault(category, [])
+    # 清单预注册的工具在模块导入时会再次注册
+    if tool_name not in tool_names:
+        tool_names.append(tool_name)
+
+
+def register_tool_definition(definition: Dict[str, Any], module: str):
+    """按清单注册工具元数据（不导入实现模块，首次调用时再由 load_tool_module 导入）"""
+    global _REGISTRY_VERSION
+
+    tool = MCPTool(
+        name=definition["name"],
+        description=definition["description"],
+        category=definition["category"],
+        schema=definition["schema"],
+        returns=definition.get("returns"),
+        metadata=definition.get("metadata") or {},
+        enabled=definition.get("enabled", True),
+        implementation_type="builtin"
+    )
+    cache = definition.get("cache")
+    validator = compile_validator(tool.name, tool.schema, definition.get("parameters"))
+    _TOOL_REGISTRY[tool.name] = tool
+    _TOOL_VALIDATORS[tool.name] = validator
+    _TOOL_MODULES[tool.name] = module
+    if cache is not None:
+        _TOOL_CACHE_POLICIES[tool.name] = CachePolicy.from_spec(cache)
+    _add_to_category(tool.category, tool.name)
+    _REGISTRY_VERSION += 1
+
+
+def register_category_definition(definition: Dict[str, Any], module: str):
+    """按清单注册分类元数据"""
+    from datetime import datetime
+
+    now = datetime.now().isoformat()
+    _CATEGORY_DEFINITIONS[definition["id"]] = {**definition, "created_at": now, "updated_at": now}
+    _CATEGORY_MODULES[definition["id"]] = module
+
+
+def get_tool_module(name: str) -> Optional[str]:
+    """获取工具实现所在模块"""
+    return _TOOL_MODULES.get(name)
+
+
+def get_category_module(category_id: str) -> Optional[str]:
+    """获取分类定义所在模块"""
+    return _CATEGORY_MODULES.get(category_id)
+
+
+def load_tool_module(module_name: str) -> bool:
+    """导入尚未加载实现函数的工具模块，返回是否执行了导入
+
+    同一模块中的所有工具（即整个分类）一起加载；并发调用只导入一次。
+    """
+    with _MODULE_LOAD_LOCK:
+        pending = [name for name, module in _TOOL_MODULES.items()
+                   if module == module_name and name not in _TOOL_CALLABLES]
+        if not pending:
+            return False
+        module = sys.modules.get(module_name)
+        if module is None:
+            importlib.import_module(module_name)
+        else:
+            # 模块已导入但注册表被清空过，重新执行装饰器
+            importlib.reload(module)
+        logger.info(f"Loaded MCP tool module on demand: {module_name}")
+        return True
+
+
 def get_registered_tools() -> List[MCPTool]:
     """获取所有已注册的工具"""
     return list(_TOOL_REGISTRY.values())
@@ -191,12 +318,38 @@ def get_tool_by_name(name: str) -> Optional[MCPTool]:
     return _TOOL_REGISTRY.get(name)
 
 
+def get_tool_callable(name: str) -> Optional[Callable]:
+    """根据名称获取工具的实现函数"""
+    return _TOOL_CALLABLES.get(name)
+
+
+def get_tool_cache_policy(name: str) -> Optional[CachePolicy]:
+    """获取工具的结果缓存策略，未声明时返回 None"""
+    return _TOOL_CACHE_POLICIES.get(name)
+
+
+def get_tool_validator(name: str) -> Optional[ArgumentValidator]:
+    """获取工具的参数校验器"""
+    return _TOOL_VALIDATORS.get(name)
+
+
+def get_registry_version() -> int:
+    """获取注册表版本号"""
+    return _REGISTRY_VERSION
+
+
 def clear_registry():
     """清空注册表（主要用于测试）"""
-    global _TOOL_REGISTRY, _CATEGORY_REGISTRY, _CATEGORY_DEFINITIONS
+    global _TOOL_REGISTRY, _CATEGORY_REGISTRY, _CATEGORY_DEFINITIONS, _REGISTRY_VERSION
     _TOOL_REGISTRY.clear()
     _CATEGORY_REGISTRY.clear()
     _CATEGORY_DEFINITIONS.clear()
+    _TOOL_CALLABLES.clear()
+    _TOOL_CACHE_POLICIES.clear()
+    _TOOL_VALIDATORS.clear()
+    _TOOL_MODULES.clear()
+    _CATEGORY_MODULES.clear()
+    _REGISTRY_VERSION += 1
 
 
 def auto_discover_tools(module_paths: List[str]) -> int:
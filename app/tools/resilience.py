@@ -0,0 +1,170 @@
+"""
+请求重试与熔断
+Request Retry Policy and Circuit Breaking
+
+特性:
+- 错误分类：超时、连接失败、连接中断和 408/425/429/5xx 可重试；其他 4xx、证书错误、无效 URL 等立即失败
+- 指数退避 + 完全抖动（full jitter）：第 n 次重试在 [0, min(上限, 基数 × 2^n)] 内随机等待，避免重试同步涌向远端
+- 按主机熔断（closed / open / half-open）：连续失败达到阈值后熔断，冷却期内直接失败，
+  冷却后放行探测请求，成功则恢复，失败则重新熔断
+- 只有连接失败、超时和 5xx 计入失败；429 和其他 4xx 说明主机仍在响应，由限速器和调用方处理
+- 主机数量有上限，按最近使用淘汰
+"""
+
+import asyncio
+import random
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+import aiohttp
+
+from app.core.logging import setup_logging
+from app.core.secure_logging import sanitize_for_log
+
+logger = setup_logging("INFO")
+
+RETRYABLE_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+MAX_TRACKED_CIRCUITS = 1024
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+# 重试也无法恢复的客户端错误（需要先于其父类 ClientConnectionError 判断）
+_FATAL_ERRORS = (aiohttp.ClientSSLError, aiohttp.InvalidURL, aiohttp.TooManyRedirects)
+_RETRYABLE_ERRORS = (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError)
+
+
+class CircuitOpenError(aiohttp.ClientConnectionError):
+    """主机处于熔断状态，请求未发出"""
+
+    def __init__(self, host: str, retry_in: float):
+        super().__init__(f"Circuit open for {host}, retry in {retry_in:.1f}s")
+        self.host = host
+        self.retry_in = retry_in
+
+
+def is_retryable_status(status: int) -> bool:
+    return status in RETRYABLE_STATUSES
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """网络层异常是否值得重试"""
+    if isinstance(error, (CircuitOpenError,) + _FATAL_ERRORS):
+        return False
+    return isinstance(error, _RETRYABLE_ERRORS)
+
+
+def backoff_delay(attempt: int, base: float, cap: float, rand: Callable[[], float] = random.random) -> float:
+    """第 attempt 次重试（从 0 开始）的等待秒数：指数退避 + 完全抖动"""
+    if base <= 0:
+        return 0.0
+    return rand() * min(cap, base * (2 ** attempt))
+
+
+class _Circuit:
+    __slots__ = ("state", "failures", "opened_at", "probe_at")
+
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_at: Optional[float] = None
+
+
+class HostCircuitBreaker:
+    """按主机的熔断器（只在事件循环中使用）"""
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0, enabled: bool = True,
+                 max_hosts: int = MAX_TRACKED_CIRCUITS, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = recovery_timeout
+        self.enabled = enabled
+        self.max_hosts = max_hosts
+        self._clock = clock
+        self._circuits: "OrderedDict[str, _Circuit]" = OrderedDict()
+        self.trips = 0
+        self.rejected = 0
+
+    def _circuit(self, host: str) -> _Circuit:
+        circuit = self._circuits.get(host)
+        if circuit is None:
+            circuit = self._circuits[host] = _Circuit()
+            while len(self._circuits) > self.max_hosts:
+                self._circuits.popitem(last=False)
+        else:
+            self._circuits.move_to_end(host)
+        return circuit
+
+    def state(self, host: str) -> str:
+        circuit = self._circuits.get(host.lower())
+        return circuit.state if circuit is not None else CLOSED
+
+    def before_request(self, host: str):
+        """请求发出前检查；熔断中抛出 CircuitOpenError"""
+        if not self.enabled:
+            return
+        host = host.lower()
+        circuit = self._circuits.get(host)
+        if circuit is None or circuit.state == CLOSED:
+            return
+        now = self._clock()
+        if circuit.state == OPEN:
+            retry_in = circuit.opened_at + self.recovery_timeout - now
+            if retry_in > 0:
+                self.rejected += 1
+                raise CircuitOpenError(host, retry_in)
+            circuit.state = HALF_OPEN
+            logger.info(f"Circuit half-open for {sanitize_for_log(host)}, sending probe request")
+        # 半开状态同时只放行一个探测请求；探测未回报结果（如被取消）时，冷却期后允许新的探测
+        if circuit.probe_at is not None and now - circuit.probe_at < self.recovery_timeout:
+            self.rejected += 1
+            raise CircuitOpenError(host, circuit.probe_at + self.recovery_timeout - now)
+        circuit.probe_at = now
+
+    def record_success(self, host: str):
+        if not self.enabled:
+            return
+        circuit = self._circuits.get(host.lower())
+        if circuit is None:
+            return
+        if circuit.state != CLOSED:
+            logger.info(f"Circuit closed for {sanitize_for_log(host)}")
+        circuit.state = CLOSED
+        circuit.failures = 0
+        circuit.probe_at = None
+
+    def record_failure(self, host: str):
+        if not self.enabled:
+            return
+        circuit = self._circuit(host.lower())
+        circuit.failures += 1
+        if circuit.state == HALF_OPEN or circuit.failures >= self.failure_threshold:
+            if circuit.state != OPEN:
+                self.trips += 1
+                logger.warning(f"Circuit opened for {sanitize_for_log(host)} after {circuit.failures} "
+                               f"consecutive failures, failing fast for {self.recovery_timeout:.0f}s")
+            circuit.state = OPEN
+            circuit.opened_at = self._clock()
+            circuit.probe_at = None
+
+    def record_status(self, host: str, status: int):
+        """按响应状态码记录：5xx 计为失败，其余说明主机可用"""
+        if status >= 500:
+            self.record_failure(host)
+        else:
+            self.record_success(host)
+
+    def get_status(self) -> Dict[str, Any]:
+        states = [circuit.state for circuit in self._circuits.values()]
+        return {
+            "enabled": self.enabled,
+            "failure_threshold": self.failure_threshold,
+            "recovery_timeout": self.recovery_timeout,
+            "hosts": len(states),
+            "open": states.count(OPEN),
+            "half_open": states.count(HALF_OPEN),
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
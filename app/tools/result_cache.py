@@ -0,0 +1,191 @@
+"""
+MCP 工具结果缓存
+MCP Tool Result Cache
+
+特性:
+- 由 @mcp_tool(cache={"ttl": 60, "key": [...]}) 声明，仅用于幂等的只读工具
+- 参数规范化：补全默认值、只取 key 中声明的参数、按键排序后序列化
+- 有界 LRU + TTL，超出容量时淘汰最久未使用的条目
+- single-flight：相同参数的并发调用只执行一次，其余调用等待同一结果；执行者被取消时由一个等待者接替执行
+- 失败结果（抛出异常或返回 success=False）以及流式转发/结果句柄形式的结果不缓存
+- 按工具统计命中、未命中和合并次数
+"""
+
+import asyncio
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from fnmatch import fnmatchcase
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Sequence, Tuple
+
+from app.core.config import MCP_TOOL_CACHE_MAX_ENTRIES
+from app.core.logging import setup_logging
+
+logger = setup_logging("INFO")
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """工具结果缓存策略"""
+    ttl: float
+    key: Optional[Tuple[str, ...]] = None
+
+    @classmethod
+    def from_spec(cls, spec: Dict[str, Any]) -> "CachePolicy":
+        """从装饰器的 cache 声明构建策略"""
+        ttl = spec.get("ttl")
+        if not isinstance(ttl, (int, float)) or ttl <= 0:
+            raise ValueError("cache ttl must be a positive number")
+        key = spec.get("key")
+        if key is not None and (isinstance(key, str) or not all(isinstance(k, str) for k in key)):
+            raise ValueError("cache key must be a list of argument names")
+        return cls(ttl=float(ttl), key=tuple(key) if key is not None else None)
+
+
+@dataclass
+class CacheStats:
+    """单个工具的缓存统计"""
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
+
+
+class _LeaderCancelled(Exception):
+    """single-flight 执行者被取消，等待者应重新发起调用"""
+
+
+def canonical_arguments(func: Callable, arguments: Dict[str, Any], key: Optional[Sequence[str]] = None) -> str:
+    """规范化调用参数：补全默认值后按参数名排序序列化"""
+    try:
+        bound = inspect.signature(func).bind(**arguments)
+        bound.apply_defaults()
+        values = dict(bound.arguments)
+    except (TypeError, ValueError):
+        # 参数不匹配时不做补全，调用本身会报错且不会被缓存
+        values = dict(arguments)
+    if key is not None:
+        values = {name: values.get(name) for name in key}
+    return json.dumps(values, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _is_cacheable(result: Any) -> bool:
+    if not isinstance(result, dict):
+        return True
+    # 结果句柄会过期，已转发的流式结果不含内容，都不能复用
+    return not (result.get("success") is False or "result_handle" in result or result.get("streamed"))
+
+
+class ToolResultCache:
+    """有界 LRU/TTL 结果缓存（带 single-flight）"""
+
+    def __init__(self, max_entries: int = MCP_TOOL_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._stats: Dict[str, CacheStats] = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _stats_for(self, tool_name: str) -> CacheStats:
+        stats = self._stats.get(tool_name)
+        if stats is None:
+            stats = self._stats[tool_name] = CacheStats()
+        return stats
+
+    def _get(self, key: Hashable) -> Tuple[bool, Any]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return False, None
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def _put(self, key: Hashable, value: Any, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    async def get_or_call(self, tool_name: str, func: Callable, policy: CachePolicy,
+                          arguments: Dict[str, Any], call: Callable[[], Awaitable[Any]]) -> Any:
+        """命中缓存时直接返回，否则执行 call；相同参数的并发调用共享一次执行"""
+        key = (tool_name, canonical_arguments(func, arguments, policy.key))
+        stats = self._stats_for(tool_name)
+
+        while True:
+            hit, value = self._get(key)
+            if hit:
+                stats.hits += 1
+                return value
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            stats.coalesced += 1
+            try:
+                return await asyncio.shield(inflight)
+            except _LeaderCancelled:
+                # 执行者被取消而本调用没有：重新检查，第一个醒来的等待者接替执行
+                continue
+
+        stats.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await call()
+        except BaseException as e:
+            # 执行者被取消时不取消共享 Future，避免把 CancelledError 传给未被取消的等待者
+            future.set_exception(_LeaderCancelled() if isinstance(e, asyncio.CancelledError) else e)
+            # 避免无人等待时出现 "exception was never retrieved"
+            future.exception()
+            raise
+        else:
+            if _is_cacheable(result):
+                self._put(key, result, policy.ttl)
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    def invalidate(self, tool_name: Optional[str] = None):
+        """清除指定工具（或全部）的缓存条目，tool_name 支持通配符（如 github_*）"""
+        with self._lock:
+            if tool_name is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if fnmatchcase(k[0], tool_name)]:
+                    del self._entries[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries_by_tool: Dict[str, int] = {}
+            for tool_name, _ in self._entries:
+                entries_by_tool[tool_name] = entries_by_tool.get(tool_name, 0) + 1
+            total_entries = len(self._entries)
+        return {
+            "entries": total_entries,
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+            "tools": {
+                name: {**stats.to_dict(), "entries": entries_by_tool.get(name, 0)}
+                for name, stats in self._stats.items()
+            },
+        }
@@ -0,0 +1,294 @@
+"""
+分段并行下载
+Segmented Parallel Downloads
+
+特性:
+- 文件按固定大小切成若干片段（Range 请求），多个 worker 共享同一 aiohttp 会话并发下载
+- 目标文件预分配后用 os.pwrite 按偏移写入，各 worker 的写缓冲在文件 I/O 线程池中落盘
+- 片段失败时只重试未完成的剩余范围，不影响其他片段；按 resilience 判断是否可重试（熔断、非 429/5xx 的
+  4xx 直接失败），重试前指数退避 + 抖动
+- 写入在线程中执行、取消 worker 不会中止线程，关闭文件描述符前等待所有已提交的写入结束
+- 并发数按实测吞吐自适应：从 INITIAL_SEGMENTS 开始，吞吐提升超过 GROWTH_THRESHOLD 时增加一个 worker，
+  提升不明显时停止增长，上限为 max_segments
+- 服务端未按请求返回 206 + 对应 Content-Range 时抛出 RangeNotSatisfied，由调用方退回单连接下载
+- 完成后整体读取文件计算 SHA-256 / MD5
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Deque, Dict, Set, Tuple
+
+import aiohttp
+
+from app.core.async_executor import run_file_io
+from app.core.logging import setup_logging
+from app.tools.resilience import backoff_delay, is_retryable_error, is_retryable_status
+
+logger = setup_logging("INFO")
+
+INITIAL_SEGMENTS = 2
+# 吞吐提升超过该比例才继续增加并发
+GROWTH_THRESHOLD = 0.1
+# 每个 worker 的写缓冲大小
+WRITE_BUFFER_SIZE = 1024 * 1024
+READ_CHUNK_SIZE = 64 * 1024
+MAX_PIECE_RETRIES = 3
+# 片段重试退避基数与上限（秒），调用方通常传入工具集的 retry_delay / retry_max_delay
+RETRY_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+# 每个 worker 平均分到的片段数（片段越多，慢 worker 拖尾越短）
+PIECES_PER_SEGMENT = 4
+
+# 发起 Range 请求：(start, end) -> 未读取响应体的响应
+OpenRange = Callable[[int, int], Awaitable[aiohttp.ClientResponse]]
+
+_CONTENT_RANGE = re.compile(r"bytes\s+(\d+)-(\d+)/(?:\d+|\*)$")
+
+
+class RangeNotSatisfied(Exception):
+    """服务端没有按请求返回字节范围"""
+
+
+class _PieceFailed(Exception):
+    """片段下载中断，position 为已写入的下一个字节偏移"""
+
+    def __init__(self, position: int, error: BaseException):
+        super().__init__(str(error))
+        self.position = position
+        self.error = error
+
+
+def _is_retryable(error: BaseException) -> bool:
+    if isinstance(error, aiohttp.ClientResponseError):
+        return is_retryable_status(error.status)
+    return is_retryable_error(error)
+
+
+def supports_pwrite() -> bool:
+    return hasattr(os, "pwrite")
+
+
+def plan_pieces(size: int, max_segments: int, min_piece_size: int) -> Deque[Tuple[int, int]]:
+    """把 [0, size) 切成闭区间片段"""
+    piece_size = max(min_piece_size, -(-size // (max_segments * PIECES_PER_SEGMENT)))
+    return deque((start, min(start + piece_size, size) - 1) for start in range(0, size, piece_size))
+
+
+class ThroughputController:
+    """按吞吐爬山调整并发数"""
+
+    def __init__(self, max_segments: int, clock: Callable[[], float] = time.monotonic):
+        self.max_segments = max_segments
+        self.target = min(INITIAL_SEGMENTS, max_segments)
+        self.settled = self.target >= max_segments
+        self.best_rate = 0.0
+        self._clock = clock
+        self._window_start = clock()
+        self._window_bytes = 0
+        self._window_pieces = 0
+
+    def record(self, nbytes: int):
+        self._window_bytes += nbytes
+
+    def piece_done(self) -> bool:
+        """一个片段完成，返回是否应增加一个 worker"""
+        self._window_pieces += 1
+        # 当前并发下每个 worker 至少完成一个片段后再评估
+        if self.settled or self._window_pieces < self.target:
+            return False
+        elapsed = self._clock() - self._window_start
+        if elapsed <= 0:
+            return False
+        rate = self._window_bytes / elapsed
+        self._window_start = self._clock()
+        self._window_bytes = 0
+        self._window_pieces = 0
+        if rate > self.best_rate * (1 + GROWTH_THRESHOLD):
+            self.best_rate = rate
+            self.target += 1
+            self.settled = self.target >= self.max_segments
+            return True
+        self.settled = True
+        return False
+
+
+@dataclass
+class SegmentedResult:
+    size: int
+    sha256: str
+    md5: str
+    pieces: int
+    retries: int
+    max_concurrency: int
+    bytes_per_second: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "pieces": self.pieces,
+            "retries": self.retries,
+            "max_concurrency": self.max_concurrency,
+            "bytes_per_second": round(self.bytes_per_second, 1),
+        }
+
+
+def _preallocate(path: Path, size: int) -> int:
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        if hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(fd, 0, size)
+            except OSError:
+                # 部分文件系统不支持 fallocate，退回稀疏文件
+                os.ftruncate(fd, size)
+        else:
+            os.ftruncate(fd, size)
+    except BaseException:
+        os.close(fd)
+        raise
+    return fd
+
+
+def _pwrite_all(fd: int, data: bytes, offset: int):
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view = view[written:]
+        offset += written
+
+
+def _hash_file(path: Path) -> Tuple[str, str]:
+    sha256 = hashlib.sha256()
+    md5 = hashlib.md5()
+    with open(path, "rb") as f:
+        while chunk := f.read(WRITE_BUFFER_SIZE):
+            sha256.update(chunk)
+            md5.update(chunk)
+    return sha256.hexdigest(), md5.hexdigest()
+
+
+async def download_segments(open_range: OpenRange, path: Path, size: int, max_segments: int,
+                            min_piece_size: int, max_retries: int = MAX_PIECE_RETRIES,
+                            retry_delay: float = RETRY_DELAY, retry_max_delay: float = RETRY_MAX_DELAY) -> SegmentedResult:
+    """分段并行下载 size 字节到 path（会被覆盖），返回整体摘要与统计"""
+    pieces = plan_pieces(size, max_segments, min_piece_size)
+    piece_count = len(pieces)
+    attempts: Dict[int, int] = {}
+    controller = ThroughputController(max_segments)
+    started = time.monotonic()
+    state = {"retries": 0, "max_concurrency": 0, "active": 0, "written": 0}
+    workers = set()
+    pending_writes: Set[asyncio.Future] = set()
+    fd = await run_file_io(_preallocate, path, size)
+
+    async def write(data: bytes, offset: int):
+        """写入在线程中执行，取消等待方不会中止线程；登记后由关闭 fd 前统一等待"""
+        future = asyncio.ensure_future(run_file_io(_pwrite_all, fd, data, offset))
+        pending_writes.add(future)
+        future.add_done_callback(pending_writes.discard)
+        await asyncio.shield(future)
+
+    async def fetch_piece(start: int, end: int) -> int:
+        """下载 [start, end]，返回已写入的字节数（失败时通过异常携带）"""
+        try:
+            response = await open_range(start, end)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise _PieceFailed(start, e) from e
+        position = start
+        buffer = bytearray()
+        try:
+            response.raise_for_status()
+            match = _CONTENT_RANGE.match(response.headers.get("Content-Range", "").strip())
+            if response.status != 206 or match is None or int(match.group(1)) != start:
+                raise RangeNotSatisfied(f"Server ignored range {start}-{end} (status {response.status})")
+            async for chunk in response.content.iter_chunked(READ_CHUNK_SIZE):
+                if position + len(buffer) + len(chunk) > end + 1:
+                    raise RangeNotSatisfied(f"Server sent more than the requested range {start}-{end}")
+                buffer.extend(chunk)
+                controller.record(len(chunk))
+                if len(buffer) >= WRITE_BUFFER_SIZE:
+                    await write(bytes(buffer), position)
+                    position += len(buffer)
+                    buffer.clear()
+            if buffer:
+                await write(bytes(buffer), position)
+                position += len(buffer)
+                buffer.clear()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # 已落盘部分保留，只重试剩余范围
+            raise _PieceFailed(position, e) from e
+        finally:
+            response.release()
+        if position != end + 1:
+            raise _PieceFailed(position, aiohttp.ClientPayloadError(
+                f"Incomplete range {start}-{end}: got {position - start} bytes"
+            ))
+        return position - start
+
+    async def worker():
+        try:
+            while pieces:
+                start, end = pieces.popleft()
+                try:
+                    written = await fetch_piece(start, end)
+                except _PieceFailed as failure:
+                    state["written"] += failure.position - start
+                    attempt = attempts.get(end, 0)
+                    attempts[end] = attempt + 1
+                    if attempt >= max_retries or not _is_retryable(failure.error):
+                        raise failure.error
+                    state["retries"] += 1
+                    delay = backoff_delay(attempt, retry_delay, retry_max_delay)
+                    logger.warning(
+                        f"Segment {start}-{end} failed ({failure.error}), "
+                        f"retrying from byte {failure.position} in {delay:.2f}s"
+                    )
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    if failure.position <= end:
+                        pieces.append((failure.position, end))
+                    continue
+                state["written"] += written
+                if controller.piece_done() and pieces:
+                    spawn()
+        finally:
+            state["active"] -= 1
+
+    def spawn():
+        workers.add(asyncio.create_task(worker()))
+        state["active"] += 1
+        state["max_concurrency"] = max(state["max_concurrency"], state["active"])
+
+    try:
+        for _ in range(min(controller.target, len(pieces))):
+            spawn()
+        # 等待所有 worker（包括运行中新增的）结束，任一失败则取消其余
+        while workers:
+            done, _ = await asyncio.wait(workers, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                workers.discard(task)
+                if task.exception() is not None:
+                    raise task.exception()
+    finally:
+        for task in workers:
+            task.cancel()
+        if workers:
+            await asyncio.gather(*workers, return_exceptions=True)
+        # 被取消的 worker 的写入线程可能仍在运行，全部结束后才能关闭（否则可能写入已复用的 fd）
+        if pending_writes:
+            await asyncio.gather(*pending_writes, return_exceptions=True)
+        await run_file_io(os.close, fd)
+
+    if state["written"] != size:
+        raise ValueError(f"Segmented download incomplete: {state['written']} of {size} bytes")
+    sha256, md5 = await run_file_io(_hash_file, path)
+    elapsed = time.monotonic() - started
+    return SegmentedResult(
+        size=size, sha256=sha256, md5=md5, pieces=piece_count, retries=state["retries"],
+        max_concurrency=state["max_concurrency"], bytes_per_second=size / elapsed if elapsed > 0 else 0.0,
+    )
@@ -19,6 +19,8 @@ from fastmcp import FastMCP
 from mcp import types
 
 from app.tools.service import get_mcp_tools_service
+from app.tools.dispatcher import get_tool_dispatcher
+from app.tools.validation import ToolArgumentError
 from app.core.database_service import get_database_service
 from app.core.logging import setup_logging
 from app.core.secure_logging import sanitize_for_log
@@ -973,101 +975,15 @@ class LazyAIMCPServer:
         return self.tools_service.get_tools(enabled_only=True)
     
     async def call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> str:
-        """调用MCP工具"""
+        """调用MCP工具（通过调度表 O(1) 定位实现函数）"""
         try:
-            # 获取工具信息
-            available_tools = self.get_available_tools()
-            tool_info = next((tool for tool in available_tools if tool['name'] == tool_name), None)
-            
-            if not tool_info:
-                raise ValueError(f"Tool '{tool_name}' not found")
-            
-            # 调用FastMCP服务器的工具
-            # 需要通过MCP协议调用已注册的工具
-            # 这里我们需要直接调用对应的实现函数
-            
-            if tool_name == "time_get_ts":
-                now = datetime.now()
-                return str(int(now.timestamp()))
-                
-            elif tool_name == "time_format":
-                from app.core.time_tools_service import get_time_tools_service
-                import pytz
-                
-                timestamp = arguments.get('timestamp')
-                format_type = arguments.get('format', 'formatted')
-                custom_format = arguments.get('custom_format', '%Y-%m-%d %H:%M:%S')
-                timezone = arguments.get('timezone')
-                include_timezone_info = arguments.get('include_timezone_info')
-                
-                time_service = get_time_tools_service()
-                
-                # 确定时间对象
-                if timestamp is None:
-                    dt = datetime.now()
-                else:
-                    if isinstance(timestamp, str):
-                        try:
-                            timestamp = float(timestamp)
-                        except ValueError:
-                            dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                            timestamp = None
-                    
-                    if timestamp is not None:
-                        dt = datetime.fromtimestamp(timestamp)
-                
-                # 确定时区
-                if timezone is None:
-                    tz_obj = time_service.get_timezone_object()
-                    timezone_name = time_service.get_default_timezone()
-                else:
-                    if timezone.lower() == "local":
-                        tz_obj = None
-                        timezone_name = "local"
-                    elif timezone.upper() == "UTC":
-                        tz_obj = pytz.UTC
-                        timezone_name = "UTC"
-                    else:
-                        tz_obj = pytz.timezone(timezone)
-                        timezone_name = timezone
-                
-                # 应用时区
-                if tz_obj:
-                    if dt.tzinfo is None:
-                        dt = tz_obj.localize(dt)
-                    else:
-                        dt = dt.astimezone(tz_obj)
-                else:
-                    if dt.tzinfo is None:
-                        dt = dt.astimezone()
-                
-                # 确定是否显示时区信息
-                if include_timezone_info is None:
-                    show_tz_info = time_service.should_display_timezone_info()
-                else:
-                    show_tz_info = include_timezone_info
-                
-                # 格式化输出
-                if format_type == 'iso':
-                    return dt.isoformat()
-                elif format_type == 'custom':
-                    formatted_time = dt.strftime(custom_format)
-                    if show_tz_info:
-                        return f"{formatted_time} ({str(dt.tzinfo)})"
-                    return formatted_time
-                else:  # formatted
-                    formatted_time = dt.strftime('%Y-%m-%d %H:%M:%S')
-                    if show_tz_info:
-                        return f"格式化时间: {formatted_time} ({str(dt.tzinfo)})\n\n完整时间信息:\n- ISO 格式: {dt.isoformat()}\n- Unix 时间戳: {int(dt.timestamp())}\n- 格式化时间: {formatted_time}\n- 配置时区: {timezone_name}\n- 实际时区: {str(dt.tzinfo)}"
-                    return formatted_time
-            
-            # 对于其他工具，可以添加类似的实现
-            # 这是一个简化的实现，实际中可能需要更完善的工具调用机制
-            else:
-                return f"Tool '{tool_name}' is registered but not implemented in call_tool method"
-                
+            # 序列化在调度器内完成，以便计入追踪的序列化耗时和结果大小
+            return await get_tool_dispatcher().call_text(tool_name, arguments)
+        except ToolArgumentError:
+            # 参数错误属于调用方问题，由上层返回给客户端
+            raise
         except Exception as e:
-            logger.error(f"Error calling tool '{tool_name}': {str(e)}")
+            logger.error(f"Error calling tool '{sanitize_for_log(tool_name)}': {sanitize_for_log(str(e))}")
             raise
     
     def get_tools_by_category(self) -> Dict[str, Any]:
@@ -14,9 +14,13 @@ from app.core.config import PROJECT_ROOT
 from app.core.logging import setup_logging
 from app.core.secure_logging import sanitize_for_log
 from app.core.unified_database import get_unified_database, TableNames
+from app.core.event_bus import publish_event, EventTopics
 
 logger = setup_logging("INFO")
 
+# system_config 表中记录已同步工具清单哈希的键
+MANIFEST_HASH_KEY = "mcp_tool_manifest_hash"
+
 class MCPTool:
     """MCP工具数据模型"""
     
@@ -77,6 +81,7 @@ class MCPToolsService:
         # 使用统一表名
         self.tools_table = self.db.table(TableNames.MCP_TOOLS)
         self.categories_table = self.db.table(TableNames.MCP_CATEGORIES)
+        self.system_config_table = self.db.table(TableNames.SYSTEM_CONFIG)
         
         logger.info(f"MCPToolsService initialized with unified db: {use_unified_db}")
 
@@ -92,31 +97,17 @@ class MCPToolsService:
         logger.info("Registry tools discovery completed.")
 
     def _discover_registry_tools(self):
-        """自动发现并导入装饰器注册的工具"""
+        """按工具清单注册装饰器工具（实现模块按需导入），清单变化时同步到数据库"""
         try:
-            from app.tools.registry import auto_discover_tools
-
-            # 发现所有工具模块
-            tool_modules = [
-                "app.tools.github_tools",
-                "app.tools.web_scraping_tools",
-                "app.tools.file_tools",
-                "app.tools.time_tools",
-                "app.tools.system_tools",
-                "app.tools.cache_tools"
-            ]
-
-            total_discovered = 0
-            for module in tool_modules:
-                try:
-                    discovered = auto_discover_tools([module])
-                    total_discovered += discovered
-                    if discovered > 0:
-                        logger.debug(f"Discovered {discovered} tools from {module}")
-                except Exception as e:
-                    logger.debug(f"Failed to discover tools from {module}: {e}")
-
-            logger.info(f"Auto-discovered {total_discovered} MCP tools")
+            from app.tools.manifest import ensure_manifest
+
+            manifest = ensure_manifest()
+            manifest_hash = manifest.get("hash") if manifest else None
+
+            # 清单未变化且数据库已同步过时跳过同步
+            if manifest_hash and len(self.tools_table) and self._get_synced_manifest_hash() == manifest_hash:
+                logger.info("MCP tool manifest unchanged, skipping registry sync")
+                return
 
             # 同步装饰器注册的分类到数据库
             sync_result = self.sync_registry_categories_to_db()
@@ -128,9 +119,24 @@ class MCPToolsService:
             if tool_sync_result['synced'] > 0 or tool_sync_result['updated'] > 0 or tool_sync_result['removed'] > 0:
                 logger.info(f"Tool sync: {tool_sync_result['synced']} added, {tool_sync_result['updated']} updated, {tool_sync_result['removed']} removed")
 
+            if manifest_hash:
+                self._set_synced_manifest_hash(manifest_hash)
+
         except Exception as e:
             logger.warning(f"Failed to auto-discover decorator tools: {e}")
 
+    def _get_synced_manifest_hash(self) -> Optional[str]:
+        """获取上次同步到数据库的工具清单哈希"""
+        record = self.system_config_table.get(Query().key == MANIFEST_HASH_KEY)
+        return record.get("value") if record else None
+
+    def _set_synced_manifest_hash(self, manifest_hash: str):
+        """记录已同步到数据库的工具清单哈希"""
+        self.system_config_table.upsert(
+            {"key": MANIFEST_HASH_KEY, "value": manifest_hash, "updated_at": datetime.now().isoformat()},
+            Query().key == MANIFEST_HASH_KEY
+        )
+
     def register_builtin_categories(self):
         """注册内置工具分类到数据库（启动时覆盖）"""
         builtin_categories = [
@@ -346,6 +352,7 @@ class MCPToolsService:
             # 保存到数据库
             self.categories_table.update(category, Query_obj.id == category_id)
             logger.info(f"Updated category '{category_id}' config: {config_key} = {sanitize_for_log(str(config_value))}")
+            publish_event(EventTopics.MCP_TOOLS, "mcp.category.config_updated", {"category": category_id, "keys": [config_key]})
             return True
             
         except Exception as e:
@@ -373,6 +380,7 @@ class MCPToolsService:
             # 保存到数据库
             self.categories_table.update(category, Query_obj.id == category_id)
             logger.info(f"Updated category '{category_id}' configs: {len(configs)} items")
+            publish_event(EventTopics.MCP_TOOLS, "mcp.category.config_updated", {"category": category_id, "keys": list(configs.keys())})
             return True
             
         except Exception as e:
@@ -413,6 +421,7 @@ class MCPToolsService:
                 logger.info(f"Registered new builtin tool: {sanitize_for_log(tool.name)}")
         
         logger.info(f"Builtin tools registration completed: {registered_count} new, {updated_count} updated")
+        publish_event(EventTopics.MCP_TOOLS, "mcp.tools.synced", {"registered": registered_count, "updated": updated_count})
         return {"registered": registered_count, "updated": updated_count}
 
     def _get_builtin_tools_definition(self):
@@ -511,6 +520,7 @@ class MCPToolsService:
             }
 
             logger.info(f"Tool database sync completed: {added_count} added, {updated_count} updated, {removed_count} removed")
+            publish_event(EventTopics.MCP_TOOLS, "mcp.tools.synced", result)
             return result
 
         except Exception as e:
@@ -856,6 +866,7 @@ class MCPToolsService:
                                         Query_obj.name == name)
         if result:
             logger.info(f"Enabled tool: {sanitize_for_log(name)}")
+            publish_event(EventTopics.MCP_TOOLS, "mcp.tool.enabled", {"name": name})
         return len(result) > 0
     
     def disable_tool(self, name: str) -> bool:
@@ -865,6 +876,7 @@ class MCPToolsService:
                                         Query_obj.name == name)
         if result:
             logger.info(f"Disabled tool: {sanitize_for_log(name)}")
+            publish_event(EventTopics.MCP_TOOLS, "mcp.tool.disabled", {"name": name})
         return len(result) > 0
     
     def remove_tool(self, name: str) -> bool:
@@ -873,6 +885,7 @@ class MCPToolsService:
         result = self.tools_table.remove(Query_obj.name == name)
         if result:
             logger.info(f"Removed tool: {sanitize_for_log(name)}")
+            publish_event(EventTopics.MCP_TOOLS, "mcp.tool.removed", {"name": name})
         return len(result) > 0
     
     def enable_category(self, category_id: str) -> bool:
@@ -882,6 +895,7 @@ class MCPToolsService:
                                             Query_obj.id == category_id)
         if result:
             logger.info(f"Enabled category: {sanitize_for_log(category_id)}")
+            publish_event(EventTopics.MCP_TOOLS, "mcp.category.enabled", {"category": category_id})
         return len(result) > 0
     
     def disable_category(self, category_id: str) -> bool:
@@ -891,6 +905,7 @@ class MCPToolsService:
                                             Query_obj.id == category_id)
         if result:
             logger.info(f"Disabled category: {sanitize_for_log(category_id)}")
+            publish_event(EventTopics.MCP_TOOLS, "mcp.category.disabled", {"category": category_id})
         return len(result) > 0
     
     def create_category(self, category_data: Dict[str, Any]) -> bool:
@@ -917,6 +932,7 @@ class MCPToolsService:
             
             self.categories_table.insert(category)
             logger.info(f"Created new category: {sanitize_for_log(category['name'])}")
+            publish_event(EventTopics.MCP_TOOLS, "mcp.category.created", {"category": category['id']})
             return True
             
         except Exception as e:
@@ -944,6 +960,7 @@ class MCPToolsService:
                 update_data['updated_at'] = datetime.now().isoformat()
                 self.categories_table.update(update_data, Query_obj.id == category_id)
                 logger.info(f"Updated category: {sanitize_for_log(category_id)}")
+                publish_event(EventTopics.MCP_TOOLS, "mcp.category.updated", {"category": category_id, "fields": list(update_data.keys())})
                 return True
             
             return False
@@ -980,6 +997,7 @@ class MCPToolsService:
             else:
                 logger.info(f"Deleted category: {sanitize_for_log(category_id)}")
             
+            publish_event(EventTopics.MCP_TOOLS, "mcp.category.deleted", {"category": category_id, "force": force})
             return True
             
         except Exception as e:
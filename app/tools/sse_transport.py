@@ -0,0 +1,277 @@
+"""
+MCP SSE 会话传输层
+MCP SSE Session Transport
+
+特性:
+- 每个 SSE 连接对应一个会话，服务器→客户端消息经会话的有界队列推送
+- 客户端→服务器消息通过配套的 POST 端点按 session_id 投递，立即返回 202
+- 背压：会话执行中的请求数有上限；响应入队等待超时视为慢消费者并关闭会话
+- 进度通知使用非阻塞入队，队列满时丢弃（进度可丢失，响应不可丢失）
+- 空闲会话（长时间无客户端消息）自动淘汰，连接断开时立即清理
+- 队列以预编码的 SSE 帧存储，按字节统计每个会话占用的内存
+"""
+
+import asyncio
+import json
+import threading
+import time
+import uuid
+from typing import Any, AsyncIterator, Awaitable, Dict, Optional, Set
+
+from app.core.config import (
+    MCP_SSE_MAX_SESSIONS,
+    MCP_SSE_QUEUE_SIZE,
+    MCP_SSE_MAX_INFLIGHT,
+    MCP_SSE_IDLE_TIMEOUT,
+    MCP_SSE_SEND_TIMEOUT,
+)
+from app.core.logging import setup_logging
+from app.core.metrics import get_metrics_registry
+from app.core.secure_logging import sanitize_for_log
+
+logger = setup_logging("INFO")
+
+
+class SessionLimitExceeded(Exception):
+    """会话数已达上限"""
+
+
+class SessionBusy(Exception):
+    """会话执行中的请求数已达上限"""
+
+
+def encode_message(message: Dict[str, Any]) -> str:
+    """将 JSON-RPC 消息编码为 SSE message 帧"""
+    return f"event: message\ndata: {json.dumps(message, ensure_ascii=False, default=str)}\n\n"
+
+
+class MCPSession:
+    """单个 SSE 会话"""
+
+    __slots__ = (
+        "id", "max_inflight", "created_at", "last_activity", "closed", "close_reason",
+        "queued_bytes", "sent_messages", "dropped_messages", "_queue", "_tasks", "_manager",
+    )
+
+    def __init__(self, manager: "SSESessionManager", session_id: str, queue_size: int, max_inflight: int):
+        self.id = session_id
+        self.max_inflight = max_inflight
+        self.created_at = time.monotonic()
+        self.last_activity = self.created_at
+        self.closed = False
+        self.close_reason: Optional[str] = None
+        self.queued_bytes = 0
+        self.sent_messages = 0
+        self.dropped_messages = 0
+        self._queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self._tasks: Set[asyncio.Task] = set()
+        self._manager = manager
+
+    @property
+    def inflight(self) -> int:
+        return len(self._tasks)
+
+    def touch(self):
+        self.last_activity = time.monotonic()
+
+    def idle_for(self) -> float:
+        return time.monotonic() - self.last_activity
+
+    def ensure_capacity(self, count: int = 1):
+        """检查是否还能接收 count 个请求，否则抛出 SessionBusy"""
+        if len(self._tasks) + count > self.max_inflight:
+            raise SessionBusy(self.id)
+
+    def spawn(self, coro: Awaitable[Any]) -> asyncio.Task:
+        """在会话内执行请求处理协程，会话关闭时一并取消"""
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def send(self, message: Dict[str, Any], timeout: float = MCP_SSE_SEND_TIMEOUT) -> bool:
+        """发送必须送达的消息（响应），队列持续满时关闭会话"""
+        if self.closed:
+            return False
+        frame = encode_message(message)
+        try:
+            await asyncio.wait_for(self._queue.put(frame), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"MCP SSE session {sanitize_for_log(self.id)} is not consuming messages, closing")
+            self._manager.close(self.id, "slow_consumer")
+            return False
+        self.queued_bytes += len(frame)
+        return True
+
+    def send_nowait(self, message: Dict[str, Any]) -> bool:
+        """发送可丢弃的消息（进度通知），队列满时丢弃"""
+        if self.closed:
+            return False
+        frame = encode_message(message)
+        try:
+            self._queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            self.dropped_messages += 1
+            return False
+        self.queued_bytes += len(frame)
+        return True
+
+    async def next_frame(self, timeout: float) -> Optional[str]:
+        """取出下一帧，超时返回 None"""
+        try:
+            frame = await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if frame is None:
+            return None
+        self.queued_bytes -= len(frame)
+        self.sent_messages += 1
+        return frame
+
+    def _close(self, reason: str):
+        if self.closed:
+            return
+        self.closed = True
+        self.close_reason = reason
+        for task in list(self._tasks):
+            task.cancel()
+        # 唤醒正在等待的 SSE 输出循环
+        try:
+            self._queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "age_seconds": round(time.monotonic() - self.created_at, 1),
+            "idle_seconds": round(self.idle_for(), 1),
+            "inflight": self.inflight,
+            "queued_messages": self._queue.qsize(),
+            "queued_bytes": self.queued_bytes,
+            "sent_messages": self.sent_messages,
+            "dropped_messages": self.dropped_messages,
+        }
+
+
+class SSESessionManager:
+    """SSE 会话管理器"""
+
+    def __init__(self, max_sessions: int = MCP_SSE_MAX_SESSIONS, queue_size: int = MCP_SSE_QUEUE_SIZE,
+                 max_inflight: int = MCP_SSE_MAX_INFLIGHT, idle_timeout: float = MCP_SSE_IDLE_TIMEOUT):
+        self.max_sessions = max_sessions
+        self.queue_size = queue_size
+        self.max_inflight = max_inflight
+        self.idle_timeout = idle_timeout
+        self._sessions: Dict[str, MCPSession] = {}
+        self.opened = 0
+        self.rejected = 0
+        self.closed_total = get_metrics_registry().counter(
+            "lazyai_mcp_sse_sessions_closed_total", "关闭的 MCP SSE 会话数", ("reason",)
+        )
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def create(self) -> MCPSession:
+        """创建会话（必须在事件循环中调用）"""
+        if len(self._sessions) >= self.max_sessions:
+            self.evict_idle()
+            if len(self._sessions) >= self.max_sessions:
+                self.rejected += 1
+                raise SessionLimitExceeded()
+        session = MCPSession(self, uuid.uuid4().hex, self.queue_size, self.max_inflight)
+        self._sessions[session.id] = session
+        self.opened += 1
+        return session
+
+    def get(self, session_id: str) -> Optional[MCPSession]:
+        session = self._sessions.get(session_id)
+        if session is not None and session.closed:
+            return None
+        return session
+
+    def close(self, session_id: str, reason: str = "closed"):
+        session = self._sessions.pop(session_id, None)
+        if session is not None and not session.closed:
+            session._close(reason)
+            self.closed_total.inc((reason,))
+
+    def close_all(self, reason: str = "shutdown"):
+        for session_id in list(self._sessions):
+            self.close(session_id, reason)
+
+    def evict_idle(self) -> int:
+        """淘汰空闲超时的会话，返回淘汰数量"""
+        expired = [sid for sid, s in self._sessions.items() if s.idle_for() > self.idle_timeout]
+        for session_id in expired:
+            self.close(session_id, "idle")
+        return len(expired)
+
+    async def stream(self, session: MCPSession, endpoint: str,
+                     heartbeat_interval: float = 15.0) -> AsyncIterator[str]:
+        """会话的 SSE 输出流：先发送 endpoint 事件，再持续输出消息帧和心跳"""
+        try:
+            yield f"event: endpoint\ndata: {endpoint}\n\n"
+            while not session.closed:
+                frame = await session.next_frame(heartbeat_interval)
+                if frame is not None:
+                    yield frame
+                    continue
+                if session.closed:
+                    break
+                if session.inflight == 0 and session.idle_for() > self.idle_timeout:
+                    self.close(session.id, "idle")
+                    break
+                yield f": ping {int(time.time())}\n\n"
+        finally:
+            # 客户端断开或服务端关闭
+            self.close(session.id, "disconnected")
+
+    def get_status(self, include_sessions: bool = False) -> Dict[str, Any]:
+        sessions = list(self._sessions.values())
+        status: Dict[str, Any] = {
+            "sessions": len(sessions),
+            "max_sessions": self.max_sessions,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "inflight": sum(s.inflight for s in sessions),
+            "queued_messages": sum(s._queue.qsize() for s in sessions),
+            "queued_bytes": sum(s.queued_bytes for s in sessions),
+        }
+        if include_sessions:
+            status["session_list"] = [s.get_status() for s in sessions]
+        return status
+
+
+# 全局会话管理器
+_session_manager: Optional[SSESessionManager] = None
+_session_manager_lock = threading.Lock()
+
+
+def get_sse_session_manager() -> SSESessionManager:
+    """获取全局 SSE 会话管理器"""
+    global _session_manager
+    if _session_manager is None:
+        with _session_manager_lock:
+            if _session_manager is None:
+                _session_manager = SSESessionManager()
+                get_metrics_registry().register_collector(_collect_sse_metrics)
+    return _session_manager
+
+
+def close_sse_sessions(reason: str = "shutdown"):
+    """关闭所有会话（应用退出时调用），使 SSE 输出流结束"""
+    if _session_manager is not None:
+        _session_manager.close_all(reason)
+
+
+def _collect_sse_metrics():
+    status = _session_manager.get_status() if _session_manager is not None else None
+    if status is None:
+        return []
+    return [
+        ("lazyai_mcp_sse_sessions", "gauge", "当前 MCP SSE 会话数", [({}, status["sessions"])]),
+        ("lazyai_mcp_sse_queued_bytes", "gauge", "MCP SSE 会话队列中待发送的字节数", [({}, status["queued_bytes"])]),
+        ("lazyai_mcp_sse_inflight", "gauge", "MCP SSE 会话执行中的请求数", [({}, status["inflight"])]),
+    ]
@@ -0,0 +1,395 @@
+"""
+MCP 工具流式结果
+MCP Streaming Tool Results
+
+特性:
+- 工具可返回 StreamingResult（同步或异步迭代器逐块产出内容 + 元数据），无需在内存中拼出完整结果
+- 传输层通过 chunk_sink 注册转发回调时，分块直接推送给客户端（SSE 部分结果通知）
+- 未注册转发时由 ResultSpool 汇总：不超过内联上限时内联返回，超过后写入临时文件并返回结果句柄
+- 结果句柄按 TTL、数量上限与临时文件总大小上限淘汰，客户端按 offset/length 分页读取
+- 生产者可抛出 StreamAborted 中止流式结果并给出最终结果（如解码失败时的错误结果）
+- 单次调用的内存占用不超过内联上限加一个分块
+"""
+
+import asyncio
+import base64
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional, Tuple, Union
+
+from app.core.async_executor import run_file_io
+from app.core.config import (
+    MCP_MAX_INLINE_RESULT_BYTES,
+    MCP_RESULT_HANDLE_TTL,
+    MCP_RESULT_MAX_BYTES,
+    MCP_RESULT_MAX_HANDLES,
+    MCP_RESULT_SPOOL_DIR,
+)
+from app.core.logging import setup_logging
+
+logger = setup_logging("INFO")
+
+CHUNK_SIZE = 64 * 1024
+TEXT_MEDIA_TYPE = "text/plain; charset=utf-8"
+BINARY_MEDIA_TYPE = "application/octet-stream"
+
+Chunk = Union[str, bytes]
+# 分块转发回调：(分块内容, 分块序号)
+ChunkSink = Callable[[Chunk, int], Awaitable[None]]
+
+_chunk_sink: ContextVar[Optional[ChunkSink]] = ContextVar("mcp_chunk_sink", default=None)
+
+
+@dataclass
+class StreamingResult:
+    """流式工具结果
+
+    chunks 逐块产出内容（str 或 bytes），metadata 为结果中的其他字段，
+    内容汇总后放入 metadata[field]（binary 时以 base64 内联）。
+    """
+    chunks: Union[AsyncIterator[Chunk], Iterator[Chunk]]
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    field: str = "content"
+    binary: bool = False
+
+
+class StreamAborted(Exception):
+    """生产者中止流式结果，result 作为工具的最终结果返回"""
+
+    def __init__(self, result: Dict[str, Any]):
+        super().__init__(result.get("error"))
+        self.result = result
+
+
+def iter_text_chunks(text: str, size: int = CHUNK_SIZE) -> Iterator[str]:
+    """把已在内存中的字符串按块产出（用于以流式结果返回大字段）"""
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
+
+@contextmanager
+def chunk_sink(sink: ChunkSink):
+    """在当前上下文中注册分块转发回调（传输层使用）"""
+    token = _chunk_sink.set(sink)
+    try:
+        yield
+    finally:
+        _chunk_sink.reset(token)
+
+
+def get_chunk_sink() -> Optional[ChunkSink]:
+    return _chunk_sink.get()
+
+
+@dataclass
+class ResultHandle:
+    """临时结果句柄"""
+    id: str
+    path: Path
+    size: int
+    media_type: str
+    expires_at: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "size": self.size,
+            "media_type": self.media_type,
+            "expires_in": max(0, int(self.expires_at - time.time())),
+            "chunk_size": CHUNK_SIZE,
+            "url": f"/api/mcp/results/{self.id}",
+        }
+
+
+class ResultStore:
+    """临时结果句柄存储（文件 I/O 为阻塞操作，应在文件线程池中调用）"""
+
+    def __init__(self, directory: str = MCP_RESULT_SPOOL_DIR, ttl: float = MCP_RESULT_HANDLE_TTL,
+                 max_handles: int = MCP_RESULT_MAX_HANDLES, max_bytes: int = MCP_RESULT_MAX_BYTES):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.max_handles = max_handles
+        self.max_bytes = max_bytes
+        self._handles: "OrderedDict[str, ResultHandle]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.evicted = 0
+
+    def new_path(self) -> Tuple[str, Path]:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        handle_id = uuid.uuid4().hex
+        return handle_id, self.directory / f"{handle_id}.part"
+
+    def register(self, handle_id: str, path: Path, size: int, media_type: str) -> ResultHandle:
+        """登记句柄，超出数量或总大小上限时淘汰最旧的句柄；单个结果超过总大小上限时抛出 ValueError"""
+        handle = ResultHandle(handle_id, path, size, media_type, time.time() + self.ttl)
+        if size > self.max_bytes:
+            self._remove_files([handle])
+            raise ValueError(f"Result too large: {size} bytes (max: {self.max_bytes})")
+        with self._lock:
+            self._handles[handle_id] = handle
+            self.created += 1
+            expired = self._pop_expired()
+            total = sum(h.size for h in self._handles.values())
+            while len(self._handles) > self.max_handles or total > self.max_bytes:
+                oldest = self._handles.popitem(last=False)[1]
+                total -= oldest.size
+                expired.append(oldest)
+        self._remove_files(expired)
+        return handle
+
+    def _pop_expired(self):
+        now = time.time()
+        expired = [h for h in self._handles.values() if h.expires_at <= now]
+        for handle in expired:
+            del self._handles[handle.id]
+        return expired
+
+    def _remove_files(self, handles):
+        for handle in handles:
+            self.evicted += 1
+            try:
+                os.unlink(handle.path)
+            except FileNotFoundError:
+                pass
+
+    def get(self, handle_id: str) -> Optional[ResultHandle]:
+        with self._lock:
+            handle = self._handles.get(handle_id)
+            if handle is not None and handle.expires_at <= time.time():
+                del self._handles[handle_id]
+                expired = [handle]
+                handle = None
+            else:
+                expired = []
+        self._remove_files(expired)
+        return handle
+
+    def read(self, handle: ResultHandle, offset: int, length: int) -> bytes:
+        with open(handle.path, "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def iter_file(self, handle: ResultHandle, offset: int = 0) -> Iterator[bytes]:
+        with open(handle.path, "rb") as f:
+            f.seek(offset)
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+
+    def delete(self, handle_id: str) -> bool:
+        with self._lock:
+            handle = self._handles.pop(handle_id, None)
+        if handle is None:
+            return False
+        self._remove_files([handle])
+        return True
+
+    def close(self):
+        """删除全部句柄文件（应用退出时调用）"""
+        with self._lock:
+            handles = list(self._handles.values())
+            self._handles.clear()
+        self._remove_files(handles)
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            handles = list(self._handles.values())
+        return {
+            "handles": len(handles),
+            "max_handles": self.max_handles,
+            "bytes": sum(h.size for h in handles),
+            "max_bytes": self.max_bytes,
+            "created": self.created,
+            "evicted": self.evicted,
+        }
+
+
+def read_text_page(store: ResultStore, handle: ResultHandle, offset: int, length: int) -> Tuple[str, int]:
+    """按字节分页读取文本句柄，返回 (文本, 下一页偏移)；不会在 UTF-8 字符中间截断"""
+    data = store.read(handle, offset, length)
+    try:
+        text = data.decode("utf-8")
+    except UnicodeDecodeError as e:
+        if e.start < len(data) - 3:
+            raise
+        # 末尾是不完整的多字节字符，留到下一页
+        data = data[:e.start]
+        text = data.decode("utf-8")
+    return text, offset + len(data)
+
+
+class ResultSpool:
+    """汇总分块：内联上限以内保存在内存，超出后写入临时文件"""
+
+    def __init__(self, store: ResultStore, max_inline: int = MCP_MAX_INLINE_RESULT_BYTES):
+        self.store = store
+        self.max_inline = max_inline
+        self.size = 0
+        self._buffer: list = []
+        self._file = None
+        self._handle_id: Optional[str] = None
+        self._path: Optional[Path] = None
+
+    @property
+    def spilled(self) -> bool:
+        return self._file is not None
+
+    def _open(self):
+        self._handle_id, self._path = self.store.new_path()
+        self._file = open(self._path, "wb")
+        for data in self._buffer:
+            self._file.write(data)
+        self._buffer = []
+
+    async def write(self, data: bytes):
+        self.size += len(data)
+        if self.size > self.store.max_bytes:
+            # 不等写完再由 register 拒绝，避免先写满磁盘
+            raise ValueError(f"Result too large: more than {self.store.max_bytes} bytes")
+        if self._file is None and self.size <= self.max_inline:
+            self._buffer.append(data)
+            return
+        if self._file is None:
+            await run_file_io(self._open)
+        await run_file_io(self._file.write, data)
+
+    async def finish(self, media_type: str) -> Tuple[Optional[bytes], Optional[ResultHandle]]:
+        """返回 (内联内容, None) 或 (None, 结果句柄)"""
+        if self._file is None:
+            data = b"".join(self._buffer)
+            self._buffer = []
+            return data, None
+        await run_file_io(self._file.close)
+        handle = await run_file_io(self.store.register, self._handle_id, self._path, self.size, media_type)
+        return None, handle
+
+    async def abort(self):
+        if self._file is not None:
+            path = self._path
+
+            def discard():
+                self._file.close()
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+
+            await run_file_io(discard)
+        self._buffer = []
+
+
+_END = object()
+
+
+async def _iterate(chunks, run_blocking: Callable[..., Awaitable[Any]]) -> AsyncIterator[Chunk]:
+    """统一同步/异步迭代器；同步迭代器的每一步在线程池中执行"""
+    if hasattr(chunks, "__anext__"):
+        async for chunk in chunks:
+            yield chunk
+        return
+    iterator = iter(chunks)
+    try:
+        while True:
+            chunk = await run_blocking(next, iterator, _END)
+            if chunk is _END:
+                return
+            yield chunk
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            await run_blocking(close)
+
+
+async def consume_stream(result: StreamingResult, run_blocking: Callable[..., Awaitable[Any]],
+                         store: Optional["ResultStore"] = None,
+                         max_inline: int = MCP_MAX_INLINE_RESULT_BYTES) -> Tuple[Dict[str, Any], int]:
+    """消费流式结果，返回 (最终结果字典, 内容总字节数)
+
+    当前上下文注册了 chunk_sink 时逐块转发，最终结果不再包含内容；
+    否则汇总，超过内联上限时最终结果中给出 result_handle。
+    生产者抛出 StreamAborted 时丢弃已汇总的内容，返回其携带的结果。
+    """
+    sink = get_chunk_sink()
+    spool = None if sink is not None else ResultSpool(store or get_result_store(), max_inline)
+    total = 0
+    count = 0
+    try:
+        async for chunk in _iterate(result.chunks, run_blocking):
+            data = chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+            if not data:
+                continue
+            total += len(data)
+            if sink is not None:
+                await sink(chunk, count)
+            else:
+                await spool.write(data)
+            count += 1
+    except StreamAborted as e:
+        if spool is not None:
+            await asyncio.shield(spool.abort())
+        return dict(e.result), total
+    except BaseException:
+        if spool is not None:
+            await asyncio.shield(spool.abort())
+        raise
+
+    output = dict(result.metadata)
+    if sink is not None:
+        output.update({result.field: None, "streamed": True, "chunks": count, "total_bytes": total})
+        return output, total
+
+    inline, handle = await spool.finish(BINARY_MEDIA_TYPE if result.binary else TEXT_MEDIA_TYPE)
+    if handle is not None:
+        output[result.field] = None
+        output["result_handle"] = handle.to_dict()
+    elif result.binary:
+        output[result.field] = base64.b64encode(inline).decode("ascii")
+        output["content_encoding"] = "base64"
+    else:
+        output[result.field] = inline.decode("utf-8")
+    return output, total
+
+
+async def spill_text(text: str, store: Optional[ResultStore] = None) -> ResultHandle:
+    """把超过内联上限的文本结果写入结果句柄"""
+    store = store or get_result_store()
+    data = text.encode("utf-8")
+
+    def write() -> ResultHandle:
+        handle_id, path = store.new_path()
+        with open(path, "wb") as f:
+            f.write(data)
+        return store.register(handle_id, path, len(data), TEXT_MEDIA_TYPE)
+
+    return await run_file_io(write)
+
+
+# 全局结果句柄存储
+_result_store: Optional[ResultStore] = None
+_result_store_lock = threading.Lock()
+
+
+def get_result_store() -> ResultStore:
+    """获取全局结果句柄存储"""
+    global _result_store
+    if _result_store is None:
+        with _result_store_lock:
+            if _result_store is None:
+                _result_store = ResultStore()
+    return _result_store
+
+
+def close_result_store():
+    """删除全部临时结果文件（应用退出时调用）"""
+    if _result_store is not None:
+        _result_store.close()
@@ -49,7 +49,8 @@ def register_system_category():
             {"detailed": False},
             {"detailed": True, "include_performance": True}
         ]
-    }
+    },
+    cache={"ttl": 5}
 )
 def get_info(detailed: bool = True, include_performance: bool = False):
     """Get LazyAI Studio system information including CPU, memory, OS, etc."""
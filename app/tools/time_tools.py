@@ -91,47 +91,58 @@ def format(timestamp: Optional[Union[int, float, str]] = None,
            custom_format: str = "%Y-%m-%d %H:%M:%S",
            timezone: Optional[str] = None,
            include_timezone_info: Optional[bool] = None):
-    """Format time output with support for multiple formats and timezones"""
+    """Format time output with support for multiple formats and timezones
+
+    Unspecified timezone and include_timezone_info fall back to the time tools configuration.
+    """
+    from app.core.time_tools_service import get_time_tools_service
+
     try:
+        time_service = get_time_tools_service()
+
         # Use current time if timestamp not provided
         if timestamp is None:
             dt = datetime.datetime.now()
-        else:
-            # Parse timestamp
-            if isinstance(timestamp, str):
-                # Try to parse as ISO format first
-                try:
-                    dt = datetime.datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                except:
-                    # Try to parse as timestamp string
-                    dt = datetime.datetime.fromtimestamp(float(timestamp))
-            else:
+        elif isinstance(timestamp, str):
+            # Try to parse as timestamp string first, then as ISO format
+            try:
                 dt = datetime.datetime.fromtimestamp(float(timestamp))
+            except ValueError:
+                dt = datetime.datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+        else:
+            dt = datetime.datetime.fromtimestamp(float(timestamp))
+
+        # Resolve timezone (None means the configured default)
+        timezone_name = time_service.get_default_timezone() if timezone is None else timezone
+        if timezone_name.lower() == "local":
+            tz_obj = None
+        elif timezone_name.upper() == "UTC":
+            tz_obj = tz.tzutc()
+        else:
+            tz_obj = tz.gettz(timezone_name)
+            if tz_obj is None:
+                raise ValueError(f"Unknown timezone: {timezone_name}")
 
-        # Handle timezone
-        if timezone:
-            if timezone.lower() == "local":
-                dt = dt.replace(tzinfo=tz.tzlocal())
-            elif timezone.upper() == "UTC":
-                dt = dt.replace(tzinfo=tz.tzutc())
-            else:
-                target_tz = tz.gettz(timezone)
-                if target_tz:
-                    dt = dt.replace(tzinfo=tz.tzutc()).astimezone(target_tz)
+        # Naive times are local wall-clock times; convert the instant instead of relabelling it
+        dt = dt.astimezone(tz_obj)
+
+        if include_timezone_info is None:
+            include_timezone_info = time_service.should_display_timezone_info()
 
         # Format output
         if format == "iso":
-            result = dt.isoformat()
-        elif format == "custom":
+            return dt.isoformat()
+        if format == "custom":
             result = dt.strftime(custom_format)
-        else:  # formatted
-            result = dt.strftime("%Y-%m-%d %H:%M:%S")
-
-        # Add timezone info if requested
-        if include_timezone_info and timezone:
-            tz_name = dt.tzname() if dt.tzinfo else "Local"
-            result += f" ({tz_name})"
-
+            return f"{result} ({dt.tzname()})" if include_timezone_info else result
+
+        result = dt.strftime("%Y-%m-%d %H:%M:%S")
+        if include_timezone_info:
+            return (
+                f"格式化时间: {result} ({dt.tzname()})\n\n完整时间信息:\n"
+                f"- ISO 格式: {dt.isoformat()}\n- Unix 时间戳: {int(dt.timestamp())}\n"
+                f"- 格式化时间: {result}\n- 配置时区: {timezone_name}\n- 实际时区: {dt.tzname()}"
+            )
         return result
 
     except Exception as e:
@@ -430,7 +441,9 @@ def calc_diff(start_time: str,
             {"timezone": "Asia/Shanghai"},
             {"timezone": "America/New_York", "include_dst_info": True}
         ]
-    }
+    },
+    # 结果包含秒级当前时间，只合并同一秒内的重复调用
+    cache={"ttl": 1}
 )
 def get_tz_info(timezone: str = "local", include_dst_info: bool = True):
     """Get timezone information including current time, UTC offset, etc."""
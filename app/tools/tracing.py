@@ -0,0 +1,311 @@
+"""
+MCP 工具调用追踪
+MCP Tool Invocation Tracing
+
+特性:
+- 按工具统计调用数、错误数、缓存命中数、参数校验失败数、排队/执行/序列化耗时以及参数和结果大小
+- 延迟与大小以直方图输出到 /metrics，按 (category, tool) 打标签
+- 环形缓冲区保留最近的调用记录，可查询其中最慢的 N 次调用
+- 调用记录中的参数经过脱敏：敏感参数名（包括嵌套字典的键）只保留占位符，URL 去掉查询参数值，
+  其余值先截断再清理控制字符
+- 超过阈值的慢调用写入告警日志
+"""
+
+import json
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Any, Deque, Dict, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from app.core.config import MCP_SLOW_CALL_SECONDS, MCP_TRACE_BUFFER_SIZE, MCP_TRACE_SLOWEST
+from app.core.logging import setup_logging
+from app.core.metrics import DEFAULT_SIZE_BUCKETS, get_metrics_registry
+from app.core.secure_logging import sanitize_for_log
+
+logger = setup_logging("INFO")
+
+# 参数名（包括嵌套字典的键）匹配时不记录参数值
+SENSITIVE_ARGUMENT_PATTERN = re.compile(
+    r"token|secret|password|passwd|auth|credential|api_?key|cookie|session", re.IGNORECASE
+)
+MAX_ARGUMENT_VALUE_LENGTH = 100
+# 嵌套参数脱敏时最多展开的层数和每层元素数
+MAX_REDACT_DEPTH = 3
+MAX_REDACT_ITEMS = 20
+
+URL_PATTERN = re.compile(r"^[a-zA-Z][a-zA-Z0-9+.-]*://")
+QUERY_VALUE_PATTERN = re.compile(r"=[^&;]*")
+
+
+def _truncate(text: str) -> str:
+    if len(text) > MAX_ARGUMENT_VALUE_LENGTH:
+        return text[:MAX_ARGUMENT_VALUE_LENGTH - 3] + "..."
+    return text
+
+
+def _redact_url(text: str) -> str:
+    """去掉 URL 中的用户信息和查询参数值"""
+    if not URL_PATTERN.match(text):
+        return text
+    try:
+        parts = urlsplit(text)
+    except ValueError:
+        return text
+    netloc = parts.netloc
+    if "@" in netloc:
+        netloc = "***@" + netloc.rsplit("@", 1)[1]
+    query = QUERY_VALUE_PATTERN.sub("=***", parts.query)
+    return urlunsplit((parts.scheme, netloc, parts.path, query, parts.fragment))
+
+
+def _redact(value: Any, depth: int = 0) -> Any:
+    """按键名递归脱敏，字符串先截断再处理，避免对大参数做完整拷贝"""
+    if isinstance(value, str):
+        return _redact_url(value[:MAX_ARGUMENT_VALUE_LENGTH])
+    if isinstance(value, (bytes, bytearray)):
+        return f"<{len(value)} bytes>"
+    if isinstance(value, dict):
+        if depth >= MAX_REDACT_DEPTH:
+            return "{...}"
+        redacted = {}
+        for index, (key, item) in enumerate(value.items()):
+            if index >= MAX_REDACT_ITEMS:
+                redacted["..."] = f"{len(value) - index} more"
+                break
+            key = str(key)[:MAX_ARGUMENT_VALUE_LENGTH]
+            redacted[key] = "***" if SENSITIVE_ARGUMENT_PATTERN.search(key) else _redact(item, depth + 1)
+        return redacted
+    if isinstance(value, (list, tuple)):
+        if depth >= MAX_REDACT_DEPTH:
+            return "[...]"
+        redacted = [_redact(item, depth + 1) for item in value[:MAX_REDACT_ITEMS]]
+        if len(value) > MAX_REDACT_ITEMS:
+            redacted.append(f"... {len(value) - MAX_REDACT_ITEMS} more")
+        return redacted
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    return str(value)[:MAX_ARGUMENT_VALUE_LENGTH]
+
+
+def sanitize_arguments(arguments: Dict[str, Any]) -> Dict[str, str]:
+    """脱敏调用参数，用于调用记录展示"""
+    sanitized = {}
+    for name, value in arguments.items():
+        name = str(name)
+        if SENSITIVE_ARGUMENT_PATTERN.search(name):
+            sanitized[sanitize_for_log(name)] = "***"
+            continue
+        redacted = _redact(value)
+        if isinstance(redacted, (dict, list)):
+            text = json.dumps(redacted, ensure_ascii=False, default=str)
+        else:
+            text = str(redacted)
+        sanitized[sanitize_for_log(name)] = _truncate(sanitize_for_log(_truncate(text)))
+    return sanitized
+
+
+def payload_size(value: Any) -> int:
+    """估算参数/结果序列化为 JSON 后的字节数（不做实际序列化）"""
+    if isinstance(value, str):
+        # ASCII 字符串长度即字节数，无需编码拷贝
+        return (len(value) if value.isascii() else len(value.encode("utf-8"))) + 2
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        separators = max(len(value) * 2 - 1, 0)
+        return 2 + separators + sum(payload_size(str(key)) + payload_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return 2 + max(len(value) - 1, 0) + sum(payload_size(item) for item in value)
+    if value is None:
+        return 4
+    return len(str(value))
+
+
+@dataclass(frozen=True)
+class ToolCallRecord:
+    """单次工具调用记录"""
+    tool: str
+    category: str
+    timestamp: float
+    total_ms: float
+    queue_ms: float
+    run_ms: float
+    serialize_ms: float
+    argument_bytes: int
+    result_bytes: Optional[int]
+    cached: bool
+    error: Optional[str]
+    arguments: Dict[str, str]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class ToolStats:
+    """单个工具的累计统计"""
+    calls: int = 0
+    errors: int = 0
+    cached: int = 0
+    invalid: int = 0
+    queue_total: float = 0.0
+    queue_max: float = 0.0
+    run_total: float = 0.0
+    run_max: float = 0.0
+    serialize_total: float = 0.0
+    total_time: float = 0.0
+    argument_bytes: int = 0
+    result_bytes: int = 0
+    result_bytes_max: int = 0
+
+    def record(self, record: ToolCallRecord, queue_time: float, run_time: float, serialize_time: float, total_time: float):
+        self.calls += 1
+        if record.error:
+            self.errors += 1
+        if record.cached:
+            self.cached += 1
+        self.queue_total += queue_time
+        self.run_total += run_time
+        self.queue_max = max(self.queue_max, queue_time)
+        self.run_max = max(self.run_max, run_time)
+        self.serialize_total += serialize_time
+        self.total_time += total_time
+        self.argument_bytes += record.argument_bytes
+        if record.result_bytes is not None:
+            self.result_bytes += record.result_bytes
+            self.result_bytes_max = max(self.result_bytes_max, record.result_bytes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        calls = self.calls or 1
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "cached": self.cached,
+            "invalid": self.invalid,
+            "avg_queue_ms": round(self.queue_total / calls * 1000, 3),
+            "max_queue_ms": round(self.queue_max * 1000, 3),
+            "avg_run_ms": round(self.run_total / calls * 1000, 3),
+            "max_run_ms": round(self.run_max * 1000, 3),
+            "avg_serialize_ms": round(self.serialize_total / calls * 1000, 3),
+            "total_ms": round(self.total_time * 1000, 3),
+            "avg_argument_bytes": round(self.argument_bytes / calls),
+            "avg_result_bytes": round(self.result_bytes / calls),
+            "max_result_bytes": self.result_bytes_max,
+        }
+
+
+class ToolTracer:
+    """工具调用追踪器"""
+
+    def __init__(self, buffer_size: int = MCP_TRACE_BUFFER_SIZE, slow_call_seconds: float = MCP_SLOW_CALL_SECONDS):
+        self.slow_call_seconds = slow_call_seconds
+        self._recent: Deque[ToolCallRecord] = deque(maxlen=buffer_size)
+        self._stats: Dict[str, ToolStats] = {}
+        self._lock = threading.Lock()
+        self.slow_calls = 0
+
+        registry = get_metrics_registry()
+        labels = ("category", "tool")
+        self._calls = registry.counter("lazyai_mcp_tool_calls_total", "MCP 工具调用次数", labels + ("status",))
+        self._invalid = registry.counter(
+            "lazyai_mcp_tool_validation_failures_total", "MCP 工具参数校验失败次数", labels
+        )
+        self._queue_seconds = registry.histogram(
+            "lazyai_mcp_tool_queue_seconds", "MCP 工具线程池排队时间（秒）", labels
+        )
+        self._run_seconds = registry.histogram(
+            "lazyai_mcp_tool_run_seconds", "MCP 工具执行时间（秒）", labels
+        )
+        self._serialize_seconds = registry.histogram(
+            "lazyai_mcp_tool_serialize_seconds", "MCP 工具结果序列化时间（秒）", labels
+        )
+        self._argument_bytes = registry.histogram(
+            "lazyai_mcp_tool_argument_bytes", "MCP 工具调用参数大小（字节）", labels, buckets=DEFAULT_SIZE_BUCKETS
+        )
+        self._result_bytes = registry.histogram(
+            "lazyai_mcp_tool_result_bytes", "MCP 工具结果大小（字节）", labels, buckets=DEFAULT_SIZE_BUCKETS
+        )
+
+    def record(self, tool: str, category: str, arguments: Dict[str, Any], *, total_time: float,
+               queue_time: float = 0.0, run_time: float = 0.0, serialize_time: float = 0.0,
+               result_bytes: Optional[int] = None, cached: bool = False, pooled: bool = False,
+               error: Optional[str] = None) -> ToolCallRecord:
+        """记录一次调用；cached 表示结果来自缓存，pooled 表示在线程池中执行"""
+        record = ToolCallRecord(
+            tool=tool,
+            category=category,
+            timestamp=time.time(),
+            total_ms=round(total_time * 1000, 3),
+            queue_ms=round(queue_time * 1000, 3),
+            run_ms=round(run_time * 1000, 3),
+            serialize_ms=round(serialize_time * 1000, 3),
+            argument_bytes=payload_size(arguments),
+            result_bytes=result_bytes,
+            cached=cached,
+            error=error,
+            arguments=sanitize_arguments(arguments),
+        )
+
+        labels = (category, tool)
+        self._calls.inc(labels + ("error" if error else "ok",))
+        if not cached:
+            # 缓存命中没有执行阶段，不计入执行/排队分布
+            if pooled:
+                self._queue_seconds.observe(queue_time, labels)
+            self._run_seconds.observe(run_time, labels)
+        if serialize_time:
+            self._serialize_seconds.observe(serialize_time, labels)
+        self._argument_bytes.observe(record.argument_bytes, labels)
+        if result_bytes is not None:
+            self._result_bytes.observe(result_bytes, labels)
+
+        with self._lock:
+            self._recent.append(record)
+            stats = self._stats.get(tool)
+            if stats is None:
+                stats = self._stats[tool] = ToolStats()
+            stats.record(record, queue_time, run_time, serialize_time, total_time)
+
+        if self.slow_call_seconds and total_time >= self.slow_call_seconds:
+            self.slow_calls += 1
+            logger.warning(
+                f"Slow MCP tool call: {sanitize_for_log(tool)} took {record.total_ms:.0f}ms "
+                f"(queue {record.queue_ms:.0f}ms, run {record.run_ms:.0f}ms) "
+                f"arguments={sanitize_for_log(json.dumps(record.arguments, ensure_ascii=False))}"
+            )
+        return record
+
+    def record_invalid(self, tool: str, category: str):
+        """记录一次参数校验失败（工具未执行，不计入调用数）"""
+        self._invalid.inc((category, tool))
+        with self._lock:
+            stats = self._stats.get(tool)
+            if stats is None:
+                stats = self._stats[tool] = ToolStats()
+            stats.invalid += 1
+
+    def get_tool_stats(self) -> Dict[str, Dict[str, Any]]:
+        """各工具的累计统计"""
+        with self._lock:
+            return {name: stats.to_dict() for name, stats in self._stats.items()}
+
+    def slowest(self, limit: int = MCP_TRACE_SLOWEST) -> List[Dict[str, Any]]:
+        """最近调用中耗时最长的 limit 次"""
+        with self._lock:
+            recent = list(self._recent)
+        recent.sort(key=lambda r: r.total_ms, reverse=True)
+        return [r.to_dict() for r in recent[:limit]]
+
+    def get_status(self, limit: int = MCP_TRACE_SLOWEST) -> Dict[str, Any]:
+        with self._lock:
+            buffered = len(self._recent)
+        return {
+            "recent_calls": buffered,
+            "buffer_size": self._recent.maxlen,
+            "slow_call_threshold_ms": round(self.slow_call_seconds * 1000, 3),
+            "slow_calls": self.slow_calls,
+            "slowest": self.slowest(limit),
+        }
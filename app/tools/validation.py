@@ -0,0 +1,335 @@
+"""
+MCP 工具参数校验
+MCP Tool Argument Validation
+
+特性:
+- 工具注册时把 @mcp_tool(schema=...) 编译为校验函数树，调用时不再解释 Schema
+- 支持 type、enum、const、properties、required、additionalProperties、items、
+  长度/数量/数值范围、pattern（注册时预编译）、oneOf/anyOf/allOf
+- 未识别的关键字（description、format、examples 等）忽略，与 JSON Schema 语义一致
+- 属性声明 "default": None 时允许显式传入 null（与省略该参数等价）
+- 校验通过后原地补全顶层参数的默认值（只补全实现函数接受的参数），不复制参数字典
+- 校验失败抛出 ToolArgumentError，携带全部（最多 MAX_ERRORS 条）错误位置与原因
+"""
+
+import copy
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 校验函数：(值, 位置, 错误列表)
+Check = Callable[[Any, str, List[str]], None]
+
+MAX_ERRORS = 10
+
+
+class SchemaCompileError(ValueError):
+    """工具 Schema 本身不合法"""
+
+
+class ToolArgumentError(ValueError):
+    """工具调用参数不符合 Schema"""
+
+    def __init__(self, tool_name: str, errors: Sequence[str]):
+        self.tool_name = tool_name
+        self.errors = list(errors[:MAX_ERRORS])
+        super().__init__(f"Invalid arguments for tool '{tool_name}': {'; '.join(self.errors)}")
+
+
+def _is_integer(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+_TYPE_CHECKS: Dict[str, Callable[[Any], bool]] = {
+    "string": lambda value: isinstance(value, str),
+    "integer": _is_integer,
+    "number": _is_number,
+    "boolean": lambda value: isinstance(value, bool),
+    "array": lambda value: isinstance(value, (list, tuple)),
+    "object": lambda value: isinstance(value, dict),
+    "null": lambda value: value is None,
+}
+
+
+def _sequence(checks: List[Check]) -> Optional[Check]:
+    if not checks:
+        return None
+    if len(checks) == 1:
+        return checks[0]
+
+    def check(value, path, errors):
+        for item in checks:
+            item(value, path, errors)
+    return check
+
+
+def _compile_type(spec: Any, pointer: str) -> Check:
+    names = [spec] if isinstance(spec, str) else spec
+    if not isinstance(names, list) or not names or any(name not in _TYPE_CHECKS for name in names):
+        raise SchemaCompileError(f"{pointer}: unsupported type {spec!r}")
+    predicates = tuple(_TYPE_CHECKS[name] for name in names)
+    expected = "/".join(names)
+
+    if len(predicates) == 1:
+        predicate = predicates[0]
+
+        def check(value, path, errors):
+            if not predicate(value):
+                errors.append(f"{path}: 应为 {expected} 类型")
+    else:
+        def check(value, path, errors):
+            if not any(predicate(value) for predicate in predicates):
+                errors.append(f"{path}: 应为 {expected} 类型")
+    return check
+
+
+def _compile_bounds(schema: Dict[str, Any], pointer: str) -> List[Check]:
+    checks: List[Check] = []
+
+    def bound(keyword: str, applies: Callable[[Any], bool], measure: Callable[[Any], Any],
+              violated: Callable[[Any, Any], bool], message: str):
+        if keyword not in schema:
+            return
+        limit = schema[keyword]
+        if not _is_number(limit):
+            raise SchemaCompileError(f"{pointer}/{keyword}: must be a number")
+
+        def check(value, path, errors):
+            if applies(value) and violated(measure(value), limit):
+                errors.append(f"{path}: {message} {limit}")
+        checks.append(check)
+
+    def identity(value):
+        return value
+
+    is_string = _TYPE_CHECKS["string"]
+    is_array = _TYPE_CHECKS["array"]
+    is_object = _TYPE_CHECKS["object"]
+    bound("minimum", _is_number, identity, lambda v, n: v < n, "不能小于")
+    bound("maximum", _is_number, identity, lambda v, n: v > n, "不能大于")
+    bound("exclusiveMinimum", _is_number, identity, lambda v, n: v <= n, "必须大于")
+    bound("exclusiveMaximum", _is_number, identity, lambda v, n: v >= n, "必须小于")
+    bound("minLength", is_string, len, lambda v, n: v < n, "长度不能小于")
+    bound("maxLength", is_string, len, lambda v, n: v > n, "长度不能大于")
+    bound("minItems", is_array, len, lambda v, n: v < n, "元素数不能少于")
+    bound("maxItems", is_array, len, lambda v, n: v > n, "元素数不能多于")
+    bound("minProperties", is_object, len, lambda v, n: v < n, "属性数不能少于")
+    bound("maxProperties", is_object, len, lambda v, n: v > n, "属性数不能多于")
+    return checks
+
+
+def _nullable_default(schema: Any, check: Optional[Check]) -> Optional[Check]:
+    """声明 "default": None 的属性显式传入 null 等同于省略"""
+    if check is None or not isinstance(schema, dict) or "default" not in schema or schema["default"] is not None:
+        return check
+
+    def nullable(value, path, errors):
+        if value is not None:
+            check(value, path, errors)
+    return nullable
+
+
+def _compile_object(schema: Dict[str, Any], pointer: str) -> Optional[Check]:
+    properties = schema.get("properties") or {}
+    required = schema.get("required") or []
+    additional = schema.get("additionalProperties", True)
+    if not isinstance(properties, dict) or not isinstance(required, list):
+        raise SchemaCompileError(f"{pointer}: properties must be an object and required a list")
+
+    property_checks = {
+        name: _nullable_default(sub_schema, _compile(sub_schema, f"{pointer}/properties/{name}"))
+        for name, sub_schema in properties.items()
+    }
+    additional_check = None if isinstance(additional, bool) else _compile(additional, f"{pointer}/additionalProperties")
+    reject_additional = additional is False
+    if not required and not reject_additional and additional_check is None \
+            and not any(property_checks.values()):
+        return None
+    required = tuple(required)
+
+    def check(value, path, errors):
+        if not isinstance(value, dict):
+            return
+        for name in required:
+            if name not in value:
+                errors.append(f"{path}.{name}: 缺少必填参数")
+        for name, item in value.items():
+            if name in property_checks:
+                sub_check = property_checks[name]
+                if sub_check is not None:
+                    sub_check(item, f"{path}.{name}", errors)
+            elif reject_additional:
+                errors.append(f"{path}.{name}: 不支持的参数")
+            elif additional_check is not None:
+                additional_check(item, f"{path}.{name}", errors)
+    return check
+
+
+def _compile_items(schema: Dict[str, Any], pointer: str) -> List[Check]:
+    checks: List[Check] = []
+    items = schema.get("items")
+    if isinstance(items, dict):
+        item_check = _compile(items, f"{pointer}/items")
+        if item_check is not None:
+            def check(value, path, errors):
+                if isinstance(value, (list, tuple)):
+                    for index, item in enumerate(value):
+                        item_check(item, f"{path}[{index}]", errors)
+            checks.append(check)
+
+    if schema.get("uniqueItems") is True:
+        def unique(value, path, errors):
+            if isinstance(value, (list, tuple)):
+                seen = []
+                for item in value:
+                    if item in seen:
+                        errors.append(f"{path}: 元素不能重复")
+                        return
+                    seen.append(item)
+        checks.append(unique)
+    return checks
+
+
+def _compile_combinators(schema: Dict[str, Any], pointer: str) -> List[Check]:
+    checks: List[Check] = []
+    for keyword in ("allOf", "anyOf", "oneOf"):
+        if keyword not in schema:
+            continue
+        branches = schema[keyword]
+        if not isinstance(branches, list) or not branches:
+            raise SchemaCompileError(f"{pointer}/{keyword}: must be a non-empty list")
+        compiled = [_compile(branch, f"{pointer}/{keyword}/{i}") for i, branch in enumerate(branches)]
+
+        def matches(branch: Optional[Check], value) -> bool:
+            if branch is None:
+                return True
+            branch_errors: List[str] = []
+            branch(value, "", branch_errors)
+            return not branch_errors
+
+        if keyword == "allOf":
+            checks.extend(branch for branch in compiled if branch is not None)
+        elif keyword == "anyOf":
+            def any_of(value, path, errors, compiled=compiled):
+                if not any(matches(branch, value) for branch in compiled):
+                    errors.append(f"{path}: 不符合 anyOf 中的任何一项")
+            checks.append(any_of)
+        else:
+            def one_of(value, path, errors, compiled=compiled):
+                matched = sum(1 for branch in compiled if matches(branch, value))
+                if matched != 1:
+                    errors.append(f"{path}: 应恰好符合 oneOf 中的一项（匹配 {matched} 项）")
+            checks.append(one_of)
+    return checks
+
+
+def _compile(schema: Any, pointer: str = "#") -> Optional[Check]:
+    """编译单个 Schema 节点，无约束时返回 None"""
+    if schema is True:
+        return None
+    if schema is False:
+        return lambda value, path, errors: errors.append(f"{path}: 不允许该参数")
+    if not isinstance(schema, dict):
+        raise SchemaCompileError(f"{pointer}: schema must be an object")
+
+    checks: List[Check] = []
+    if "type" in schema:
+        checks.append(_compile_type(schema["type"], pointer))
+
+    if "enum" in schema:
+        allowed = schema["enum"]
+        if not isinstance(allowed, list):
+            raise SchemaCompileError(f"{pointer}/enum: must be a list")
+        # 值全部可哈希时用集合查找；bool 与 1/0 在集合中相等，需额外比较类型
+        try:
+            allowed_set = frozenset((type(v), v) for v in allowed)
+        except TypeError:
+            allowed_set = None
+
+        def enum_check(value, path, errors):
+            if allowed_set is not None:
+                try:
+                    if (type(value), value) in allowed_set:
+                        return
+                except TypeError:
+                    pass
+            elif value in allowed:
+                return
+            errors.append(f"{path}: 取值必须是 {allowed} 之一")
+        checks.append(enum_check)
+
+    if "const" in schema:
+        expected = schema["const"]
+
+        def const_check(value, path, errors):
+            if value != expected or type(value) is not type(expected):
+                errors.append(f"{path}: 取值必须是 {expected!r}")
+        checks.append(const_check)
+
+    if "pattern" in schema:
+        try:
+            pattern = re.compile(schema["pattern"])
+        except (re.error, TypeError) as e:
+            raise SchemaCompileError(f"{pointer}/pattern: {e}") from e
+
+        def pattern_check(value, path, errors):
+            if isinstance(value, str) and pattern.search(value) is None:
+                errors.append(f"{path}: 不符合格式 {pattern.pattern}")
+        checks.append(pattern_check)
+
+    checks.extend(_compile_bounds(schema, pointer))
+    object_check = _compile_object(schema, pointer)
+    if object_check is not None:
+        checks.append(object_check)
+    checks.extend(_compile_items(schema, pointer))
+    checks.extend(_compile_combinators(schema, pointer))
+    return _sequence(checks)
+
+
+class ArgumentValidator:
+    """编译后的工具参数校验器"""
+
+    __slots__ = ("tool_name", "_check", "_defaults")
+
+    def __init__(self, tool_name: str, check: Optional[Check], defaults: Tuple[Tuple[str, Any], ...]):
+        self.tool_name = tool_name
+        self._check = check
+        self._defaults = defaults
+
+    @property
+    def defaults(self) -> Dict[str, Any]:
+        return dict(self._defaults)
+
+    def validate(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """校验参数并原地补全默认值，返回同一个字典"""
+        if self._check is not None:
+            errors: List[str] = []
+            self._check(arguments, "arguments", errors)
+            if errors:
+                raise ToolArgumentError(self.tool_name, errors)
+        for name, default in self._defaults:
+            if name not in arguments:
+                # 可变默认值每次复制，避免工具修改后影响后续调用
+                arguments[name] = copy.deepcopy(default) if isinstance(default, (dict, list)) else default
+        return arguments
+
+
+def compile_validator(tool_name: str, schema: Optional[Dict[str, Any]],
+                      parameters: Optional[Iterable[str]] = None) -> ArgumentValidator:
+    """把工具 Schema 编译为校验器
+
+    parameters 为实现函数接受的参数名，只为这些参数补全默认值；None 表示接受任意参数。
+    """
+    schema = schema or {}
+    check = _compile(schema)
+    accepted = None if parameters is None else set(parameters)
+    properties = schema.get("properties") or {}
+    defaults = tuple(
+        (name, sub_schema["default"])
+        for name, sub_schema in properties.items()
+        if isinstance(sub_schema, dict) and "default" in sub_schema and (accepted is None or name in accepted)
+    )
+    return ArgumentValidator(tool_name, check, defaults)
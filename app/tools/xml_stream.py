@@ -0,0 +1,295 @@
+"""
+增量 XML / RSS / Atom 解析
+Incremental XML and Feed Parsing
+
+特性:
+- 基于 xml.etree.ElementTree.XMLPullParser，按块喂入（字符串切片或 HTTP 响应流），元素完成即处理
+- FeedParser：RSS item / Atom entry 完成时提取字段，随即清空并从父元素移除；达到 max_items 后停止解析
+- XMLStreamParser：元素完成时自底向上构建字典结构、记录元素信息和纯文本，子元素随即释放；
+  只有需要执行 XPath 查询时才保留完整的树
+- parse_text / parse_stream 统一驱动两类解析器，提前结束时不再读取剩余内容
+"""
+
+import xml.etree.ElementTree as ET
+from typing import Any, AsyncIterable, Dict, List, Optional, Tuple, Union
+
+from app.tools.streaming import iter_text_chunks
+
+ATOM_NS = "{http://www.w3.org/2005/Atom}"
+CONTENT_NS = {"content": "http://purl.org/rss/1.0/modules/content/"}
+RSS_CHANNEL_FIELDS = ("title", "description", "link", "language", "lastBuildDate", "generator")
+ATOM_FEED_FIELDS = ("title", "subtitle", "id", "updated", "generator")
+
+Chunk = Union[str, bytes]
+
+
+def _text(element: Optional[ET.Element]) -> Optional[str]:
+    return element.text if element is not None else ""
+
+
+def rss_item(item: ET.Element, extract_content: bool = True, include_raw: bool = False) -> Dict[str, Any]:
+    """提取一个 RSS item"""
+    item_data = {
+        "title": _text(item.find("title")),
+        "description": _text(item.find("description")),
+        "link": _text(item.find("link")),
+        "pubDate": _text(item.find("pubDate")),
+        "guid": _text(item.find("guid")),
+        "author": _text(item.find("author")),
+        "categories": [category.text for category in item.findall("category") if category.text],
+    }
+    if extract_content:
+        content = item.find("content:encoded", CONTENT_NS)
+        if content is not None:
+            item_data["content"] = content.text
+    if include_raw:
+        item_data["raw_xml"] = ET.tostring(item, encoding="unicode")
+    return item_data
+
+
+def atom_entry(entry: ET.Element, extract_content: bool = True, include_raw: bool = False) -> Dict[str, Any]:
+    """提取一个 Atom entry"""
+    item_data = {
+        "title": _text(entry.find(f".//{ATOM_NS}title")),
+        "summary": _text(entry.find(f".//{ATOM_NS}summary")),
+        "id": _text(entry.find(f".//{ATOM_NS}id")),
+        "published": _text(entry.find(f".//{ATOM_NS}published")),
+        "updated": _text(entry.find(f".//{ATOM_NS}updated")),
+        "categories": [category.get("term") for category in entry.findall(f".//{ATOM_NS}category")
+                       if category.get("term")],
+    }
+    link = entry.find(f".//{ATOM_NS}link")
+    if link is not None:
+        item_data["link"] = link.get("href", "")
+    author = entry.find(f".//{ATOM_NS}author/{ATOM_NS}name")
+    if author is not None:
+        item_data["author"] = author.text
+    if extract_content:
+        content = entry.find(f".//{ATOM_NS}content")
+        if content is not None:
+            item_data["content"] = content.text
+    if include_raw:
+        item_data["raw_xml"] = ET.tostring(entry, encoding="unicode")
+    return item_data
+
+
+class _PullParser:
+    """XMLPullParser 的公共驱动：feed 返回是否已提前结束"""
+
+    def __init__(self):
+        self.done = False
+        self._parser = ET.XMLPullParser(events=("start", "end"))
+
+    def feed(self, data: Chunk) -> bool:
+        if not self.done:
+            self._parser.feed(data)
+            self._drain()
+        return self.done
+
+    def close(self):
+        """输入结束；未提前结束时检查文档完整性"""
+        if not self.done:
+            self._parser.close()
+            self._drain()
+        self._finish()
+
+    def _drain(self):
+        for event, element in self._parser.read_events():
+            if event == "start":
+                self._start(element)
+            else:
+                self._end(element)
+            if self.done:
+                break
+
+    def _start(self, element: ET.Element):
+        raise NotImplementedError
+
+    def _end(self, element: ET.Element):
+        raise NotImplementedError
+
+    def _finish(self):
+        pass
+
+
+class FeedParser(_PullParser):
+    """增量解析 RSS/Atom 订阅源"""
+
+    def __init__(self, max_items: int = 50, extract_content: bool = True, include_raw: bool = False):
+        super().__init__()
+        self.max_items = max_items
+        self.extract_content = extract_content
+        self.include_raw = include_raw
+        self.feed_type = ""
+        self.feed_info: Dict[str, Any] = {}
+        self.items: List[Dict[str, Any]] = []
+        self._stack: List[ET.Element] = []
+        self._channel: Optional[ET.Element] = None
+        self._seen = set()
+
+    def _start(self, element: ET.Element):
+        self._stack.append(element)
+        if len(self._stack) == 1:
+            tag = element.tag.lower()
+            if tag == "rss" or "rss" in tag:
+                self.feed_type = "RSS"
+            elif "atom" in tag or tag.endswith("feed"):
+                self.feed_type = "Atom"
+                self.feed_info = dict.fromkeys(ATOM_FEED_FIELDS, "")
+        elif self.feed_type == "RSS" and self._channel is None and element.tag == "channel":
+            self._channel = element
+            self.feed_info = dict.fromkeys(RSS_CHANNEL_FIELDS, "")
+
+    def _end(self, element: ET.Element):
+        self._stack.pop()
+        parent = self._stack[-1] if self._stack else None
+        if self.feed_type == "RSS":
+            if parent is not None and parent is self._channel:
+                if element.tag == "item":
+                    self._add_item(rss_item(element, self.extract_content, self.include_raw), element, parent)
+                elif element.tag in RSS_CHANNEL_FIELDS:
+                    self._set_info(element.tag, element.text)
+        elif self.feed_type == "Atom":
+            if element.tag == f"{ATOM_NS}entry":
+                self._add_item(atom_entry(element, self.extract_content, self.include_raw), element, parent)
+            elif len(self._stack) == 1 and element.tag.startswith(ATOM_NS):
+                name = element.tag[len(ATOM_NS):]
+                if name in ATOM_FEED_FIELDS:
+                    self._set_info(name, element.text)
+                elif name == "link":
+                    self._set_info("link", element.get("href", ""))
+
+    def _set_info(self, name: str, value: Optional[str]):
+        # 与 find() 一致，只取第一次出现的值
+        if name not in self._seen:
+            self._seen.add(name)
+            self.feed_info[name] = value
+
+    def _add_item(self, item_data: Dict[str, Any], element: ET.Element, parent: Optional[ET.Element]):
+        if len(self.items) < self.max_items:
+            self.items.append(item_data)
+        # 条目已提取，释放其子树
+        element.clear()
+        if parent is not None:
+            parent.remove(element)
+        if len(self.items) >= self.max_items:
+            self.done = True
+
+
+class _OpenElement:
+    __slots__ = ("element", "info", "text_slot", "tail_slot", "children", "structure")
+
+    def __init__(self, element: ET.Element, info: Dict[str, Any], text_slot: int):
+        self.element = element
+        self.info = info
+        self.text_slot = text_slot
+        self.tail_slot = -1
+        self.children: List["_OpenElement"] = []
+        self.structure: Dict[str, Any] = {}
+
+
+class XMLStreamParser(_PullParser):
+    """增量解析通用 XML，输出与 parse_xml 相同的 structure / elements / text_content"""
+
+    def __init__(self, extract_attributes: bool = True, build_structure: bool = True,
+                 keep_tree: bool = False, max_elements: Optional[int] = None):
+        super().__init__()
+        self.extract_attributes = extract_attributes
+        self.build_structure = build_structure
+        self.keep_tree = keep_tree
+        self.max_elements = max_elements
+        self.root: Optional[ET.Element] = None
+        self.root_tag = ""
+        self.structure: Dict[str, Any] = {}
+        self.elements: List[Dict[str, Any]] = []
+        self.truncated = False
+        self._stack: List[_OpenElement] = []
+        # 纯文本片段按文档顺序预留位置：元素 text 在 start 时预留，tail 在 end 时预留
+        self._text_parts: List[str] = []
+
+    @property
+    def text_content(self) -> str:
+        return "".join(self._text_parts).strip()
+
+    def _start(self, element: ET.Element):
+        if self.max_elements is not None and len(self.elements) >= self.max_elements:
+            self.truncated = True
+            self.done = True
+            return
+        info = {
+            "tag": element.tag,
+            "text": "",
+            "attributes": dict(element.attrib) if self.extract_attributes else {},
+            "tail": "",
+        }
+        self.elements.append(info)
+        self._text_parts.append("")
+        if self.root is None:
+            self.root = element
+            self.root_tag = element.tag
+        self._stack.append(_OpenElement(element, info, len(self._text_parts) - 1))
+
+    def _end(self, element: ET.Element):
+        record = self._stack.pop()
+        text = element.text or ""
+        record.info["text"] = text.strip()
+        self._text_parts[record.text_slot] = text
+        # 元素结束时所有子元素的 tail 都已确定
+        for child in record.children:
+            tail = child.element.tail or ""
+            child.info["tail"] = tail.strip()
+            self._text_parts[child.tail_slot] = tail
+
+        if self.build_structure:
+            structure: Dict[str, Any] = {}
+            if self.extract_attributes and element.attrib:
+                structure["@attributes"] = element.attrib
+            if text.strip():
+                structure["@text"] = text.strip()
+            for child in record.children:
+                tag = child.element.tag
+                if tag in structure:
+                    if not isinstance(structure[tag], list):
+                        structure[tag] = [structure[tag]]
+                    structure[tag].append(child.structure)
+                else:
+                    structure[tag] = child.structure
+            record.structure = structure
+
+        record.children = []
+        if not self.keep_tree:
+            del element[:]
+        self._text_parts.append("")
+        record.tail_slot = len(self._text_parts) - 1
+        if self._stack:
+            self._stack[-1].children.append(record)
+        elif self.build_structure:
+            self.structure = {element.tag: record.structure}
+
+    def _finish(self):
+        # 提前结束时按当前已解析的内容收尾仍未闭合的元素
+        while self._stack:
+            self._end(self._stack[-1].element)
+
+
+def parse_text(parser: _PullParser, text: str) -> _PullParser:
+    """分块喂入字符串，提前结束时不再处理剩余部分"""
+    for chunk in iter_text_chunks(text):
+        if parser.feed(chunk):
+            break
+    parser.close()
+    return parser
+
+
+async def parse_stream(parser: _PullParser, chunks: AsyncIterable[bytes],
+                       max_size: Optional[int] = None) -> Tuple[_PullParser, int]:
+    """从字节流喂入，返回解析器和实际读取的字节数；提前结束时停止读取"""
+    total = 0
+    async for chunk in chunks:
+        total += len(chunk)
+        if max_size is not None and total > max_size:
+            raise ValueError(f"Content too large: more than {max_size} bytes")
+        if parser.feed(chunk):
+            break
+    parser.close()
+    return parser, total
@@ -2,6 +2,7 @@
 pytest configuration file for LazyAI Studio backend tests
 """
 
+import asyncio
 import sys
 from pathlib import Path
 
@@ -121,6 +122,44 @@ def sample_command_metadata():
     }
 
 
+@pytest.fixture
+def make_scraping_tools(monkeypatch):
+    """Factory building WebScrapingTools through its constructor
+
+    Keyword arguments are the web-scraping category's custom_config (same keys as
+    the MCP config file). Retries don't wait and the on-disk HTTP cache is off
+    unless overridden. Sessions are closed on teardown.
+    """
+    import app.tools.fetch_tools as fetch_tools
+
+    created = []
+
+    def factory(**custom_config):
+        service = Mock()
+        service.get_config.return_value = None
+        service.get_tool_category_config.return_value = {
+            "custom_config": {"retry_delay": 0, "http_cache": {"enabled": False}, **custom_config}
+        }
+        monkeypatch.setattr(fetch_tools, "get_mcp_config_service", lambda: service)
+        tools = fetch_tools.WebScrapingTools()
+        created.append(tools)
+        return tools
+
+    yield factory
+    for tools in created:
+        asyncio.run(tools.close())
+
+
+@pytest.fixture
+def scraping_tools(make_scraping_tools, monkeypatch):
+    """WebScrapingTools instance installed as the global used by the fetch tools"""
+    import app.tools.fetch_tools as fetch_tools
+
+    tools = make_scraping_tools()
+    monkeypatch.setattr(fetch_tools, "_fetch_tools", tools)
+    return tools
+
+
 @pytest.fixture(autouse=True)
 def cleanup_logs():
     """Clean up log files after each test"""
@@ -0,0 +1,208 @@
+"""
+准入控制测试
+Admission Control Tests
+"""
+
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+import app.core.admission_control as admission_control
+from app.core.admission_control import (
+    AdmissionControlMiddleware,
+    AdmissionRejected,
+    ConcurrencyLimiter,
+    RouteClass,
+    admission_slot,
+    get_admission_status,
+)
+from app.core.metrics import MetricsMiddleware, MetricsRegistry
+
+
+def _build_app(gate: asyncio.Event, heavy_limit: int = 1, heavy_queue: int = 1, timeout: float = 0.2):
+    app = FastAPI()
+
+    @app.post("/api/models/refresh")
+    async def refresh():
+        await gate.wait()
+        return {"success": True}
+
+    @app.get("/api/models")
+    async def models():
+        return {"success": True}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    app.add_middleware(
+        AdmissionControlMiddleware,
+        route_classes=[
+            RouteClass("heavy", heavy_limit, heavy_queue, timeout, retry_after=7),
+            RouteClass("default", 10, 10, timeout),
+        ],
+    )
+    return app
+
+
+class TestConcurrencyLimiter:
+    """测试并发限制器"""
+
+    def test_fifo_handoff(self):
+        """测试释放时按 FIFO 移交名额"""
+        async def run():
+            limiter = ConcurrencyLimiter(RouteClass("t", 1, 5, 1.0))
+            await limiter.acquire()
+            order = []
+
+            async def waiter(i):
+                await limiter.acquire()
+                order.append(i)
+                limiter.release()
+
+            tasks = [asyncio.create_task(waiter(i)) for i in range(3)]
+            await asyncio.sleep(0.01)
+            assert limiter.queue_depth == 3
+            limiter.release()
+            await asyncio.gather(*tasks)
+            return order, limiter
+
+        order, limiter = asyncio.run(run())
+        assert order == [0, 1, 2]
+        assert limiter.active == 0
+        assert limiter.queue_depth == 0
+
+    def test_queue_full_and_timeout(self):
+        """测试队列满和排队超时"""
+        async def run():
+            limiter = ConcurrencyLimiter(RouteClass("t", 1, 1, 0.05))
+            await limiter.acquire()
+            queued = asyncio.create_task(limiter.acquire())
+            await asyncio.sleep(0)
+            reasons = []
+            try:
+                await limiter.acquire()
+            except AdmissionRejected as e:
+                reasons.append(e.reason)
+            try:
+                await queued
+            except AdmissionRejected as e:
+                reasons.append(e.reason)
+            return reasons, limiter
+
+        reasons, limiter = asyncio.run(run())
+        assert reasons == ["queue_full", "timeout"]
+        assert limiter.shed == 2
+        assert limiter.queue_depth == 0
+        assert limiter.active == 1
+
+
+class TestAdmissionControlMiddleware:
+    """测试准入控制中间件"""
+
+    def test_sheds_heavy_routes_without_starving_reads(self):
+        """测试高开销路由饱和时返回 503，普通读请求不受影响"""
+        async def run():
+            gate = asyncio.Event()
+            app = _build_app(gate)
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                first = asyncio.create_task(client.post("/api/models/refresh"))
+                await asyncio.sleep(0.02)
+                second = asyncio.create_task(client.post("/api/models/refresh"))
+                await asyncio.sleep(0.02)
+                shed = await client.post("/api/models/refresh")
+                read = await client.get("/api/models")
+                health = await client.get("/health")
+                status = get_admission_status()
+                gate.set()
+                return shed, read, health, await first, await second, status
+
+        shed, read, health, first, second, status = asyncio.run(run())
+        assert shed.status_code == 503
+        assert shed.headers["retry-after"] == "7"
+        assert shed.json()["success"] is False
+        assert read.status_code == 200
+        assert health.status_code == 200
+        assert first.status_code == 200
+        assert second.status_code == 200
+        heavy = next(s for s in status if s["class"] == "heavy")
+        assert heavy["active"] == 1
+        assert heavy["queue_depth"] == 1
+        assert heavy["shed"] == 1
+
+    def test_classify(self):
+        """测试路由分类"""
+        middleware = AdmissionControlMiddleware(app=None)
+        assert middleware.classify("POST", "/api/mcp/call-tool") == "heavy"
+        assert middleware.classify("POST", "/api/mcp/streamable") == "heavy"
+        # SSE 消息端点立即返回 202，工具调用在会话任务中占用 heavy 名额
+        assert middleware.classify("POST", "/api/mcp/messages") == "default"
+        assert middleware.classify("POST", "/api/deploy/export") == "heavy"
+        assert middleware.classify("GET", "/api/models") == "default"
+        assert middleware.classify("GET", "/api/events") is None
+        assert middleware.classify("GET", "/metrics") is None
+        assert middleware.classify("GET", "/static/js/main.js") is None
+
+    def test_shed_requests_labelled_by_class(self, monkeypatch):
+        """测试被卸载的请求在指标中按路由类别标记"""
+        monkeypatch.setattr(admission_control, "_current_middleware", None)
+        registry = MetricsRegistry()
+
+        async def run():
+            gate = asyncio.Event()
+            app = _build_app(gate, heavy_queue=0)
+            app.add_middleware(MetricsMiddleware, registry=registry)
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                first = asyncio.create_task(client.post("/api/models/refresh"))
+                await asyncio.sleep(0.02)
+                shed = await client.post("/api/models/refresh")
+                gate.set()
+                return shed, await first
+
+        shed, first = asyncio.run(run())
+        assert shed.status_code == 503
+        assert first.status_code == 200
+        requests_total = registry.get("lazyai_http_requests_total")
+        assert requests_total.get(("POST", "<shed:heavy>", "503")) == 1
+        assert requests_total.get(("POST", "<unmatched>", "503")) == 0
+
+
+class TestAdmissionSlot:
+    """测试后台任务占用准入名额"""
+
+    def test_slot_shares_class_limit(self, monkeypatch):
+        """测试后台任务与请求共享类别名额，饱和时抛出 AdmissionRejected"""
+        monkeypatch.setattr(admission_control, "_current_middleware", None)
+        middleware = AdmissionControlMiddleware(
+            app=None, route_classes=[RouteClass("heavy", 1, 0, 0.05)]
+        )
+
+        async def run():
+            async with admission_slot("heavy", "test task"):
+                assert middleware.limiters["heavy"].active == 1
+                with pytest.raises(AdmissionRejected):
+                    async with admission_slot("heavy", "test task"):
+                        pass
+            # 未配置的类别不限制
+            async with admission_slot("default", "test task"):
+                pass
+
+        asyncio.run(run())
+        status = middleware.limiters["heavy"].get_status()
+        assert status["active"] == 0
+        assert status["shed"] == 1
+
+    def test_slot_without_middleware(self, monkeypatch):
+        """测试准入控制未启用时不限制"""
+        monkeypatch.setattr(admission_control, "_current_middleware", None)
+
+        async def run():
+            async with admission_slot("heavy", "test task"):
+                async with admission_slot("heavy", "test task"):
+                    return True
+
+        assert asyncio.run(run()) is True
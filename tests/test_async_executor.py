@@ -0,0 +1,177 @@
+"""
+阻塞操作异步执行层测试
+Async Executor Tests
+"""
+
+import asyncio
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.async_executor import (
+    BlockingPool,
+    LoopBlockingMonitor,
+    async_service,
+    get_pools_status,
+    run_file_io,
+    run_storage,
+)
+from app.core.metrics import get_metrics_registry
+
+
+class TestBlockingPools:
+    """测试线程池执行"""
+
+    def test_runs_off_event_loop_thread(self):
+        """测试阻塞调用在独立线程中执行，存储与文件池互不共用线程"""
+        async def run():
+            loop_thread = threading.current_thread().name
+            storage_thread = await run_storage(lambda: threading.current_thread().name)
+            file_thread = await run_file_io(lambda: threading.current_thread().name)
+            return loop_thread, storage_thread, file_thread
+
+        loop_thread, storage_thread, file_thread = asyncio.run(run())
+        assert storage_thread.startswith("lazyai-storage")
+        assert file_thread.startswith("lazyai-file_io")
+        assert loop_thread not in (storage_thread, file_thread)
+
+    def test_loop_stays_responsive(self):
+        """测试慢阻塞调用期间事件循环仍可调度其他任务"""
+        async def run():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.005)
+                    ticks += 1
+
+            task = asyncio.create_task(ticker())
+            await run_file_io(time.sleep, 0.1)
+            task.cancel()
+            return ticks
+
+        assert asyncio.run(run()) >= 5
+
+    def test_pool_bounds_in_flight_work(self):
+        """测试线程池限制同时提交的任务数"""
+        pool = BlockingPool("test", max_workers=1, max_pending=1)
+        peak = 0
+
+        async def run():
+            nonlocal peak
+
+            async def observe():
+                nonlocal peak
+                while True:
+                    peak = max(peak, pool.pending + pool.active)
+                    await asyncio.sleep(0.001)
+
+            watcher = asyncio.create_task(observe())
+            await asyncio.gather(*(pool.run(time.sleep, 0.01) for _ in range(6)))
+            watcher.cancel()
+
+        asyncio.run(run())
+        pool.shutdown()
+        assert peak <= 2
+        assert pool.completed == 6
+
+    def test_cancelled_queued_job_releases_pending(self):
+        """测试排队中的任务被取消后不遗留排队计数"""
+        pool = BlockingPool("test", max_workers=1, max_pending=2)
+
+        async def run():
+            running = asyncio.create_task(pool.run(time.sleep, 0.1))
+            await asyncio.sleep(0.02)
+            queued = asyncio.create_task(pool.run(time.sleep, 0.1))
+            await asyncio.sleep(0.02)
+            assert pool.pending == 1
+            queued.cancel()
+            await asyncio.gather(queued, return_exceptions=True)
+            await running
+
+        asyncio.run(run())
+        pool.shutdown(wait=True)
+        assert pool.pending == 0
+        assert pool.active == 0
+        assert pool.completed == 1
+
+    def test_async_service_proxy(self):
+        """测试同步服务代理"""
+        class Service:
+            name = "svc"
+
+            def add(self, a, b=0):
+                return a + b
+
+        async def run():
+            proxy = async_service(Service())
+            return proxy.name, await proxy.add(1, b=2)
+
+        assert asyncio.run(run()) == ("svc", 3)
+        assert any(status["name"] == "storage" for status in get_pools_status())
+
+
+class TestLoopBlockingMonitor:
+    """测试事件循环阻塞检测"""
+
+    def test_flags_blocking_handler(self):
+        """测试检测在事件循环上阻塞的处理器"""
+        app = FastAPI()
+
+        @app.get("/blocking")
+        async def blocking():
+            time.sleep(0.05)
+            return {"ok": True}
+
+        @app.get("/offloaded")
+        async def offloaded():
+            await run_file_io(time.sleep, 0.05)
+            return {"ok": True}
+
+        app.add_middleware(LoopBlockingMonitor, threshold_ms=20)
+        client = TestClient(app)
+        counter = get_metrics_registry().counter(
+            "lazyai_loop_blocked_requests_total", "在事件循环上阻塞超过阈值的请求数", ("method", "route")
+        )
+        before_blocking = counter.get(("GET", "/blocking"))
+        before_offloaded = counter.get(("GET", "/offloaded"))
+
+        assert client.get("/blocking").status_code == 200
+        assert client.get("/offloaded").status_code == 200
+        assert counter.get(("GET", "/blocking")) == before_blocking + 1
+        assert counter.get(("GET", "/offloaded")) == before_offloaded
+
+
+class TestThreadSafeTinyDB:
+    """测试统一数据库跨线程访问"""
+
+    def test_concurrent_updates_are_not_lost(self, tmp_path):
+        """测试多个线程同时读-改-写同一张表不会丢失更新"""
+        from tinydb import Query
+        from app.core.unified_database import ThreadSafeTinyDB
+
+        db = ThreadSafeTinyDB(str(tmp_path / "db.json"))
+        table = db.table("counters")
+        table.insert({"name": "hits", "value": 0})
+        Counter = Query()
+
+        def increment(doc):
+            doc["value"] += 1
+
+        def worker(index):
+            for i in range(25):
+                table.update(increment, Counter.name == "hits")
+                db.table("items").insert({"worker": index, "i": i})
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert table.get(Counter.name == "hits")["value"] == 200
+        assert len(db.table("items")) == 200
+        db.close()
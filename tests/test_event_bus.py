@@ -0,0 +1,142 @@
+"""
+事件总线单元测试
+Event Bus Unit Tests
+"""
+
+import asyncio
+import threading
+
+from fastapi.testclient import TestClient
+
+from app.core.event_bus import EventBus, EventTopics, event_stream, get_event_bus
+
+
+class TestEventBus:
+    """测试发布/订阅"""
+
+    def test_publish_increments_topic_version(self):
+        """测试每个主题独立递增目录版本"""
+        bus = EventBus()
+        assert bus.publish(EventTopics.MCP_TOOLS, "mcp.tool.enabled", {"name": "a"}).version == 1
+        assert bus.publish(EventTopics.MCP_TOOLS, "mcp.tool.disabled", {"name": "a"}).version == 2
+        assert bus.publish(EventTopics.CACHE, "cache.flushed").version == 1
+        assert bus.get_versions() == {EventTopics.MCP_TOOLS: 2, EventTopics.CACHE: 1}
+
+    def test_topic_filter_and_cross_thread_publish(self):
+        """测试主题过滤以及从其他线程发布"""
+        async def run():
+            bus = EventBus()
+            sub = bus.subscribe(topics=[EventTopics.CACHE])
+            thread = threading.Thread(target=lambda: (
+                bus.publish(EventTopics.MCP_TOOLS, "mcp.tool.enabled"),
+                bus.publish(EventTopics.CACHE, "cache.flushed"),
+            ))
+            thread.start()
+            events = await sub.get(timeout=2)
+            thread.join()
+            sub.close()
+            return events, bus
+
+        events, bus = asyncio.run(run())
+        assert [e.type for e in events] == ["cache.flushed"]
+        assert bus.get_status()["subscribers"] == 0
+
+    def test_drop_oldest_when_queue_full(self):
+        """测试队列满时丢弃最旧事件"""
+        async def run():
+            bus = EventBus()
+            sub = bus.subscribe(max_queue_size=3)
+            for i in range(5):
+                bus.publish(EventTopics.RESOURCES, "resources.synced", {"i": i})
+            return sub.drain(), sub.dropped
+
+        events, dropped = asyncio.run(run())
+        assert [e.data["i"] for e in events] == [2, 3, 4]
+        assert dropped == 2
+
+    def test_resume_from_last_event_id(self):
+        """测试按 Last-Event-ID 补发事件"""
+        async def run():
+            bus = EventBus(buffer_size=10)
+            for i in range(5):
+                bus.publish(EventTopics.RESOURCES, "resources.synced", {"i": i})
+            return bus.subscribe(last_event_id=3).drain()
+
+        events = asyncio.run(run())
+        assert [e.id for e in events] == [4, 5]
+
+    def test_resume_expired_sends_reset(self):
+        """测试续传位置已被淘汰时发送 reset 事件"""
+        async def run():
+            bus = EventBus(buffer_size=2)
+            for i in range(5):
+                bus.publish(EventTopics.RESOURCES, "resources.synced", {"i": i})
+            return bus.subscribe(last_event_id=1).drain()
+
+        events = asyncio.run(run())
+        assert len(events) == 1
+        assert events[0].type == "stream.reset"
+        assert events[0].data["versions"] == {EventTopics.RESOURCES: 5}
+
+    def test_resume_unknown_id_sends_reset(self):
+        """测试续传 ID 超过当前最新事件（服务重启或其他副本）时发送 reset 事件"""
+        async def run():
+            bus = EventBus(buffer_size=10)
+            for i in range(3):
+                bus.publish(EventTopics.RESOURCES, "resources.synced", {"i": i})
+            current = bus.subscribe(last_event_id=3).drain()
+            return current, bus.subscribe(last_event_id=4).drain(), bus.get_status()
+
+        current, events, status = asyncio.run(run())
+        assert current == []
+        assert [e.type for e in events] == ["stream.reset"]
+        assert events[0].data["reason"] == "last_event_id_unknown"
+        assert status["resets"] == 1
+
+    def test_event_stream_heartbeat_and_sse_format(self):
+        """测试 SSE 编码与心跳"""
+        async def run():
+            bus = EventBus()
+            sub = bus.subscribe()
+            stream = event_stream(sub, heartbeat_interval=0.01)
+            chunks = [await stream.__anext__()]
+            chunks.append(await stream.__anext__())
+            bus.publish(EventTopics.CACHE, "cache.backend_switched", {"to": "diskcache"})
+            chunks.append(await stream.__anext__())
+            await stream.aclose()
+            return chunks, bus
+
+        chunks, bus = asyncio.run(run())
+        assert chunks[0].startswith("retry:")
+        assert chunks[1].startswith(": heartbeat")
+        assert chunks[2].startswith("id: 1\nevent: cache.backend_switched\ndata: ")
+        assert chunks[2].endswith("\n\n")
+        assert bus.get_status()["subscribers"] == 0
+
+
+class TestEventPublishers:
+    """测试服务发布事件"""
+
+    def test_recycle_bin_manual_cleanup_publishes(self, monkeypatch):
+        """测试回收站清理发布事件"""
+        from app.core import recycle_bin_scheduler
+
+        class FakeRecycleService:
+            def cleanup_expired_items(self):
+                return 3
+
+        monkeypatch.setattr(recycle_bin_scheduler, "get_recycle_bin_service", lambda: FakeRecycleService())
+        bus = get_event_bus()
+        before = bus.get_versions().get(EventTopics.RECYCLE_BIN, 0)
+        asyncio.run(recycle_bin_scheduler.manual_cleanup_expired_items())
+        assert bus.get_versions()[EventTopics.RECYCLE_BIN] == before + 1
+
+    def test_events_status_endpoint(self):
+        """测试事件总线状态端点"""
+        from app.main import app
+
+        response = TestClient(app).get("/api/events/status")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["success"] is True
+        assert "versions" in data["data"]
@@ -0,0 +1,248 @@
+"""
+自适应并发批量请求测试
+Adaptive-Concurrency Batch Request Tests
+"""
+
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+
+import pytest
+from aiohttp import web
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import app.tools.fetch_tools as fetch_tools
+from app.core.async_executor import run_file_io
+from app.tools.batch_executor import AIMDController, BatchExecutor, is_congested
+from app.tools.fetch_tools import batch_requests
+from app.tools.streaming import StreamingResult, consume_stream
+
+
+class TestAIMDController:
+    """测试 AIMD 并发窗口"""
+
+    def test_additive_increase(self):
+        controller = AIMDController(initial=2, maximum=4)
+        for _ in range(3):
+            controller.record(None, congested=False)
+        assert controller.window == 3
+        for _ in range(20):
+            controller.record(None, congested=False)
+        assert controller.window == 4
+        assert controller.increases == 2
+
+    def test_decrease_once_per_window(self):
+        """测试同一波拥塞只减半一次"""
+        controller = AIMDController(initial=8, maximum=8)
+        for _ in range(4):
+            controller.record(None, congested=True)
+        assert controller.window == 4
+        assert controller.decreases == 1
+        # 减少后完成一个窗口（4 个请求）才允许再次减少
+        controller.record(None, congested=True)
+        assert controller.window == 2
+        for _ in range(2):
+            controller.record(None, congested=True)
+        assert controller.window == 1
+
+    def test_latency_rise_counts_as_congestion(self):
+        controller = AIMDController(initial=4, maximum=4)
+        for _ in range(5):
+            controller.record(0.01, congested=False)
+        assert controller.window == 4
+        for _ in range(5):
+            controller.record(0.2, congested=False)
+        assert controller.decreases >= 1
+        assert controller.window < 4
+
+    def test_is_congested(self):
+        assert is_congested({"success": True, "status_code": 200}) is False
+        assert is_congested({"success": False, "status_code": 404}) is False
+        assert is_congested({"success": False, "status_code": 429}) is True
+        assert is_congested({"success": False, "status_code": 502}) is True
+        assert is_congested({"success": False, "error": "Connection refused"}) is True
+
+
+def fake_execute(state, delays=None, statuses=None):
+    """按主机记录并发数的假请求"""
+    async def execute(request_data):
+        host = request_data["url"].split("/")[2]
+        active = state.setdefault("active", {})
+        peak = state.setdefault("peak", {})
+        active[host] = active.get(host, 0) + 1
+        peak[host] = max(peak.get(host, 0), active[host])
+        try:
+            await asyncio.sleep((delays or {}).get(host, 0.01))
+        finally:
+            active[host] -= 1
+        status = (statuses or {}).get(host, 200)
+        return {"success": status < 400, "status_code": status, "url": request_data["url"]}
+    return execute
+
+
+def run_executor(executor):
+    async def run():
+        return [result async for result in executor.results()]
+    return asyncio.run(run())
+
+
+class TestBatchExecutor:
+    """测试批量执行器的调度"""
+
+    def test_per_host_limits_and_adaptation(self):
+        """测试每主机并发上限，过载主机收缩窗口而不影响其他主机"""
+        state = {}
+        requests = [{"url": f"http://{host}/{i}"} for i in range(30) for host in ("ok.test", "busy.test")]
+        executor = BatchExecutor(requests, fake_execute(state, statuses={"busy.test": 503}),
+                                 max_concurrent=8, max_per_host=4)
+        results = run_executor(executor)
+
+        assert sorted(result["request_index"] for result in results) == list(range(60))
+        assert state["peak"]["ok.test"] <= 4 and state["peak"]["busy.test"] <= 2
+        summary = executor.summary()
+        assert summary["successful"] == 30 and summary["failed"] == 30
+        assert summary["concurrency"]["final_limits"] == {"ok.test": 4, "busy.test": 1}
+        assert summary["concurrency"]["peak_in_flight"] <= 8
+
+    def test_full_host_does_not_block_others(self):
+        """测试一个主机的窗口已满时仍调度其他主机的请求"""
+        state = {}
+        requests = [{"url": "http://slow.test/"} for _ in range(4)] + [{"url": "http://fast.test/"} for _ in range(4)]
+        executor = BatchExecutor(requests, fake_execute(state, delays={"slow.test": 0.3}),
+                                 max_concurrent=4, max_per_host=2)
+        started = time.monotonic()
+        first_fast = None
+        for result in run_executor(executor):
+            if result["url"].startswith("http://fast.test"):
+                first_fast = first_fast or result
+        assert first_fast["elapsed_ms"] < 300
+        assert time.monotonic() - started < 1.2
+
+    def test_deadline_cancels_stragglers(self):
+        state = {}
+        requests = [{"url": "http://fast.test/"}, {"url": "http://slow.test/"}, {"url": "http://slow.test/"}]
+        executor = BatchExecutor(requests, fake_execute(state, delays={"slow.test": 5}),
+                                 max_concurrent=2, max_per_host=1, deadline=0.2)
+        started = time.monotonic()
+        results = run_executor(executor)
+        assert time.monotonic() - started < 2
+
+        by_index = {result["request_index"]: result for result in results}
+        assert by_index[0]["success"] is True
+        assert by_index[1]["cancelled"] is True and by_index[1]["started"] is True
+        assert by_index[2]["cancelled"] is True and by_index[2]["started"] is False
+        assert state["active"]["slow.test"] == 0
+        summary = executor.summary()
+        assert summary["cancelled"] == 2 and summary["failed"] == 2
+        assert summary["deadline_exceeded"] is True
+
+
+@asynccontextmanager
+async def serve(state):
+    async def handler(request):
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        try:
+            await asyncio.sleep(0.02)
+        finally:
+            state["active"] -= 1
+        if request.match_info["n"] == "missing":
+            raise web.HTTPNotFound()
+        return web.json_response({"n": request.match_info["n"]})
+
+    app = web.Application()
+    app.router.add_get("/item/{n}", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    try:
+        yield f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+    finally:
+        await runner.cleanup()
+
+
+
+class TestBatchRequests:
+    """测试 batch_requests 工具"""
+
+    def test_results_in_request_order(self, scraping_tools):
+        state = {"active": 0, "peak": 0}
+
+        async def run():
+            async with serve(state) as base:
+                try:
+                    requests = [{"url": f"{base}/item/{i}"} for i in range(12)] + [{"url": f"{base}/item/missing"}]
+                    return await batch_requests(requests, max_concurrent=10, max_per_host=3)
+                finally:
+                    await scraping_tools.close()
+
+        result = asyncio.run(run())
+        assert result["success"] is True
+        assert [item["request_index"] for item in result["results"]] == list(range(13))
+        assert result["results"][5]["content"] == {"n": "5"}
+        assert result["results"][12]["status_code"] == 404
+        assert result["successful"] == 12 and result["failed"] == 1
+        assert result["summary"]["total"] == 13
+        assert state["peak"] <= 3
+
+    def test_stream(self, scraping_tools):
+        """测试流式模式按完成顺序输出 NDJSON，统计在流结束后可用"""
+        state = {"active": 0, "peak": 0}
+
+        async def run():
+            async with serve(state) as base:
+                try:
+                    result = await batch_requests([{"url": f"{base}/item/{i}"} for i in range(6)], stream=True)
+                    assert isinstance(result, StreamingResult)
+                    output, _ = await consume_stream(result, run_file_io)
+                    return output
+                finally:
+                    await scraping_tools.close()
+
+        output = asyncio.run(run())
+        lines = [json.loads(line) for line in output["results"].splitlines()]
+        assert sorted(line["request_index"] for line in lines) == list(range(6))
+        assert output["successful"] == 6
+        assert output["summary"]["concurrency"]["hosts"] == 1
+
+
+class TestBatchRequestsEndpoint:
+    """测试 /web-scraping/batch-requests 的流式响应"""
+
+    @pytest.fixture
+    def client(self, monkeypatch):
+        async def fake_request(url, **kwargs):
+            await asyncio.sleep(0.01)
+            return {"success": True, "status_code": 200, "url": url}
+
+        monkeypatch.setattr(fetch_tools, "http_request", fake_request)
+        from app.routers.api_web_scraping import router
+
+        test_app = FastAPI()
+        test_app.include_router(router)
+        return TestClient(test_app)
+
+    def test_ndjson(self, client):
+        body = {"requests": [{"url": f"http://a.test/{i}"} for i in range(3)], "stream": True}
+        response = client.post("/web-scraping/batch-requests", json=body)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert len(lines) == 4
+        assert lines[-1]["summary"]["successful"] == 3
+
+    def test_sse(self, client):
+        body = {"requests": [{"url": f"http://a.test/{i}"} for i in range(2)]}
+        response = client.post("/web-scraping/batch-requests", json=body, headers={"Accept": "text/event-stream"})
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = [frame.split("\n") for frame in response.text.strip().split("\n\n")]
+        assert [event[0] for event in events] == ["event: result", "event: result", "event: summary"]
+        assert json.loads(events[-1][1][len("data: "):])["total"] == 2
+
+    def test_json(self, client):
+        body = {"requests": [{"url": "http://a.test/"}]}
+        response = client.post("/web-scraping/batch-requests", json=body)
+        assert response.json()["data"]["results"][0]["request_index"] == 0
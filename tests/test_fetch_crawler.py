@@ -0,0 +1,252 @@
+"""
+并发站点爬取测试
+Concurrent Site Crawler Tests
+"""
+
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+import pytest
+from aiohttp import web
+
+import app.tools.crawler as crawler_module
+from app.core.async_executor import run_file_io
+from app.tools.crawler import Crawler, RobotsCache, URLSet, get_robots_cache, normalize_url
+from app.tools.fetch_tools import crawl
+from app.tools.streaming import StreamingResult, consume_stream
+
+
+class TestURLHandling:
+    """测试 URL 规范化与去重"""
+
+    @pytest.mark.parametrize("url,expected", [
+        ("HTTP://Example.COM", "http://example.com/"),
+        ("http://example.com:80/a?b=1#frag", "http://example.com/a?b=1"),
+        ("https://example.com:443/", "https://example.com/"),
+        ("https://example.com:8443/x", "https://example.com:8443/x"),
+        ("mailto:a@example.com", None),
+        ("javascript:void(0)", None),
+        ("http://example.com:bad/", None),
+    ])
+    def test_normalize_url(self, url, expected):
+        assert normalize_url(url) == expected
+
+    def test_normalize_relative(self):
+        assert normalize_url("../c#x", "http://example.com/a/b/") == "http://example.com/a/c"
+
+    def test_url_set(self):
+        seen = URLSet()
+        assert seen.add("http://example.com/") is True
+        assert seen.add("http://example.com/") is False
+        assert "http://example.com/" in seen
+        assert len(seen) == 1
+
+
+class TestRobotsCache:
+    def test_expiry_and_eviction(self):
+        cache = RobotsCache(ttl=60, max_entries=2)
+        parsers = [object(), object(), object()]
+        for index, parser in enumerate(parsers):
+            cache.put(f"http://h{index}", parser)
+        assert cache.get("http://h0") is None
+        assert cache.get("http://h2") is parsers[2]
+        cache.ttl = -1
+        assert cache.get("http://h2") is None
+
+    def test_entry_ttl(self):
+        cache = RobotsCache(ttl=60)
+        cache.put("http://ok", "ok")
+        cache.put("http://failed", "failed", ttl=-1)
+        assert cache.get("http://ok") == "ok"
+        assert cache.get("http://failed") is None
+
+
+PAGE = "<html><head><title>{title}</title></head><body><p>{title} body</p>{links}</body></html>"
+SITE = {
+    "/": ["/a", "/b#top", "/private/x", "mailto:x@example.com"],
+    "/a": ["/", "/c", "/missing"],
+    "/b": ["/c", "/d"],
+    "/c": ["/deep"],
+    "/d": [],
+    "/deep": [],
+}
+
+
+@asynccontextmanager
+async def serve_site(state):
+    async def page(request):
+        path = request.path
+        state["requests"].append(path)
+        if path not in SITE:
+            raise web.HTTPNotFound()
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        try:
+            await asyncio.sleep(0.02)
+        finally:
+            state["active"] -= 1
+        links = "".join(f'<a href="{href}">{href}</a>' for href in SITE[path])
+        # 同一页面的默认端口写法，规范化后应判为重复
+        if path == "/":
+            links += f'<a href="http://127.0.0.1:{request.url.port}/a">a</a>'
+        return web.Response(text=PAGE.format(title=path, links=links), content_type="text/html")
+
+    async def robots(request):
+        state["requests"].append("/robots.txt")
+        return web.Response(text="User-agent: *\nDisallow: /private\n")
+
+    app = web.Application()
+    app.router.add_get("/robots.txt", robots)
+    app.router.add_get("/{tail:.*}", page)
+    async with serve_app(app) as base:
+        yield base
+
+
+@asynccontextmanager
+async def serve_app(app):
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    try:
+        yield f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+    finally:
+        await runner.cleanup()
+
+
+@pytest.fixture(autouse=True)
+def robots_cache():
+    get_robots_cache().clear()
+    yield
+    get_robots_cache().clear()
+
+
+def new_state():
+    return {"requests": [], "active": 0, "peak": 0}
+
+
+class TestCrawl:
+    """测试针对本地站点的端到端爬取"""
+
+    def test_crawl_site(self, scraping_tools):
+        """测试深度限制、去重、robots.txt 和每主机并发上限"""
+        state = new_state()
+
+        async def run():
+            async with serve_site(state) as base:
+                try:
+                    result = await crawl(base + "/", max_depth=2, concurrency=8, max_per_host=2,
+                                         requests_per_second=0)
+                    assert isinstance(result, StreamingResult)
+                    output, _ = await consume_stream(result, run_file_io)
+                    return output
+                finally:
+                    await scraping_tools.close()
+
+        output = asyncio.run(run())
+        pages = [json.loads(line) for line in output["pages"].splitlines()]
+        by_path = {page["url"].split("/", 3)[3]: page for page in pages}
+        assert set(by_path) == {"", "a", "b", "c", "d", "missing"}
+        assert by_path[""]["title"] == "/"
+        assert "/ body" in by_path[""]["text"]
+        assert by_path["c"]["depth"] == 2
+        assert by_path["missing"]["status"] == 404 and "error" in by_path["missing"]
+
+        # /deep 超出深度，/private 被 robots.txt 拦截，每个页面只请求一次
+        assert "/deep" not in state["requests"]
+        assert not any(path.startswith("/private") for path in state["requests"])
+        assert state["requests"].count("/robots.txt") == 1
+        assert state["requests"].count("/c") == 1
+        assert state["peak"] <= 2
+
+        stats = output["statistics"]
+        assert stats["pages_crawled"] == 5
+        assert stats["errors"] == 1
+        assert stats["robots_blocked"] == 1
+        assert stats["duplicates"] >= 3
+        assert stats["max_depth_reached"] == 2
+
+    def test_max_pages_and_exclude(self, scraping_tools):
+        state = new_state()
+
+        async def run():
+            async with serve_site(state) as base:
+                try:
+                    crawler = Crawler(scraping_tools, base + "/", max_depth=5, max_pages=3,
+                                      exclude_patterns=[r"/a$", "/private"], requests_per_second=0)
+                    return [page async for page in crawler.pages()], crawler.get_status()
+                finally:
+                    await scraping_tools.close()
+
+        pages, status = asyncio.run(run())
+        assert len(pages) == 3
+        assert status["pages_scheduled"] == 3
+        assert status["filtered"] >= 2
+        assert "/a" not in state["requests"]
+        assert "/d" not in state["requests"]
+
+    def test_robots_failure_cached_briefly(self, scraping_tools, monkeypatch):
+        """robots.txt 5xx 时本次全部禁止，但不按 ROBOTS_TTL 长期缓存"""
+        monkeypatch.setattr(crawler_module, "ROBOTS_FAILURE_TTL", -1)
+        scraping_tools.config.max_retries = 0
+        requests = []
+
+        async def robots(request):
+            requests.append(request.path)
+            raise web.HTTPServiceUnavailable()
+
+        async def page(request):
+            requests.append(request.path)
+            return web.Response(text=PAGE.format(title="/", links=""), content_type="text/html")
+
+        async def run():
+            app = web.Application()
+            app.router.add_get("/robots.txt", robots)
+            app.router.add_get("/", page)
+            async with serve_app(app) as base:
+                try:
+                    results = []
+                    for _ in range(2):
+                        crawler = Crawler(scraping_tools, base + "/", requests_per_second=0)
+                        results.append(([page async for page in crawler.pages()], crawler.get_status()))
+                    return results
+                finally:
+                    await scraping_tools.close()
+
+        results = asyncio.run(run())
+        assert all(pages == [] and status["robots_blocked"] == 1 for pages, status in results)
+        # 失败结果已过期，第二次爬取重新请求 robots.txt
+        assert requests == ["/robots.txt", "/robots.txt"]
+
+    def test_page_size_limit(self, scraping_tools, monkeypatch):
+        """链接到的大文件按每页上限中止读取，不按 max_file_size 整体缓冲"""
+        monkeypatch.setattr(crawler_module, "MAX_PAGE_BYTES", 1024)
+
+        async def page(request):
+            return web.Response(text=PAGE.format(title="/", links='<a href="/big.bin">big</a>'),
+                                content_type="text/html")
+
+        async def big(request):
+            return web.Response(body=b"x" * 4096, content_type="application/octet-stream")
+
+        async def run():
+            app = web.Application()
+            app.router.add_get("/", page)
+            app.router.add_get("/big.bin", big)
+            async with serve_app(app) as base:
+                try:
+                    crawler = Crawler(scraping_tools, base + "/", respect_robots=False, requests_per_second=0)
+                    return [page async for page in crawler.pages()], crawler.get_status()
+                finally:
+                    await scraping_tools.close()
+
+        pages, status = asyncio.run(run())
+        by_path = {page["url"].rsplit("/", 1)[1]: page for page in pages}
+        assert by_path[""]["links_queued"] == 1
+        assert "too large" in by_path["big.bin"]["error"]
+        assert status["errors"] == 1
+
+    def test_invalid_input(self):
+        assert asyncio.run(crawl("ftp://example.com/"))["success"] is False
+        assert asyncio.run(crawl("http://example.com/", include_patterns=["("]))["success"] is False
@@ -0,0 +1,333 @@
+"""
+流式文件下载测试
+Streaming File Download Tests
+"""
+
+import asyncio
+import base64
+import hashlib
+from contextlib import asynccontextmanager
+
+import pytest
+from aiohttp import web
+
+from app.core.async_executor import run_file_io
+from app.tools.fetch_tools import download_file
+from app.tools.segmented_download import ThroughputController
+from app.tools.streaming import StreamingResult, consume_stream
+
+DATA = bytes(range(256)) * 1200  # 300KB
+ETAG = '"v1"'
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@asynccontextmanager
+async def serve(handler):
+    app = web.Application()
+    app.router.add_get("/file", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    try:
+        yield f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/file"
+    finally:
+        await runner.cleanup()
+
+
+def ranged_response(request):
+    """支持 Range + If-Range 的文件响应"""
+    range_header = request.headers.get("Range")
+    if range_header and request.headers.get("If-Range") == ETAG:
+        start = int(range_header.split("=")[1].rstrip("-"))
+        return web.Response(body=DATA[start:], status=206, headers={
+            "ETag": ETAG, "Content-Range": f"bytes {start}-{len(DATA) - 1}/{len(DATA)}",
+        })
+    return web.Response(body=DATA, headers={"ETag": ETAG})
+
+
+
+class TestDownloadToFile:
+    """测试流式下载到文件"""
+
+    def test_download_hashes_and_atomic_rename(self, scraping_tools, tmp_path):
+        """测试下载完成后重命名为目标文件并给出摘要"""
+        target = tmp_path / "out" / "data.bin"
+
+        async def run():
+            async with serve(ranged_response) as url:
+                try:
+                    return await download_file(url, save_path=str(target))
+                finally:
+                    await scraping_tools.close()
+
+        result = asyncio.run(run())
+        assert result["success"] is True
+        assert target.read_bytes() == DATA
+        assert result["size"] == len(DATA)
+        assert result["sha256"] == hashlib.sha256(DATA).hexdigest()
+        assert result["md5"] == hashlib.md5(DATA).hexdigest()
+        assert result["resumed_from"] == 0
+        assert not list(target.parent.glob("*.part*"))
+
+    def test_resume_after_interruption(self, scraping_tools, tmp_path):
+        """测试连接中断后保留 .part 文件，再次调用时通过 Range/If-Range 续传"""
+        target = tmp_path / "data.bin"
+        ranges = []
+
+        async def handler(request):
+            ranges.append(request.headers.get("Range"))
+            if len(ranges) == 1:
+                # 声明完整长度但只发送一半后断开连接
+                response = web.StreamResponse(headers={"ETag": ETAG})
+                response.content_length = len(DATA)
+                await response.prepare(request)
+                await response.write(DATA[:len(DATA) // 2])
+                await asyncio.sleep(0.05)
+                request.transport.close()
+                return response
+            return ranged_response(request)
+
+        async def run():
+            async with serve(handler) as url:
+                try:
+                    first = await download_file(url, save_path=str(target))
+                    partial = (tmp_path / "data.bin.part").stat().st_size
+                    second = await download_file(url, save_path=str(target))
+                    return first, partial, second
+                finally:
+                    await scraping_tools.close()
+
+        first, partial, second = asyncio.run(run())
+        assert first["success"] is False
+        assert first["resumable"] is True
+        assert 0 < partial < len(DATA)
+        assert ranges == [None, f"bytes={partial}-"]
+        assert second["success"] is True
+        assert second["resumed_from"] == partial
+        assert second["sha256"] == hashlib.sha256(DATA).hexdigest()
+        assert target.read_bytes() == DATA
+
+    def test_size_limit_and_checksum(self, scraping_tools, tmp_path):
+        """测试无 Content-Length 时边下载边检查大小，以及 SHA-256 校验失败"""
+        async def chunked(request):
+            response = web.StreamResponse()
+            await response.prepare(request)
+            for offset in range(0, len(DATA), 64 * 1024):
+                await response.write(DATA[offset:offset + 64 * 1024])
+            return response
+
+        async def run():
+            async with serve(chunked) as url:
+                try:
+                    too_large = await download_file(url, save_path=str(tmp_path / "a.bin"), max_size=100_000)
+                    mismatch = await download_file(url, save_path=str(tmp_path / "b.bin"), expected_sha256="00" * 32)
+                    return too_large, mismatch
+                finally:
+                    await scraping_tools.close()
+
+        too_large, mismatch = asyncio.run(run())
+        assert too_large["success"] is False
+        assert "too large" in too_large["error"]
+        assert mismatch["success"] is False
+        assert "mismatch" in mismatch["error"]
+        assert list(tmp_path.iterdir()) == []
+
+    def test_initial_request_follows_retry_policy(self, scraping_tools, tmp_path):
+        """测试下载请求遇到可重试状态码时按重试策略重试，不可重试的直接失败"""
+        scraping_tools.config.max_retries = 2
+        hits = []
+
+        async def handler(request):
+            hits.append(request.path)
+            if len(hits) < 3:
+                return web.Response(status=503)
+            return ranged_response(request)
+
+        async def run():
+            async with serve(handler) as url:
+                try:
+                    return await download_file(url, save_path=str(tmp_path / "data.bin"))
+                finally:
+                    await scraping_tools.close()
+
+        result = asyncio.run(run())
+        assert result["success"] is True
+        assert len(hits) == 3
+        assert (tmp_path / "data.bin").read_bytes() == DATA
+
+
+class TestDownloadAsStream:
+    """测试不指定保存路径时返回流式结果"""
+
+    def test_streaming_result(self, scraping_tools):
+        async def run():
+            async with serve(ranged_response) as url:
+                try:
+                    result = await download_file(url)
+                    assert isinstance(result, StreamingResult)
+                    return await consume_stream(result, run_file_io, max_inline=len(DATA) * 2)
+                finally:
+                    await scraping_tools.close()
+
+        output, total = asyncio.run(run())
+        assert total == len(DATA)
+        assert output["content_encoding"] == "base64"
+        assert base64.b64decode(output["content_base64"]) == DATA
+        assert output["size"] == len(DATA)
+        assert output["sha256"] == hashlib.sha256(DATA).hexdigest()
+
+
+def segment_response(request, fail_starts=(), fail_status=500):
+    """支持 bytes=a-b 的分段响应，fail_starts 中的起始偏移返回 fail_status"""
+    headers = {"ETag": ETAG, "Accept-Ranges": "bytes"}
+    range_header = request.headers.get("Range")
+    if request.method == "HEAD" or not range_header:
+        return web.Response(body=DATA, headers=headers)
+    assert request.headers.get("If-Range") == ETAG
+    start, end = (int(value) for value in range_header.split("=")[1].split("-"))
+    if start in fail_starts:
+        fail_starts.discard(start)
+        return web.Response(status=fail_status)
+    headers["Content-Range"] = f"bytes {start}-{end}/{len(DATA)}"
+    return web.Response(body=DATA[start:end + 1], status=206, headers=headers)
+
+
+class TestSegmentedDownload:
+    """测试分段并行下载"""
+
+    def test_parallel_segments_with_retry(self, scraping_tools, tmp_path):
+        """测试按片段并发下载，失败片段单独重试，完成后整体校验"""
+        scraping_tools.config.download_min_segment_size = 16 * 1024
+        scraping_tools.config.retry_delay = 0.01
+        target = tmp_path / "data.bin"
+        requested = []
+        # 片段大小为 300KB / (4 * 4) = 19200 字节，第二个片段首次请求失败
+        fail_starts = {19200}
+
+        async def handler(request):
+            requested.append(request.headers.get("Range"))
+            return segment_response(request, fail_starts)
+
+        async def run():
+            async with serve(handler) as url:
+                try:
+                    return await download_file(url, save_path=str(target), max_segments=4)
+                finally:
+                    await scraping_tools.close()
+
+        result = asyncio.run(run())
+        assert result["success"] is True
+        assert target.read_bytes() == DATA
+        assert result["sha256"] == hashlib.sha256(DATA).hexdigest()
+        assert result["segments"]["pieces"] == 16
+        assert result["segments"]["retries"] == 1
+        assert 2 <= result["segments"]["max_concurrency"] <= 4
+        assert not list(tmp_path.glob("*.part*"))
+        assert requested.count("bytes=19200-38399") == 2
+
+    def test_non_retryable_status_fails_without_retry(self, scraping_tools, tmp_path):
+        """测试 404 等不可重试的片段错误直接失败，且不遗留临时文件"""
+        scraping_tools.config.download_min_segment_size = 16 * 1024
+        scraping_tools.config.retry_delay = 0.01
+        requested = []
+
+        async def handler(request):
+            requested.append(request.headers.get("Range"))
+            return segment_response(request, {19200}, fail_status=404)
+
+        async def run():
+            async with serve(handler) as url:
+                try:
+                    return await download_file(url, save_path=str(tmp_path / "data.bin"), max_segments=4)
+                finally:
+                    await scraping_tools.close()
+
+        result = asyncio.run(run())
+        assert result["success"] is False
+        assert requested.count("bytes=19200-38399") == 1
+        assert not list(tmp_path.glob("*.part*"))
+
+    def test_cancel_waits_for_inflight_writes(self, scraping_tools, tmp_path, monkeypatch):
+        """测试取消下载时，关闭文件前等待写入线程结束"""
+        import threading
+        import time
+        import app.tools.segmented_download as segmented_download
+
+        scraping_tools.config.download_min_segment_size = 16 * 1024
+        started = threading.Event()
+        writes = {"started": 0, "finished": 0}
+        original = segmented_download._pwrite_all
+
+        def slow_pwrite(fd, data, offset):
+            writes["started"] += 1
+            started.set()
+            time.sleep(0.2)
+            original(fd, data, offset)
+            writes["finished"] += 1
+
+        monkeypatch.setattr(segmented_download, "_pwrite_all", slow_pwrite)
+
+        async def run():
+            async with serve(segment_response) as url:
+                task = asyncio.create_task(
+                    download_file(url, save_path=str(tmp_path / "data.bin"), max_segments=4)
+                )
+                for _ in range(500):
+                    if started.is_set() or task.done():
+                        break
+                    await asyncio.sleep(0.01)
+                assert started.is_set()
+                task.cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await task
+                await scraping_tools.close()
+
+        asyncio.run(run())
+        assert writes["started"] >= 1
+        assert writes["finished"] == writes["started"]
+
+    def test_falls_back_without_accept_ranges(self, scraping_tools, tmp_path):
+        """测试服务端不支持 Range 时退回单连接下载"""
+        scraping_tools.config.download_min_segment_size = 16 * 1024
+
+        async def run():
+            async with serve(lambda request: web.Response(body=DATA)) as url:
+                try:
+                    return await download_file(url, save_path=str(tmp_path / "data.bin"), max_segments=4)
+                finally:
+                    await scraping_tools.close()
+
+        result = asyncio.run(run())
+        assert result["success"] is True
+        assert "segments" not in result
+        assert result["sha256"] == hashlib.sha256(DATA).hexdigest()
+
+
+class TestThroughputController:
+    """测试按吞吐调整并发数"""
+
+    def test_grows_while_throughput_improves(self):
+        clock = FakeClock()
+        controller = ThroughputController(max_segments=8, clock=clock)
+        assert controller.target == 2
+
+        def window(nbytes):
+            clock.now += 1.0
+            controller.record(nbytes)
+            return [controller.piece_done() for _ in range(controller.target)][-1]
+
+        assert window(100) is True  # 首个窗口建立基线
+        assert controller.target == 3
+        assert window(200) is True  # 吞吐翻倍
+        assert window(205) is False  # 提升不足 10%，停止增长
+        assert controller.settled
+        assert controller.target == 4
+        assert window(1000) is False
@@ -0,0 +1,140 @@
+"""
+HTML 单次解析提取测试
+Single-Parse HTML Extraction Tests
+"""
+
+import asyncio
+
+import pytest
+
+from app.tools.fetch_tools import extract_css_selector, parse_html
+from app.tools.html_extract import (
+    SNIFF_SIZE, DocumentCache, content_features, detect_format, extract, get_document_cache, tags_for_outputs,
+)
+
+PAGE = """<!DOCTYPE html>
+<html><head>
+<title>Page</title><meta name="description" content="demo"><style>.x{color:red}</style>
+</head><body>
+<h2 id="b">Second</h2><h1>First</h1>
+<p>Hello <a href="/a" title="A">link</a><script>var s = 1;</script></p>
+<p>  </p>
+<img src="img.png" alt="pic">
+<table><tr><th>k</th><th>v</th></tr><tr><td>1</td><td>2</td></tr></table>
+<form action="/go"><input name="q" required></form>
+<!-- comment -->
+<div class="box">box<script>alert(1)</script></div>
+</body></html>"""
+
+
+@pytest.fixture(autouse=True)
+def clear_documents():
+    get_document_cache().clear()
+    yield
+    get_document_cache().clear()
+
+
+class TestParseHtml:
+    """测试单次遍历提取"""
+
+    def test_all_outputs(self):
+        result = asyncio.run(parse_html(PAGE, url="http://example.com/dir/", extract_tables=True,
+                                        extract_forms=True, css_selectors=["div.box"]))
+        assert result["success"] is True
+        assert result["title"] == "Page"
+        # 先按级别，同级按文档顺序
+        assert [(h["level"], h["text"]) for h in result["headings"]] == [(1, "First"), (2, "Second")]
+        assert result["paragraphs"] == ["Hello link"]
+        assert result["links"] == [{"text": "link", "href": "http://example.com/a", "title": "A", "class": None}]
+        assert result["images"][0]["src"] == "http://example.com/dir/img.png"
+        assert result["tables"] == [[["k", "v"], ["1", "2"]]]
+        assert result["forms"] == [{"action": "/go", "method": "get",
+                                    "fields": [{"name": "q", "type": None, "value": None, "required": True}]}]
+        assert result["meta_tags"] == {"description": "demo"}
+        # 纯文本不含 script/style/注释
+        assert "var s" not in result["text_content"] and "color" not in result["text_content"]
+        assert "comment" not in result["text_content"]
+        assert result["css_extracts"]["div.box"][0]["html"] == '<div class="box">box</div>'
+
+    def test_remove_scripts_does_not_mutate_cached_document(self):
+        """测试移除 script 只作用于输出，缓存的文档树保持不变"""
+        asyncio.run(parse_html(PAGE, css_selectors=["div.box"]))
+        kept = asyncio.run(parse_html(PAGE, css_selectors=["div.box"], remove_scripts=False))
+        assert kept["css_extracts"]["div.box"][0]["html"] == '<div class="box">box<script>alert(1)</script></div>'
+
+    def test_include_uses_targeted_parse(self):
+        """测试只请求链接和 meta 时定向解析"""
+        assert tags_for_outputs(["links", "meta_tags"]) == frozenset({"a", "meta"})
+        assert tags_for_outputs(["links", "text_content"]) is None
+
+        result = asyncio.run(parse_html(PAGE, include=["links", "meta_tags"]))
+        assert result["links"][0]["href"] == "/a"
+        assert result["meta_tags"] == {"description": "demo"}
+        assert result["title"] == "" and result["paragraphs"] == [] and result["text_content"] == ""
+        document = get_document_cache().get(PAGE, ["a", "meta"])
+        assert document.soup.find("p") is None
+
+
+class TestDocumentCache:
+    """测试解析结果复用"""
+
+    def test_chained_calls_reuse_document(self):
+        """测试 parse_html 之后 extract_css_selector 复用同一份解析结果"""
+        async def run():
+            await parse_html(PAGE)
+            return await extract_css_selector([{"name": "title", "selector": "title"}], html_content=PAGE)
+
+        result = asyncio.run(run())
+        assert result["extracted_data"]["title"] == "Page"
+        status = get_document_cache().get_status()
+        assert (status["misses"], status["hits"], status["documents"]) == (1, 1, 1)
+
+    def test_full_document_covers_targeted_requests(self):
+        cache = DocumentCache(max_entries=2, parser="html.parser")
+        full = cache.get(PAGE)
+        assert cache.get(PAGE, ["a"]) is full
+        # 定向解析的文档不能满足更大的请求
+        cache.clear()
+        links = cache.get(PAGE, ["a"])
+        assert cache.get(PAGE, ["a", "img"]) is not links
+        assert cache.get_status()["misses"] == 2
+
+    def test_lru_eviction(self):
+        cache = DocumentCache(max_entries=2, parser="html.parser")
+        first = cache.get("<p>1</p>")
+        cache.get("<p>2</p>")
+        cache.get("<p>1</p>")
+        cache.get("<p>3</p>")
+        assert cache.get("<p>1</p>") is first
+        assert cache.get_status()["documents"] == 2
+
+    def test_extract_is_single_pass_per_output(self):
+        document = DocumentCache(parser="html.parser").get(PAGE)
+        result = extract(document, ["title", "images"])
+        assert result["title"] == "Page"
+        assert result["links"] == []
+        assert len(result["images"]) == 1
+
+
+class TestDetectFormat:
+    """测试格式检测"""
+
+    def test_content_type_and_sniffing(self):
+        assert detect_format("<html></html>", "application/json; charset=utf-8") == "json"
+        assert detect_format('  {"a": 1}') == "json"
+        assert detect_format('<?xml version="1.0"?><rss version="2.0"></rss>') == "rss"
+        assert detect_format('<?xml version="1.0"?><root/>') == "xml"
+        assert detect_format("<!DOCTYPE html><html></html>") == "html"
+        assert detect_format("# Title\n\ntext") == "markdown"
+        assert detect_format("plain text") == "html"
+
+    def test_only_inspects_prefix(self):
+        """测试只查看开头部分，后面出现的标记不影响判断"""
+        content = "x" * SNIFF_SIZE + "<rss>"
+        assert detect_format(content) == "html"
+        assert detect_format("x" * (SNIFF_SIZE - 10) + "<rss>") == "rss"
+
+    def test_content_features(self):
+        assert content_features("a  b\nc <TABLE>") == {
+            "estimated_word_count": 4, "has_code_blocks": False, "has_tables": True,
+        }
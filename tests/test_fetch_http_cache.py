@@ -0,0 +1,206 @@
+"""
+网络抓取 HTTP 缓存测试
+HTTP Response Cache Tests
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from email.utils import formatdate
+
+import pytest
+from aiohttp import web
+from multidict import CIMultiDict
+
+from app.tools.http_cache import BufferedResponse, CacheEntry, HTTPCache, HTTPCacheMiss, parse_cache_control
+
+
+def make_entry(headers, request_time=1000.0, response_time=1000.0, status=200):
+    return CacheEntry(
+        key="k", primary="GET http://example.com/", method="GET", url="http://example.com/",
+        status=status, reason="OK", headers=headers, vary={},
+        request_time=request_time, response_time=response_time, size=0,
+    )
+
+
+class TestFreshness:
+    """测试 RFC 7234 新鲜度计算"""
+
+    def test_parse_cache_control(self):
+        assert parse_cache_control('Max-Age=60, no-cache, private="Set-Cookie"') == {
+            "max-age": "60", "no-cache": None, "private": "Set-Cookie",
+        }
+
+    def test_max_age_minus_age(self):
+        """测试 max-age 优先于 Expires，Age 计入当前年龄"""
+        entry = make_entry([("Cache-Control", "max-age=60"), ("Age", "50"),
+                            ("Expires", formatdate(5000, usegmt=True))])
+        assert entry.freshness_lifetime() == 60
+        assert entry.is_fresh(1005.0)
+        assert not entry.is_fresh(1011.0)
+
+    def test_expires_and_heuristic(self):
+        entry = make_entry([("Date", formatdate(1000, usegmt=True)), ("Expires", formatdate(1100, usegmt=True))])
+        assert entry.freshness_lifetime() == 100
+        # 无法解析的 Expires 视为已过期
+        assert make_entry([("Expires", "0")]).freshness_lifetime() == 0
+        # 启发式：距 Last-Modified 的 10%
+        entry = make_entry([("Date", formatdate(1000, usegmt=True)), ("Last-Modified", formatdate(0, usegmt=True))])
+        assert entry.freshness_lifetime() == 100
+
+    def test_no_cache_always_stale(self):
+        entry = make_entry([("Cache-Control", "max-age=60, no-cache"), ("ETag", '"v1"')])
+        assert not entry.is_fresh(1000.0)
+        assert entry.conditional_headers() == {"If-None-Match": '"v1"'}
+
+
+class TestHTTPCacheStore:
+    """测试磁盘存储、淘汰与重启加载"""
+
+    def _response(self, url, body, headers=(("Cache-Control", "max-age=60"),)):
+        return BufferedResponse("GET", url, 200, "OK", list(headers), body)
+
+    def test_eviction_and_reload(self, tmp_path):
+        """测试超过总大小按最近使用淘汰，重启后从磁盘加载索引"""
+        async def run():
+            cache = HTTPCache(tmp_path, max_bytes=800)
+            headers = CIMultiDict()
+            for i in range(8):
+                await cache.store(f"http://example.com/{i}", headers, self._response(f"http://example.com/{i}", b"x" * 100), 0)
+            # 访问 0 号条目后它成为最近使用，写入第 9 个条目时淘汰 1 号
+            assert await cache.lookup("http://example.com/0", headers) is not None
+            await cache.store("http://example.com/8", headers, self._response("http://example.com/8", b"x" * 100), 0)
+            assert await cache.lookup("http://example.com/1", headers) is None
+            # 超过单条目上限的响应不存储
+            assert not await cache.store("http://example.com/big", headers,
+                                         self._response("http://example.com/big", b"x" * 101), 0)
+
+            reloaded = HTTPCache(tmp_path, max_bytes=800)
+            entry = await reloaded.lookup("http://example.com/8", headers)
+            assert entry is not None
+            return cache.get_status(), await reloaded.read_body(entry), reloaded.get_status()
+
+        status, body, reloaded_status = asyncio.run(run())
+        assert status["evictions"] == 1
+        assert status["entries"] == 8
+        assert status["size_bytes"] == 800
+        assert body == b"x" * 100
+        assert reloaded_status["entries"] == 8
+
+    def test_not_storable(self, tmp_path):
+        cache = HTTPCache(tmp_path, max_bytes=1024)
+        assert not cache.is_storable(self._response("http://a/", b"", [("Cache-Control", "no-store, max-age=60")]))
+        assert not cache.is_storable(self._response("http://a/", b"", [("Cache-Control", "max-age=60"), ("Vary", "*")]))
+        # 既没有新鲜期也没有验证器
+        assert not cache.is_storable(self._response("http://a/", b"", []))
+        assert cache.is_storable(self._response("http://a/", b"", [("ETag", '"v1"')]))
+
+
+@asynccontextmanager
+async def serve(routes):
+    app = web.Application()
+    for method, path, handler in routes:
+        app.router.add_route(method, path, handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    try:
+        yield f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+    finally:
+        await runner.cleanup()
+
+
+class TestWebScrapingCache:
+    """测试 WebScrapingTools 请求经过 HTTP 缓存"""
+
+    @pytest.fixture
+    def tools(self, make_scraping_tools, tmp_path):
+        return make_scraping_tools(http_cache={"enabled": True, "directory": str(tmp_path), "max_size_mb": 1})
+
+    def test_fresh_hit_and_modes(self, tools):
+        """测试新鲜响应直接命中，cache_mode 覆盖默认行为"""
+        hits = []
+
+        async def fresh(request):
+            hits.append(request.path)
+            return web.Response(text=f"v{len(hits)}", headers={"Cache-Control": "max-age=60"})
+
+        async def run():
+            async with serve([("GET", "/fresh", fresh), ("POST", "/fresh", fresh)]) as base:
+                try:
+                    url = f"{base}/fresh"
+                    results = []
+                    for mode in (None, None, "no-store", "reload", None, "only-if-cached"):
+                        response = await tools._make_request_with_retry("GET", url, cache_mode=mode)
+                        results.append((response.cache_status, await response.text()))
+                    # 非安全方法成功后同一 URL 的缓存失效
+                    await tools._make_request_with_retry("POST", url)
+                    with pytest.raises(HTTPCacheMiss):
+                        await tools._make_request_with_retry("GET", url, cache_mode="only-if-cached")
+                    return results, tools.http_cache.get_status()
+                finally:
+                    await tools.close()
+
+        results, status = asyncio.run(run())
+        assert results == [
+            ("miss", "v1"), ("hit", "v1"), ("bypass", "v2"), ("miss", "v3"), ("hit", "v3"), ("hit", "v3"),
+        ]
+        assert len(hits) == 4
+        assert status["hits"] == 3
+        assert status["misses"] == 3
+        assert status["bypassed"] == 2
+
+    def test_revalidation_with_etag(self, tools):
+        """测试 no-cache 响应每次携带 If-None-Match 重新验证，304 时复用响应体"""
+        conditional = []
+
+        async def etag(request):
+            conditional.append(request.headers.get("If-None-Match"))
+            if request.headers.get("If-None-Match") == '"v1"':
+                return web.Response(status=304, headers={"ETag": '"v1"', "Cache-Control": "no-cache"})
+            return web.Response(text="body-v1", headers={"ETag": '"v1"', "Cache-Control": "no-cache"})
+
+        async def run():
+            async with serve([("GET", "/etag", etag)]) as base:
+                try:
+                    outcomes = []
+                    for _ in range(3):
+                        response = await tools._make_request_with_retry("GET", f"{base}/etag")
+                        outcomes.append((response.status, response.cache_status, await response.text()))
+                    return outcomes, tools.http_cache.get_status()
+                finally:
+                    await tools.close()
+
+        outcomes, status = asyncio.run(run())
+        assert outcomes == [(200, "miss", "body-v1"), (200, "revalidated", "body-v1"), (200, "revalidated", "body-v1")]
+        assert conditional == [None, '"v1"', '"v1"']
+        assert status["revalidated"] == 2
+
+    def test_vary_and_authorization(self, tools):
+        """测试 Vary 请求头区分缓存变体，带 Authorization 的请求不经过缓存"""
+        hits = []
+
+        async def vary(request):
+            hits.append(request.headers.get("Accept-Language"))
+            return web.Response(text=request.headers.get("Accept-Language", ""),
+                                headers={"Cache-Control": "max-age=60", "Vary": "Accept-Language"})
+
+        async def run():
+            async with serve([("GET", "/vary", vary)]) as base:
+                try:
+                    url = f"{base}/vary"
+                    texts = []
+                    for language in ("en", "fr", "en"):
+                        response = await tools._make_request_with_retry("GET", url, headers={"Accept-Language": language})
+                        texts.append((response.cache_status, await response.text()))
+                    response = await tools._make_request_with_retry(
+                        "GET", url, headers={"Accept-Language": "en", "Authorization": "Bearer x"}
+                    )
+                    texts.append((response.cache_status, await response.text()))
+                    return texts
+                finally:
+                    await tools.close()
+
+        texts = asyncio.run(run())
+        assert texts == [("miss", "en"), ("miss", "fr"), ("hit", "en"), ("bypass", "en")]
+        assert hits == ["en", "fr", "en"]
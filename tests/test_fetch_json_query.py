@@ -0,0 +1,118 @@
+"""
+JSON 解析与查询测试
+JSON Decoding and Query Tests
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from app.core.async_executor import run_file_io
+from app.tools.fetch_tools import parse_json
+import app.tools.json_query as json_query
+from app.tools.json_query import JSONStats, JSONStream, compile_jsonpath, iter_array_items, loads
+from app.tools.streaming import StreamingResult, consume_stream
+
+DOC = {"a": [{"x": 1, "y": [1, 2]}, {"x": "s"}], "b": {"c": {"d": 1.5}}}
+
+
+class TestJSONPath:
+    """测试 JSONPath 编译与求值"""
+
+    @pytest.mark.parametrize("expression,expected", [
+        ("a[*].x", [1, "s"]),
+        ("$.a[0].y", [[1, 2]]),
+        ("*.c", [{"d": 1.5}]),
+        ("b.c.d", [1.5]),
+        ("a[5]", []),
+        ("a[x]", []),
+        ("", [DOC]),
+    ])
+    def test_find(self, expression, expected):
+        assert compile_jsonpath(expression).find(DOC) == expected
+
+    def test_compiled_once(self):
+        assert compile_jsonpath("a[*].x") is compile_jsonpath("a[*].x")
+        assert compile_jsonpath("a[*].x").steps == (("all", "a", None), ("key", "x", None))
+
+    def test_loads_falls_back_for_big_integers(self):
+        assert loads("[123456789012345678901234567890]") == [123456789012345678901234567890]
+        assert loads(b'{"n": -123456789012345678901}') == {"n": -123456789012345678901}
+        with pytest.raises(json.JSONDecodeError):
+            loads("{bad")
+
+    @pytest.mark.parametrize("content", [
+        '{"id": "1234567890123456789012"}',
+        b'["a\\"1234567890123456789012"]',
+        "[1.1234567890123456789012]",
+        "[1e-1234567890123456789012]",
+    ])
+    def test_long_digits_outside_integers_use_orjson(self, content):
+        """字符串、小数和指数中的长数字串不触发标准库回退"""
+        assert json_query._has_long_integer(content) is False
+        assert loads(content) == json.loads(content)
+
+
+class TestStatistics:
+    def test_matches_recursive_definition(self):
+        stats = JSONStats(max_depth=10)
+        stats.add(DOC)
+        assert stats.to_dict() == {
+            "total_keys": 7, "total_values": 4, "max_depth": 3,
+            "data_types": {"list": 2, "dict": 2, "int": 1, "str": 1, "float": 1},
+        }
+
+    def test_max_depth_limits_walk(self):
+        stats = JSONStats(max_depth=0)
+        stats.add(DOC)
+        assert stats.to_dict()["total_keys"] == 2
+
+
+ITEMS = [{"id": i, "tags": ["t", "a,b]"], "meta": {"n": f'q"{i}'}} for i in range(500)]
+
+
+class TestStreaming:
+    """测试数组流式解析"""
+
+    def test_iter_array_items(self):
+        text = json.dumps(ITEMS, indent=1)
+        assert list(iter_array_items(text)) == ITEMS
+        assert list(iter_array_items(" [ ] ")) == []
+        for bad in ("[1,]", "[1,2", "[1] x", "[,1]"):
+            with pytest.raises(json.JSONDecodeError):
+                list(iter_array_items(bad))
+        with pytest.raises(ValueError):
+            JSONStream('{"a": 1}')
+
+    def test_stream_matches_full_parse(self):
+        """测试流式模式的匹配、统计、提取和展平与整体解析一致"""
+        text = json.dumps(ITEMS)
+        queries = ["*.meta.n", "*.tags[1]", "tags"]
+
+        async def run():
+            full = await parse_json(text, jsonpath_queries=queries, extract_keys=["n"], flatten_arrays=True)
+            streamed = await parse_json(text, jsonpath_queries=queries, extract_keys=["n"],
+                                        flatten_arrays=True, stream=True)
+            assert isinstance(streamed, StreamingResult)
+            output, _ = await consume_stream(streamed, run_file_io, max_inline=len(text) * 4)
+            return full, output
+
+        full, output = asyncio.run(run())
+        lines = [json.loads(line) for line in output["matches"].splitlines()]
+        for query in queries:
+            assert [line["value"] for line in lines if line["query"] == query] == full["jsonpath_results"][query]
+            assert output["match_counts"][query] == len(full["jsonpath_results"][query])
+        # 逐元素产出：不同查询的匹配按元素交错
+        assert [line["query"] for line in lines[:2]] == ["*.meta.n", "*.tags[1]"]
+        assert output["statistics"] == full["statistics"]
+        assert output["extracted_keys"] == full["extracted_keys"]
+        assert output["flattened"] == full["flattened"]
+        assert output["streamed_items"] == len(ITEMS)
+        assert "data" not in output
+
+    def test_stream_rejects_non_array(self):
+        result = asyncio.run(parse_json('{"a": 1}', stream=True))
+        assert result["success"] is False
+        result = asyncio.run(parse_json("[1]", jsonpath_queries=[""], stream=True))
+        assert result["success"] is False
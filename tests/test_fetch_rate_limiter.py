@@ -0,0 +1,144 @@
+"""
+网络请求限速测试
+Outbound Request Rate Limiting Tests
+"""
+
+import asyncio
+import time
+from email.utils import formatdate
+
+import pytest
+from aiohttp import web
+
+from app.tools.rate_limiter import HostRateLimiter, TokenBucket, parse_retry_after
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket:
+    """测试令牌桶预约"""
+
+    def test_burst_then_rate(self):
+        """测试突发额度用完后按速率排队"""
+        bucket = TokenBucket(rate=10, capacity=3, now=0.0)
+        waits = [bucket.reserve(0.0) for _ in range(5)]
+        assert waits[:3] == [0.0, 0.0, 0.0]
+        assert waits[3] == pytest.approx(0.1)
+        assert waits[4] == pytest.approx(0.2)
+        # 时间推进后补充令牌
+        assert bucket.reserve(1.0) == 0.0
+
+    def test_pause_spreads_resumed_requests(self):
+        """测试暂停结束后逐个放行"""
+        bucket = TokenBucket(rate=10, capacity=5, now=0.0)
+        bucket.pause(2.0, 0.0)
+        waits = [bucket.reserve(0.5) for _ in range(3)]
+        assert waits == [pytest.approx(1.5), pytest.approx(1.6), pytest.approx(1.7)]
+
+    def test_unlimited_bucket_only_pauses(self):
+        bucket = TokenBucket(rate=None, capacity=1, now=0.0)
+        assert [bucket.reserve(0.0) for _ in range(100)] == [0.0] * 100
+        bucket.pause(3.0, 0.0)
+        assert bucket.reserve(1.0) == 2.0
+
+
+class TestHostRateLimiter:
+    """测试按主机与全局限速"""
+
+    def test_hosts_are_independent(self):
+        clock = FakeClock()
+        limiter = HostRateLimiter(requests_per_second=1, burst_size=1, clock=clock)
+        assert limiter.reserve("a.example.com") == 0.0
+        assert limiter.reserve("b.example.com") == 0.0
+        assert limiter.reserve("A.example.com") == pytest.approx(1.0)
+        assert limiter.get_status()["delayed"] == 1
+
+    def test_global_bucket(self):
+        clock = FakeClock()
+        limiter = HostRateLimiter(requests_per_second=100, burst_size=10,
+                                  global_requests_per_second=2, global_burst_size=1, clock=clock)
+        assert limiter.reserve("a") == 0.0
+        assert limiter.reserve("b") == pytest.approx(0.5)
+
+    def test_retry_after_feedback(self):
+        """测试 429/503 的 Retry-After 暂停主机，其他状态码忽略"""
+        clock = FakeClock()
+        limiter = HostRateLimiter(clock=clock)
+        assert limiter.enabled is False
+        assert limiter.feedback("a", 500, "10") is None
+        assert limiter.feedback("a", 429, "bogus") is None
+        assert limiter.feedback("a", 429, "3") == 3.0
+        assert limiter.reserve("a") == 3.0
+        assert limiter.reserve("b") == 0.0
+
+    def test_parse_retry_after_http_date(self):
+        now = time.time()
+        # HTTP 日期精确到秒
+        assert parse_retry_after(formatdate(now + 30, usegmt=True), now) == pytest.approx(30, abs=1)
+        assert parse_retry_after(formatdate(now - 30, usegmt=True), now) == 0.0
+        assert parse_retry_after("999999") == 3600.0
+
+
+class TestWebScrapingRateLimit:
+    """测试 WebScrapingTools 接入限速器"""
+
+    def test_config_mapping(self, make_scraping_tools):
+        """测试配置到限速器参数的映射"""
+        assert make_scraping_tools().rate_limiter.enabled is False
+        limiter = make_scraping_tools(rate_limit={"enabled": True, "requests_per_second": 5, "burst_size": 2}).rate_limiter
+        assert (limiter.rate, limiter.burst_size) == (5, 2)
+        # 最小间隔折算为速率上限
+        limiter = make_scraping_tools(
+            rate_limit={"enabled": True, "requests_per_second": 5, "delay_between_requests": 0.5}
+        ).rate_limiter
+        assert (limiter.rate, limiter.burst_size) == (2.0, 1)
+
+    def test_reload_keeps_limiter(self, make_scraping_tools):
+        """测试重新加载配置时参数未变化则沿用限速器，保留主机状态"""
+        tools = make_scraping_tools(rate_limit={"enabled": True, "requests_per_second": 5, "burst_size": 2})
+        limiter = tools.rate_limiter
+        limiter.reserve("example.com")
+        tools._load_config()
+        assert tools.rate_limiter is limiter
+        assert tools.rate_limiter.get_status()["hosts"] == 1
+
+        tools.config.rate_limit_enabled = False
+        assert tools._build_rate_limiter() is not limiter
+
+    def test_retry_after_respected(self, make_scraping_tools):
+        """测试 429 + Retry-After 后等待指定时间再重试"""
+        hits = []
+
+        async def handler(request):
+            hits.append(time.monotonic())
+            if len(hits) == 1:
+                return web.Response(status=429, headers={"Retry-After": "0.3"})
+            return web.Response(text="ok")
+
+        async def run():
+            app = web.Application()
+            app.router.add_get("/", handler)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]
+            tools = make_scraping_tools(max_retries=2)
+            try:
+                response = await tools._make_request_with_retry("GET", f"http://127.0.0.1:{port}/")
+                return response.status, tools.rate_limiter.get_status()
+            finally:
+                await tools.close()
+                await runner.cleanup()
+
+        status, limiter_status = asyncio.run(run())
+        assert status == 200
+        assert len(hits) == 2
+        assert hits[1] - hits[0] >= 0.25
+        assert limiter_status["retry_after_pauses"] == 1
@@ -0,0 +1,208 @@
+"""
+请求重试与熔断测试
+Request Retry Policy and Circuit Breaker Tests
+"""
+
+import asyncio
+import socket
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from app.tools.resilience import (
+    CLOSED, HALF_OPEN, OPEN, CircuitOpenError, HostCircuitBreaker, backoff_delay, is_retryable_error,
+    is_retryable_status,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRetryPolicy:
+    """测试错误分类与退避"""
+
+    def test_classification(self):
+        assert is_retryable_status(503) and is_retryable_status(429) and is_retryable_status(408)
+        assert not is_retryable_status(404) and not is_retryable_status(400) and not is_retryable_status(501)
+        assert is_retryable_error(asyncio.TimeoutError())
+        assert is_retryable_error(aiohttp.ServerDisconnectedError())
+        assert not is_retryable_error(aiohttp.InvalidURL("x"))
+        assert not is_retryable_error(CircuitOpenError("h", 1))
+        assert not is_retryable_error(aiohttp.ContentTypeError(None, ()))
+
+    def test_full_jitter_backoff(self):
+        assert backoff_delay(0, 1.0, 30, rand=lambda: 1.0) == 1.0
+        assert backoff_delay(3, 1.0, 30, rand=lambda: 1.0) == 8.0
+        assert backoff_delay(10, 1.0, 30, rand=lambda: 1.0) == 30
+        assert backoff_delay(3, 1.0, 30, rand=lambda: 0.0) == 0.0
+        assert backoff_delay(5, 0, 30) == 0.0
+        assert all(0 <= backoff_delay(2, 0.5, 30) <= 2.0 for _ in range(100))
+
+
+class TestHostCircuitBreaker:
+    """测试熔断状态机"""
+
+    def test_open_half_open_close(self):
+        clock = FakeClock()
+        breaker = HostCircuitBreaker(failure_threshold=3, recovery_timeout=10, clock=clock)
+        for _ in range(2):
+            breaker.record_failure("Example.com")
+        breaker.record_success("example.com")
+        for _ in range(2):
+            breaker.record_failure("example.com")
+        assert breaker.state("example.com") == CLOSED
+
+        breaker.record_failure("example.com")
+        assert breaker.state("example.com") == OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.before_request("example.com")
+        breaker.before_request("other.com")
+
+        # 冷却期后只放行一个探测请求
+        clock.now += 10
+        breaker.before_request("example.com")
+        assert breaker.state("example.com") == HALF_OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.before_request("example.com")
+        breaker.record_success("example.com")
+        assert breaker.state("example.com") == CLOSED
+        breaker.before_request("example.com")
+
+        status = breaker.get_status()
+        assert status["trips"] == 1 and status["rejected"] == 2 and status["open"] == 0
+
+    def test_failed_probe_reopens(self):
+        clock = FakeClock()
+        breaker = HostCircuitBreaker(failure_threshold=1, recovery_timeout=5, clock=clock)
+        breaker.record_failure("h")
+        clock.now += 5
+        breaker.before_request("h")
+        breaker.record_failure("h")
+        assert breaker.state("h") == OPEN
+        clock.now += 4
+        with pytest.raises(CircuitOpenError):
+            breaker.before_request("h")
+
+    def test_status_classification_and_disable(self):
+        breaker = HostCircuitBreaker(failure_threshold=1)
+        breaker.record_status("h", 404)
+        assert breaker.state("h") == CLOSED
+        breaker.record_status("h", 502)
+        assert breaker.state("h") == OPEN
+        disabled = HostCircuitBreaker(failure_threshold=1, enabled=False)
+        disabled.record_failure("h")
+        disabled.before_request("h")
+
+
+async def start_server(handler):
+    app = web.Application()
+    app.router.add_get("/{name}", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+
+def unused_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class TestRequestCore:
+    """测试 _make_request_with_retry 的重试与熔断"""
+
+    def test_retries_only_retryable_statuses(self, make_scraping_tools):
+        hits = {}
+
+        async def handler(request):
+            name = request.match_info["name"]
+            hits[name] = hits.get(name, 0) + 1
+            if name == "flaky" and hits[name] < 3:
+                return web.Response(status=503)
+            if name == "missing":
+                return web.Response(status=404)
+            return web.Response(text="ok")
+
+        async def run():
+            runner, base = await start_server(handler)
+            tools = make_scraping_tools(max_retries=3)
+            try:
+                response = await tools._make_request_with_retry("GET", f"{base}/flaky")
+                assert response.status == 200 and await response.text() == "ok"
+                with pytest.raises(aiohttp.ClientResponseError) as excinfo:
+                    await tools._make_request_with_retry("GET", f"{base}/missing")
+                assert excinfo.value.status == 404
+            finally:
+                await tools.close()
+                await runner.cleanup()
+
+        asyncio.run(run())
+        assert hits == {"flaky": 3, "missing": 1}
+
+    def test_dead_host_fails_fast(self, make_scraping_tools):
+        """测试主机不可达时熔断，之后的请求不再尝试连接"""
+        host = f"127.0.0.1:{unused_port()}"
+        url = f"http://{host}/x"
+
+        async def run():
+            tools = make_scraping_tools(max_retries=5, circuit_breaker={"failure_threshold": 3, "recovery_timeout": 60})
+            try:
+                with pytest.raises(aiohttp.ClientConnectionError) as excinfo:
+                    await tools._make_request_with_retry("GET", url)
+                # 熔断后停止重试，抛出的仍是原始连接错误
+                assert not isinstance(excinfo.value, CircuitOpenError)
+                breaker = tools.circuit_breaker
+                assert breaker.state(host) == OPEN
+                # 熔断中的请求在发出前被拒绝：只计入 rejected，不产生新的失败
+                with pytest.raises(CircuitOpenError) as excinfo:
+                    await tools._make_request_with_retry("GET", url)
+                return excinfo.value, breaker.state(host), breaker.get_status()
+            finally:
+                await tools.close()
+
+        error, state, status = asyncio.run(run())
+        assert 0 < error.retry_in <= 60
+        assert state == OPEN
+        assert status["open"] == 1 and status["trips"] == 1 and status["rejected"] == 1
+
+    def test_negative_max_retries_sends_once(self, make_scraping_tools):
+        """测试 max_retries 为负数时按不重试处理，仍发起一次请求"""
+        hits = []
+
+        async def handler(request):
+            hits.append(request.path)
+            return web.Response(status=503)
+
+        async def run():
+            runner, base = await start_server(handler)
+            tools = make_scraping_tools(max_retries=-1)
+            try:
+                assert tools.config.max_retries == 0
+                with pytest.raises(aiohttp.ClientResponseError):
+                    await tools._make_request_with_retry("GET", f"{base}/x")
+            finally:
+                await tools.close()
+                await runner.cleanup()
+
+        asyncio.run(run())
+        assert len(hits) == 1
+
+    def test_fatal_error_not_retried(self, make_scraping_tools):
+        async def run():
+            tools = make_scraping_tools(max_retries=3)
+            try:
+                with pytest.raises(aiohttp.InvalidURL):
+                    await tools._make_request_with_retry("GET", "http://")
+                return tools.circuit_breaker.get_status()
+            finally:
+                await tools.close()
+
+        assert asyncio.run(run())["hosts"] == 0
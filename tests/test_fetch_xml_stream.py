@@ -0,0 +1,154 @@
+"""
+增量 XML / RSS 解析测试
+Incremental XML and Feed Parsing Tests
+"""
+
+import asyncio
+import xml.etree.ElementTree as ET
+from contextlib import asynccontextmanager
+
+import pytest
+from aiohttp import web
+
+from app.tools.fetch_tools import parse_rss, parse_xml
+from app.tools.xml_stream import FeedParser, XMLStreamParser, parse_text
+
+RSS_HEAD = ('<?xml version="1.0"?><rss version="2.0" xmlns:content="http://purl.org/rss/1.0/modules/content/">'
+            '<channel><title>Feed</title><link>http://example.com/</link>')
+
+
+def rss_items(start, count):
+    return "".join(
+        f"<item><title>T{i}</title><category>c{i % 2}</category>"
+        f"<content:encoded>body{i}</content:encoded></item>"
+        for i in range(start, start + count)
+    )
+
+
+XML = ('<?xml version="1.0"?><root a="1">head<item id="x">one<sub>s</sub>t1</item>'
+       'mid<item>two</item><item/>end<ns:q xmlns:ns="urn:q">z</ns:q></root>')
+
+
+class TestFeedParser:
+    """测试订阅源增量解析"""
+
+    def test_stops_at_max_items(self):
+        """测试达到 max_items 后停止解析，后续内容（即使格式错误）不再处理"""
+        content = RSS_HEAD + rss_items(0, 3) + "<item><broken></channel>"
+        result = asyncio.run(parse_rss(content, max_items=3))
+        assert result["success"] is True
+        assert [item["title"] for item in result["items"]] == ["T0", "T1", "T2"]
+        assert result["items"][1]["content"] == "body1"
+        assert result["feed_info"]["title"] == "Feed"
+        assert result["statistics"]["categories_count"] == 2
+
+    def test_processed_items_are_released(self):
+        parser = parse_text(FeedParser(max_items=100), RSS_HEAD + rss_items(0, 20) + "</channel></rss>")
+        assert len(parser.items) == 20
+        assert parser._channel.findall("item") == []
+
+    def test_atom_feed_info_from_feed_children(self):
+        """测试 Atom 订阅源信息只取 feed 的直接子元素"""
+        atom = ('<feed xmlns="http://www.w3.org/2005/Atom"><title>A</title><link href="http://a/"/>'
+                '<entry><title>E</title><updated>2024</updated><link href="http://a/1"/>'
+                '<author><name>n</name></author><category term="t"/></entry></feed>')
+        result = asyncio.run(parse_rss(atom))
+        assert result["feed_type"] == "Atom"
+        assert result["feed_info"]["link"] == "http://a/"
+        assert result["feed_info"]["updated"] == ""
+        assert result["items"] == [{
+            "title": "E", "summary": "", "id": "", "published": "", "updated": "2024",
+            "categories": ["t"], "link": "http://a/1", "author": "n", "updated_parsed": "2024",
+        }]
+
+    def test_malformed_feed_reports_error(self):
+        result = asyncio.run(parse_rss(RSS_HEAD + rss_items(0, 2)))
+        assert result["success"] is False
+
+
+class TestXMLStreamParser:
+    """测试通用 XML 增量解析"""
+
+    def test_matches_tree_based_output(self):
+        """测试结构、元素列表和纯文本与整树解析一致"""
+        result = asyncio.run(parse_xml(XML))
+        root = ET.fromstring(XML)
+        assert result["root_tag"] == "root"
+        assert result["text_content"] == ET.tostring(root, method="text", encoding="unicode").strip()
+        assert result["elements"] == [
+            {"tag": elem.tag, "text": (elem.text or "").strip(), "attributes": dict(elem.attrib),
+             "tail": (elem.tail or "").strip()}
+            for elem in root.iter()
+        ]
+        assert result["structure"] == {"root": {
+            "@attributes": {"a": "1"}, "@text": "head",
+            "item": [{"@attributes": {"id": "x"}, "@text": "one", "sub": {"@text": "s"}}, {"@text": "two"}, {}],
+            "{urn:q}q": {"@text": "z"},
+        }}
+        assert result["truncated"] is False
+
+    def test_tree_released_unless_xpath(self):
+        parser = parse_text(XMLStreamParser(), XML)
+        assert len(parser.root) == 0
+        result = asyncio.run(parse_xml(XML, xpath_queries=["item"]))
+        assert [match["text"] for match in result["xpath_results"]["item"]] == ["one", "two", ""]
+
+    def test_max_elements(self):
+        result = asyncio.run(parse_xml(XML + "<trailing-garbage", max_elements=3))
+        assert result["success"] is True
+        assert result["truncated"] is True
+        assert [elem["tag"] for elem in result["elements"]] == ["root", "item", "sub"]
+        assert result["structure"]["root"]["item"]["sub"] == {"@text": "s"}
+
+
+@asynccontextmanager
+async def serve(handler):
+    app = web.Application()
+    app.router.add_get("/feed", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    try:
+        yield f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/feed"
+    finally:
+        await runner.cleanup()
+
+
+
+class TestParseFromStream:
+    """测试直接从 HTTP 响应流解析"""
+
+    def test_stops_reading_after_max_items(self, scraping_tools):
+        """测试解析到 max_items 后不再读取剩余响应"""
+        sent = []
+
+        async def handler(request):
+            response = web.StreamResponse(headers={"Content-Type": "application/rss+xml"})
+            await response.prepare(request)
+            await response.write(RSS_HEAD.encode())
+            try:
+                for batch in range(200):
+                    await response.write(rss_items(batch * 10, 10).encode())
+                    sent.append(batch)
+                    await asyncio.sleep(0.005)
+                await response.write(b"</channel></rss>")
+            except ConnectionError:
+                pass
+            return response
+
+        async def run():
+            async with serve(handler) as url:
+                try:
+                    return await parse_rss(url=url, max_items=5)
+                finally:
+                    await scraping_tools.close()
+
+        result = asyncio.run(run())
+        assert result["success"] is True
+        assert [item["title"] for item in result["items"]] == ["T0", "T1", "T2", "T3", "T4"]
+        assert len(sent) < 200
+
+    def test_missing_input(self):
+        result = asyncio.run(parse_xml())
+        assert result["success"] is False
@@ -0,0 +1,134 @@
+"""
+MCP 工具目录快照测试
+MCP Tool Catalog Snapshot Tests
+"""
+
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+import app.routers.mcp as mcp_router
+from app.core.event_bus import EventTopics, publish_event
+from app.core.mcp_permissions import refresh_permission_manager
+from app.tools.catalog import ToolCatalogCache
+
+
+class FakeToolsService:
+    """内存中的工具/分类数据，并记录数据库读取次数"""
+
+    def __init__(self):
+        self.tools = {
+            "time_get_ts": {"name": "time_get_ts", "description": "时间戳", "category": "time", "enabled": True},
+            "time_custom": {"name": "time_custom", "description": "自定义", "category": "time", "enabled": False},
+            "files_write": {"name": "files_write", "description": "写文件", "category": "files", "enabled": True},
+        }
+        self.categories = {
+            "time": {"id": "time", "name": "时间", "enabled": True},
+            "files": {"id": "files", "name": "文件", "enabled": False},
+        }
+        self.calls = 0
+
+    def get_tools(self, category=None, enabled_only=True):
+        self.calls += 1
+        return [t for t in self.tools.values() if not enabled_only or t["enabled"]]
+
+    def get_categories(self, enabled_only=True):
+        self.calls += 1
+        return [c for c in self.categories.values() if not enabled_only or c["enabled"]]
+
+
+@pytest.fixture
+def catalog():
+    refresh_permission_manager("local")
+    service = FakeToolsService()
+    yield ToolCatalogCache(tools_service=service), service
+    refresh_permission_manager()
+
+
+class TestToolCatalog:
+    """测试目录快照的构建与失效"""
+
+    def test_partitions_and_grouping(self, catalog):
+        """测试权限分区、分类工具数和按分类分组"""
+        cache, _ = catalog
+        refresh_permission_manager("remote")
+        snapshot = cache.catalog
+
+        assert [t["name"] for t in snapshot.allowed] == ["time_get_ts"]
+        blocked = {t["name"]: t for t in snapshot.blocked}
+        assert set(blocked) == {"time_custom", "files_write"}
+        assert "remote 环境下不可用" in blocked["files_write"]["blocked_reason"]
+        assert snapshot.environment == "remote"
+
+        counts = {c["id"]: c["tools_count"] for c in snapshot.categories}
+        # 禁用分类的工具数为 0，但仍可按分类查询其启用的工具
+        assert counts == {"time": 1, "files": 0}
+        assert [t["name"] for t in snapshot.get_category("files").tools] == ["files_write"]
+        assert snapshot.get_category("missing") is None
+
+    def test_rebuilt_only_on_key_change(self, catalog):
+        """测试快照仅在工具事件或环境切换后重建"""
+        cache, service = catalog
+        first = cache.catalog
+        calls = service.calls
+        for _ in range(5):
+            assert cache.catalog is first
+        assert service.calls == calls
+
+        service.tools["time_custom"]["enabled"] = True
+        publish_event(EventTopics.CACHE, "cache.flushed")
+        assert cache.catalog is first
+
+        publish_event(EventTopics.MCP_TOOLS, "mcp.tool.enabled", {"name": "time_custom"})
+        second = cache.catalog
+        assert second.version == first.version + 1
+        assert len(second.get_category("time").tools) == 2
+
+        refresh_permission_manager("local")
+        assert cache.catalog is not second
+        assert cache.rebuilds == 3
+
+    def test_snapshot_isolated_from_source(self, catalog):
+        """测试快照复制数据，修改源记录不影响已发布的快照"""
+        cache, service = catalog
+        snapshot = cache.catalog
+        service.tools["time_get_ts"]["description"] = "changed"
+        service.categories["time"]["name"] = "changed"
+        assert snapshot.allowed[0]["description"] == "时间戳"
+        assert snapshot.get_category("time").info["name"] == "时间"
+        assert "tools_count" not in service.categories["time"]
+
+
+class TestCatalogEndpoints:
+    """测试列表接口使用目录快照"""
+
+    def test_list_endpoints(self, catalog, monkeypatch):
+        """测试 /tools、/categories 和 /tools/{category} 的响应结构"""
+        cache, service = catalog
+        monkeypatch.setattr(mcp_router, "get_tool_catalog", lambda: cache)
+        app = FastAPI()
+        app.include_router(mcp_router.router, prefix="/api")
+
+        async def run():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                tools = await client.get("/api/mcp/tools")
+                categories = await client.get("/api/mcp/categories")
+                time_tools = await client.get("/api/mcp/tools/time")
+                missing = await client.get("/api/mcp/tools/missing")
+            return tools.json(), categories.json(), time_tools.json(), missing.json()
+
+        tools, categories, time_tools, missing = asyncio.run(run())
+        assert tools["success"] is True
+        assert len(tools["data"]["tools"]) == 3
+        assert tools["data"]["blocked_tools"] == []
+        assert tools["data"]["environment"] == "local"
+
+        assert categories["data"]["total_categories"] == 2
+        assert time_tools["data"]["tools_count"] == 1
+        assert time_tools["data"]["category"]["name"] == "时间"
+        assert missing["success"] is False
+        # 三个接口共享同一份快照
+        assert cache.rebuilds == 1
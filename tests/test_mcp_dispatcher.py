@@ -0,0 +1,380 @@
+"""
+MCP 工具调度引擎测试
+MCP Tool Dispatch Engine Tests
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core.event_bus import EventBus, EventTopics
+from app.core.mcp_permissions import refresh_permission_manager
+from app.tools.dispatcher import ToolDispatcher, ToolNotFoundError, ToolPermissionError
+from app.tools.registry import clear_registry, get_tool_callable, mcp_tool
+from app.tools.tracing import MAX_ARGUMENT_VALUE_LENGTH, payload_size, sanitize_arguments
+
+SCHEMA = {"type": "object", "properties": {"value": {"type": "integer"}}, "required": []}
+
+
+class FakeToolsService:
+    """只返回启用工具名称的最小服务"""
+
+    def __init__(self, names):
+        self.enabled = set(names)
+        self.calls = 0
+
+    def get_tools(self, enabled_only=True):
+        self.calls += 1
+        return [{"name": name} for name in sorted(self.enabled)]
+
+
+@pytest.fixture(autouse=True)
+def local_permissions():
+    refresh_permission_manager("local")
+    yield
+    refresh_permission_manager()
+
+
+class TestToolDispatcher:
+    """测试工具调度器"""
+
+    def setup_method(self):
+        clear_registry()
+
+        @mcp_tool(name="double", description="翻倍", category="dispatch", schema=SCHEMA)
+        def double(value: int = 1):
+            return {"value": value * 2, "thread": threading.current_thread().name}
+
+        @mcp_tool(name="echo", description="回显", category="dispatch", schema=SCHEMA)
+        async def echo(value: int = 0):
+            return value
+
+        self.service = FakeToolsService({"dispatch_double", "dispatch_echo", "dispatch_missing_impl"})
+        self.dispatcher = ToolDispatcher(tools_service=self.service)
+
+    def teardown_method(self):
+        clear_registry()
+
+    def test_registry_captures_callables(self):
+        """测试装饰器保存原始实现函数"""
+        assert get_tool_callable("dispatch_echo") is not None
+        assert asyncio.iscoroutinefunction(get_tool_callable("dispatch_echo"))
+        assert get_tool_callable("dispatch_unknown") is None
+
+    def test_table_built_once(self):
+        """测试调度表只在过期时重建"""
+        entry = self.dispatcher.lookup("dispatch_double")
+        assert entry.is_async is False
+        assert entry.schema == SCHEMA
+        assert self.dispatcher.lookup("dispatch_echo").is_async is True
+        # 没有实现函数的工具不进入调度表
+        assert self.dispatcher.lookup("dispatch_missing_impl") is None
+
+        for _ in range(10):
+            self.dispatcher.lookup("dispatch_double")
+        assert self.service.calls == 1
+        assert self.dispatcher.rebuilds == 1
+
+    def test_call_sync_and_async_tools(self):
+        """测试同步工具在线程池执行，异步工具直接 await"""
+        async def run():
+            return (
+                await self.dispatcher.call("dispatch_double", {"value": 21}),
+                await self.dispatcher.call("dispatch_echo", {"value": 7}),
+            )
+
+        doubled, echoed = asyncio.run(run())
+        assert doubled["value"] == 42
+        assert doubled["thread"].startswith("lazyai-mcp-dispatch")
+        assert echoed == 7
+
+    def test_unknown_tool(self):
+        """测试未知工具"""
+        with pytest.raises(ToolNotFoundError):
+            asyncio.run(self.dispatcher.call("dispatch_unknown"))
+
+    def test_invalidated_by_tool_events(self):
+        """测试工具启用/禁用事件使调度表失效"""
+        bus = EventBus()
+        bus.add_listener(self.dispatcher.invalidate, (EventTopics.MCP_TOOLS,))
+        assert self.dispatcher.lookup("dispatch_echo") is not None
+
+        self.service.enabled.discard("dispatch_echo")
+        bus.publish(EventTopics.CACHE, "cache.flushed")
+        assert self.dispatcher.lookup("dispatch_echo") is not None
+
+        bus.publish(EventTopics.MCP_TOOLS, "mcp.tool.disabled", {"name": "dispatch_echo"})
+        assert self.dispatcher.lookup("dispatch_echo") is None
+        assert self.dispatcher.rebuilds == 2
+
+    def test_permission_environment_change(self):
+        """测试切换权限环境后重建调度表并拒绝未授权工具"""
+        assert self.dispatcher.lookup("dispatch_double").allowed is True
+
+        refresh_permission_manager("remote")
+        entry = self.dispatcher.lookup("dispatch_double")
+        assert entry.allowed is False
+        with pytest.raises(ToolPermissionError) as exc_info:
+            asyncio.run(self.dispatcher.call("dispatch_double"))
+        assert exc_info.value.environment == "remote"
+
+
+class TestToolPools:
+    """测试同步工具按分类隔离线程池"""
+
+    def setup_method(self):
+        clear_registry()
+
+        @mcp_tool(name="slow", description="慢工具", category="slowcat", schema=SCHEMA)
+        def slow(value: int = 0):
+            time.sleep(0.2)
+            return value
+
+        @mcp_tool(name="fast", description="快工具", category="fastcat", schema=SCHEMA)
+        def fast(value: int = 0):
+            return threading.current_thread().name
+
+        service = FakeToolsService({"slowcat_slow", "fastcat_fast"})
+        self.dispatcher = ToolDispatcher(tools_service=service)
+
+    def teardown_method(self):
+        clear_registry()
+
+    def test_slow_category_does_not_stall_others(self):
+        """测试慢分类占满线程池时其他分类的工具仍能立即执行"""
+        async def run():
+            slow_calls = [asyncio.create_task(self.dispatcher.call("slowcat_slow")) for _ in range(8)]
+            await asyncio.sleep(0.02)
+            start = time.perf_counter()
+            thread = await self.dispatcher.call("fastcat_fast")
+            elapsed = time.perf_counter() - start
+            await asyncio.gather(*slow_calls)
+            return thread, elapsed
+
+        thread, elapsed = asyncio.run(run())
+        assert thread.startswith("lazyai-mcp-fastcat")
+        assert elapsed < 0.15
+
+        timings = self.dispatcher.get_tool_timings()
+        slow = timings["slowcat_slow"]
+        assert slow["calls"] == 8
+        assert slow["errors"] == 0
+        assert slow["avg_run_ms"] >= 150
+        # 默认 4 个线程，8 个调用中后 4 个需要排队等待一轮
+        assert slow["max_queue_ms"] >= 150
+        assert timings["fastcat_fast"]["calls"] == 1
+
+
+class TestResultCache:
+    """测试声明式结果缓存"""
+
+    def setup_method(self):
+        clear_registry()
+        self.executions = 0
+
+        @mcp_tool(name="lookup", description="查询", category="cached", schema=SCHEMA,
+                  cache={"ttl": 60, "key": ["owner", "repo"]})
+        async def lookup(owner: str, repo: str, verbose: bool = False):
+            self.executions += 1
+            await asyncio.sleep(0.05)
+            if owner == "missing":
+                return {"success": False, "error": "not found"}
+            return {"full_name": f"{owner}/{repo}"}
+
+        @mcp_tool(name="clock", description="时钟", category="cached", schema=SCHEMA, cache={"ttl": 0.05})
+        def clock(value: int = 0):
+            self.executions += 1
+            return time.monotonic()
+
+        self.dispatcher = ToolDispatcher(tools_service=FakeToolsService({"cached_lookup", "cached_clock"}))
+
+    def teardown_method(self):
+        clear_registry()
+
+    def test_single_flight_and_hits(self):
+        """测试并发相同调用只执行一次，之后命中缓存，key 之外的参数不影响缓存键"""
+        async def run():
+            args = {"owner": "octocat", "repo": "hello"}
+            first = await asyncio.gather(*(self.dispatcher.call("cached_lookup", dict(args)) for _ in range(5)))
+            again = await self.dispatcher.call("cached_lookup", {**args, "verbose": True})
+            return first, again
+
+        first, again = asyncio.run(run())
+        assert self.executions == 1
+        assert all(r == {"full_name": "octocat/hello"} for r in first)
+        assert again == {"full_name": "octocat/hello"}
+
+        stats = self.dispatcher.get_status()["cache"]["tools"]["cached_lookup"]
+        assert stats["misses"] == 1
+        assert stats["coalesced"] == 4
+        assert stats["hits"] == 1
+        assert stats["hit_rate"] == round(5 / 6, 4)
+        assert stats["entries"] == 1
+
+    def test_failures_not_cached(self):
+        """测试 success=False 的结果不缓存"""
+        async def run():
+            for _ in range(2):
+                await self.dispatcher.call("cached_lookup", {"owner": "missing", "repo": "x"})
+
+        asyncio.run(run())
+        assert self.executions == 2
+
+    def test_defaults_canonicalized_and_ttl(self):
+        """测试默认参数规范化以及 TTL 过期"""
+        async def run():
+            a = await self.dispatcher.call("cached_clock", {})
+            b = await self.dispatcher.call("cached_clock", {"value": 0})
+            await asyncio.sleep(0.06)
+            c = await self.dispatcher.call("cached_clock", {})
+            return a, b, c
+
+        a, b, c = asyncio.run(run())
+        assert a == b
+        assert c != a
+        assert self.executions == 2
+
+    def test_lru_bound(self):
+        """测试缓存容量上限"""
+        from app.tools.result_cache import CachePolicy, ToolResultCache
+
+        async def run():
+            cache = ToolResultCache(max_entries=2)
+            policy = CachePolicy(ttl=60)
+
+            async def call_with(value):
+                async def produce():
+                    return value
+                return await cache.get_or_call("t", lambda value: None, policy, {"value": value}, produce)
+
+            for value in (1, 2, 1, 3, 1):
+                await call_with(value)
+            return cache.get_stats()
+
+        stats = asyncio.run(run())
+        assert stats["entries"] == 2
+        assert stats["evictions"] == 1
+        # 1 在访问后变为最近使用，插入 3 时淘汰的是 2，最后一次访问 1 仍命中
+        assert stats["tools"]["t"]["hits"] == 2
+
+    def test_leader_cancellation_not_propagated(self):
+        """测试执行者被取消时，等待者不收到 CancelledError，而由其中一个接替执行"""
+        async def run():
+            args = {"owner": "octocat", "repo": "hello"}
+            leader = asyncio.create_task(self.dispatcher.call("cached_lookup", dict(args)))
+            await asyncio.sleep(0.01)
+            followers = [asyncio.create_task(self.dispatcher.call("cached_lookup", dict(args))) for _ in range(3)]
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            results = await asyncio.gather(*followers)
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+            return results
+
+        results = asyncio.run(run())
+        assert results == [{"full_name": "octocat/hello"}] * 3
+        # 被取消的执行者 + 一个接替者
+        assert self.executions == 2
+
+    def test_invalidate_pattern(self):
+        """测试按通配符清除缓存"""
+        async def run():
+            await self.dispatcher.call("cached_lookup", {"owner": "octocat", "repo": "hello"})
+            await self.dispatcher.call("cached_clock", {})
+            self.dispatcher.result_cache.invalidate("cached_l*")
+            return self.dispatcher.get_status()["cache"]["tools"]
+
+        tools = asyncio.run(run())
+        assert tools["cached_lookup"]["entries"] == 0
+        assert tools["cached_clock"]["entries"] == 1
+
+    def test_invalid_cache_spec(self):
+        """测试非法缓存声明在注册时报错"""
+        with pytest.raises(ValueError):
+            mcp_tool(name="bad", description="bad", category="cached", schema=SCHEMA, cache={"ttl": 0})
+        with pytest.raises(ValueError):
+            mcp_tool(name="bad", description="bad", category="cached", schema=SCHEMA, cache={"ttl": 1, "key": "owner"})
+
+
+class TestToolTracing:
+    """测试工具调用追踪"""
+
+    def setup_method(self):
+        clear_registry()
+
+        @mcp_tool(name="sleepy", description="按参数等待", category="traced", schema=SCHEMA)
+        async def sleepy(value: int = 0, token: str = ""):
+            await asyncio.sleep(value / 1000)
+            return {"slept": value, "padding": "x" * 100}
+
+        @mcp_tool(name="broken", description="总是失败", category="traced", schema=SCHEMA)
+        def broken(value: int = 0):
+            raise RuntimeError("boom")
+
+        self.dispatcher = ToolDispatcher(tools_service=FakeToolsService({"traced_sleepy", "traced_broken"}))
+
+    def teardown_method(self):
+        clear_registry()
+
+    def test_stats_and_slowest_calls(self):
+        """测试统计、序列化结果大小以及最慢调用排序和参数脱敏"""
+        async def run():
+            texts = [await self.dispatcher.call_text("traced_sleepy", {"value": v, "token": "secret"}) for v in (1, 30, 10)]
+            with pytest.raises(RuntimeError):
+                await self.dispatcher.call("traced_broken")
+            return texts
+
+        texts = asyncio.run(run())
+        assert all(isinstance(text, str) for text in texts)
+
+        stats = self.dispatcher.get_tool_timings()
+        assert stats["traced_sleepy"]["calls"] == 3
+        assert stats["traced_sleepy"]["max_result_bytes"] == len(texts[1].encode("utf-8"))
+        assert stats["traced_sleepy"]["avg_argument_bytes"] > 0
+        assert stats["traced_broken"]["errors"] == 1
+
+        slowest = self.dispatcher.tracer.slowest(2)
+        assert [r["arguments"]["value"] for r in slowest] == ["30", "10"]
+        assert slowest[0]["arguments"]["token"] == "***"
+        assert slowest[0]["run_ms"] >= 25
+
+        status = self.dispatcher.get_status()["tracing"]
+        assert status["recent_calls"] == 4
+
+    def test_slow_call_threshold_and_metrics(self):
+        """测试慢调用计数和 Prometheus 指标输出"""
+        from app.core.metrics import get_metrics_registry
+
+        self.dispatcher.tracer.slow_call_seconds = 0.01
+        asyncio.run(self.dispatcher.call("traced_sleepy", {"value": 20}))
+        asyncio.run(self.dispatcher.call("traced_sleepy", {"value": 0}))
+        assert self.dispatcher.tracer.slow_calls == 1
+
+        rendered = get_metrics_registry().render()
+        assert 'lazyai_mcp_tool_calls_total{category="traced",tool="traced_sleepy",status="ok"}' in rendered
+        assert "lazyai_mcp_tool_argument_bytes_bucket" in rendered
+
+    def test_sanitize_nested_arguments(self):
+        """测试嵌套请求头、Cookie 和 URL 查询参数脱敏"""
+        sanitized = sanitize_arguments({
+            "url": "https://user:pw@example.com/api?access_token=abc123&page=2#top",
+            "headers": {"Authorization": "Bearer abc123", "Cookie": "sid=abc123", "Accept": "text/html"},
+            "items": [{"session_id": "abc123", "name": "ok"}],
+            "session": "abc123",
+            "content": "x" * 100000,
+        })
+        assert "abc123" not in "".join(sanitized.values())
+        assert sanitized["url"] == "https://***@example.com/api?access_token=***&page=***#top"
+        assert '"Accept": "text/html"' in sanitized["headers"]
+        assert '"name": "ok"' in sanitized["items"]
+        assert sanitized["session"] == "***"
+        assert len(sanitized["content"]) == MAX_ARGUMENT_VALUE_LENGTH
+
+    def test_payload_size_estimate(self):
+        """测试参数大小估算与 JSON 序列化长度一致"""
+        import json
+        value = {"path": "a.txt", "content": "数据" * 10, "lines": [1, 2.5, None, True]}
+        expected = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        assert payload_size(value) == len(expected)
@@ -0,0 +1,181 @@
+"""
+MCP 工具清单与按需加载测试
+MCP Tool Manifest and Lazy Loading Tests
+"""
+
+import asyncio
+import sys
+import textwrap
+
+import pytest
+from tinydb import TinyDB
+from tinydb.storages import MemoryStorage
+
+import app.tools.manifest as manifest_module
+from app.core.mcp_permissions import refresh_permission_manager
+from app.tools.dispatcher import ToolDispatcher, ToolNotFoundError, ToolPermissionError
+from app.tools.registry import (
+    clear_registry,
+    get_registered_categories,
+    get_tool_cache_policy,
+    get_tool_callable,
+    get_tool_module,
+)
+from app.tools.service import MCPToolsService
+
+MODULE = "lazytoolpkg.sample_tools"
+
+SOURCE = '''
+import asyncio
+from app.tools.registry import mcp_category, mcp_tool
+
+SCHEMA = {"type": "object", "properties": {"value": {"type": "integer"}}, "required": []}
+
+
+@mcp_category(category_id="lazy", name="按需加载", description="测试分类")
+def register_lazy_category():
+    pass
+
+
+@mcp_tool(name="double", description="翻倍", category="lazy", schema=SCHEMA)
+def double(value: int = 1):
+    return value * 2
+
+
+@mcp_tool(name="echo", description="回显", category="lazy", schema=SCHEMA, cache={"ttl": 30, "key": ["value"]})
+async def echo(value: int = 0):
+    await asyncio.sleep(0)
+    return value
+'''
+
+
+class FakeToolsService:
+    def get_tools(self, enabled_only=True):
+        return [{"name": "lazy_double"}, {"name": "lazy_echo"}]
+
+
+@pytest.fixture
+def tool_package(tmp_path, monkeypatch):
+    package = tmp_path / "lazytoolpkg"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    (package / "sample_tools.py").write_text(SOURCE)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    refresh_permission_manager("local")
+    clear_registry()
+    yield package, str(tmp_path / "manifest.json")
+    clear_registry()
+    refresh_permission_manager()
+    for name in [m for m in sys.modules if m.startswith("lazytoolpkg")]:
+        del sys.modules[name]
+
+
+def _fresh_start():
+    """模拟新进程：清空注册表并卸载工具模块"""
+    clear_registry()
+    sys.modules.pop(MODULE, None)
+
+
+class TestToolManifest:
+    """测试清单生成、加载与失效"""
+
+    def test_generate_then_register_without_import(self, tool_package):
+        """测试首次启动生成清单，之后按清单注册而不导入实现模块"""
+        _, path = tool_package
+        generated = manifest_module.ensure_manifest(path, [MODULE])
+        tools = generated["modules"][MODULE]["tools"]
+        assert [t["name"] for t in tools] == ["lazy_double", "lazy_echo"]
+        assert tools[1]["cache"] == {"ttl": 30.0, "key": ["value"]}
+
+        _fresh_start()
+        loaded = manifest_module.ensure_manifest(path, [MODULE])
+        assert loaded["hash"] == generated["hash"]
+        assert MODULE not in sys.modules
+        assert get_tool_callable("lazy_double") is None
+        assert get_tool_module("lazy_double") == MODULE
+        assert get_tool_cache_policy("lazy_echo").key == ("value",)
+        assert [c["id"] for c in get_registered_categories()] == ["lazy"]
+
+    def test_source_change_invalidates_manifest(self, tool_package):
+        """测试工具模块源码变化后清单失效"""
+        package, path = tool_package
+        manifest_module.ensure_manifest(path, [MODULE])
+        assert manifest_module.load_manifest(path, [MODULE]) is not None
+
+        (package / "sample_tools.py").write_text(SOURCE + "\n# changed\n")
+        assert manifest_module.load_manifest(path, [MODULE]) is None
+
+    def test_first_call_imports_category_module(self, tool_package):
+        """测试首次调用时导入模块，同分类的其他工具随之加载"""
+        _, path = tool_package
+        manifest_module.ensure_manifest(path, [MODULE])
+        _fresh_start()
+        manifest_module.ensure_manifest(path, [MODULE])
+
+        dispatcher = ToolDispatcher(tools_service=FakeToolsService())
+        assert dispatcher.lookup("lazy_double").loaded is False
+        assert dispatcher.get_status()["unloaded"] == 2
+
+        async def run():
+            return (
+                await dispatcher.call("lazy_double", {"value": 4}),
+                await dispatcher.call("lazy_echo", {"value": 5}),
+            )
+
+        assert asyncio.run(run()) == (8, 5)
+        assert MODULE in sys.modules
+        assert dispatcher.lookup("lazy_echo").is_async is True
+        assert dispatcher.get_status()["unloaded"] == 0
+
+    def test_access_check_does_not_import(self, tool_package):
+        """测试存在性与权限检查只读调度表元数据，不导入实现模块"""
+        _, path = tool_package
+        manifest_module.ensure_manifest(path, [MODULE])
+        _fresh_start()
+        manifest_module.ensure_manifest(path, [MODULE])
+        dispatcher = ToolDispatcher(tools_service=FakeToolsService())
+
+        async def run():
+            entry = await dispatcher.check_access("lazy_double")
+            with pytest.raises(ToolNotFoundError):
+                await dispatcher.check_access("lazy_missing")
+            refresh_permission_manager("remote")
+            with pytest.raises(ToolPermissionError):
+                await dispatcher.check_access("lazy_double")
+            return entry
+
+        assert asyncio.run(run()).loaded is False
+        assert MODULE not in sys.modules
+
+
+class TestManifestSync:
+    """测试清单哈希未变化时跳过数据库同步"""
+
+    def test_sync_skipped_when_hash_unchanged(self, monkeypatch):
+        service = MCPToolsService.__new__(MCPToolsService)
+        db = TinyDB(storage=MemoryStorage)
+        service.tools_table = db.table("mcp_tools")
+        service.categories_table = db.table("mcp_categories")
+        service.system_config_table = db.table("system_config")
+
+        syncs = []
+
+        def sync_tools():
+            syncs.append("tools")
+            service.tools_table.insert({"name": "x"})
+            return {"synced": 1, "updated": 0, "removed": 0}
+
+        monkeypatch.setattr(service, "sync_registry_categories_to_db",
+                            lambda: {"synced": 0, "updated": 0, "removed": 0})
+        monkeypatch.setattr(service, "sync_registry_tools_to_db", sync_tools)
+        current = {"hash": "a"}
+        monkeypatch.setattr(manifest_module, "ensure_manifest", lambda: current)
+
+        service._discover_registry_tools()
+        service._discover_registry_tools()
+        assert syncs == ["tools"]
+
+        current["hash"] = "b"
+        service._discover_registry_tools()
+        assert syncs == ["tools", "tools"]
+        assert service._get_synced_manifest_hash() == "b"
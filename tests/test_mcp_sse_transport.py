@@ -0,0 +1,234 @@
+"""
+MCP SSE 会话传输测试
+MCP SSE Session Transport Tests
+"""
+
+import asyncio
+import json
+import tracemalloc
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+
+import app.routers.mcp as mcp_router
+from app.core.mcp_permissions import refresh_permission_manager
+from app.tools.dispatcher import ToolDispatcher
+from app.tools.registry import clear_registry, mcp_tool
+from app.tools.sse_transport import SSESessionManager, SessionBusy, SessionLimitExceeded
+
+SCHEMA = {"type": "object", "properties": {"seconds": {"type": "number"}}, "required": []}
+
+
+def _data(frame):
+    """解析 SSE 帧中的 JSON 数据"""
+    return json.loads(frame.split("data: ", 1)[1])
+
+
+class TestSSESessionManager:
+    """测试会话管理"""
+
+    def test_queue_backpressure(self):
+        """测试进度通知队列满时丢弃，响应入队超时关闭慢消费者"""
+        async def run():
+            manager = SSESessionManager(queue_size=2)
+            session = manager.create()
+            assert session.send_nowait({"n": 1})
+            assert await session.send({"n": 2})
+            assert not session.send_nowait({"n": 3})
+            assert session.dropped_messages == 1
+            assert session.queued_bytes > 0
+
+            delivered = await session.send({"n": 4}, timeout=0.05)
+            return manager, session, delivered
+
+        manager, session, delivered = asyncio.run(run())
+        assert delivered is False
+        assert session.closed
+        assert session.close_reason == "slow_consumer"
+        assert manager.get(session.id) is None
+
+    def test_limits_and_idle_eviction(self):
+        """测试会话数上限、执行中请求上限和空闲淘汰"""
+        async def run():
+            manager = SSESessionManager(max_sessions=2, max_inflight=1, idle_timeout=0.05)
+            first = manager.create()
+            manager.create()
+            with pytest.raises(SessionLimitExceeded):
+                manager.create()
+
+            first.spawn(asyncio.sleep(1))
+            with pytest.raises(SessionBusy):
+                first.ensure_capacity()
+
+            await asyncio.sleep(0.06)
+            # 达到上限时先淘汰空闲会话
+            third = manager.create()
+            return manager, first, third
+
+        manager, first, third = asyncio.run(run())
+        assert first.closed and first.close_reason == "idle"
+        assert len(manager) == 1
+        assert manager.get(third.id) is third
+        assert manager.rejected == 1
+
+    def test_stream_frames(self):
+        """测试输出流先发送 endpoint，再输出消息，关闭后结束"""
+        async def run():
+            manager = SSESessionManager()
+            session = manager.create()
+            stream = manager.stream(session, "/api/mcp/messages?session_id=x", heartbeat_interval=0.01)
+            frames = [await stream.__anext__()]
+            frames.append(await stream.__anext__())  # 心跳
+            session.send_nowait({"jsonrpc": "2.0", "id": 1, "result": {}})
+            frames.append(await stream.__anext__())
+            manager.close(session.id)
+            with pytest.raises(StopAsyncIteration):
+                await stream.__anext__()
+            return frames
+
+        endpoint, heartbeat, message = asyncio.run(run())
+        assert endpoint == "event: endpoint\ndata: /api/mcp/messages?session_id=x\n\n"
+        assert heartbeat.startswith(": ping")
+        assert message.startswith("event: message\n")
+        assert _data(message)["id"] == 1
+
+    def test_memory_per_session(self):
+        """测试空闲会话的内存占用"""
+        async def run():
+            manager = SSESessionManager(max_sessions=1000)
+            tracemalloc.start()
+            try:
+                before = tracemalloc.get_traced_memory()[0]
+                sessions = [manager.create() for _ in range(300)]
+                after = tracemalloc.get_traced_memory()[0]
+            finally:
+                tracemalloc.stop()
+            return (after - before) / len(sessions)
+
+        assert asyncio.run(run()) < 8 * 1024
+
+
+@pytest.fixture
+def sse_app(monkeypatch):
+    refresh_permission_manager("local")
+    clear_registry()
+
+    @mcp_tool(name="wait", description="等待", category="sse", schema=SCHEMA)
+    async def wait(seconds: float = 0):
+        await asyncio.sleep(seconds)
+        return f"waited {seconds}"
+
+    dispatcher = ToolDispatcher(tools_service=type("Service", (), {
+        "get_tools": lambda self, enabled_only=True: [{"name": "sse_wait"}]
+    })())
+
+    class Server:
+        async def call_tool(self, tool_name, arguments):
+            return str(await dispatcher.call(tool_name, arguments))
+
+    manager = SSESessionManager()
+    monkeypatch.setattr(mcp_router, "get_tool_dispatcher", lambda: dispatcher)
+    monkeypatch.setattr(mcp_router, "get_mcp_server", lambda: Server())
+    monkeypatch.setattr(mcp_router, "get_sse_session_manager", lambda: manager)
+    monkeypatch.setattr(mcp_router, "MCP_SSE_PROGRESS_INTERVAL", 0.02)
+
+    app = FastAPI()
+    app.include_router(mcp_router.router, prefix="/api")
+    yield app, manager
+    clear_registry()
+    refresh_permission_manager()
+
+
+class TestSSEEndpoints:
+    """测试 SSE 端点与消息投递"""
+
+    def test_sse_endpoint_announces_message_url(self, sse_app):
+        """测试 SSE 端点创建会话并发送 endpoint 事件"""
+        app, manager = sse_app
+
+        async def run():
+            request = Request({
+                "type": "http", "method": "GET", "path": "/api/mcp/sse", "headers": [],
+                "query_string": b"", "scheme": "http", "server": ("test", 80),
+            })
+            response = await mcp_router.mcp_sse_endpoint(request)
+            first = await response.body_iterator.__anext__()
+            await response.body_iterator.aclose()
+            return response, first
+
+        response, first = asyncio.run(run())
+        assert response.media_type == "text/event-stream"
+        assert first.startswith("event: endpoint\ndata: /api/mcp/messages?session_id=")
+        # 输出流关闭后会话被清理
+        assert len(manager) == 0
+
+    def test_post_messages_streams_results_and_progress(self, sse_app):
+        """测试投递消息后响应与进度通知通过会话流返回"""
+        app, manager = sse_app
+
+        async def run():
+            session = manager.create()
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                accepted = await client.post(f"/api/mcp/messages?session_id={session.id}", json=[
+                    {"jsonrpc": "2.0", "id": 1, "method": "tools/call",
+                     "params": {"name": "sse_wait", "arguments": {"seconds": 0.1}, "_meta": {"progressToken": "t1"}}},
+                    {"jsonrpc": "2.0", "id": 2, "method": "ping"},
+                    {"jsonrpc": "2.0", "method": "notifications/initialized"},
+                ])
+                missing = await client.post("/api/mcp/messages?session_id=unknown", json={"jsonrpc": "2.0", "id": 1, "method": "ping"})
+
+            messages = []
+            while not any(m.get("id") == 1 for m in messages):
+                frame = await session.next_frame(1.0)
+                assert frame is not None
+                messages.append(_data(frame))
+            return accepted, missing, messages
+
+        accepted, missing, messages = asyncio.run(run())
+        assert accepted.status_code == 202
+        assert missing.status_code == 404
+
+        responses = [m for m in messages if "id" in m]
+        progress = [m for m in messages if m.get("method") == "notifications/progress"]
+        # ping 先于慢工具完成并先送达，通知没有响应
+        assert [m["id"] for m in responses] == [2, 1]
+        assert responses[1]["result"]["content"][0]["text"] == "waited 0.1"
+        assert len(progress) >= 2
+        assert all(p["params"]["progressToken"] == "t1" for p in progress)
+
+    def test_tool_calls_share_heavy_admission_slots(self, sse_app, monkeypatch):
+        """测试会话中的工具调用占用 heavy 名额，饱和时返回 JSON-RPC 繁忙错误"""
+        import app.core.admission_control as admission_control
+
+        app, manager = sse_app
+        monkeypatch.setattr(admission_control, "_current_middleware", None)
+        middleware = admission_control.AdmissionControlMiddleware(
+            app=None, route_classes=[admission_control.RouteClass("heavy", 1, 0, 0.05)]
+        )
+
+        async def run():
+            session = manager.create()
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                await client.post(f"/api/mcp/messages?session_id={session.id}", json=[
+                    {"jsonrpc": "2.0", "id": 1, "method": "tools/call",
+                     "params": {"name": "sse_wait", "arguments": {"seconds": 0.1}}},
+                    {"jsonrpc": "2.0", "id": 2, "method": "tools/call",
+                     "params": {"name": "sse_wait", "arguments": {"seconds": 0.1}}},
+                ])
+
+            responses = {}
+            while len(responses) < 2:
+                frame = await session.next_frame(1.0)
+                assert frame is not None
+                message = _data(frame)
+                responses[message["id"]] = message
+            return responses
+
+        responses = asyncio.run(run())
+        results = sorted(responses.values(), key=lambda m: "error" in m)
+        assert results[0]["result"]["content"][0]["text"] == "waited 0.1"
+        assert results[1]["error"]["code"] == mcp_router.JSONRPC_SERVER_BUSY
+        assert middleware.limiters["heavy"].active == 0
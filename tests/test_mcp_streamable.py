@@ -0,0 +1,167 @@
+"""
+MCP Streamable HTTP 端点测试
+MCP Streamable HTTP Endpoint Tests
+"""
+
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+import app.routers.mcp as mcp_router
+from app.core.mcp_permissions import refresh_permission_manager
+from app.tools.dispatcher import ToolDispatcher
+from app.tools.registry import clear_registry, mcp_tool
+
+SCHEMA = {"type": "object", "properties": {"value": {"type": "integer"}}, "required": []}
+
+
+class FakeToolsService:
+    def __init__(self, names):
+        self.enabled = set(names)
+        self.calls = 0
+
+    def get_tools(self, enabled_only=True):
+        self.calls += 1
+        return [{"name": name} for name in sorted(self.enabled)]
+
+
+class DispatcherServer:
+    """直接使用调度器执行工具的服务器"""
+
+    def __init__(self, dispatcher):
+        self.dispatcher = dispatcher
+
+    async def call_tool(self, tool_name, arguments):
+        return str(await self.dispatcher.call(tool_name, arguments))
+
+
+@pytest.fixture
+def dispatcher(monkeypatch):
+    refresh_permission_manager("local")
+    clear_registry()
+
+    @mcp_tool(name="sleep", description="异步等待", category="rpc", schema=SCHEMA)
+    async def sleep(value: int = 0):
+        await asyncio.sleep(0.1)
+        return value
+
+    @mcp_tool(name="add", description="加一", category="rpc", schema=SCHEMA)
+    def add(value: int = 0):
+        return value + 1
+
+    dispatcher = ToolDispatcher(tools_service=FakeToolsService({"rpc_sleep", "rpc_add"}))
+    monkeypatch.setattr(mcp_router, "get_tool_dispatcher", lambda: dispatcher)
+    monkeypatch.setattr(mcp_router, "get_mcp_server", lambda: DispatcherServer(dispatcher))
+    yield dispatcher
+    clear_registry()
+    refresh_permission_manager()
+
+
+def _post(payload):
+    app = FastAPI()
+    app.include_router(mcp_router.router, prefix="/api")
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            body = payload if isinstance(payload, (bytes, str)) else json.dumps(payload)
+            return await client.post("/api/mcp/streamable", content=body,
+                                     headers={"content-type": "application/json"})
+
+    return asyncio.run(run())
+
+
+class TestStreamableEndpoint:
+    """测试 JSON-RPC 处理"""
+
+    def test_tools_list_from_snapshot(self, dispatcher):
+        """测试 tools/list 返回真实注册表快照并复用缓存"""
+        first = _post({"jsonrpc": "2.0", "id": 1, "method": "tools/list"}).json()
+        second = _post({"jsonrpc": "2.0", "id": 2, "method": "tools/list"}).json()
+
+        names = [tool["name"] for tool in first["result"]["tools"]]
+        assert names == ["rpc_add", "rpc_sleep"]
+        assert first["result"]["tools"][0]["inputSchema"] == SCHEMA
+        assert first["result"]["_meta"]["version"] == second["result"]["_meta"]["version"]
+        assert dispatcher.tools_service.calls == 1
+
+        dispatcher.tools_service.enabled.discard("rpc_add")
+        dispatcher.invalidate()
+        third = _post({"jsonrpc": "2.0", "id": 3, "method": "tools/list"}).json()
+        assert [tool["name"] for tool in third["result"]["tools"]] == ["rpc_sleep"]
+        assert third["result"]["_meta"]["version"] > first["result"]["_meta"]["version"]
+
+    def test_batch_runs_concurrently(self, dispatcher):
+        """测试批量请求并发执行并按原顺序返回，通知不产生响应"""
+        batch = [
+            {"jsonrpc": "2.0", "id": i, "method": "tools/call", "params": {"name": "rpc_sleep", "arguments": {"value": i}}}
+            for i in range(5)
+        ]
+        batch.append({"jsonrpc": "2.0", "method": "notifications/initialized"})
+        batch.append({"jsonrpc": "2.0", "id": "add", "method": "tools/call", "params": {"name": "rpc_add", "arguments": {"value": 1}}})
+
+        start = time.perf_counter()
+        response = _post(batch)
+        elapsed = time.perf_counter() - start
+
+        results = response.json()
+        assert [r["id"] for r in results] == [0, 1, 2, 3, 4, "add"]
+        assert [r["result"]["content"][0]["text"] for r in results] == ["0", "1", "2", "3", "4", "2"]
+        # 5 个 0.1 秒的调用并发执行
+        assert elapsed < 0.4
+
+    def test_notifications_only(self, dispatcher):
+        """测试只有通知时返回 202 且无响应体"""
+        single = _post({"jsonrpc": "2.0", "method": "notifications/initialized"})
+        batch = _post([{"jsonrpc": "2.0", "method": "notifications/initialized"}])
+        assert single.status_code == 202
+        assert single.content == b""
+        assert batch.status_code == 202
+
+    def test_errors(self, dispatcher):
+        """测试解析错误、无效请求和未知工具"""
+        assert _post(b"{not json").json()["error"]["code"] == mcp_router.JSONRPC_PARSE_ERROR
+        assert _post([]).json()["error"]["code"] == mcp_router.JSONRPC_INVALID_REQUEST
+
+        results = _post([
+            1,
+            {"jsonrpc": "2.0", "id": 7, "method": "tools/call", "params": {"name": "rpc_missing"}},
+            {"jsonrpc": "2.0", "id": 8, "method": "ping"},
+        ]).json()
+        assert results[0]["error"]["code"] == mcp_router.JSONRPC_INVALID_REQUEST
+        assert results[1]["id"] == 7
+        assert "not found" in results[1]["error"]["message"]
+        assert results[2] == {"jsonrpc": "2.0", "id": 8, "result": {}}
+
+    def test_error_codes(self, dispatcher):
+        """测试未知方法与非法参数使用标准 JSON-RPC 错误码"""
+        results = _post([
+            {"jsonrpc": "2.0", "id": 1, "method": "tools/unknown"},
+            {"jsonrpc": "2.0", "id": 2, "method": "tools/call", "params": {"name": 1}},
+            {"jsonrpc": "2.0", "id": 3, "method": "tools/call", "params": []},
+        ]).json()
+        assert [r["error"]["code"] for r in results] == [
+            mcp_router.JSONRPC_METHOD_NOT_FOUND,
+            mcp_router.JSONRPC_INVALID_PARAMS,
+            mcp_router.JSONRPC_INVALID_PARAMS,
+        ]
+
+    def test_tool_call_disabled_in_remote(self, dispatcher, monkeypatch):
+        """测试远程环境下 tools/call 与 /call-tool 一样被拒绝"""
+
+        class RemoteConfigService:
+            def is_tool_call_allowed(self):
+                return False
+
+        monkeypatch.setattr(mcp_router, "get_mcp_config_service", lambda: RemoteConfigService())
+        results = _post([
+            {"jsonrpc": "2.0", "id": 1, "method": "tools/call", "params": {"name": "rpc_add", "arguments": {"value": 1}}},
+            {"jsonrpc": "2.0", "id": 2, "method": "tools/list"},
+        ]).json()
+        assert results[0]["error"]["data"]["error_code"] == "TOOL_CALL_DISABLED"
+        assert "result" not in results[0]
+        assert "tools" in results[1]["result"]
@@ -0,0 +1,310 @@
+"""
+MCP 流式工具结果测试
+MCP Streaming Tool Results Tests
+"""
+
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+import app.routers.mcp as mcp_router
+import app.tools.streaming as streaming
+from app.core.mcp_permissions import refresh_permission_manager
+from app.tools.dispatcher import ToolDispatcher
+from app.tools.file_tools import read as file_read
+from app.tools.registry import clear_registry, mcp_tool
+from app.tools.streaming import ResultStore, StreamingResult, chunk_sink, read_text_page
+
+SCHEMA = {"type": "object", "properties": {"count": {"type": "integer"}}, "required": []}
+
+
+class FakeToolsService:
+    def __init__(self, names):
+        self.names = names
+
+    def get_tools(self, enabled_only=True):
+        return [{"name": name} for name in self.names]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = ResultStore(directory=str(tmp_path / "results"), ttl=60, max_handles=4)
+    monkeypatch.setattr(streaming, "_result_store", store)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def dispatcher():
+    refresh_permission_manager("local")
+    clear_registry()
+
+    @mcp_tool(name="sync_chunks", description="同步分块", category="stream", schema=SCHEMA)
+    def sync_chunks(count: int = 3):
+        return StreamingResult((f"{i:04d}" for i in range(count)), metadata={"success": True, "count": count})
+
+    @mcp_tool(name="async_chunks", description="异步分块", category="stream", schema=SCHEMA)
+    async def async_chunks(count: int = 3):
+        async def chunks():
+            for i in range(count):
+                await asyncio.sleep(0)
+                yield bytes([i]) * 4
+        return StreamingResult(chunks(), metadata={"success": True}, field="data", binary=True)
+
+    @mcp_tool(name="big_text", description="大文本", category="stream", schema=SCHEMA)
+    def big_text(count: int = 100):
+        return {"success": True, "text": "x" * count}
+
+    dispatcher = ToolDispatcher(
+        tools_service=FakeToolsService(["stream_sync_chunks", "stream_async_chunks", "stream_big_text"]),
+        max_inline_bytes=32,
+    )
+    yield dispatcher
+    clear_registry()
+    refresh_permission_manager()
+
+
+class TestResultSpooling:
+    """测试流式结果的内联、落盘与转发"""
+
+    def test_small_stream_inlined(self, dispatcher, store):
+        """测试不超过内联上限的流式结果直接内联"""
+        result = asyncio.run(dispatcher.call("stream_sync_chunks", {"count": 3}))
+        assert result == {"success": True, "count": 3, "content": "000000010002"}
+
+        binary = asyncio.run(dispatcher.call("stream_async_chunks", {"count": 2}))
+        assert binary["data"] == "AAAAAAEBAQE="
+        assert binary["content_encoding"] == "base64"
+        assert store.get_status()["handles"] == 0
+
+    def test_large_stream_spilled_to_handle(self, dispatcher, store):
+        """测试超过内联上限的流式结果写入句柄，并可分页读回"""
+        result = asyncio.run(dispatcher.call("stream_sync_chunks", {"count": 20}))
+        assert result["content"] is None
+        descriptor = result["result_handle"]
+        assert descriptor["size"] == 80
+
+        handle = store.get(descriptor["id"])
+        text, next_offset = read_text_page(store, handle, 0, 50)
+        rest, end = read_text_page(store, handle, next_offset, 50)
+        assert text + rest == "".join(f"{i:04d}" for i in range(20))
+        assert end == 80
+        # 带句柄的结果记录的是完整内容大小
+        assert dispatcher.tracer.slowest(1)[0]["result_bytes"] >= 80
+
+    def test_sink_receives_chunks(self, dispatcher, store):
+        """测试注册转发回调后分块逐个转发，最终结果不含内容"""
+        received = []
+
+        async def sink(chunk, index):
+            received.append((index, chunk))
+
+        async def run():
+            with chunk_sink(sink):
+                return await dispatcher.call("stream_sync_chunks", {"count": 3})
+
+        result = asyncio.run(run())
+        assert received == [(0, "0000"), (1, "0001"), (2, "0002")]
+        assert result["streamed"] is True
+        assert result["chunks"] == 3
+        assert result["total_bytes"] == 12
+        assert result["content"] is None
+
+    def test_call_text_spills_large_results(self, dispatcher, store):
+        """测试序列化后超过内联上限的文本结果返回句柄和预览"""
+        text = asyncio.run(dispatcher.call_text("stream_big_text", {"count": 100}))
+        payload = json.loads(text)
+        assert payload["truncated"] is True
+        handle = store.get(payload["result_handle"]["id"])
+        assert json.loads(store.read(handle, 0, handle.size))["text"] == "x" * 100
+
+    def test_utf8_page_boundary(self, store):
+        """测试分页不会截断多字节字符"""
+        handle = asyncio.run(streaming.spill_text("中文内容", store))
+        text, next_offset = read_text_page(store, handle, 0, 4)
+        assert text == "中"
+        assert next_offset == 3
+
+
+class TestResultStore:
+    """测试句柄淘汰"""
+
+    def test_capacity_and_ttl(self, store):
+        handles = [asyncio.run(streaming.spill_text(str(i), store)) for i in range(6)]
+        assert store.get(handles[0].id) is None
+        assert store.get(handles[5].id) is not None
+        assert not handles[0].path.exists()
+
+        handles[5].expires_at = time.time() - 1
+        assert store.get(handles[5].id) is None
+        assert store.delete(handles[4].id) is True
+        assert store.get_status()["handles"] == 2
+
+    def test_byte_budget(self, store):
+        """测试临时文件总大小上限：淘汰最旧句柄，单个超限结果被拒绝"""
+        store.max_bytes = 10
+        first = asyncio.run(streaming.spill_text("a" * 6, store))
+        second = asyncio.run(streaming.spill_text("b" * 6, store))
+        assert store.get(first.id) is None and not first.path.exists()
+        assert store.get(second.id) is not None
+        assert store.get_status()["bytes"] == 6
+
+        with pytest.raises(ValueError):
+            asyncio.run(streaming.spill_text("c" * 11, store))
+        assert sorted(p.name for p in store.directory.iterdir()) == [second.path.name]
+
+    def test_spool_stops_at_budget(self, store):
+        """测试落盘中超过总大小上限时中止并删除临时文件"""
+        store.max_bytes = 16
+        result = StreamingResult(iter(["x" * 8] * 4))
+        with pytest.raises(ValueError):
+            asyncio.run(streaming.consume_stream(result, streaming.run_file_io, store, max_inline=4))
+        assert list(store.directory.iterdir()) == []
+
+
+class TestStreamingEndpoints:
+    """测试结果读取接口与 Streamable HTTP 的分块推送"""
+
+    def test_result_endpoints(self, dispatcher, store, monkeypatch):
+        monkeypatch.setattr(mcp_router, "get_tool_dispatcher", lambda: dispatcher)
+        app = FastAPI()
+        app.include_router(mcp_router.router, prefix="/api")
+
+        async def run():
+            result = await dispatcher.call("stream_sync_chunks", {"count": 20})
+            handle_id = result["result_handle"]["id"]
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                page = await client.get(f"/api/mcp/results/{handle_id}", params={"offset": 4, "length": 8})
+                full = await client.get(f"/api/mcp/results/{handle_id}")
+                rpc = await client.post("/api/mcp/streamable", json={
+                    "jsonrpc": "2.0", "id": 1, "method": "results/read",
+                    "params": {"id": handle_id, "offset": 76, "length": 100},
+                })
+                deleted = await client.delete(f"/api/mcp/results/{handle_id}")
+                missing = await client.get(f"/api/mcp/results/{handle_id}")
+            return page, full, rpc.json(), deleted.json(), missing
+
+        page, full, rpc, deleted, missing = asyncio.run(run())
+        assert page.text == "00010002"
+        assert page.headers["x-next-offset"] == "12"
+        assert len(full.text) == 80
+        assert rpc["result"]["content"][0]["text"] == "0019"
+        assert rpc["result"]["_meta"]["eof"] is True
+        assert deleted["success"] is True
+        assert missing.status_code == 404
+
+    def test_streamable_event_stream(self, dispatcher, store, monkeypatch):
+        """测试 Accept: text/event-stream 时先推送部分结果再推送响应"""
+        monkeypatch.setattr(mcp_router, "get_tool_dispatcher", lambda: dispatcher)
+
+        class FakeServer:
+            async def call_tool(self, name, arguments):
+                return await dispatcher.call_text(name, arguments)
+
+        monkeypatch.setattr(mcp_router, "get_mcp_server", lambda: FakeServer())
+        # 最终响应只含元数据，放宽内联上限避免其本身被写入句柄
+        monkeypatch.setattr(dispatcher, "max_inline_bytes", 4096)
+        app = FastAPI()
+        app.include_router(mcp_router.router, prefix="/api")
+
+        async def run():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.post(
+                    "/api/mcp/streamable",
+                    json={"jsonrpc": "2.0", "id": 7, "method": "tools/call",
+                          "params": {"name": "stream_sync_chunks", "arguments": {"count": 2}}},
+                    headers={"Accept": "application/json, text/event-stream"},
+                )
+            return response
+
+        response = asyncio.run(run())
+        assert response.headers["content-type"].startswith("text/event-stream")
+        messages = [json.loads(line[len("data: "):]) for line in response.text.splitlines() if line.startswith("data: ")]
+        partials = [m for m in messages if m.get("method") == "notifications/tools/partial"]
+        assert [p["params"]["content"]["text"] for p in partials] == ["0000", "0001"]
+        assert partials[0]["params"]["progressToken"] == 7
+        final = messages[-1]
+        assert final["id"] == 7
+        assert json.loads(final["result"]["content"][0]["text"])["streamed"] is True
+
+
+class TestFileReadStreaming:
+    """测试大文件读取改为流式结果"""
+
+    def test_large_file_streams(self, tmp_path, monkeypatch):
+        import app.tools.file_tools as file_tools
+        monkeypatch.setattr(file_tools, "MCP_MAX_INLINE_RESULT_BYTES", 10)
+        path = tmp_path / "big.txt"
+        path.write_text("0123456789abcdef", encoding="utf-8")
+
+        result = file_read(str(path))
+        assert isinstance(result, StreamingResult)
+        assert "".join(result.chunks) == "0123456789abcdef"
+        assert isinstance(file_read(str(path), max_lines=1), dict)
+
+    def test_decode_error_returns_error_result(self, tmp_path, monkeypatch, store):
+        """测试流式读取中途解码失败时返回错误结果，不抛出异常"""
+        import app.tools.file_tools as file_tools
+        monkeypatch.setattr(file_tools, "MCP_MAX_INLINE_RESULT_BYTES", 10)
+        path = tmp_path / "bad.txt"
+        path.write_bytes(b"0123456789abcdef\xff")
+
+        result = file_read(str(path))
+        assert isinstance(result, StreamingResult)
+        output, _ = asyncio.run(streaming.consume_stream(result, streaming.run_file_io, store, max_inline=4))
+        assert output["success"] is False
+        assert output["error"].startswith("Encoding error")
+        assert store.get_status()["handles"] == 0
+
+
+class TestLargeToolResultsStream:
+    """测试网页与 GitHub 文件内容超过内联上限时以流式结果返回"""
+
+    def test_fetch_webpage_streams_html(self, scraping_tools, monkeypatch, store):
+        import app.tools.fetch_tools as fetch_tools
+        html = "<html><head><title>Big</title></head><body>" + "<p>x</p>" * 100 + "</body></html>"
+
+        async def fake_request(url, **kwargs):
+            return {"success": True, "status_code": 200, "headers": {}, "cache": "bypass", "url": url,
+                    "content_type": "text/html", "content": html, "content_text": html}
+
+        monkeypatch.setattr(fetch_tools, "http_request", fake_request)
+        monkeypatch.setattr(fetch_tools, "MCP_MAX_INLINE_RESULT_BYTES", 64)
+        result = asyncio.run(fetch_tools.fetch_webpage("http://example.com/"))
+        assert isinstance(result, StreamingResult)
+        assert result.metadata["title"] == "Big" and "html" not in result.metadata
+        output, total = asyncio.run(streaming.consume_stream(result, streaming.run_file_io, store, max_inline=64))
+        assert total == len(html)
+        handle = store.get(output["result_handle"]["id"])
+        assert store.read(handle, 0, total).decode("utf-8") == html
+
+    def test_github_file_contents_streams_decoded(self, monkeypatch, store):
+        import base64
+        import app.tools.github_tools as github_tools
+        text = "héllo\n" * 200
+        encoded = base64.encodebytes(text.encode("utf-8")).decode("ascii")
+
+        class FakeClient:
+            def get(self, endpoint, params=None):
+                return {"success": True, "data": {"path": "a.txt", "content": encoded, "encoding": "base64"}}
+
+        monkeypatch.setattr(github_tools, "github_client", FakeClient())
+        monkeypatch.setattr(github_tools, "MCP_MAX_INLINE_RESULT_BYTES", 64)
+        result = github_tools.github_get_file_contents("o", "r", "a.txt")
+        assert isinstance(result, StreamingResult)
+        assert "content" not in result.metadata["data"]
+        output, total = asyncio.run(streaming.consume_stream(result, streaming.run_file_io, store, max_inline=64))
+        handle = store.get(output["result_handle"]["id"])
+        assert store.read(handle, 0, total).decode("utf-8") == text
+
+        # 不是 UTF-8 文本时与整体解码失败一致，返回未解码的原始结果
+        encoded = base64.b64encode(b"\xff" * 200).decode("ascii")
+        result = github_tools.github_get_file_contents("o", "r", "a.bin")
+        output, _ = asyncio.run(streaming.consume_stream(result, streaming.run_file_io, store, max_inline=64))
+        assert output["data"]["content"] == encoded and "decoded_content" not in output["data"]
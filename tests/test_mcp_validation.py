@@ -0,0 +1,183 @@
+"""
+MCP 工具参数校验测试
+MCP Tool Argument Validation Tests
+"""
+
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+import app.routers.mcp as mcp_router
+from app.core.mcp_permissions import refresh_permission_manager
+from app.tools.dispatcher import ToolDispatcher
+from app.tools.manifest import import_tool_modules
+from app.tools.registry import clear_registry, get_registered_tools, get_tool_validator, mcp_tool
+from app.tools.validation import SchemaCompileError, ToolArgumentError, compile_validator
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "q": {"type": "string", "minLength": 1, "pattern": "^[a-z]+$"},
+        "per_page": {"type": "integer", "minimum": 1, "maximum": 100, "default": 30},
+        "order": {"type": "string", "enum": ["asc", "desc"], "default": "desc"},
+        "labels": {"type": "array", "items": {"type": "string"}, "maxItems": 2, "default": []},
+        "page": {"type": "integer", "default": 1},
+        "value": {"oneOf": [{"type": "integer"}, {"type": "string"}]},
+    },
+    "required": ["q"],
+}
+
+
+class TestCompileValidator:
+    """测试 Schema 编译与校验"""
+
+    def test_valid_arguments_get_defaults_in_place(self):
+        """测试校验通过后原地补全默认值，只补全实现函数接受的参数"""
+        validator = compile_validator("t", SCHEMA, ["q", "per_page", "order", "labels"])
+        arguments = {"q": "abc", "order": "asc"}
+        assert validator.validate(arguments) is arguments
+        assert arguments == {"q": "abc", "order": "asc", "per_page": 30, "labels": []}
+
+        # 可变默认值每次独立
+        again = validator.validate({"q": "abc"})
+        again["labels"].append("x")
+        assert validator.validate({"q": "abc"})["labels"] == []
+
+    def test_collects_errors(self):
+        """测试一次返回所有错误及其位置"""
+        validator = compile_validator("t", SCHEMA)
+        with pytest.raises(ToolArgumentError) as exc_info:
+            validator.validate({
+                "per_page": 0, "order": "up", "labels": ["a", 1, "c"], "value": 1.5, "page": True,
+            })
+        errors = exc_info.value.errors
+        assert "arguments.q: 缺少必填参数" in errors
+        assert "arguments.per_page: 不能小于 1" in errors
+        assert any(e.startswith("arguments.order: 取值必须是") for e in errors)
+        assert "arguments.labels[1]: 应为 string 类型" in errors
+        assert "arguments.labels: 元素数不能多于 2" in errors
+        assert any(e.startswith("arguments.value: 应恰好符合 oneOf") for e in errors)
+        # bool 不是 integer
+        assert "arguments.page: 应为 integer 类型" in errors
+
+    def test_pattern_and_additional_properties(self):
+        validator = compile_validator("t", {
+            "type": "object",
+            "properties": {"q": {"type": "string", "pattern": "^[a-z]+$"}},
+            "additionalProperties": False,
+        })
+        validator.validate({"q": "abc"})
+        with pytest.raises(ToolArgumentError) as exc_info:
+            validator.validate({"q": "ABC", "extra": 1})
+        assert len(exc_info.value.errors) == 2
+
+    def test_null_allowed_for_none_default(self):
+        """测试声明 "default": None 的属性可以显式传 null"""
+        validator = compile_validator("t", {
+            "type": "object",
+            "properties": {
+                "timestamp": {"type": ["number", "string"], "default": None},
+                "count": {"type": "integer", "default": 1},
+            },
+        })
+        assert validator.validate({"timestamp": None}) == {"timestamp": None, "count": 1}
+        with pytest.raises(ToolArgumentError):
+            validator.validate({"count": None})
+
+    def test_argument_size_limit(self, monkeypatch):
+        """测试参数字符串总长度上限（嵌套值同样计入）"""
+        monkeypatch.setattr(mcp_router, "MCP_MAX_ARGUMENT_SIZE", 100)
+        mcp_router.MCPToolCallRequest(name="t", arguments={"content": "x" * 90})
+        with pytest.raises(ValueError):
+            mcp_router.MCPToolCallRequest(name="t", arguments={"content": "x" * 101})
+        with pytest.raises(ValueError):
+            mcp_router.MCPToolCallRequest(name="t", arguments={"items": [{"a": "x" * 60}, {"b": "y" * 60}]})
+
+    def test_invalid_schema_rejected_at_registration(self):
+        """测试不合法的 Schema 在注册时报错"""
+        with pytest.raises(SchemaCompileError):
+            compile_validator("t", {"type": "object", "properties": {"x": {"type": "text"}}})
+        with pytest.raises(SchemaCompileError):
+            compile_validator("t", {"type": "object", "properties": {"x": {"pattern": "("}}})
+
+    def test_builtin_tool_schemas_compile(self):
+        """测试所有内置工具的 Schema 都能编译"""
+        clear_registry()
+        try:
+            import_tool_modules()
+            tools = get_registered_tools()
+            assert tools
+            assert all(get_tool_validator(tool.name) is not None for tool in tools)
+        finally:
+            clear_registry()
+
+
+class FakeToolsService:
+    def get_tools(self, enabled_only=True):
+        return [{"name": "check_search"}]
+
+
+@pytest.fixture
+def dispatcher():
+    refresh_permission_manager("local")
+    clear_registry()
+    calls = []
+
+    @mcp_tool(name="search", description="搜索", category="check", schema=SCHEMA)
+    def search(q: str, per_page: int = 10, order: str = "desc"):
+        calls.append((q, per_page, order))
+        return {"success": True, "count": per_page}
+
+    yield ToolDispatcher(tools_service=FakeToolsService()), calls
+    clear_registry()
+    refresh_permission_manager()
+
+
+class TestDispatcherValidation:
+    """测试调度前校验"""
+
+    def test_invalid_call_not_executed(self, dispatcher):
+        """测试参数不合法时不执行工具，并按工具计数"""
+        tool_dispatcher, calls = dispatcher
+        with pytest.raises(ToolArgumentError):
+            asyncio.run(tool_dispatcher.call("check_search", {"q": "abc", "per_page": 500}))
+        assert calls == []
+
+        # 只补全函数接受的参数，Schema 默认值覆盖函数默认值
+        assert asyncio.run(tool_dispatcher.call("check_search", {"q": "abc"})) == {"success": True, "count": 30}
+        assert calls == [("abc", 30, "desc")]
+
+        stats = tool_dispatcher.get_tool_timings()["check_search"]
+        assert stats["invalid"] == 1
+        assert stats["calls"] == 1
+
+    def test_jsonrpc_invalid_params(self, dispatcher, monkeypatch):
+        """测试 JSON-RPC 调用返回 -32602 和错误列表"""
+        tool_dispatcher, _ = dispatcher
+
+        class FakeServer:
+            async def call_tool(self, name, arguments):
+                return await tool_dispatcher.call_text(name, arguments)
+
+        monkeypatch.setattr(mcp_router, "get_tool_dispatcher", lambda: tool_dispatcher)
+        monkeypatch.setattr(mcp_router, "get_mcp_server", lambda: FakeServer())
+        app = FastAPI()
+        app.include_router(mcp_router.router, prefix="/api")
+
+        async def run():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.post("/api/mcp/streamable", json={
+                    "jsonrpc": "2.0", "id": 3, "method": "tools/call",
+                    "params": {"name": "check_search", "arguments": {"per_page": "ten"}},
+                })
+            return response.json()
+
+        response = asyncio.run(run())
+        assert response["error"]["code"] == -32602
+        assert response["error"]["data"]["errors"] == [
+            "arguments.q: 缺少必填参数",
+            "arguments.per_page: 应为 integer 类型",
+        ]
@@ -0,0 +1,119 @@
+"""
+Prometheus 指标单元测试
+Prometheus Metrics Unit Tests
+"""
+
+import threading
+
+from fastapi.testclient import TestClient
+
+from app.core.metrics import MetricsRegistry, MetricsMiddleware, get_metrics_registry
+
+
+class TestMetricTypes:
+    """测试指标类型"""
+
+    def test_counter_merges_thread_shards(self):
+        """测试计数器合并多线程分片"""
+        registry = MetricsRegistry()
+        counter = registry.counter("test_total", "测试计数", ("kind",))
+
+        def worker():
+            for _ in range(1000):
+                counter.inc(("a",))
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert counter.get(("a",)) == 4000
+        assert 'test_total{kind="a"} 4000' in registry.render()
+
+    def test_histogram_buckets_are_cumulative(self):
+        """测试直方图输出累计桶"""
+        registry = MetricsRegistry()
+        hist = registry.histogram("test_seconds", "测试延迟", buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 5.0):
+            hist.observe(value)
+
+        text = registry.render()
+        assert 'test_seconds_bucket{le="0.1"} 1' in text
+        assert 'test_seconds_bucket{le="1"} 3' in text
+        assert 'test_seconds_bucket{le="+Inf"} 4' in text
+        assert "test_seconds_count 4" in text
+        assert "# TYPE test_seconds histogram" in text
+
+    def test_histogram_quantile(self):
+        """测试分位数估算"""
+        registry = MetricsRegistry()
+        hist = registry.histogram("test_q", "测试分位数", buckets=(1.0, 2.0))
+        for _ in range(10):
+            hist.observe(0.5)
+        assert 0 < hist.quantile(0.5) <= 1.0
+        assert registry.histogram("test_empty", "空").quantile(0.5) is None
+
+    def test_register_conflict(self):
+        """测试重复注册不同定义的指标"""
+        registry = MetricsRegistry()
+        registry.counter("dup", "x")
+        assert registry.counter("dup", "x") is registry.get("dup")
+        try:
+            registry.histogram("dup", "x")
+            assert False, "应抛出 ValueError"
+        except ValueError:
+            pass
+
+    def test_collector_output_and_failure_isolation(self):
+        """测试采集回调输出，异常回调不影响其他指标"""
+        registry = MetricsRegistry()
+        registry.register_collector(lambda: [("test_depth", "gauge", "深度", [({"q": "x"}, 3)])])
+
+        def broken():
+            raise RuntimeError("boom")
+
+        registry.register_collector(broken)
+        assert 'test_depth{q="x"} 3' in registry.render()
+
+
+class TestMetricsEndpoint:
+    """测试 /metrics 端点和中间件"""
+
+    def test_metrics_endpoint_uses_route_template(self):
+        """测试按路由模板统计请求"""
+        from app.main import app
+
+        client = TestClient(app)
+        client.get("/health")
+        client.get("/api/models/some-slug-that-does-not-exist")
+
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        text = response.text
+        assert 'lazyai_http_requests_total{method="GET",route="/health",status="200"}' in text
+        assert 'route="/api/models/{slug}"' in text
+        assert "some-slug-that-does-not-exist" not in text
+        assert "lazyai_http_request_duration_seconds_bucket" in text
+        assert "process_resident_memory_bytes" in text
+
+    def test_record_counts(self):
+        """测试重复记录按路由模板累加"""
+        registry = MetricsRegistry()
+        middleware = MetricsMiddleware(app=None, registry=registry)
+
+        class Route:
+            path_format = "/api/items/{item_id}"
+
+        scope = {"type": "http", "method": "GET", "route": Route()}
+        for _ in range(1000):
+            middleware.in_flight.inc()
+            middleware.record(scope, 200, 0.003, 512)
+            middleware.in_flight.dec()
+
+        assert registry.get("lazyai_http_requests_total").get(("GET", "/api/items/{item_id}", "200")) == 1000
+
+    def test_global_registry_singleton(self):
+        """测试全局注册表单例"""
+        assert get_metrics_registry() is get_metrics_registry()
@@ -0,0 +1,160 @@
+"""
+前端静态资源服务测试
+Static Asset Server Tests
+"""
+
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.static_assets import (
+    StaticAssetServer,
+    IMMUTABLE_CACHE_CONTROL,
+    REVALIDATE_CACHE_CONTROL,
+    precompress_directory,
+)
+
+HASHED_JS = "static/js/main.3f2a1b9c.js"
+
+
+@pytest.fixture
+def build_dir(tmp_path):
+    """构造一个 CRA 风格的构建目录"""
+    (tmp_path / "static" / "js").mkdir(parents=True)
+    (tmp_path / "index.html").write_text("<html><body>app</body></html>" * 50)
+    (tmp_path / HASHED_JS).write_text("console.log('hello');" * 200)
+    (tmp_path / "favicon.svg").write_text("<svg></svg>")
+    (tmp_path / "asset-manifest.json").write_text(json.dumps({
+        "files": {"main.js": "/" + HASHED_JS, "index.html": "/index.html"},
+        "entrypoints": [HASHED_JS],
+    }))
+    return tmp_path
+
+
+@pytest.fixture
+def client(build_dir):
+    app = FastAPI()
+
+    @app.get("/api/ping")
+    async def ping():
+        return {"ok": True}
+
+    app.mount("/", StaticAssetServer(build_dir), name="frontend")
+    return TestClient(app)
+
+
+class TestStaticAssetServer:
+    """测试静态资源服务"""
+
+    def test_hashed_asset_is_immutable(self, client, build_dir):
+        """测试哈希资源长期缓存"""
+        response = client.get("/" + HASHED_JS)
+        assert response.status_code == 200
+        assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+        assert response.headers["content-type"].startswith("application/javascript")
+        assert response.content == (build_dir / HASHED_JS).read_bytes()
+
+    def test_unhashed_asset_revalidates(self, client):
+        """测试非哈希资源需要重新验证"""
+        response = client.get("/favicon.svg")
+        assert response.headers["cache-control"] == REVALIDATE_CACHE_CONTROL
+
+    def test_if_none_match_returns_304(self, client):
+        """测试 ETag 命中返回 304"""
+        etag = client.get("/" + HASHED_JS).headers["etag"]
+        response = client.get("/" + HASHED_JS, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+
+    def test_range_request(self, client, build_dir):
+        """测试 Range 请求"""
+        data = (build_dir / HASHED_JS).read_bytes()
+        response = client.get("/" + HASHED_JS, headers={"Range": "bytes=10-19"})
+        assert response.status_code == 206
+        assert response.content == data[10:20]
+        assert response.headers["content-range"] == f"bytes 10-19/{len(data)}"
+
+        suffix = client.get("/" + HASHED_JS, headers={"Range": "bytes=-5"})
+        assert suffix.content == data[-5:]
+
+        invalid = client.get("/" + HASHED_JS, headers={"Range": f"bytes={len(data) + 10}-"})
+        assert invalid.status_code == 416
+
+    def test_precompressed_sibling(self, client, build_dir):
+        """测试优先返回预压缩文件"""
+        stats = precompress_directory(build_dir)
+        assert stats["gzip"] >= 1
+        server_client = TestClient(_app_for(build_dir))
+
+        response = server_client.get("/" + HASHED_JS, headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert response.content == (build_dir / HASHED_JS).read_bytes()
+
+        identity = server_client.get("/" + HASHED_JS, headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in identity.headers
+        assert identity.headers["etag"] != response.headers["etag"]
+
+    def test_spa_fallback_served_from_memory(self, client, build_dir):
+        """测试 SPA 路由回退到内存中的 index.html"""
+        index = (build_dir / "index.html").read_bytes()
+        (build_dir / "index.html").unlink()
+
+        response = client.get("/settings/profile")
+        assert response.status_code == 200
+        assert response.content == index
+        assert response.headers["cache-control"] == REVALIDATE_CACHE_CONTROL
+
+        not_modified = client.get("/", headers={"If-None-Match": response.headers["etag"]})
+        assert not_modified.status_code == 304
+
+    def test_api_paths_are_not_spa_routes(self, client):
+        """测试 API 路径不会回退到 index.html"""
+        assert client.get("/api/ping").json() == {"ok": True}
+        response = client.get("/api/does-not-exist")
+        assert response.status_code == 404
+        assert response.json() == {"detail": "Not Found"}
+
+    def test_path_traversal_rejected(self, build_dir):
+        """测试拒绝目录穿越"""
+        server = StaticAssetServer(build_dir)
+        assert server.get_entry("/../etc/passwd") is None
+        assert server.get_entry("/static/../../secret") is None
+
+    def test_unknown_paths_are_not_cached(self, build_dir):
+        """测试 SPA 深链接与扫描请求不会让元数据表增长"""
+        server = StaticAssetServer(build_dir)
+        known = len(server._entries)
+        for i in range(100):
+            assert server.get_entry(f"/deep/link/{i}") is None
+        assert len(server._entries) == known
+
+    def test_if_range_requires_strong_etag(self, client, build_dir):
+        """测试 If-Range 使用强比较，弱 ETag 返回完整内容"""
+        data = (build_dir / HASHED_JS).read_bytes()
+        etag = client.get("/" + HASHED_JS, headers={"Accept-Encoding": "identity"}).headers["etag"]
+
+        strong = client.get("/" + HASHED_JS, headers={"Range": "bytes=0-9", "If-Range": etag})
+        assert strong.status_code == 206
+
+        weak = client.get("/" + HASHED_JS, headers={"Range": "bytes=0-9", "If-Range": "W/" + etag})
+        assert weak.status_code == 200
+        assert weak.content == data
+
+    def test_index_encodings_have_distinct_etags(self, client):
+        """测试 index.html 的 gzip 与原始表示使用不同 ETag"""
+        gzipped = client.get("/", headers={"Accept-Encoding": "gzip"})
+        identity = client.get("/", headers={"Accept-Encoding": "identity"})
+        assert gzipped.headers["content-encoding"] == "gzip"
+        assert gzipped.headers["etag"] != identity.headers["etag"]
+
+        stale = client.get("/", headers={"Accept-Encoding": "identity", "If-None-Match": gzipped.headers["etag"]})
+        assert stale.status_code == 200
+
+
+def _app_for(build_dir):
+    app = FastAPI()
+    app.mount("/", StaticAssetServer(build_dir), name="frontend")
+    return app
@@ -221,8 +221,12 @@ class TestTimeTools:
 
     def test_format_default_current_time(self):
         """测试格式化当前时间（默认参数）"""
-        with patch('app.tools.time_tools.datetime.datetime') as mock_datetime:
+        with patch('app.tools.time_tools.datetime.datetime') as mock_datetime, \
+                patch('app.core.time_tools_service.get_time_tools_service') as mock_service:
+            mock_service.return_value.get_default_timezone.return_value = "local"
+            mock_service.return_value.should_display_timezone_info.return_value = False
             mock_now = Mock()
+            mock_now.astimezone.return_value = mock_now
             mock_now.strftime.return_value = "2023-12-31 23:59:59"
             mock_datetime.now.return_value = mock_now
 
@@ -231,6 +235,20 @@ class TestTimeTools:
             assert result == "2023-12-31 23:59:59"
             mock_datetime.now.assert_called_once()
 
+    def test_format_uses_configured_timezone(self):
+        """测试未指定时区时使用全局配置，且转换时间点而不是重新标注时区"""
+        with patch('app.core.time_tools_service.get_time_tools_service') as mock_service:
+            mock_service.return_value.get_default_timezone.return_value = "Asia/Shanghai"
+            mock_service.return_value.should_display_timezone_info.return_value = False
+
+            assert format(timestamp=1640995200, format="iso") == "2022-01-01T08:00:00+08:00"
+            assert format(timestamp=1640995200, format="iso", timezone="UTC") == "2022-01-01T00:00:00+00:00"
+
+            mock_service.return_value.should_display_timezone_info.return_value = True
+            detailed = format(timestamp=1640995200)
+            assert "Unix 时间戳: 1640995200" in detailed
+            assert "配置时区: Asia/Shanghai" in detailed
+
     def test_format_with_timestamp_unix(self):
         """测试格式化Unix时间戳"""
         result = format(timestamp=1640995200, format="formatted")